@@ -36,8 +36,18 @@ def get_contact_list_location(service_id, contact_list_id):
 
 
 def get_job_and_metadata_from_s3(service_id, job_id):
-    obj = get_s3_object(*get_job_location(service_id, job_id))
-    return obj.get()["Body"].read().decode("utf-8"), obj.get()["Metadata"]
+    response = get_s3_object(*get_job_location(service_id, job_id)).get()
+    return response["Body"].read().decode("utf-8"), response["Metadata"]
+
+
+def get_job_lines_and_metadata_from_s3(service_id, job_id):
+    """
+    Like get_job_and_metadata_from_s3, but rather than reading the whole file into memory returns an iterator
+    over its lines (including line endings), streamed from S3 as they're consumed.
+    """
+    response = get_s3_object(*get_job_location(service_id, job_id)).get()
+    lines = (line.decode("utf-8") for line in response["Body"].iter_lines(keepends=True))
+    return lines, response["Metadata"]
 
 
 def get_job_from_s3(service_id, job_id):
@@ -0,0 +1,156 @@
+"""
+Lets a process evict entries from every other process's in-memory caches of serialised models.
+
+DAO functions which change a cached model call `queue_cache_invalidation`. Once the database session has committed,
+the model's copies in the Redis cache are deleted and an invalidation message is published on a Redis pub/sub
+channel. Each process runs a listener thread which evicts the model from its memory caches when it receives one.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from flask import current_app
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app import db, redis_store
+from app.models import Template
+
+CACHE_INVALIDATION_CHANNEL = "serialised-model-cache-invalidation"
+
+_SESSION_INFO_KEY = "pending_cache_invalidations"
+
+
+class CacheInvalidationListener:
+    def __init__(self):
+        self._caches = defaultdict(list)
+        self._lock = threading.Lock()
+        self._pid = None
+        self._subscribed = False
+
+    @property
+    def listening(self):
+        # a forked process doesn't inherit the listener thread, so needs its own
+        return self._subscribed and self._pid == os.getpid()
+
+    def register(self, model, cache, lock):
+        self._caches[model].append((cache, lock))
+
+    def ensure_started(self):
+        if self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+
+            self._pid = os.getpid()
+            self._subscribed = False
+
+            if not (redis_store.active and current_app.config["SERIALISED_MODEL_CACHE_INVALIDATION_ENABLED"]):
+                return
+
+            threading.Thread(
+                target=self._listen,
+                args=(redis_store.redis_store, current_app.logger),
+                name="cache-invalidation-listener",
+                daemon=True,
+            ).start()
+
+    def evict(self, model, model_id):
+        model_id = str(model_id)
+        for cache, lock in self._caches[model]:
+            with lock:
+                # cache keys are the cached function's arguments, the first of which is the model's id
+                for key in [key for key in cache.keys() if key and str(key[0]) == model_id]:
+                    cache.pop(key, None)
+
+    def evict_all(self):
+        for caches in self._caches.values():
+            for cache, lock in caches:
+                with lock:
+                    cache.clear()
+
+    def _listen(self, redis_client, logger):
+        while True:
+            try:
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CACHE_INVALIDATION_CHANNEL)
+                # anything published while we weren't subscribed has been missed
+                self.evict_all()
+                self._subscribed = True
+
+                while True:
+                    if message := pubsub.get_message(timeout=1.0):
+                        data = json.loads(message["data"])
+                        self.evict(data["model"], data["id"])
+            except Exception:
+                self._subscribed = False
+                logger.exception("Cache invalidation listener lost its subscription, resubscribing")
+                time.sleep(1)
+
+
+cache_invalidation_listener = CacheInvalidationListener()
+
+
+def queue_cache_invalidation(model, model_id, redis_keys=()):
+    """
+    Invalidates the cached copies of a model once the current database session commits. Nothing is invalidated if
+    the session is rolled back instead.
+    """
+    db.session.info.setdefault(_SESSION_INFO_KEY, set()).add((model, str(model_id), tuple(redis_keys)))
+
+
+def queue_service_cache_invalidation(service_id):
+    queue_cache_invalidation("service", service_id, redis_keys=[f"service-{service_id}"])
+
+
+def queue_template_cache_invalidation(service_id, template_id):
+    queue_cache_invalidation(
+        "template", template_id, redis_keys=[f"service-{service_id}-template-{template_id}-version-None"]
+    )
+
+
+def queue_service_and_templates_cache_invalidation(service_id):
+    """
+    For changes to a service's SMS senders or email reply-to addresses. Serialised templates include the service's
+    default sender or reply-to address as their `reply_to_text`, so every template of the service is invalidated too.
+    """
+    queue_service_cache_invalidation(service_id)
+    for template_id in db.session.scalars(select(Template.id).where(Template.service_id == service_id)):
+        queue_template_cache_invalidation(service_id, template_id)
+
+
+def queue_email_branding_cache_invalidation(email_branding_id):
+    # not email_branding-{id}, which the admin app caches its own (differently shaped) copy under
+    queue_cache_invalidation(
+        "email_branding", email_branding_id, redis_keys=[f"api-email_branding-{email_branding_id}"]
+    )
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_cache_invalidations(session):
+    for model, model_id, redis_keys in session.info.pop(_SESSION_INFO_KEY, ()):
+        for redis_key in redis_keys:
+            redis_store.delete(redis_key)
+
+        cache_invalidation_listener.evict(model, model_id)
+
+        if redis_store.active:
+            try:
+                redis_store.redis_store.publish(
+                    CACHE_INVALIDATION_CHANNEL, json.dumps({"model": model, "id": model_id})
+                )
+            except Exception:
+                extra = {"model": model, "model_id": model_id}
+                current_app.logger.exception(
+                    "Failed to publish cache invalidation for %(model)s %(model_id)s", extra, extra=extra
+                )
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_cache_invalidations(session):
+    session.info.pop(_SESSION_INFO_KEY, None)
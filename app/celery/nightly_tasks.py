@@ -18,7 +18,7 @@ from notifications_utils.letter_timings import (
 )
 from notifications_utils.timezones import convert_utc_to_bst
 from sqlalchemy import CursorResult, Table, delete, func, inspect, select
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
 
 from app import db, notify_celery, zendesk_client
 from app.aws import s3
@@ -33,12 +33,20 @@ from app.constants import (
     TEMPLATE_EMAIL_FILE_S3_CLEANUP_CATCH_UP_WINDOW_DAYS,
 )
 from app.cronitor import cronitor
+from app.dao.dao_utils import dao_get_replication_lag_seconds
 from app.dao.fact_processing_time_dao import insert_update_processing_time
 from app.dao.inbound_sms_dao import delete_inbound_sms_older_than_retention
 from app.dao.jobs_dao import (
     dao_archive_job,
     dao_get_jobs_older_than_data_retention,
 )
+from app.dao.notification_partitions_dao import (
+    NOTIFICATION_PARTITIONS_TO_CREATE_AHEAD,
+    dao_archive_notification_partition,
+    dao_create_notification_partitions,
+    dao_get_notification_partitions,
+    dao_notification_partition_has_notifications_to_keep,
+)
 from app.dao.notifications_dao import (
     dao_get_notifications_processing_time_stats,
     dao_timeout_notifications,
@@ -62,6 +70,13 @@ from app.notifications.notifications_ses_callback import (
 )
 from app.utils import get_london_midnight_in_utc
 
+# how long each delete-notifications-for-service-and-type task spends deleting before queueing up the next one
+RETENTION_DELETE_TASK_DURATION = timedelta(minutes=1)
+RETENTION_DELETE_BATCH_SIZE = 10_000
+RETENTION_DELETE_REPLICATION_LAG_BACKOFF = timedelta(minutes=1)
+# how many times a service's deletion backs off before giving up until the next night's run
+RETENTION_DELETE_MAX_REPLICATION_LAG_BACKOFFS = 60
+
 
 @notify_celery.task(name="remove_sms_email_jobs")
 @cronitor("remove_sms_email_jobs")
@@ -286,13 +301,41 @@ def _delete_notifications_older_than_retention_by_type(
 
 
 @notify_celery.task(bind=True, name="delete-notifications-for-service-and-type")
-def delete_notifications_for_service_and_type(self, service_id, notification_type, datetime_to_delete_before):
+def delete_notifications_for_service_and_type(
+    self,
+    service_id,
+    notification_type,
+    datetime_to_delete_before,
+    after_created_at=None,
+    after_id=None,
+    replication_lag_backoffs=0,
+):
+    """
+    Moves batches of the service's notifications to notification_history for up to RETENTION_DELETE_TASK_DURATION,
+    walking through them in (created_at, id) order, then queues itself up to carry on from where it got to. Backs off
+    while the replica is lagging too far behind, up to RETENTION_DELETE_MAX_REPLICATION_LAG_BACKOFFS times.
+    """
     start = datetime.utcnow()
-    num_deleted = move_notifications_to_notification_history(
-        notification_type,
-        service_id,
-        datetime_to_delete_before,
-    )
+    after = (after_created_at, after_id) if after_created_at else None
+    num_deleted = 0
+    replication_lagging = False
+
+    while True:
+        if dao_get_replication_lag_seconds() > current_app.config["RETENTION_DELETE_MAX_REPLICATION_LAG_SECONDS"]:
+            replication_lagging = True
+            break
+
+        batch_deleted, after = move_notifications_to_notification_history(
+            notification_type,
+            service_id,
+            datetime_to_delete_before,
+            qry_limit=RETENTION_DELETE_BATCH_SIZE,
+            after=after,
+        )
+        num_deleted += batch_deleted
+        if after is None or datetime.utcnow() - start >= RETENTION_DELETE_TASK_DURATION:
+            break
+
     if num_deleted:
         end = datetime.utcnow()
         base_params = {
@@ -300,12 +343,14 @@ def delete_notifications_for_service_and_type(self, service_id, notification_typ
             "notification_type": notification_type,
             "deleted_record_count": num_deleted,
             "duration": end - start,
+            "rows_per_second": round(num_deleted / max((end - start).total_seconds(), 0.001)),
         }
         current_app.logger.info(
             (
                 "delete-notifications-for-service-and-type: "
                 "service: %(service_id)s, notification_type: %(notification_type)s, "
-                "count deleted: %(deleted_record_count)s, duration: %(duration)s"
+                "count deleted: %(deleted_record_count)s, duration: %(duration)s, "
+                "rows per second: %(rows_per_second)s"
             ),
             base_params,
             extra={
@@ -313,11 +358,30 @@ def delete_notifications_for_service_and_type(self, service_id, notification_typ
                 "duration": base_params["duration"].total_seconds(),
             },
         )
-        # if some things were deleted, there could be more! lets queue up a new task with the same params
-        # if there was nothing deleted, we've got no more work to do
+
+    if replication_lagging:
+        replication_lag_backoffs += 1
+
+    if replication_lag_backoffs > RETENTION_DELETE_MAX_REPLICATION_LAG_BACKOFFS:
+        # whatever's left will be picked up by the next night's run
+        current_app.logger.error(
+            "delete-notifications-for-service-and-type: giving up on service %s, notification_type %s after the "
+            "replica lagged %s times",
+            service_id,
+            notification_type,
+            replication_lag_backoffs,
+        )
+    elif after is not None or replication_lagging:
+        # there could be more! carry on from the last notification we got to, giving the replica a chance to catch up
+        # first if it's lagging behind
         delete_notifications_for_service_and_type.apply_async(
             args=(service_id, notification_type, datetime_to_delete_before),
+            kwargs={
+                **({"after_created_at": after[0], "after_id": after[1]} if after else {}),
+                "replication_lag_backoffs": replication_lag_backoffs,
+            },
             queue=QueueNames.REPORTING,
+            countdown=RETENTION_DELETE_REPLICATION_LAG_BACKOFF.seconds if replication_lagging else 0,
             MessageGroupId=self.message_group_id,
         )
     else:
@@ -341,6 +405,89 @@ def delete_test_notifications_for_service_and_type(service_id, notification_type
         )
 
 
+@notify_celery.task(name="create-notification-partitions")
+@cronitor("create-notification-partitions")
+def create_notification_partitions():
+    created = dao_create_notification_partitions(datetime.utcnow().date(), days=NOTIFICATION_PARTITIONS_TO_CREATE_AHEAD)
+
+    extra = {"partition_count": len(created), "partitions": ", ".join(partition.name for partition in created)}
+    current_app.logger.info(
+        "create-notification-partitions: created %(partition_count)s partitions %(partitions)s", extra, extra=extra
+    )
+
+    for partition in created:
+        if partition.moved_from_default:
+            # partitions are created a week ahead, so notifications only end up in the default partition if this
+            # task hasn't run for that long
+            extra = {"partition": partition.name, "moved_count": partition.moved_from_default}
+            current_app.logger.error(
+                "create-notification-partitions: moved %(moved_count)s notifications from notifications_default "
+                "into %(partition)s",
+                extra,
+                extra=extra,
+            )
+
+
+@notify_celery.task(name="archive-notification-partitions")
+@cronitor("archive-notification-partitions")
+def archive_notification_partitions():
+    """
+    Archives the daily partitions of notifications which only hold notifications past their data retention, before
+    delete-notifications-older-than-retention deletes what's left a service at a time
+    """
+    seven_days_ago = get_london_midnight_in_utc(convert_utc_to_bst(datetime.utcnow()).date() - timedelta(days=7))
+
+    flexible_data_retention = [
+        (
+            f.service_id,
+            notification_type,
+            get_london_midnight_in_utc(
+                convert_utc_to_bst(datetime.utcnow()).date() - timedelta(days=f.days_of_retention)
+            ),
+        )
+        for notification_type in (SMS_TYPE, EMAIL_TYPE)
+        for f in fetch_service_data_retention_for_all_services_by_notification_type(notification_type)
+    ]
+
+    for partition in dao_get_notification_partitions():
+        # the legacy partition has no start, and is left to be emptied a service at a time
+        if partition.start is None or partition.end > seven_days_ago:
+            continue
+
+        services_still_retaining = [
+            (service_id, notification_type)
+            for service_id, notification_type, delete_before in flexible_data_retention
+            if partition.end > delete_before
+        ]
+        if dao_notification_partition_has_notifications_to_keep(partition.name, services_still_retaining):
+            continue
+
+        start = datetime.utcnow()
+        try:
+            archived = dao_archive_notification_partition(partition.name)
+        except OperationalError:
+            extra = {"partition": partition.name}
+            current_app.logger.warning(
+                "archive-notification-partitions: timed out waiting to detach %(partition)s, will retry tomorrow",
+                extra,
+                extra=extra,
+                exc_info=True,
+            )
+            continue
+
+        extra = {
+            "partition": partition.name,
+            "archived_record_count": archived,
+            "duration": (datetime.utcnow() - start).total_seconds(),
+        }
+        current_app.logger.info(
+            "archive-notification-partitions: archived %(partition)s, "
+            "count archived: %(archived_record_count)s, duration: %(duration)s",
+            extra,
+            extra=extra,
+        )
+
+
 @notify_celery.task(name="timeout-sending-notifications")
 @cronitor("timeout-sending-notifications")
 def timeout_notifications():
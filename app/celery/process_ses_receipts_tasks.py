@@ -1,5 +1,7 @@
 import logging
+from collections import defaultdict
 from datetime import datetime, timedelta
+from typing import NamedTuple
 
 from celery import Task
 from celery.exceptions import Retry
@@ -7,7 +9,7 @@ from flask import current_app, json
 from notifications_utils.json import RelaxedContainerJSONEncoder as RCJSONEncoder
 from sqlalchemy.orm.exc import NoResultFound
 
-from app import notify_celery
+from app import db, notify_celery
 from app.clients.email.aws_ses import get_aws_responses
 from app.config import QueueNames
 from app.constants import NOTIFICATION_PENDING, NOTIFICATION_SENDING
@@ -15,6 +17,7 @@ from app.dao import notifications_dao
 from app.notifications.notifications_ses_callback import (
     _check_and_queue_complaint_callback_task,
     check_and_queue_callback_task,
+    check_and_queue_callback_tasks,
     determine_notification_bounce_type,
     handle_complaint,
 )
@@ -24,7 +27,7 @@ from app.otel_metrics.notification import record_deliver_duration
 @notify_celery.task(
     bind=True, name="process-ses-result", max_retries=5, default_retry_delay=300, early_log_level=logging.DEBUG
 )
-def process_ses_results(  # noqa: C901
+def process_ses_results(
     self: Task,
     response: dict,
     receipt_iso_timestamp: str | None = None,
@@ -45,80 +48,18 @@ def process_ses_results(  # noqa: C901
         notification_status = aws_response_dict["notification_status"]
         reference = ses_message["mail"]["messageId"]
 
-        delivery_dt = None
-        if delivery_iso_timestamp := (ses_message.get("delivery") or ses_message.get("bounce", {})).get("timestamp"):
-            try:
-                delivery_dt = datetime.fromisoformat(delivery_iso_timestamp).replace(tzinfo=None)
-            except ValueError:
-                pass  # None it is, then
-
-        receipt_dt = None
-        if receipt_iso_timestamp is not None:
-            try:
-                receipt_dt = datetime.fromisoformat(receipt_iso_timestamp).replace(tzinfo=None)
-            except ValueError:
-                pass  # None it is, then
+        delivery_dt = _get_delivery_datetime(ses_message)
+        receipt_dt = _parse_iso_timestamp(receipt_iso_timestamp)
 
         uniform_now = datetime.utcnow()
-        common_extra = {
-            "receipt_received_at": receipt_dt,
-            "receipt_received_ago": (uniform_now - receipt_dt).total_seconds() if receipt_dt is not None else None,
-        }
         try:
             notification = notifications_dao.dao_get_notification_or_history_by_reference(reference=reference)
         except NoResultFound:
-            sent_dt = datetime.fromisoformat(ses_message["mail"]["timestamp"]).replace(tzinfo=None)
-            extra = {
-                "notification_reference": reference,
-                "notification_status": notification_status,
-                **common_extra,
-            }
-            if datetime.utcnow() - sent_dt < timedelta(minutes=5):
-                current_app.logger.info(
-                    "notification not found for reference: %(notification_reference)s "
-                    "(update to %(notification_status)s). "
-                    "Callback may have arrived before notification's reference was persisted to the DB. "
-                    "Adding task to retry queue",
-                    extra,
-                    extra=extra,
-                )
+            if _notification_may_not_be_persisted_yet(ses_message, reference, notification_status, receipt_dt):
                 self.retry(queue=QueueNames.RETRY)
-            else:
-                current_app.logger.warning(
-                    "notification not found for reference: %(notification_reference)s "
-                    "(update to %(notification_status)s)",
-                    extra,
-                    extra=extra,
-                )
             return
 
-        if bounce_message:
-            bounce_message_bounce = bounce_message.get("bounce") or {}
-            current_app.logger.info(
-                "SES bounce for notification ID %s",
-                notification.id,
-                extra={
-                    "notification_id": notification.id,
-                    "bounce_message": RCJSONEncoder().encode(bounce_message),
-                    "bounced_at": delivery_dt,
-                    "bounced_ago": (uniform_now - delivery_dt).total_seconds() if delivery_dt is not None else None,
-                    "bounce_message_type": bounce_message_bounce.get("bounceType"),
-                    "bounce_message_sub_type": bounce_message_bounce.get("bounceSubType"),
-                    "bounce_message_remote_mta_ip": bounce_message_bounce.get("remoteMtaIp"),
-                    **common_extra,
-                },
-            )
-        else:
-            current_app.logger.info(
-                "SES successful delivery for notification ID %s",
-                notification.id,
-                extra={
-                    "notification_id": notification.id,
-                    "delivered_at": delivery_dt,
-                    "delivered_ago": (uniform_now - delivery_dt).total_seconds() if delivery_dt is not None else None,
-                    **common_extra,
-                },
-            )
+        _log_ses_receipt(notification, bounce_message, delivery_dt, receipt_dt, uniform_now)
 
         if notification.status not in [NOTIFICATION_SENDING, NOTIFICATION_PENDING]:
             notifications_dao._duplicate_update_warning(notification=notification, status=notification_status)
@@ -128,14 +69,7 @@ def process_ses_results(  # noqa: C901
                 references=[reference], update_dict={"status": notification_status}
             )
 
-        record_deliver_duration(
-            callback_duration=(receipt_dt - notification.created_at).total_seconds() if receipt_dt else None,
-            deliver_duration=(delivery_dt - notification.created_at).total_seconds() if delivery_dt else None,
-            key_type=notification.key_type,
-            notification_status=notification.status,
-            notification_type="email",
-            provider_name="ses",
-        )
+        _record_ses_receipt_durations(notification, delivery_dt, receipt_dt)
 
         check_and_queue_callback_task(notification, receipt_dt=receipt_dt)
 
@@ -147,3 +81,294 @@ def process_ses_results(  # noqa: C901
     except Exception as e:
         current_app.logger.exception("Error processing SES results: %s", type(e))
         self.retry(queue=QueueNames.RETRY)
+
+
+class _SESReceipt(NamedTuple):
+    response: dict
+    receipt_iso_timestamp: str | None
+    ses_message: dict
+    reference: str
+    notification_status: str
+    bounce_message: dict | None
+    delivery_dt: datetime | None
+    receipt_dt: datetime | None
+
+
+@notify_celery.task(
+    bind=True, name="process-ses-results-batch", max_retries=5, default_retry_delay=300, early_log_level=logging.DEBUG
+)
+def process_ses_results_batch(self: Task, receipts: list, updated_receipts: list | None = None):
+    """
+    Processes a batch of SES receipts, each a [response, receipt_iso_timestamp] pair of the arguments
+    process_ses_results would be given for it. Nothing in this app queues these - the consumer of SES's notifications
+    outside it does.
+
+    All the batch's notifications are looked up together and updated with one UPDATE per status, in one transaction.
+    Receipts which can't be processed here - because they can't be parsed, or their notification can't be found yet -
+    are handed to individual process_ses_results tasks, so they're retried exactly as they would have been without
+    batching.
+
+    `updated_receipts` are receipts from an earlier attempt at the batch whose notifications were updated, but which
+    failed before their service callbacks were queued. Their callbacks are queued without updating them again.
+    """
+    ses_receipts = {}
+    # receipts which are dealt with by now - complaints, and receipts handed to tasks of their own - so shouldn't be
+    # processed again if the batch is retried
+    handled_receipt_indexes = set()
+    for index, (response, receipt_iso_timestamp) in enumerate(receipts):
+        try:
+            if (ses_receipt := _parse_ses_receipt(response, receipt_iso_timestamp)) is not None:
+                ses_receipts[index] = ses_receipt
+            else:
+                handled_receipt_indexes.add(index)
+        except Exception as e:
+            current_app.logger.exception("Error processing SES results: %s", type(e))
+            _process_ses_result_individually(response, receipt_iso_timestamp)
+            handled_receipt_indexes.add(index)
+
+    # these parsed fine the first time round
+    receipts_to_call_back = {
+        ses_receipt.reference: ses_receipt
+        for ses_receipt in (_parse_ses_receipt(*receipt) for receipt in updated_receipts or [])
+    }
+    try:
+        receipts_to_call_back |= _update_notifications_from_ses_receipts(ses_receipts.values())
+        _queue_callbacks_for_ses_receipts(receipts_to_call_back)
+    except Exception as e:
+        current_app.logger.exception("Error processing SES results batch: %s", type(e))
+        self.retry(
+            args=[
+                [
+                    receipt
+                    for index, receipt in enumerate(receipts)
+                    if index not in handled_receipt_indexes
+                    and ses_receipts[index].reference not in receipts_to_call_back
+                ]
+            ],
+            kwargs={
+                "updated_receipts": [
+                    [ses_receipt.response, ses_receipt.receipt_iso_timestamp]
+                    for ses_receipt in receipts_to_call_back.values()
+                ]
+            },
+            queue=QueueNames.RETRY,
+        )
+
+    extra = {"receipt_count": len(receipts), "notification_count": len(receipts_to_call_back)}
+    current_app.logger.info(
+        "Processed batch of %(receipt_count)s SES receipts, updating %(notification_count)s notifications",
+        extra,
+        extra=extra,
+    )
+
+
+def _update_notifications_from_ses_receipts(ses_receipts):
+    """
+    Updates the notifications the receipts are for in one transaction, returning the receipts they were updated from
+    keyed by reference
+    """
+    notifications_by_reference = notifications_dao.dao_get_notifications_or_history_by_references(
+        ses_receipt.reference for ses_receipt in ses_receipts
+    )
+
+    updated_receipts = _get_ses_receipts_to_update(ses_receipts, notifications_by_reference)
+
+    references_by_status = defaultdict(list)
+    for reference, ses_receipt in updated_receipts.items():
+        references_by_status[ses_receipt.notification_status].append(reference)
+
+    # all or nothing, so a retry never finds some of them already updated and takes them for duplicates
+    try:
+        for notification_status, references in references_by_status.items():
+            notifications_dao.dao_update_notifications_by_reference(
+                references=references, update_dict={"status": notification_status}, _autocommit=False
+            )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return updated_receipts
+
+
+def _queue_callbacks_for_ses_receipts(updated_receipts):
+    if not updated_receipts:
+        return
+
+    # fetch the notifications again now they've been updated, rather than refreshing each of them separately
+    notifications_by_reference = notifications_dao.dao_get_notifications_or_history_by_references(
+        updated_receipts.keys()
+    )
+    for reference, ses_receipt in updated_receipts.items():
+        _record_ses_receipt_durations(
+            notifications_by_reference[reference], ses_receipt.delivery_dt, ses_receipt.receipt_dt
+        )
+
+    check_and_queue_callback_tasks(
+        (notifications_by_reference[reference], ses_receipt.receipt_dt)
+        for reference, ses_receipt in updated_receipts.items()
+    )
+
+
+def _get_ses_receipts_to_update(ses_receipts, notifications_by_reference):
+    """
+    Returns the receipts whose notifications should be updated, keyed by reference. Receipts for notifications which
+    can't be found are retried individually if the notification may not have been persisted yet.
+    """
+    uniform_now = datetime.utcnow()
+    updated_receipts = {}
+    for ses_receipt in ses_receipts:
+        notification = notifications_by_reference.get(ses_receipt.reference)
+        if notification is None:
+            if _notification_may_not_be_persisted_yet(
+                ses_receipt.ses_message, ses_receipt.reference, ses_receipt.notification_status, ses_receipt.receipt_dt
+            ):
+                _process_ses_result_individually(
+                    ses_receipt.response,
+                    ses_receipt.receipt_iso_timestamp,
+                    countdown=process_ses_results.default_retry_delay,
+                )
+            continue
+
+        _log_ses_receipt(
+            notification, ses_receipt.bounce_message, ses_receipt.delivery_dt, ses_receipt.receipt_dt, uniform_now
+        )
+
+        # a second receipt for the same notification in one batch is as much a duplicate as one arriving later
+        if (
+            notification.status not in [NOTIFICATION_SENDING, NOTIFICATION_PENDING]
+            or ses_receipt.reference in updated_receipts
+        ):
+            notifications_dao._duplicate_update_warning(
+                notification=notification, status=ses_receipt.notification_status
+            )
+            continue
+
+        updated_receipts[ses_receipt.reference] = ses_receipt
+
+    return updated_receipts
+
+
+def _parse_ses_receipt(response, receipt_iso_timestamp):
+    ses_message = json.loads(response["Message"])
+    notification_type = ses_message["notificationType"]
+    bounce_message = None
+
+    if notification_type == "Bounce":
+        notification_type, bounce_message = determine_notification_bounce_type(notification_type, ses_message)
+    elif notification_type == "Complaint":
+        _check_and_queue_complaint_callback_task(*handle_complaint(ses_message))
+        return None
+
+    return _SESReceipt(
+        response=response,
+        receipt_iso_timestamp=receipt_iso_timestamp,
+        ses_message=ses_message,
+        reference=ses_message["mail"]["messageId"],
+        notification_status=get_aws_responses(notification_type)["notification_status"],
+        bounce_message=bounce_message,
+        delivery_dt=_get_delivery_datetime(ses_message),
+        receipt_dt=_parse_iso_timestamp(receipt_iso_timestamp),
+    )
+
+
+def _process_ses_result_individually(response, receipt_iso_timestamp, countdown=None):
+    process_ses_results.apply_async(
+        [response],
+        {"receipt_iso_timestamp": receipt_iso_timestamp},
+        queue=QueueNames.RETRY,
+        countdown=countdown,
+    )
+
+
+def _parse_iso_timestamp(iso_timestamp):
+    if iso_timestamp is None:
+        return None
+
+    try:
+        return datetime.fromisoformat(iso_timestamp).replace(tzinfo=None)
+    except ValueError:
+        return None  # None it is, then
+
+
+def _get_delivery_datetime(ses_message):
+    return _parse_iso_timestamp((ses_message.get("delivery") or ses_message.get("bounce", {})).get("timestamp"))
+
+
+def _receipt_extra(receipt_dt, uniform_now):
+    return {
+        "receipt_received_at": receipt_dt,
+        "receipt_received_ago": (uniform_now - receipt_dt).total_seconds() if receipt_dt is not None else None,
+    }
+
+
+def _notification_may_not_be_persisted_yet(ses_message, reference, notification_status, receipt_dt):
+    """
+    Logs that a receipt's notification couldn't be found, returning True if it was sent recently enough that it's
+    worth retrying
+    """
+    sent_dt = datetime.fromisoformat(ses_message["mail"]["timestamp"]).replace(tzinfo=None)
+    extra = {
+        "notification_reference": reference,
+        "notification_status": notification_status,
+        **_receipt_extra(receipt_dt, datetime.utcnow()),
+    }
+    if datetime.utcnow() - sent_dt < timedelta(minutes=5):
+        current_app.logger.info(
+            "notification not found for reference: %(notification_reference)s "
+            "(update to %(notification_status)s). "
+            "Callback may have arrived before notification's reference was persisted to the DB. "
+            "Adding task to retry queue",
+            extra,
+            extra=extra,
+        )
+        return True
+
+    current_app.logger.warning(
+        "notification not found for reference: %(notification_reference)s (update to %(notification_status)s)",
+        extra,
+        extra=extra,
+    )
+    return False
+
+
+def _log_ses_receipt(notification, bounce_message, delivery_dt, receipt_dt, uniform_now):
+    common_extra = _receipt_extra(receipt_dt, uniform_now)
+    if bounce_message:
+        bounce_message_bounce = bounce_message.get("bounce") or {}
+        current_app.logger.info(
+            "SES bounce for notification ID %s",
+            notification.id,
+            extra={
+                "notification_id": notification.id,
+                "bounce_message": RCJSONEncoder().encode(bounce_message),
+                "bounced_at": delivery_dt,
+                "bounced_ago": (uniform_now - delivery_dt).total_seconds() if delivery_dt is not None else None,
+                "bounce_message_type": bounce_message_bounce.get("bounceType"),
+                "bounce_message_sub_type": bounce_message_bounce.get("bounceSubType"),
+                "bounce_message_remote_mta_ip": bounce_message_bounce.get("remoteMtaIp"),
+                **common_extra,
+            },
+        )
+    else:
+        current_app.logger.info(
+            "SES successful delivery for notification ID %s",
+            notification.id,
+            extra={
+                "notification_id": notification.id,
+                "delivered_at": delivery_dt,
+                "delivered_ago": (uniform_now - delivery_dt).total_seconds() if delivery_dt is not None else None,
+                **common_extra,
+            },
+        )
+
+
+def _record_ses_receipt_durations(notification, delivery_dt, receipt_dt):
+    record_deliver_duration(
+        callback_duration=(receipt_dt - notification.created_at).total_seconds() if receipt_dt else None,
+        deliver_duration=(delivery_dt - notification.created_at).total_seconds() if delivery_dt else None,
+        key_type=notification.key_type,
+        notification_status=notification.status,
+        notification_type="email",
+        provider_name="ses",
+    )
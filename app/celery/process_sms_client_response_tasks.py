@@ -1,12 +1,14 @@
 import logging
 import uuid
 from datetime import datetime
+from typing import NamedTuple
 
-from flask import current_app
+from flask import current_app, json
 from notifications_utils.template import SMSMessageTemplate
+from redis.exceptions import LockError
 from sqlalchemy.exc import OperationalError
 
-from app import notify_celery
+from app import notify_celery, redis_store
 from app.clients import ClientException
 from app.clients.sms.firetext import get_firetext_responses
 from app.clients.sms.mmg import get_mmg_responses
@@ -14,8 +16,10 @@ from app.config import QueueNames
 from app.constants import NOTIFICATION_PENDING
 from app.dao import notifications_dao
 from app.dao.templates_dao import dao_get_template_by_id
+from app.delivery.sms_provider_health import record_sms_provider_receipt_lag
 from app.notifications.notifications_ses_callback import (
     check_and_queue_callback_task,
+    check_and_queue_callback_tasks,
 )
 from app.otel_metrics.notification import record_deliver_duration, record_international_sms
 
@@ -25,6 +29,105 @@ sms_response_mapper = {
 }
 
 
+SMS_CLIENT_RESPONSE_BUFFER_KEY = "sms-client-response-buffer"
+# receipts being queued by drain-sms-client-responses, kept until they're safely on SQS
+SMS_CLIENT_RESPONSE_PROCESSING_KEY = "sms-client-response-buffer-processing"
+SMS_CLIENT_RESPONSE_DRAIN_LOCK_KEY = "sms-client-response-buffer-drain-lock"
+SMS_CLIENT_RESPONSE_DRAIN_LOCK_TIMEOUT_SECONDS = 60
+
+# moves up to ARGV[1] receipts from the buffer (KEYS[1]) to the processing list (KEYS[2]), returning them
+CLAIM_SMS_CLIENT_RESPONSES_LUA_SCRIPT = """
+local receipts = {}
+for i = 1, tonumber(ARGV[1]) do
+    local receipt = redis.call("LMOVE", KEYS[1], KEYS[2], "LEFT", "RIGHT")
+    if not receipt then
+        break
+    end
+    receipts[i] = receipt
+end
+return receipts
+"""
+
+_claim_sms_client_responses_script = None
+
+
+class _SMSClientResponse(NamedTuple):
+    notification_status: str
+    provider_reference: str
+    client_name: str
+    detailed_status_code: str | None
+    delivery_dt: datetime | None
+    receipt_dt: datetime | None
+
+
+def queue_sms_client_response(receipt: list):
+    """
+    Queues a provider's delivery receipt for processing, given the arguments process_sms_client_response takes.
+
+    With SMS_CALLBACK_BATCHING_ENABLED, receipts are buffered in redis and processed in batches by
+    process_sms_client_responses tasks, falling back to a task of their own if redis can't be reached.
+    """
+    if current_app.config["SMS_CALLBACK_BATCHING_ENABLED"] and redis_store.active:
+        try:
+            buffered_count = redis_store.redis_store.rpush(SMS_CLIENT_RESPONSE_BUFFER_KEY, json.dumps(receipt))
+        except Exception:
+            current_app.logger.exception("Failed to buffer SMS client response, processing it individually")
+        else:
+            # drain-sms-client-responses empties the buffer, so it only needs queuing when the buffer was empty. The
+            # scheduled run will pick up anything left over if queuing it fails.
+            if buffered_count == 1:
+                drain_sms_client_responses.apply_async(queue=QueueNames.SMS_CALLBACKS, countdown=1)
+            return
+
+    process_sms_client_response.apply_async(receipt, queue=QueueNames.SMS_CALLBACKS)
+
+
+def _get_claim_sms_client_responses_script():
+    global _claim_sms_client_responses_script
+    if _claim_sms_client_responses_script is None:
+        _claim_sms_client_responses_script = redis_store.redis_store.register_script(
+            CLAIM_SMS_CLIENT_RESPONSES_LUA_SCRIPT
+        )
+    return _claim_sms_client_responses_script
+
+
+def _claim_sms_client_responses(batch_size):
+    # a batch left in the processing list goes first
+    return redis_store.redis_store.lrange(SMS_CLIENT_RESPONSE_PROCESSING_KEY, 0, -1) or (
+        _get_claim_sms_client_responses_script()(
+            keys=[SMS_CLIENT_RESPONSE_BUFFER_KEY, SMS_CLIENT_RESPONSE_PROCESSING_KEY], args=[batch_size]
+        )
+    )
+
+
+@notify_celery.task(name="drain-sms-client-responses")
+def drain_sms_client_responses():
+    """
+    Queues the buffered receipts in batches. Each batch is moved to a processing list first, and only removed from it
+    once it's been queued - so if queuing fails or the worker dies, the batch is queued by the next run instead of
+    being lost. Only one drain runs at a time, so anything in the processing list at the start was left by one which
+    didn't finish.
+    """
+    if not redis_store.active:
+        return
+
+    batch_size = current_app.config["SMS_CALLBACK_BATCH_SIZE"]
+    try:
+        with redis_store.get_lock(
+            SMS_CLIENT_RESPONSE_DRAIN_LOCK_KEY, timeout=SMS_CLIENT_RESPONSE_DRAIN_LOCK_TIMEOUT_SECONDS, blocking=False
+        ) as lock:
+            while receipts := _claim_sms_client_responses(batch_size):
+                process_sms_client_responses.apply_async(
+                    [[json.loads(receipt) for receipt in receipts]], queue=QueueNames.SMS_CALLBACKS
+                )
+                redis_store.redis_store.delete(SMS_CLIENT_RESPONSE_PROCESSING_KEY)
+                lock.reacquire()
+    except LockError:
+        # another drain is running, and will queue anything buffered before it finishes. Anything it misses is left
+        # for the next scheduled run.
+        current_app.logger.info("drain-sms-client-responses lock held by other process, doing nothing")
+
+
 @notify_celery.task(
     bind=True, name="process-sms-client-response", max_retries=5, default_retry_delay=300, early_log_level=logging.DEBUG
 )
@@ -37,85 +140,179 @@ def process_sms_client_response(
     delivery_iso_timestamp: str | None = None,
     receipt_iso_timestamp: str | None = None,
 ):
-    # validate reference
-    try:
-        uuid.UUID(provider_reference, version=4)
-    except ValueError as e:
-        extra = {
-            "client_name": client_name,
-            # for sms, we happen to use notification id as the "provider reference"
-            "notification_id": provider_reference,
-        }
-        current_app.logger.exception(
-            "%(client_name)s callback with invalid reference %(notification_id)s",
-            extra,
-            extra=extra,
-        )
-        raise e
-
-    response_parser = sms_response_mapper[client_name]
+    _validate_provider_reference(provider_reference, client_name)
 
     # validate status
     try:
-        delivery_dt = None
-        receipt_dt = None
         try:
-            notification_status, detailed_status = response_parser(status, detailed_status_code)
-
-            if delivery_iso_timestamp is not None:
-                try:
-                    delivery_dt = datetime.fromisoformat(delivery_iso_timestamp)
-                except ValueError:
-                    pass  # None it is, then
-
-            if receipt_iso_timestamp is not None:
-                try:
-                    receipt_dt = datetime.fromisoformat(receipt_iso_timestamp)
-                except ValueError:
-                    pass  # None it is, then
-
-            uniform_now = datetime.utcnow()
-            extra = {
-                "client_name": client_name,
-                "notification_status": notification_status,
-                "provider_status": status,
-                "detailed_status": detailed_status,
-                "detailed_status_code": detailed_status_code,
-                "receipt_received_at": receipt_dt,
-                "receipt_received_ago": (uniform_now - receipt_dt).total_seconds() if receipt_dt is not None else None,
-                "delivered_at": delivery_dt,
-                "delivered_ago": (uniform_now - delivery_dt).total_seconds() if delivery_dt is not None else None,
-                # for sms, we happen to use notification id as the "provider reference"
-                "notification_id": provider_reference,
-            }
-            current_app.logger.info(
-                "%(client_name)s callback returned status of %(notification_status)s(%(provider_status)s): "
-                "%(detailed_status)s(%(detailed_status_code)s) for reference: %(notification_id)s",
-                extra,
-                extra=extra,
+            response = _parse_sms_client_response(
+                status,
+                provider_reference,
+                client_name,
+                detailed_status_code,
+                delivery_iso_timestamp,
+                receipt_iso_timestamp,
             )
         except KeyError as e:
             _process_for_status(
                 notification_status="technical-failure",
                 client_name=client_name,
                 provider_reference=provider_reference,
-                delivery_dt=delivery_dt,
-                receipt_dt=receipt_dt,
+                delivery_dt=None,
+                receipt_dt=None,
             )
             raise ClientException(f"{client_name} callback failed: status {status} not found.") from e
 
         _process_for_status(
-            notification_status=notification_status,
+            notification_status=response.notification_status,
             client_name=client_name,
             provider_reference=provider_reference,
-            delivery_dt=delivery_dt,
-            receipt_dt=receipt_dt,
+            delivery_dt=response.delivery_dt,
+            receipt_dt=response.receipt_dt,
             detailed_status_code=detailed_status_code,
         )
     except OperationalError:
         self.retry(queue=QueueNames.RETRY)
 
 
+@notify_celery.task(
+    bind=True,
+    name="process-sms-client-responses",
+    max_retries=5,
+    default_retry_delay=300,
+    early_log_level=logging.DEBUG,
+)
+def process_sms_client_responses(self, receipts: list):
+    """
+    Processes a batch of delivery receipts, each a list of the arguments process_sms_client_response would be given
+    for it. The notifications are updated together, with one UPDATE per resulting status.
+    """
+    responses = []
+    for receipt in receipts:
+        status, provider_reference, client_name, *_ = receipt
+        try:
+            _validate_provider_reference(provider_reference, client_name)
+        except ValueError:
+            continue
+
+        try:
+            responses.append(_parse_sms_client_response(*receipt))
+        except KeyError:
+            current_app.logger.exception("%s callback failed: status %s not found.", client_name, status)
+            responses.append(
+                _SMSClientResponse(
+                    notification_status="technical-failure",
+                    provider_reference=provider_reference,
+                    client_name=client_name,
+                    detailed_status_code=None,
+                    delivery_dt=None,
+                    receipt_dt=None,
+                )
+            )
+
+    try:
+        notifications = notifications_dao.dao_update_notification_statuses_by_id(
+            [
+                (
+                    response.provider_reference,
+                    response.notification_status,
+                    response.client_name.lower(),
+                    response.detailed_status_code,
+                )
+                for response in responses
+            ]
+        )
+    except OperationalError:
+        self.retry(queue=QueueNames.RETRY)
+
+    callbacks = []
+    for response, notification in zip(responses, notifications, strict=True):
+        if not notification:
+            continue
+
+        _record_status_update(
+            notification, response.notification_status, response.client_name, response.delivery_dt, response.receipt_dt
+        )
+        if response.notification_status != NOTIFICATION_PENDING:
+            callbacks.append((notification, response.receipt_dt))
+
+    check_and_queue_callback_tasks(callbacks)
+
+
+def _validate_provider_reference(provider_reference, client_name):
+    try:
+        uuid.UUID(provider_reference, version=4)
+    except ValueError as e:
+        extra = {
+            "client_name": client_name,
+            # for sms, we happen to use notification id as the "provider reference"
+            "notification_id": provider_reference,
+        }
+        current_app.logger.exception(
+            "%(client_name)s callback with invalid reference %(notification_id)s",
+            extra,
+            extra=extra,
+        )
+        raise e
+
+
+def _parse_iso_timestamp(iso_timestamp):
+    if iso_timestamp is None:
+        return None
+
+    try:
+        return datetime.fromisoformat(iso_timestamp)
+    except ValueError:
+        return None  # None it is, then
+
+
+def _parse_sms_client_response(
+    status,
+    provider_reference,
+    client_name,
+    detailed_status_code=None,
+    delivery_iso_timestamp: str | None = None,
+    receipt_iso_timestamp: str | None = None,
+) -> _SMSClientResponse:
+    """
+    Raises KeyError if the provider's status isn't one we recognise
+    """
+    notification_status, detailed_status = sms_response_mapper[client_name](status, detailed_status_code)
+
+    delivery_dt = _parse_iso_timestamp(delivery_iso_timestamp)
+    receipt_dt = _parse_iso_timestamp(receipt_iso_timestamp)
+
+    uniform_now = datetime.utcnow()
+    extra = {
+        "client_name": client_name,
+        "notification_status": notification_status,
+        "provider_status": status,
+        "detailed_status": detailed_status,
+        "detailed_status_code": detailed_status_code,
+        "receipt_received_at": receipt_dt,
+        "receipt_received_ago": (uniform_now - receipt_dt).total_seconds() if receipt_dt is not None else None,
+        "delivered_at": delivery_dt,
+        "delivered_ago": (uniform_now - delivery_dt).total_seconds() if delivery_dt is not None else None,
+        # for sms, we happen to use notification id as the "provider reference"
+        "notification_id": provider_reference,
+    }
+    current_app.logger.info(
+        "%(client_name)s callback returned status of %(notification_status)s(%(provider_status)s): "
+        "%(detailed_status)s(%(detailed_status_code)s) for reference: %(notification_id)s",
+        extra,
+        extra=extra,
+    )
+
+    return _SMSClientResponse(
+        notification_status=notification_status,
+        provider_reference=provider_reference,
+        client_name=client_name,
+        detailed_status_code=detailed_status_code,
+        delivery_dt=delivery_dt,
+        receipt_dt=receipt_dt,
+    )
+
+
 def _process_for_status(
     notification_status,
     client_name,
@@ -134,6 +331,19 @@ def _process_for_status(
     if not notification:
         return
 
+    _record_status_update(notification, notification_status, client_name, delivery_dt, receipt_dt)
+
+    if notification_status != NOTIFICATION_PENDING:
+        check_and_queue_callback_task(notification, receipt_dt=receipt_dt)
+
+
+def _record_status_update(
+    notification,
+    notification_status,
+    client_name,
+    delivery_dt: datetime | None,
+    receipt_dt: datetime | None,
+):
     record_deliver_duration(
         callback_duration=(receipt_dt - notification.created_at).total_seconds() if receipt_dt else None,
         deliver_duration=(delivery_dt - notification.created_at).total_seconds() if delivery_dt else None,
@@ -144,6 +354,9 @@ def _process_for_status(
         provider_name=client_name.lower(),
     )
 
+    if notification_status != NOTIFICATION_PENDING and receipt_dt and notification.sent_at:
+        record_sms_provider_receipt_lag(client_name.lower(), (receipt_dt - notification.sent_at).total_seconds())
+
     if notification.billable_units == 0:
         service = notification.service
         template_model = dao_get_template_by_id(notification.template_id, notification.template_version)
@@ -157,9 +370,5 @@ def _process_for_status(
         notification.billable_units = template.fragment_count
         notifications_dao.dao_update_notification(notification)
 
-    if notification_status != NOTIFICATION_PENDING:
-        check_and_queue_callback_task(notification, receipt_dt=receipt_dt)
-        if notification.international:
-            record_international_sms(
-                1, notification_status=notification_status, sms_country_code=notification.phone_prefix
-            )
+    if notification_status != NOTIFICATION_PENDING and notification.international:
+        record_international_sms(1, notification_status=notification_status, sms_country_code=notification.phone_prefix)
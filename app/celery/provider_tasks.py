@@ -1,4 +1,5 @@
 import logging
+import random
 from datetime import datetime
 from uuid import UUID
 
@@ -30,6 +31,7 @@ from app.dao.provider_details_dao import (
     get_provider_details_by_notification_type,
 )
 from app.delivery import send_to_providers
+from app.delivery.ses_rate_governor import ses_rate_governor_enabled
 from app.exceptions import NotificationTechnicalFailureException
 from app.letters.utils import LetterPDFNotFound, find_letter_pdf_in_s3
 
@@ -75,6 +77,50 @@ def deliver_sms(self, notification_id):
             raise NotificationTechnicalFailureException(message) from e
 
 
+@notify_celery.task(bind=True, name="deliver-sms-batch", early_log_level=logging.DEBUG)
+def deliver_sms_batch(self, notification_ids):
+    """
+    Sends a batch of SMS notifications with send_to_providers.send_sms_batch_to_providers.
+
+    Notifications which fail are handed to their own deliver_sms task on the retry queue, which then carries on
+    retrying them as usual - straight away the first time, like deliver_sms, so they can go to the other provider.
+    """
+    extra = {"celery_task": self.name, "notification_count": len(notification_ids)}
+    current_app.logger.info("Start sending %(notification_count)s SMS", extra, extra=extra)
+
+    notifications = notifications_dao.dao_get_notifications_by_ids(notification_ids)
+    failures = send_to_providers.send_sms_batch_to_providers(notifications)
+
+    found_notification_ids = {str(notification.id) for notification in notifications}
+    for notification_id in notification_ids:
+        if notification_id not in found_notification_ids:
+            failures[notification_id] = NoResultFound()
+
+    for notification_id, e in failures.items():
+        extra = {"notification_id": notification_id}
+        if isinstance(e, NotificationTechnicalFailureException):
+            # already updated to technical-failure, eg because its service is inactive
+            current_app.logger.error("SMS notification %s failed: %s", notification_id, e, extra=extra)
+            continue
+
+        if isinstance(e, SmsClientResponseException):
+            current_app.logger.warning(
+                "SMS notification delivery for id: %s failed", notification_id, exc_info=e, extra=extra
+            )
+        else:
+            current_app.logger.error(
+                "SMS notification delivery for id: %s failed", notification_id, exc_info=e, extra=extra
+            )
+
+        deliver_sms.apply_async(
+            [str(notification_id)],
+            queue=QueueNames.RETRY,
+            countdown=0,
+            # this batch counts as the first attempt
+            retries=1,
+        )
+
+
 @notify_celery.task(
     bind=True, name="deliver_email", max_retries=48, default_retry_delay=300, early_log_level=logging.DEBUG
 )
@@ -105,7 +151,10 @@ def deliver_email(self, notification_id):
                     "RETRY: Email notification %s failed", notification_id, extra={"notification_id": notification_id}
                 )
 
-            self.retry(queue=QueueNames.RETRY)
+            if isinstance(e, AwsSesClientThrottlingSendRateException) and ses_rate_governor_enabled():
+                self.retry(queue=QueueNames.RETRY, countdown=_throttled_email_retry_countdown())
+            else:
+                self.retry(queue=QueueNames.RETRY)
         except self.MaxRetriesExceededError as e:
             message = (
                 "RETRY FAILED: Max retries reached. "
@@ -116,6 +165,58 @@ def deliver_email(self, notification_id):
             raise NotificationTechnicalFailureException(message) from e
 
 
+@notify_celery.task(bind=True, name="deliver-emails", early_log_level=logging.DEBUG)
+def deliver_emails(self, notification_ids):
+    """
+    Sends a batch of email notifications with send_to_providers.send_emails_to_provider.
+
+    Notifications which fail in a way deliver_email would retry are handed to their own deliver_email task on the
+    retry queue, which then carries on retrying them as usual.
+    """
+    extra = {"celery_task": self.name, "notification_count": len(notification_ids)}
+    current_app.logger.info("Start sending %(notification_count)s emails", extra, extra=extra)
+
+    notifications = notifications_dao.dao_get_notifications_by_ids(notification_ids)
+    failures = send_to_providers.send_emails_to_provider(notifications)
+
+    found_notification_ids = {str(notification.id) for notification in notifications}
+    for notification_id in notification_ids:
+        if notification_id not in found_notification_ids:
+            failures[notification_id] = NoResultFound()
+
+    for notification_id, e in failures.items():
+        extra = {"notification_id": notification_id}
+        if isinstance(e, EmailClientNonRetryableException):
+            current_app.logger.error("Email notification %s failed: %s", notification_id, e, exc_info=e, extra=extra)
+            update_notification_status_by_id(notification_id, NOTIFICATION_TECHNICAL_FAILURE)
+            continue
+        if isinstance(e, NotificationTechnicalFailureException):
+            # already updated to technical-failure, eg because its service is inactive
+            current_app.logger.error("Email notification %s failed: %s", notification_id, e, extra=extra)
+            continue
+
+        if isinstance(e, AwsSesClientThrottlingSendRateException):
+            current_app.logger.warning(
+                "RETRY: Email notification %s was rate limited by SES", notification_id, extra=extra
+            )
+        else:
+            current_app.logger.error("RETRY: Email notification %s failed", notification_id, exc_info=e, extra=extra)
+
+        throttled = isinstance(e, AwsSesClientThrottlingSendRateException) and ses_rate_governor_enabled()
+        deliver_email.apply_async(
+            [str(notification_id)],
+            queue=QueueNames.RETRY,
+            countdown=_throttled_email_retry_countdown() if throttled else deliver_email.default_retry_delay,
+            # this batch counts as the first attempt
+            retries=1,
+        )
+
+
+def _throttled_email_retry_countdown():
+    # spread emails SES throttled out over the retry delay, rather than sending them all back to SES together
+    return random.randint(1, deliver_email.default_retry_delay)
+
+
 @notify_celery.task(bind=True, name="deliver_letter", max_retries=55)
 def deliver_letter(self, notification_id):
     current_app.logger.info(
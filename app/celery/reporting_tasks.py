@@ -9,11 +9,16 @@ from app.constants import EMAIL_TYPE, LETTER_TYPE, SMS_TYPE, CacheKeys
 from app.cronitor import cronitor
 from app.dao.fact_billing_dao import (
     fetch_billing_data_for_day,
+    fetch_service_ids_with_billing_changes_for_day,
     update_ft_billing,
     update_ft_billing_letter_despatch,
 )
-from app.dao.fact_notification_status_dao import generate_fact_notification_status_rows, update_fact_notification_status
+from app.dao.fact_notification_status_dao import (
+    generate_fact_notification_status_rows_for_services,
+    update_fact_notification_status_for_services,
+)
 from app.dao.notifications_dao import get_service_ids_with_notifications_on_date
+from app.utils import batched
 
 
 @notify_celery.task(name="create-nightly-billing")
@@ -60,12 +65,27 @@ def create_nightly_billing(
 @cronitor("update-ft-billing-for-today")
 def update_ft_billing_for_today():
     process_day = convert_utc_to_bst(datetime.utcnow()).date().isoformat()
-    create_or_update_ft_billing_for_day(process_day=process_day)
+    create_or_update_ft_billing_for_day(process_day=process_day, only_changed_services=True)
     redis_store.set(CacheKeys.FT_BILLING_FOR_TODAY_UPDATED_AT_UTC_ISOFORMAT, datetime.now(UTC).isoformat())
 
 
+# how far back from when a day's billing was last worked out to look for changes to its notifications, to allow for
+# replication lag and for changes made in transactions which hadn't committed by then
+FT_BILLING_CHANGES_OVERLAP = timedelta(minutes=10)
+# longer than create-nightly-billing keeps working days out for
+FT_BILLING_CHANGES_EXPIRY_SECONDS = int(timedelta(days=14).total_seconds())
+
+
 @notify_celery.task(name="create-or-update-ft-billing-for-day")
-def create_or_update_ft_billing_for_day(process_day: str):
+def create_or_update_ft_billing_for_day(process_day: str, only_changed_services: bool = False):
+    """
+    Works out the day's billing for every service, or with `only_changed_services` just for each service whose
+    notifications from that day have been created or updated since it was last worked out (or every service if it
+    hasn't been, or redis has forgotten when it was).
+
+    Changes to rates, crown status or organisation aren't changes to notifications, so are only picked up when every
+    service's billing is worked out - as create-nightly-billing does for each of the last few days.
+    """
     process_date = datetime.strptime(process_day, "%Y-%m-%d").date()
     current_app.logger.info(
         "create-or-update-ft-billing-for-day task for %s: started",
@@ -74,16 +94,42 @@ def create_or_update_ft_billing_for_day(process_day: str):
     )
 
     start = datetime.utcnow()
-    billing_data = fetch_billing_data_for_day(process_day=process_date, session=db.session_bulk, inner_retry_attempts=2)
+    changes_processed_up_to_key = CacheKeys.FT_BILLING_FOR_DAY_CHANGES_PROCESSED_UP_TO_UTC_ISOFORMAT.format(process_day)
+
+    service_ids = None
+    if only_changed_services and (changes_processed_up_to := redis_store.get(changes_processed_up_to_key)):
+        service_ids = sorted(
+            fetch_service_ids_with_billing_changes_for_day(
+                process_date,
+                datetime.fromisoformat(changes_processed_up_to.decode()) - FT_BILLING_CHANGES_OVERLAP,
+                session=db.session_bulk,
+                retry_attempts=2,  # type: ignore
+            )
+        )
+        if not service_ids:
+            redis_store.set(changes_processed_up_to_key, start.isoformat(), ex=FT_BILLING_CHANGES_EXPIRY_SECONDS)
+            current_app.logger.info(
+                "create-or-update-ft-billing-for-day task for %s: no changes since %s",
+                process_date,
+                changes_processed_up_to.decode(),
+                extra={"process_day": process_date},
+            )
+            return
+
+    billing_data = fetch_billing_data_for_day(
+        process_day=process_date, service_ids=service_ids, session=db.session_bulk, inner_retry_attempts=2
+    )
     end = datetime.utcnow()
 
     duration = end - start
     base_params = {
         "process_day": process_date,
         "duration": duration,
+        "service_count": "all" if service_ids is None else len(service_ids),
     }
     current_app.logger.info(
-        "create-or-update-ft-billing-for-day task for %(process_day)s: data fetched in %(duration)s",
+        "create-or-update-ft-billing-for-day task for %(process_day)s: data fetched for %(service_count)s services "
+        "in %(duration)s",
         base_params,
         extra={
             **base_params,
@@ -92,6 +138,7 @@ def create_or_update_ft_billing_for_day(process_day: str):
     )
 
     update_ft_billing(billing_data, process_date)
+    redis_store.set(changes_processed_up_to_key, start.isoformat(), ex=FT_BILLING_CHANGES_EXPIRY_SECONDS)
 
     extra = {
         "process_day": process_date,
@@ -166,40 +213,57 @@ def create_nightly_notification_status():
                 retry_attempts=2,  # type: ignore
             )
 
-            for service_id in relevant_service_ids:
-                create_nightly_notification_status_for_service_and_day.apply_async(
+            # each task aggregates a batch of services in one go, rather than querying the day a chunk at a time
+            # for every service separately
+            for service_ids in batched(
+                sorted(relevant_service_ids), current_app.config["FT_NOTIFICATION_STATUS_SERVICES_PER_TASK"]
+            ):
+                create_nightly_notification_status_for_services_and_day.apply_async(
                     kwargs={
                         "process_day": process_day.isoformat(),
                         "notification_type": notification_type,
-                        "service_id": service_id,
+                        "service_ids": [str(service_id) for service_id in service_ids],
                     },
                     queue=QueueNames.REPORTING,
-                    MessageGroupId=str(service_id),
                 )
 
 
-@notify_celery.task(name="create-nightly-notification-status-for-service-and-day")
-def create_nightly_notification_status_for_service_and_day(process_day, service_id, notification_type):
+@notify_celery.task(name="create-nightly-notification-status-for-services-and-day")
+def create_nightly_notification_status_for_services_and_day(process_day, service_ids, notification_type):
     process_day = datetime.strptime(process_day, "%Y-%m-%d").date()
 
-    rows = generate_fact_notification_status_rows(
-        process_day, notification_type, service_id, session=db.session_bulk, inner_retry_attempts=2
+    start = datetime.utcnow()
+    rows = generate_fact_notification_status_rows_for_services(
+        process_day, notification_type, service_ids, session=db.session_bulk, inner_retry_attempts=2
     )
-    deleted_rows = update_fact_notification_status(rows, process_day, notification_type, service_id)
+    fetched = datetime.utcnow()
+    deleted_rows = update_fact_notification_status_for_services(rows, process_day, notification_type, service_ids)
+    end = datetime.utcnow()
 
-    extra = {
-        "service_id": service_id,
+    base_params = {
+        "service_count": len(service_ids),
         "notification_type": notification_type,
         "process_day": process_day,
         "deleted_record_count": deleted_rows,
         "inserted_record_count": len(rows),
+        "fetch_duration": fetched - start,
+        "update_duration": end - fetched,
     }
     current_app.logger.info(
         (
-            "create-nightly-notification-status-for-service-and-day for "
-            "%(service_id)s, %(notification_type)s for %(process_day)s: replaced %(deleted_record_count)s "
-            "rows with %(inserted_record_count)s"
+            "create-nightly-notification-status-for-services-and-day for %(service_count)s services, "
+            "%(notification_type)s for %(process_day)s: replaced %(deleted_record_count)s rows with "
+            "%(inserted_record_count)s. Data fetched in %(fetch_duration)s, updated in %(update_duration)s"
         ),
-        extra,
-        extra=extra,
+        base_params,
+        extra={
+            **base_params,
+            "fetch_duration": base_params["fetch_duration"].total_seconds(),
+            "update_duration": base_params["update_duration"].total_seconds(),
+        },
     )
+
+
+@notify_celery.task(name="create-nightly-notification-status-for-service-and-day")
+def create_nightly_notification_status_for_service_and_day(process_day, service_id, notification_type):
+    create_nightly_notification_status_for_services_and_day(process_day, [service_id], notification_type)
@@ -1,5 +1,6 @@
 import csv
 import io
+import time
 from collections import defaultdict
 from datetime import date, datetime, timedelta
 
@@ -18,12 +19,12 @@ from redis.exceptions import LockError
 from sqlalchemy import and_, between, quoted_name, text
 from sqlalchemy.exc import SQLAlchemyError
 
-from app import db, dvla_client, notify_celery, redis_store, zendesk_client
+from app import aws_ses_client, db, dvla_client, notify_celery, redis_store, zendesk_client
 from app.aws import s3
 from app.celery.letters_pdf_tasks import get_pdf_for_templated_letter
 from app.celery.tasks import (
     get_id_task_args_kwargs_for_job_row,
-    get_recipient_csv_and_template_and_sender_id,
+    get_job_rows_and_template_and_sender_id,
     process_incomplete_jobs,
     process_job,
     process_job_row,
@@ -42,6 +43,7 @@ from app.constants import (
 )
 from app.cronitor import cronitor
 from app.dao.annual_billing_dao import set_default_free_allowance_for_service
+from app.dao.dao_utils import dao_get_replication_lag_seconds
 from app.dao.date_util import get_current_financial_year_start_year
 from app.dao.inbound_numbers_dao import dao_get_available_inbound_numbers
 from app.dao.invited_org_user_dao import (
@@ -74,12 +76,14 @@ from app.dao.provider_details_dao import (
 )
 from app.dao.services_dao import (
     dao_fetch_service_by_id,
+    dao_fetch_stats_by_service_and_key_type_for_day,
     dao_find_services_sending_to_tv_numbers,
     dao_find_services_with_high_failure_rates,
 )
 from app.dao.template_email_files_dao import dao_archive_pending_files, dao_get_template_email_files_by_template_id
 from app.dao.templates_dao import dao_get_template_by_id
 from app.dao.users_dao import delete_codes_older_created_more_than_a_day_ago, get_users_for_research
+from app.delivery.ses_rate_governor import ses_rate_governor_enabled, set_ses_max_send_rate
 from app.letters.utils import generate_letter_pdf_filename
 from app.models import (
     AnnualBilling,
@@ -92,6 +96,7 @@ from app.models import (
     User,
 )
 from app.notifications.process_notifications import persist_notification, send_notification_to_queue
+from app.notifications.todays_stats_cache import get_service_ids_to_refresh, refresh_todays_stats
 from app.otel_metrics.provider import (
     record_info,
     record_priority,
@@ -205,6 +210,19 @@ def switch_current_sms_provider_on_slow_delivery():
                 dao_reduce_sms_provider_priority(provider_name, time_threshold=timedelta(minutes=5))
 
 
+@notify_celery.task(name="refresh-ses-max-send-rate")
+def refresh_ses_max_send_rate():
+    """
+    Stores the SES account's current max send rate for the SES rate governor to pace sends to.
+    """
+    if not ses_rate_governor_enabled() or current_app.config["SES_STUB_URL"]:
+        return
+
+    max_send_rate = aws_ses_client.get_max_send_rate()
+    set_ses_max_send_rate(max_send_rate)
+    current_app.logger.info("SES max send rate is %s", max_send_rate, extra={"ses_max_send_rate": max_send_rate})
+
+
 def _check_slow_text_message_delivery_reports_and_raise_error_if_needed(reports: list[SlowProviderDeliveryReport]):
     total_notifications = sum(report.total_notifications for report in reports)
     slow_notifications = sum(report.slow_notifications for report in reports)
@@ -279,6 +297,24 @@ def generate_sms_delivery_stats():
         record_info(provider.identifier, provider.active, provider.supports_international, provider.notification_type)
 
 
+@notify_celery.task(name="refresh-todays-stats-cache")
+def refresh_todays_stats_cache():
+    if not (redis_store.active and current_app.config["TODAYS_STATS_CACHE_ENABLED"]):
+        return
+
+    day = date.today()
+    service_ids = get_service_ids_to_refresh(day)
+    if service_ids == []:
+        return
+
+    # measured before the counts are, so the replica's snapshot is at least this recent
+    snapshot_at = time.time() - dao_get_replication_lag_seconds()
+    rows = dao_fetch_stats_by_service_and_key_type_for_day(
+        day, service_ids=service_ids, session=db.session_bulk, retry_attempts=2
+    )
+    refresh_todays_stats(rows, day, service_ids, snapshot_at)
+
+
 @notify_celery.task(name="tend-providers-back-to-middle")
 def tend_providers_back_to_middle():
     dao_adjust_provider_priority_back_to_resting_points()
@@ -575,15 +611,20 @@ def check_for_missing_rows_in_completed_jobs():
         dao_update_job(job)
 
     for job in jobs_missing:
-        recipient_csv, template, sender_id = get_recipient_csv_and_template_and_sender_id(job)
-        missing_rows = find_missing_row_for_job(job.id, job.notification_count)
-        for row_to_process in missing_rows:
-            row = recipient_csv[row_to_process.missing_row]
+        job_rows, template, sender_id = get_job_rows_and_template_and_sender_id(job)
+        missing_row_numbers = {row.missing_row for row in find_missing_row_for_job(job.id, job.notification_count)}
+        has_files = bool(dao_get_template_email_files_by_template_id(job.template_id))
+        for row in job_rows:
+            if not missing_row_numbers:
+                break
+            if row.index not in missing_row_numbers:
+                continue
+            missing_row_numbers.remove(row.index)
+
             _, task_args_kwargs = get_id_task_args_kwargs_for_job_row(
                 row, template, job, job.service, sender_id=sender_id
             )
-            has_files = bool(dao_get_template_email_files_by_template_id(job.template_id))
-            extra = {"job_row_number": row_to_process.missing_row, "job_id": job.id}
+            extra = {"job_row_number": row.index, "job_id": job.id}
             current_app.logger.info("Processing missing row %(job_row_number)s for job %(job_id)s", extra, extra=extra)
             process_job_row(
                 template.template_type,
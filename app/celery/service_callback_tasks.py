@@ -1,4 +1,7 @@
 import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from contextvars import ContextVar
 from datetime import datetime
 
@@ -14,7 +17,12 @@ from app.constants import ServiceCallbackTypes
 from app.dao.inbound_sms_dao import dao_get_inbound_sms_by_id
 from app.dao.returned_letters_dao import fetch_returned_letter_callback_data_dao
 from app.dao.service_callback_api_dao import get_service_callback_api_by_callback_type
-from app.otel_metrics.service_callback import record_service_callback_forward_duration
+from app.notifications.service_callback_circuit_breaker import (
+    CIRCUIT_PROBE_TIMEOUT_SECONDS,
+    check_service_callback_circuit,
+    record_service_callback_circuit_result,
+)
+from app.otel_metrics.service_callback import record_service_callback_forward_duration, record_service_callback_parked
 from app.utils import DATETIME_FORMAT
 
 # thread-local copies of persistent requests.Session
@@ -26,6 +34,12 @@ get_requests_session: LazyLocalGetter[requests.Session] = LazyLocalGetter(
 memo_resetters.append(lambda: get_requests_session.clear())
 requests_session = LocalProxy(get_requests_session)
 
+# send-delivery-statuses tasks send their callbacks from these threads. They live as long as the process, so each
+# thread's requests.Session keeps its connections to service callback urls alive between tasks.
+_callback_executor: ThreadPoolExecutor | None = None
+_callback_executor_pid: int | None = None
+_callback_executor_lock = threading.Lock()
+
 
 @notify_celery.task(bind=True, name="send-returned-letter", max_retries=5, default_retry_delay=300)
 def send_returned_letter_to_service(self, encoded_returned_letter):
@@ -62,18 +76,7 @@ def send_delivery_status_to_service(
 ):
     status_update = signing.decode(encoded_status_update)
 
-    data = {
-        "id": str(notification_id),
-        "reference": status_update["notification_client_reference"],
-        "to": status_update["notification_to"],
-        "status": status_update["notification_status"],
-        "created_at": status_update["notification_created_at"],
-        "completed_at": status_update["notification_updated_at"],
-        "sent_at": status_update["notification_sent_at"],
-        "notification_type": status_update["notification_type"],
-        "template_id": status_update["template_id"],
-        "template_version": status_update["template_version"],
-    }
+    data = _delivery_status_callback_data(notification_id, status_update)
 
     start_dt = datetime.utcnow()
 
@@ -96,6 +99,107 @@ def send_delivery_status_to_service(
             )
 
 
+@notify_celery.task(bind=True, name="send-delivery-statuses", early_log_level=logging.DEBUG)
+def send_delivery_statuses_to_service(self, status_updates):
+    """
+    Sends a batch of delivery status callbacks for a service concurrently, SERVICE_CALLBACK_BATCH_CONCURRENCY at a
+    time. `status_updates` is a list of [notification_id, encoded_status_update, receipt_iso_timestamp] - the
+    arguments send_delivery_status_to_service would be given for each.
+
+    Callbacks which fail in a way send-delivery-status would retry are handed to their own send-delivery-status
+    task on the retry queue, which then carries on retrying them as usual.
+    """
+    start_dt = datetime.utcnow()
+    decoded_status_updates = [
+        (notification_id, encoded_status_update, receipt_iso_timestamp, signing.decode(encoded_status_update))
+        for notification_id, encoded_status_update, receipt_iso_timestamp in status_updates
+    ]
+
+    # a batch's callbacks are all for the same service, so go to the same url
+    circuit = check_service_callback_circuit(decoded_status_updates[0][3]["service_callback_api_url"])
+    if circuit.park_for:
+        _park_delivery_status_callbacks(self, status_updates, circuit.park_for)
+        return
+    if circuit.probe and len(status_updates) > 1:
+        _park_delivery_status_callbacks(self, status_updates[1:], CIRCUIT_PROBE_TIMEOUT_SECONDS)
+        decoded_status_updates = decoded_status_updates[:1]
+
+    executor = _get_callback_executor()
+    futures = [
+        executor.submit(
+            _post_to_service_callback_api,
+            _delivery_status_callback_data(notification_id, status_update),
+            status_update["service_callback_api_url"],
+            status_update["service_callback_api_bearer_token"],
+        )
+        for notification_id, _, _, status_update in decoded_status_updates
+    ]
+
+    for (notification_id, encoded_status_update, receipt_iso_timestamp, status_update), future in zip(
+        decoded_status_updates, futures, strict=True
+    ):
+        service_callback_url = status_update["service_callback_api_url"]
+        log_extra = {
+            "celery_task": self.name,
+            "service_callback_url": service_callback_url,
+            "notification_id": str(notification_id),
+        }
+        try:
+            _log_service_callback_response(
+                self.name, str(notification_id), service_callback_url, future.result(), log_extra
+            )
+            record_service_callback_circuit_result(service_callback_url, succeeded=True)
+        except requests.RequestException as e:
+            should_be_retried = _service_callback_should_be_retried(
+                self.name, str(notification_id), service_callback_url, e, log_extra
+            )
+            record_service_callback_circuit_result(service_callback_url, succeeded=not should_be_retried)
+            if should_be_retried:
+                send_delivery_status_to_service.apply_async(
+                    [notification_id, encoded_status_update],
+                    {"receipt_iso_timestamp": receipt_iso_timestamp},
+                    queue=QueueNames.CALLBACKS_RETRY,
+                    countdown=send_delivery_status_to_service.default_retry_delay,
+                    # this batch counts as the first attempt
+                    retries=1,
+                )
+        finally:
+            if receipt_iso_timestamp:
+                record_service_callback_forward_duration(
+                    (start_dt - datetime.fromisoformat(receipt_iso_timestamp)).total_seconds(),
+                    str(ServiceCallbackTypes.delivery_status),
+                    0,
+                    status_update["notification_type"],
+                )
+
+
+def _park_delivery_status_callbacks(self, status_updates, park_for):
+    extra = {"celery_task": self.name, "callback_count": len(status_updates), "park_for": park_for}
+    current_app.logger.info(
+        "%(celery_task)s parking %(callback_count)s callbacks for %(park_for)s seconds as their url's circuit is open",
+        extra,
+        extra=extra,
+    )
+    record_service_callback_parked(self.name, len(status_updates))
+    self.apply_async([status_updates], queue=QueueNames.CALLBACKS_RETRY, countdown=park_for)
+
+
+def _get_callback_executor():
+    global _callback_executor, _callback_executor_pid
+
+    # a forked process doesn't inherit the executor's threads, so needs its own
+    if _callback_executor_pid != os.getpid():
+        with _callback_executor_lock:
+            if _callback_executor_pid != os.getpid():
+                _callback_executor = ThreadPoolExecutor(
+                    max_workers=current_app.config["SERVICE_CALLBACK_BATCH_CONCURRENCY"],
+                    thread_name_prefix="service-callback",
+                )
+                _callback_executor_pid = os.getpid()
+
+    return _callback_executor
+
+
 @notify_celery.task(bind=True, name="send-complaint", max_retries=5, default_retry_delay=300)
 def send_complaint_to_service(self, complaint_data):
     complaint = signing.decode(complaint_data)
@@ -150,42 +254,60 @@ def send_inbound_sms_to_service(self, inbound_sms_id, service_id):
         )
 
 
+def _delivery_status_callback_data(notification_id, status_update):
+    return {
+        "id": str(notification_id),
+        "reference": status_update["notification_client_reference"],
+        "to": status_update["notification_to"],
+        "status": status_update["notification_status"],
+        "created_at": status_update["notification_created_at"],
+        "completed_at": status_update["notification_updated_at"],
+        "sent_at": status_update["notification_sent_at"],
+        "notification_type": status_update["notification_type"],
+        "template_id": status_update["template_id"],
+        "template_version": status_update["template_version"],
+    }
+
+
 def _send_data_to_service_callback_api(self, data, service_callback_url, token, id_display, log_extra):
     log_extra = {
         "celery_task": self.name,
         "service_callback_url": service_callback_url,
         **log_extra,
     }
-    try:
-        response = requests_session.request(
-            method="POST",
-            url=service_callback_url,
-            data=RCJSONEncoder().encode(data),
-            headers={"Content-Type": "application/json", "Authorization": f"Bearer {token}"},
-            timeout=5,
-        )
+
+    circuit = check_service_callback_circuit(service_callback_url)
+    if circuit.park_for:
         current_app.logger.info(
-            "%s sending %s to %s, response %s",
+            "%s parking %s for %s seconds as the circuit for url %s is open",
             self.name,
             id_display,
+            circuit.park_for,
             service_callback_url,
-            response.status_code,
-            extra={
-                "status_code": response.status_code,
-                **log_extra,
-            },
+            extra=log_extra,
         )
-        response.raise_for_status()
+        record_service_callback_parked(self.name)
+        # parking the callback doesn't count as one of its retries
+        self.apply_async(
+            self.request.args,
+            self.request.kwargs,
+            queue=QueueNames.CALLBACKS_RETRY,
+            countdown=circuit.park_for,
+            retries=self.request.retries,
+        )
+        return
+
+    try:
+        response = _post_to_service_callback_api(data, service_callback_url, token)
+        _log_service_callback_response(self.name, id_display, service_callback_url, response, log_extra)
+        record_service_callback_circuit_result(service_callback_url, succeeded=True)
     except requests.RequestException as e:
-        current_app.logger.warning(
-            "%s request failed for id: %s and url: %s. exception: %s",
-            self.name,
-            id_display,
-            service_callback_url,
-            e,
-            extra=log_extra,
+        should_be_retried = _service_callback_should_be_retried(
+            self.name, id_display, service_callback_url, e, log_extra
         )
-        if not isinstance(e, requests.HTTPError) or e.response.status_code >= 500 or e.response.status_code == 429:
+        # only failures which suggest the service's endpoint is struggling count against its circuit
+        record_service_callback_circuit_result(service_callback_url, succeeded=not should_be_retried)
+        if should_be_retried:
             try:
                 self.retry(queue=QueueNames.CALLBACKS_RETRY)
             except self.MaxRetriesExceededError as e:
@@ -196,15 +318,57 @@ def _send_data_to_service_callback_api(self, data, service_callback_url, token,
                     id_display,
                     extra=log_extra,
                 )
-        else:
-            current_app.logger.warning(
-                "%s callback is not being retried for id: %s and url: %s. exception: %s",
-                self.name,
-                id_display,
-                service_callback_url,
-                e,
-                extra=log_extra,
-            )
+
+
+def _post_to_service_callback_api(data, service_callback_url, token):
+    return requests_session.request(
+        method="POST",
+        url=service_callback_url,
+        data=RCJSONEncoder().encode(data),
+        headers={"Content-Type": "application/json", "Authorization": f"Bearer {token}"},
+        timeout=5,
+    )
+
+
+def _log_service_callback_response(task_name, id_display, service_callback_url, response, log_extra):
+    """
+    Raises an HTTPError if the response was an error
+    """
+    current_app.logger.info(
+        "%s sending %s to %s, response %s",
+        task_name,
+        id_display,
+        service_callback_url,
+        response.status_code,
+        extra={
+            "status_code": response.status_code,
+            **log_extra,
+        },
+    )
+    response.raise_for_status()
+
+
+def _service_callback_should_be_retried(task_name, id_display, service_callback_url, e, log_extra):
+    current_app.logger.warning(
+        "%s request failed for id: %s and url: %s. exception: %s",
+        task_name,
+        id_display,
+        service_callback_url,
+        e,
+        extra=log_extra,
+    )
+    if not isinstance(e, requests.HTTPError) or e.response.status_code >= 500 or e.response.status_code == 429:
+        return True
+
+    current_app.logger.warning(
+        "%s callback is not being retried for id: %s and url: %s. exception: %s",
+        task_name,
+        id_display,
+        service_callback_url,
+        e,
+        extra=log_extra,
+    )
+    return False
 
 
 def create_delivery_status_callback_data(notification, service_callback_api):
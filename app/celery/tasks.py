@@ -1,3 +1,6 @@
+import csv
+import io
+import itertools
 import logging
 from collections.abc import Sequence
 from datetime import datetime
@@ -33,8 +36,10 @@ from app.constants import (
     REPORT_REQUEST_STORED,
     SMS_TYPE,
 )
-from app.dao.jobs_dao import dao_get_job_by_id, dao_update_job
+from app.dao.jobs_dao import dao_get_job_by_id, dao_record_job_partition_shattered, dao_update_job
 from app.dao.notifications_dao import (
+    dao_bulk_create_notifications,
+    dao_get_already_saved_notifications,
     dao_get_last_notification_added_for_job_id,
     dao_get_unknown_references,
     dao_update_notifications_by_reference,
@@ -48,7 +53,13 @@ from app.dao.service_email_reply_to_dao import dao_get_reply_to_by_id
 from app.dao.service_sms_sender_dao import dao_get_service_sms_senders_by_id
 from app.dao.template_email_files_dao import dao_get_template_email_files_by_template_id
 from app.dao.templates_dao import dao_get_template_by_id
-from app.notifications.process_notifications import add_email_file_links_to_personalisation, persist_notification
+from app.notifications.process_notifications import (
+    add_email_file_links_to_personalisation,
+    build_notification_row,
+    increment_daily_limit_caches_for_batch,
+    persist_notification,
+)
+from app.notifications.todays_stats_cache import record_notifications_created
 from app.notifications.validators import (
     check_service_over_daily_message_limit,
     validate_and_format_recipient,
@@ -57,9 +68,10 @@ from app.report_requests.process_notifications_report import ReportRequestProces
 from app.serialised_models import SerialisedService, SerialisedTemplate
 from app.service.utils import service_allowed_to_send_to
 from app.utils import batched
-from app.v2.errors import TooManyRequestsError
+from app.v2.errors import BadRequestError, TooManyRequestsError
 
 DEFAULT_SHATTER_JOB_ROWS_BATCH_SIZE = 32
+DEFAULT_JOB_CSV_ROWS_CHUNK_SIZE = 1000
 
 
 class UnprocessableJobRow(Exception):
@@ -104,7 +116,28 @@ def process_job(self, job_id, sender_id=None, shatter_batch_size=DEFAULT_SHATTER
     if __sending_limits_for_job_exceeded(service, job, job_id):
         return
 
-    recipient_csv, template, sender_id = get_recipient_csv_and_template_and_sender_id(job)
+    if (
+        current_app.config["PARALLEL_JOB_SHATTERING_ENABLED"]
+        and job.notification_count > current_app.config["JOB_SHATTER_PARTITION_SIZE"]
+    ):
+        job.shatter_partition_size = current_app.config["JOB_SHATTER_PARTITION_SIZE"]
+        dao_update_job(job)
+
+        current_app.logger.info(
+            "Starting job %s processing %s notifications in %s partitions",
+            job_id,
+            job.notification_count,
+            job.shatter_partition_count,
+            extra={
+                "job_id": job_id,
+                "notification_count": job.notification_count,
+                "shatter_partition_count": job.shatter_partition_count,
+            },
+        )
+        _enqueue_job_partitions(job, range(job.shatter_partition_count), self.message_group_id, shatter_batch_size)
+        return
+
+    job_rows, template, sender_id = get_job_rows_and_template_and_sender_id(job)
 
     has_files = bool(dao_get_template_email_files_by_template_id(job.template_id))
 
@@ -115,17 +148,76 @@ def process_job(self, job_id, sender_id=None, shatter_batch_size=DEFAULT_SHATTER
         extra={"job_id": job_id, "notification_count": job.notification_count},
     )
 
-    for shatter_batch in batched(recipient_csv, n=shatter_batch_size):
+    _shatter_job_rows_in_batches(
+        job_rows, template, job, sender_id, self.message_group_id, shatter_batch_size, has_files=has_files
+    )
+
+    job_complete(job, start=start)
+
+
+def _enqueue_job_partitions(job, partitions, message_group_id, shatter_batch_size):
+    for partition in partitions:
+        process_job_partition.apply_async(
+            (str(job.id), partition),
+            {"shatter_batch_size": shatter_batch_size},
+            queue=QueueNames.JOBS,
+            MessageGroupId=message_group_id,
+        )
+
+
+@notify_celery.task(bind=True, name="process-job-partition")
+def process_job_partition(self, job_id, partition, shatter_batch_size=DEFAULT_SHATTER_JOB_ROWS_BATCH_SIZE):
+    """
+    Shatters one row-range partition of a job. Once a partition's rows have all been sent on it is added to the
+    job's shattered_partitions, and whichever partition task finishes last marks the job as finished.
+    """
+    job = dao_get_job_by_id(job_id)
+
+    if job.job_status != JOB_STATUS_IN_PROGRESS or partition in job.shattered_partitions:
+        # the job has been cancelled, or this partition has already been shattered by an earlier delivery of this task
+        return
+
+    start_row = partition * job.shatter_partition_size
+    stop_row = min(start_row + job.shatter_partition_size, job.notification_count)
+
+    # if the partition was part shattered before (eg by a delivery of this task whose worker was killed, or before
+    # the job was resumed), carry on after its last saved row so the rows already saved aren't sent again
+    if last_notification_added := dao_get_last_notification_added_for_job_id(
+        job.id, start_row=start_row, stop_row=stop_row
+    ):
+        start_row = last_notification_added.job_row_number + 1
+
+    job_rows, template, sender_id = get_job_rows_and_template_and_sender_id(job, start=start_row, stop=stop_row)
+
+    has_files = bool(dao_get_template_email_files_by_template_id(job.template_id))
+
+    extra = {"job_id": job_id, "shatter_partition": partition, "job_row_start": start_row, "job_row_stop": stop_row}
+    current_app.logger.info(
+        "Starting job %(job_id)s partition %(shatter_partition)s processing rows %(job_row_start)s to %(job_row_stop)s",
+        extra,
+        extra=extra,
+    )
+
+    _shatter_job_rows_in_batches(
+        job_rows, template, job, sender_id, self.message_group_id, shatter_batch_size, has_files=has_files
+    )
+
+    if dao_record_job_partition_shattered(job.id, partition) == job.shatter_partition_count:
+        job_complete(job, start=job.processing_started)
+
+
+def _shatter_job_rows_in_batches(
+    job_rows, template, job, sender_id, message_group_id, shatter_batch_size, has_files=False
+):
+    for shatter_batch in batched(job_rows, n=shatter_batch_size):
         batch_args_kwargs = [
-            get_id_task_args_kwargs_for_job_row(row, template, job, service, sender_id=sender_id)[1]
+            get_id_task_args_kwargs_for_job_row(row, template, job, job.service, sender_id=sender_id)[1]
             for row in shatter_batch
         ]
         _shatter_job_rows_with_subdivision(
-            template.template_type, batch_args_kwargs, self.message_group_id, has_files=has_files
+            template.template_type, batch_args_kwargs, message_group_id, has_files=has_files
         )
 
-    job_complete(job, start=start)
-
 
 def _shatter_job_rows_with_subdivision(
     template_type, args_kwargs_seq, message_group_id, top_level=True, has_files=False
@@ -175,6 +267,19 @@ def shatter_job_rows(
     args_kwargs_seq: Sequence,
     has_files: bool = False,
 ):
+    if current_app.config["BATCH_SAVE_JOB_ROWS_ENABLED"] and template_type in (SMS_TYPE, EMAIL_TYPE) and not has_files:
+        # rows with email files need their own document download uploads, so aren't batched
+        send_fn = {
+            SMS_TYPE: save_sms_batch,
+            EMAIL_TYPE: save_email_batch,
+        }[template_type]
+        send_fn.apply_async(
+            (args_kwargs_seq,),
+            queue=QueueNames.DATABASE,
+            MessageGroupId=self.message_group_id,
+        )
+        return
+
     for task_args_kwargs in args_kwargs_seq:
         process_job_row(template_type, task_args_kwargs, has_files, self.message_group_id)
 
@@ -226,14 +331,47 @@ def job_complete(job, resumed=False, start=None):
         )
 
 
-def get_recipient_csv_and_template_and_sender_id(job):
+def get_job_rows_and_template_and_sender_id(job, start=0, stop=None):
     db_template = dao_get_template_by_id(job.template_id, job.template_version)
     template = db_template._as_utils_template()
 
-    contents, meta_data = s3.get_job_and_metadata_from_s3(service_id=str(job.service_id), job_id=str(job.id))
-    recipient_csv = RecipientCSV(contents, template=template)
+    lines, meta_data = s3.get_job_lines_and_metadata_from_s3(service_id=str(job.service_id), job_id=str(job.id))
+
+    return iter_job_csv_rows(lines, template, start=start, stop=stop), template, meta_data.get("sender_id")
+
 
-    return recipient_csv, template, meta_data.get("sender_id")
+def iter_job_csv_rows(lines, template, chunk_size=DEFAULT_JOB_CSV_ROWS_CHUNK_SIZE, start=0, stop=None):
+    """
+    Yields the rows of a job's CSV file from an iterable of its lines.
+
+    Rather than giving RecipientCSV the whole file, the file is parsed `chunk_size` rows at a time, so only one
+    chunk of the file needs to be held in memory however big the job is. Each chunk gets its own copy of the
+    header row, and its rows' indexes are adjusted so they're the same as if the whole file had been parsed at once.
+
+    Only rows with indexes from `start` up to (but not including) `stop` are yielded. Rows outside that range are
+    skipped without being given to RecipientCSV at all.
+    """
+    # split lines the same way RecipientCSV does, so quoted values spanning lines are parsed the same
+    split_lines = (split_line for line in lines for split_line in line.splitlines())
+    # RecipientCSV ignores blank rows and doesn't count them towards row indexes
+    records = (
+        record for record in csv.reader(split_lines, quoting=csv.QUOTE_MINIMAL, skipinitialspace=True) if any(record)
+    )
+    if (header := next(records, None)) is None:
+        return
+
+    index_offset = start
+    for chunk in batched(itertools.islice(records, start, stop), n=chunk_size):
+        chunk_file = io.StringIO()
+        writer = csv.writer(chunk_file)
+        writer.writerow(header)
+        writer.writerows(chunk)
+
+        for row in RecipientCSV(chunk_file.getvalue(), template=template):
+            row.index += index_offset
+            yield row
+
+        index_offset += len(chunk)
 
 
 def get_id_task_args_kwargs_for_job_row(row, template, job, service, sender_id=None):
@@ -353,6 +491,9 @@ def save_sms(
         }
 
     try:
+        if _notification_already_saved(notification_id, notification):
+            return
+
         saved_notification = persist_notification(
             template_id=notification["template"],
             template_version=notification["template_version"],
@@ -439,6 +580,9 @@ def save_email(self, service_id, notification_id, encoded_notification, sender_i
         return
 
     try:
+        if _notification_already_saved(notification_id, notification):
+            return
+
         saved_notification = persist_notification(
             template_id=notification["template"],
             template_version=notification["template_version"],
@@ -497,6 +641,9 @@ def save_letter(
     )
 
     try:
+        if _notification_already_saved(notification_id, notification):
+            return
+
         saved_notification = persist_notification(
             template_id=notification["template"],
             template_version=notification["template_version"],
@@ -538,6 +685,229 @@ def save_letter(
         handle_exception(self, notification, notification_id, e)
 
 
+@notify_celery.task(bind=True, name="save-sms-batch", max_retries=5, default_retry_delay=300)
+def save_sms_batch(self, args_kwargs_seq: Sequence):
+    try:
+        _save_notifications_batch(SMS_TYPE, args_kwargs_seq, self.message_group_id)
+    except SQLAlchemyError as e:
+        handle_batch_exception(self, SMS_TYPE, args_kwargs_seq, e)
+
+
+@notify_celery.task(bind=True, name="save-email-batch", max_retries=5, default_retry_delay=300)
+def save_email_batch(self, args_kwargs_seq: Sequence):
+    try:
+        _save_notifications_batch(EMAIL_TYPE, args_kwargs_seq, self.message_group_id)
+    except SQLAlchemyError as e:
+        handle_batch_exception(self, EMAIL_TYPE, args_kwargs_seq, e)
+
+
+def _save_notifications_batch(notification_type, args_kwargs_seq, message_group_id=None):
+    """
+    Persist a shatter batch of sms or email job rows with a single bulk insert, incrementing the daily
+    limit caches once for the whole batch.
+
+    `args_kwargs_seq` is the same sequence of (args, kwargs) shatter_job_rows would otherwise pass to
+    individual save_sms/save_email tasks. Any row that doesn't pass validation, or the whole batch if
+    the insert fails, falls back to those per-row tasks, which already know how to handle restricted
+    services, invalid recipients, retries and duplicate rows.
+    """
+    if not args_kwargs_seq:
+        return
+
+    # every row in a shatter batch belongs to the same job, so has the same service
+    service = SerialisedService.from_id(args_kwargs_seq[0][0][0])
+    reply_to_texts = {}
+
+    notifications = [signing.decode(encoded_notification) for (_, _, encoded_notification), _ in args_kwargs_seq]
+    job_id = notifications[0].get("job", None)
+    already_saved = dao_get_already_saved_notifications(
+        [notification_id for (_, notification_id, _), _ in args_kwargs_seq],
+        job_id,
+        [notification.get("row_number", None) for notification in notifications],
+    )
+    already_saved_ids = {str(notification_id) for notification_id, _ in already_saved}
+    already_saved_job_row_numbers = {job_row_number for _, job_row_number in already_saved} if job_id else set()
+
+    notification_rows = []
+    fallback_args_kwargs_seq = []
+    for task_args_kwargs, notification in zip(args_kwargs_seq, notifications, strict=True):
+        (_, notification_id, _), task_kwargs = task_args_kwargs
+        if (
+            str(notification_id) in already_saved_ids
+            or notification.get("row_number", None) in already_saved_job_row_numbers
+        ):
+            # SQS delivered this batch's message again, or the batch is being retried after saving some of it
+            continue
+
+        template = SerialisedTemplate.from_id_service_id_and_version(
+            notification["template"],
+            service_id=service.id,
+            version=notification["template_version"],
+        )
+
+        sender_id = task_kwargs.get("sender_id")
+        if sender_id not in reply_to_texts:
+            reply_to_texts[sender_id] = _get_reply_to_text_for_job_row(notification_type, service, template, sender_id)
+
+        if (recipient := _validate_job_row_recipient_for_batch(notification_type, notification, service)) is None:
+            fallback_args_kwargs_seq.append(task_args_kwargs)
+            continue
+
+        if notification_type == EMAIL_TYPE:
+            personalisation = add_email_file_links_to_personalisation(
+                template=template, personalisation=notification.get("personalisation", {}), recipient=recipient
+            )
+        else:
+            personalisation = notification.get("personalisation")
+
+        notification_rows.append(
+            build_notification_row(
+                template_id=notification["template"],
+                template_version=notification["template_version"],
+                recipient=recipient,
+                service=service,
+                personalisation=personalisation,
+                notification_type=notification_type,
+                key_type=KEY_TYPE_NORMAL,
+                created_at=datetime.utcnow(),
+                job_id=notification.get("job", None),
+                job_row_number=notification.get("row_number", None),
+                notification_id=notification_id,
+                reply_to_text=reply_to_texts[sender_id],
+                client_reference=notification.get("client_reference", None),
+            )
+        )
+
+    if notification_rows and not _save_notification_rows(
+        notification_type, service, notification_rows, message_group_id
+    ):
+        for task_args_kwargs in args_kwargs_seq:
+            process_job_row(notification_type, task_args_kwargs, message_group_id=message_group_id)
+        return
+
+    extra = {
+        "notification_type": notification_type,
+        "job_id": notification_rows[0]["job_id"] if notification_rows else None,
+        "saved_count": len(notification_rows),
+        "fallback_count": len(fallback_args_kwargs_seq),
+    }
+    current_app.logger.info(
+        "Saved batch of %(saved_count)s %(notification_type)s notifications for job %(job_id)s, "
+        "%(fallback_count)s rows sent to per-row tasks",
+        extra,
+        extra=extra,
+    )
+
+    for task_args_kwargs in fallback_args_kwargs_seq:
+        process_job_row(notification_type, task_args_kwargs, message_group_id=message_group_id)
+
+
+def _save_notification_rows(notification_type, service, notification_rows, message_group_id):
+    try:
+        notification_ids = dao_bulk_create_notifications(notification_rows)
+    except SQLAlchemyError:
+        extra = {
+            "notification_type": notification_type,
+            "batch_size": len(notification_rows),
+        }
+        current_app.logger.exception(
+            "Failed to save %(notification_type)s batch of %(batch_size)s notifications, falling back to per-row tasks",
+            extra,
+            extra=extra,
+        )
+        return False
+
+    increment_daily_limit_caches_for_batch(service, notification_rows, KEY_TYPE_NORMAL)
+    record_notifications_created(service.id, KEY_TYPE_NORMAL, {notification_type: len(notification_rows)})
+
+    deliver_task, deliver_batch_task, deliver_queue, batching_enabled_config, batch_size_config = {
+        SMS_TYPE: (
+            provider_tasks.deliver_sms,
+            provider_tasks.deliver_sms_batch,
+            QueueNames.SEND_SMS,
+            "SMS_DELIVERY_BATCHING_ENABLED",
+            "SMS_DELIVERY_BATCH_SIZE",
+        ),
+        EMAIL_TYPE: (
+            provider_tasks.deliver_email,
+            provider_tasks.deliver_emails,
+            QueueNames.SEND_EMAIL,
+            "EMAIL_DELIVERY_BATCHING_ENABLED",
+            "EMAIL_DELIVERY_BATCH_SIZE",
+        ),
+    }[notification_type]
+
+    if current_app.config[batching_enabled_config]:
+        for notification_ids_batch in batched(notification_ids, current_app.config[batch_size_config]):
+            deliver_batch_task.apply_async(
+                [[str(notification_id) for notification_id in notification_ids_batch]],
+                queue=deliver_queue,
+                MessageGroupId=message_group_id,
+            )
+        return True
+
+    for notification_id in notification_ids:
+        deliver_task.apply_async(
+            [str(notification_id)],
+            queue=deliver_queue,
+            MessageGroupId=message_group_id,
+        )
+
+    return True
+
+
+def _validate_job_row_recipient_for_batch(notification_type, notification, service):
+    """
+    Returns the recipient to persist for a batched job row, or None if the row needs to go through the
+    per-row save task instead
+    """
+    if not service_allowed_to_send_to(notification["to"], service, KEY_TYPE_NORMAL):
+        return None
+
+    if notification_type == EMAIL_TYPE:
+        return notification["to"]
+
+    try:
+        return validate_and_format_recipient(
+            send_to=notification["to"],
+            key_type=KEY_TYPE_NORMAL,
+            service=service,
+            notification_type=SMS_TYPE,
+            check_intl_sms_limit=False,
+        )
+    except (InvalidPhoneError, BadRequestError):
+        return None
+
+
+def _get_reply_to_text_for_job_row(notification_type, service, template, sender_id):
+    if not sender_id:
+        return template.reply_to_text
+
+    if notification_type == SMS_TYPE:
+        return dao_get_service_sms_senders_by_id(service.id, sender_id).sms_sender
+
+    return dao_get_reply_to_by_id(reply_to_id=sender_id, service_id=service.id).email_address
+
+
+def _notification_already_saved(notification_id, notification):
+    if not dao_get_already_saved_notifications(
+        [notification_id], notification.get("job", None), [notification.get("row_number", None)]
+    ):
+        return False
+
+    extra = {
+        "notification_id": notification_id,
+        "job_id": notification.get("job", None),
+        "job_row_number": notification.get("row_number", None),
+    }
+    current_app.logger.info(
+        "Notification %(notification_id)s for job %(job_id)s row number %(job_row_number)s has already been saved",
+        extra,
+        extra=extra,
+    )
+    return True
+
+
 def handle_exception(task, notification, notification_id, exc):
     job_id = notification.get("job", None)
     job_row_number = notification.get("row_number", None)
@@ -569,6 +939,35 @@ def handle_exception(task, notification, notification_id, exc):
             current_app.logger.error("Max retry failed: " + base_msg, extra, extra=extra)  # noqa
 
 
+def handle_batch_exception(task, notification_type, args_kwargs_seq, exc):
+    """
+    Retries a batch save task whose rows couldn't be looked up or saved. Saving the batch again is safe even if some
+    of it was saved first, as rows which have already been saved are skipped.
+    """
+    (_, first_notification_id, encoded_notification), _ = args_kwargs_seq[0]
+    extra = {
+        "celery_task": task.name,
+        "notification_type": notification_type,
+        "job_id": signing.decode(encoded_notification).get("job", None),
+        "batch_size": len(args_kwargs_seq),
+        "notification_id": first_notification_id,
+    }
+    base_msg = (
+        "task %(celery_task)s %(notification_type)s batch of %(batch_size)s notifications for job %(job_id)s "
+        "starting with notification id %(notification_id)s"
+    )
+    current_app.logger.exception("Retry: " + base_msg, extra, extra=extra)  # noqa
+    try:
+        retry_kwargs = {
+            "queue": QueueNames.RETRY,
+            "exc": exc,
+            "MessageGroupId": task.message_group_id,
+        }
+        task.retry(**retry_kwargs)
+    except task.MaxRetriesExceededError:
+        current_app.logger.error("Max retry failed: " + base_msg, extra, extra=extra)  # noqa
+
+
 @notify_celery.task(name="process-incomplete-jobs")
 def process_incomplete_jobs(job_ids, shatter_batch_size=DEFAULT_SHATTER_JOB_ROWS_BATCH_SIZE):
     jobs = [dao_get_job_by_id(job_id) for job_id in job_ids]
@@ -591,6 +990,10 @@ def process_incomplete_jobs(job_ids, shatter_batch_size=DEFAULT_SHATTER_JOB_ROWS
 def process_incomplete_job(job_id, shatter_batch_size=DEFAULT_SHATTER_JOB_ROWS_BATCH_SIZE):
     job = dao_get_job_by_id(job_id)
 
+    if job.shatter_partition_size:
+        process_incomplete_partitioned_job(job, shatter_batch_size=shatter_batch_size)
+        return
+
     last_notification_added = dao_get_last_notification_added_for_job_id(job_id)
 
     if last_notification_added:
@@ -605,21 +1008,33 @@ def process_incomplete_job(job_id, shatter_batch_size=DEFAULT_SHATTER_JOB_ROWS_B
         extra={"job_id": job_id, "job_row_number": resume_from_row},
     )
 
-    recipient_csv, template, sender_id = get_recipient_csv_and_template_and_sender_id(job)
+    job_rows, template, sender_id = get_job_rows_and_template_and_sender_id(job, start=resume_from_row + 1)
 
-    for shatter_batch in batched(
-        (row for row in recipient_csv if row.index > resume_from_row),
-        n=shatter_batch_size,
-    ):
-        batch_args_kwargs = [
-            get_id_task_args_kwargs_for_job_row(row, template, job, job.service, sender_id=sender_id)[1]
-            for row in shatter_batch
-        ]
-        _shatter_job_rows_with_subdivision(template.template_type, batch_args_kwargs, str(job.service_id))
+    _shatter_job_rows_in_batches(job_rows, template, job, sender_id, str(job.service_id), shatter_batch_size)
 
     job_complete(job, resumed=True)
 
 
+def process_incomplete_partitioned_job(job, shatter_batch_size=DEFAULT_SHATTER_JOB_ROWS_BATCH_SIZE):
+    remaining_partitions = [
+        partition for partition in range(job.shatter_partition_count) if partition not in job.shattered_partitions
+    ]
+
+    current_app.logger.info(
+        "Resuming job %s from %s remaining partitions",
+        job.id,
+        len(remaining_partitions),
+        extra={"job_id": job.id, "shatter_partition_count": len(remaining_partitions)},
+    )
+
+    if not remaining_partitions:
+        # every partition was shattered but the job wasn't marked as finished
+        job_complete(job, resumed=True)
+        return
+
+    _enqueue_job_partitions(job, remaining_partitions, str(job.service_id), shatter_batch_size)
+
+
 @notify_celery.task(name="process-returned-letters-list")
 def process_returned_letters_list(notification_references):
     for ref in dao_get_unknown_references(notification_references):
@@ -122,6 +122,15 @@ class AwsSesClient(EmailClient):
             )
             return response["MessageId"]
 
+    def get_max_send_rate(self) -> float:
+        """
+        Returns the maximum number of emails per second the SES account can send.
+        """
+        try:
+            return self._client.get_account()["SendQuota"]["MaxSendRate"]
+        except botocore.exceptions.ClientError as e:
+            raise AwsSesClientException(str(e) + e.response["Error"]["Code"]) from e
+
 
 def punycode_encode_email(email_address):
     # only the hostname should ever be punycode encoded.
@@ -6,6 +6,7 @@ import itertools
 import logging
 import os
 import random
+import resource
 import uuid
 from datetime import date, datetime, timedelta
 from time import monotonic
@@ -30,7 +31,14 @@ from app.celery.letters_pdf_tasks import (
 )
 from app.celery.tasks import get_id_task_args_kwargs_for_job_row, process_job_row
 from app.config import QueueNames
-from app.constants import KEY_TYPE_TEST, NOTIFICATION_CREATED, SMS_TYPE
+from app.constants import (
+    EMAIL_TYPE,
+    KEY_TYPE_TEST,
+    NOTIFICATION_CREATED,
+    NOTIFICATION_REQUEST_REPORT_ALL,
+    REPORT_REQUEST_NOTIFICATIONS,
+    SMS_TYPE,
+)
 from app.dao.annual_billing_dao import (
     dao_create_or_update_annual_billing_for_year,
     set_default_free_allowance_for_service,
@@ -47,6 +55,7 @@ from app.dao.organisation_dao import (
     dao_get_organisation_by_email_address,
     dao_get_organisation_by_id,
 )
+from app.dao.report_requests_dao import dao_create_report_request
 from app.dao.services_dao import (
     dao_create_service,
     dao_fetch_all_services_by_user,
@@ -68,10 +77,12 @@ from app.models import (
     LetterBranding,
     Notification,
     Organisation,
+    ReportRequest,
     Service,
     Template,
     User,
 )
+from app.report_requests.process_notifications_report import ReportRequestProcessor
 
 
 @click.group(name="command", help="Additional commands")
@@ -1012,3 +1023,92 @@ def generate_bulktest_data(user_id):
     pprint("Committing...")
     db.session.commit()
     pprint("Finished.")
+
+
+@click.option("-s", "--service-id", required=True)
+@click.option("-t", "--notification-type", type=click.Choice([EMAIL_TYPE, SMS_TYPE]), default=SMS_TYPE)
+@click.option(
+    "-c",
+    "--create-notifications",
+    type=int,
+    default=0,
+    help="Insert this many delivered notifications for the service first (development only)",
+)
+@notify_command(name="benchmark-notifications-report")
+def benchmark_notifications_report(service_id, notification_type, create_notifications):
+    """
+    Generates a report of all the service's notifications of a type, without uploading it to S3, and prints how many
+    rows per second it managed and the process's peak memory use. For example, to benchmark a report for a service
+    with a million notifications:
+
+        flask command benchmark-notifications-report -s <service id> -c 1000000
+    """
+    service = Service.query.get(service_id)
+
+    if create_notifications:
+        if os.getenv("NOTIFY_ENVIRONMENT", "") not in ["development", "test"]:
+            current_app.logger.error("Can only create notifications in development")
+            return
+
+        template = Template.query.filter_by(service_id=service.id, template_type=notification_type).first()
+        db.session.execute(
+            text(
+                """
+                INSERT INTO notifications (
+                    id, "to", normalised_to, service_id, template_id, template_version, key_type, billable_units,
+                    notification_type, created_at, notification_status, client_reference, rate_multiplier,
+                    international
+                )
+                SELECT
+                    gen_random_uuid(), :to, :to, :service_id, :template_id, :template_version, 'normal', 1,
+                    :notification_type, (now() AT TIME ZONE 'utc') - (i % 518400) * interval '1 second', 'delivered',
+                    'BENCHMARK: ' || i, 1, false
+                FROM generate_series(1, :count) AS i
+                """
+            ),
+            {
+                "to": "07700900001" if notification_type == SMS_TYPE else "benchmark@example.com",
+                "service_id": service.id,
+                "template_id": template.id,
+                "template_version": template.version,
+                "notification_type": notification_type,
+                # within the last 6 days, so they're all inside the default data retention
+                "count": create_notifications,
+            },
+        )
+        db.session.commit()
+        print(f"Created {create_notifications:,} notifications")
+
+    report_request = ReportRequest(
+        user_id=service.created_by_id,
+        service_id=service.id,
+        report_type=REPORT_REQUEST_NOTIFICATIONS,
+        parameter={"notification_type": notification_type, "notification_status": NOTIFICATION_REQUEST_REPORT_ALL},
+    )
+    dao_create_report_request(report_request)
+
+    row_count = 0
+
+    def count_rows(*, data_bytes, **kwargs):
+        nonlocal row_count
+        row_count += data_bytes.count(b"\n")
+        return {"ETag": "benchmark"}
+
+    module = "app.report_requests.process_notifications_report"
+    start = monotonic()
+    with (
+        mock.patch(f"{module}.s3_multipart_upload_create", return_value={"UploadId": "benchmark"}),
+        mock.patch(f"{module}.s3_multipart_upload_part", side_effect=count_rows),
+        mock.patch(f"{module}.s3_multipart_upload_complete"),
+    ):
+        ReportRequestProcessor(service.id, report_request.id).process()
+    duration = monotonic() - start
+
+    db.session.delete(report_request)
+    db.session.commit()
+
+    # not counting the header
+    row_count -= 1
+    # ru_maxrss is in kilobytes on linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{row_count:,} rows in {duration:.2f}s: {row_count / duration:,.0f} rows/s, peak RSS {peak_rss_mb:,.1f}MB")
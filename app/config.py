@@ -231,6 +231,13 @@ class Config:
     DATABASE_STATEMENT_TIMEOUT_MS = int(os.getenv("DATABASE_STATEMENT_TIMEOUT_MS", 1_200_000))
     DATABASE_STATEMENT_TIMEOUT_REPLICA_MS = int(os.getenv("DATABASE_STATEMENT_TIMEOUT_REPLICA_MS", 1_200_000))
 
+    # delete-notifications-for-service-and-type backs off while the replica is further behind than this
+    RETENTION_DELETE_MAX_REPLICATION_LAG_SECONDS = int(os.getenv("RETENTION_DELETE_MAX_REPLICATION_LAG_SECONDS", 30))
+
+    # how many services' notification statuses each create-nightly-notification-status-for-services-and-day task
+    # aggregates
+    FT_NOTIFICATION_STATUS_SERVICES_PER_TASK = int(os.getenv("FT_NOTIFICATION_STATUS_SERVICES_PER_TASK", 50))
+
     PAGE_SIZE = 50
     API_PAGE_SIZE = 250
     TEST_MESSAGE_FILENAME = "Test message"
@@ -320,6 +327,11 @@ class Config:
                 "schedule": timedelta(minutes=66),
                 "options": {"queue": QueueNames.PERIODIC},
             },
+            "refresh-todays-stats-cache": {
+                "task": "refresh-todays-stats-cache",
+                "schedule": crontab(),  # Every minute
+                "options": {"queue": QueueNames.PERIODIC},
+            },
             "generate-sms-delivery-stats": {
                 "task": "generate-sms-delivery-stats",
                 "schedule": crontab(),  # Every minute
@@ -330,6 +342,16 @@ class Config:
                 "schedule": crontab(),  # Every minute
                 "options": {"queue": QueueNames.PERIODIC},
             },
+            "drain-sms-client-responses": {
+                "task": "drain-sms-client-responses",
+                "schedule": crontab(),  # Every minute
+                "options": {"queue": QueueNames.PERIODIC},
+            },
+            "refresh-ses-max-send-rate": {
+                "task": "refresh-ses-max-send-rate",
+                "schedule": crontab(minute="*/15"),
+                "options": {"queue": QueueNames.PERIODIC},
+            },
             "check-job-status": {
                 "task": "check-job-status",
                 "schedule": crontab(),
@@ -391,6 +413,16 @@ class Config:
                 "schedule": crontab(hour=0, minute=30),  # after 'timeout-sending-notifications'
                 "options": {"queue": QueueNames.REPORTING},
             },
+            "create-notification-partitions": {
+                "task": "create-notification-partitions",
+                "schedule": crontab(hour=0, minute=20),
+                "options": {"queue": QueueNames.PERIODIC},
+            },
+            "archive-notification-partitions": {
+                "task": "archive-notification-partitions",
+                "schedule": crontab(hour=2, minute=30),  # before 'delete-notifications-older-than-retention'
+                "options": {"queue": QueueNames.REPORTING},
+            },
             "delete-notifications-older-than-retention": {
                 "task": "delete-notifications-older-than-retention",
                 "schedule": crontab(hour=3, minute=0),  # after 'create-nightly-notification-status'
@@ -599,6 +631,80 @@ class Config:
     CHECK_SLOW_TEXT_MESSAGE_DELIVERY = os.environ.get("CHECK_SLOW_TEXT_MESSAGE_DELIVERY", "0") == "1"
     WEEKLY_USER_RESEARCH_EMAIL_ENABLED = os.environ.get("WEEKLY_USER_RESEARCH_EMAIL_ENABLED", "0") == "1"
 
+    # save sms/email job rows a whole shatter batch at a time (save-sms-batch/save-email-batch) rather
+    # than with one save-sms/save-email task per row
+    BATCH_SAVE_JOB_ROWS_ENABLED = os.environ.get("BATCH_SAVE_JOB_ROWS_ENABLED", "0") == "1"
+
+    # check the API token bucket and daily limits, and increment the daily limit counters, with a lua script
+    # (see app.notifications.rate_limit_script) rather than several separate redis commands
+    REDIS_RATE_LIMIT_SCRIPT_ENABLED = os.environ.get("REDIS_RATE_LIMIT_SCRIPT_ENABLED", "0") == "1"
+
+    # keep SerialisedService/SerialisedTemplate in memory for longer, evicting them when they're changed using
+    # invalidation messages published over redis
+    SERIALISED_MODEL_CACHE_INVALIDATION_ENABLED = (
+        os.environ.get("SERIALISED_MODEL_CACHE_INVALIDATION_ENABLED", "0") == "1"
+    )
+
+    # split jobs with more rows than JOB_SHATTER_PARTITION_SIZE into row-range partitions, each shattered by its
+    # own process-job-partition task so several workers can work on one job at once
+    PARALLEL_JOB_SHATTERING_ENABLED = os.environ.get("PARALLEL_JOB_SHATTERING_ENABLED", "0") == "1"
+    JOB_SHATTER_PARTITION_SIZE = int(os.environ.get("JOB_SHATTER_PARTITION_SIZE", 10_000))
+
+    # buffer MMG/Firetext delivery receipts in redis and process them SMS_CALLBACK_BATCH_SIZE at a time with
+    # process-sms-client-responses tasks, rather than with one process-sms-client-response task each
+    SMS_CALLBACK_BATCHING_ENABLED = os.environ.get("SMS_CALLBACK_BATCHING_ENABLED", "0") == "1"
+    SMS_CALLBACK_BATCH_SIZE = int(os.environ.get("SMS_CALLBACK_BATCH_SIZE", 250))
+
+    # send delivery status callbacks queued together (by check_and_queue_callback_tasks) with one send-delivery-statuses
+    # task per SERVICE_CALLBACK_BATCH_SIZE callbacks for a service, which sends SERVICE_CALLBACK_BATCH_CONCURRENCY of
+    # them at a time, rather than with one send-delivery-status task each
+    SERVICE_CALLBACK_BATCHING_ENABLED = os.environ.get("SERVICE_CALLBACK_BATCHING_ENABLED", "0") == "1"
+    SERVICE_CALLBACK_BATCH_SIZE = int(os.environ.get("SERVICE_CALLBACK_BATCH_SIZE", 50))
+    SERVICE_CALLBACK_BATCH_CONCURRENCY = int(os.environ.get("SERVICE_CALLBACK_BATCH_CONCURRENCY", 8))
+
+    # park callbacks to urls which keep failing on the retry queue rather than sending them, using a circuit breaker
+    # per url shared through redis (see app.notifications.service_callback_circuit_breaker)
+    SERVICE_CALLBACK_CIRCUIT_BREAKER_ENABLED = os.environ.get("SERVICE_CALLBACK_CIRCUIT_BREAKER_ENABLED", "0") == "1"
+
+    # reuse the content rendered for a notification from a template without placeholders for others with the same
+    # template version, rather than rendering (and for emails, converting markdown to html for) each of them again
+    TEMPLATE_RENDER_CACHE_ENABLED = os.environ.get("TEMPLATE_RENDER_CACHE_ENABLED", "0") == "1"
+
+    # send emails saved together from a job batch with one deliver-emails task per EMAIL_DELIVERY_BATCH_SIZE
+    # notifications, which sends EMAIL_DELIVERY_BATCH_CONCURRENCY of them at a time, rather than with one deliver_email
+    # task each
+    EMAIL_DELIVERY_BATCHING_ENABLED = os.environ.get("EMAIL_DELIVERY_BATCHING_ENABLED", "0") == "1"
+    EMAIL_DELIVERY_BATCH_SIZE = int(os.environ.get("EMAIL_DELIVERY_BATCH_SIZE", 50))
+    EMAIL_DELIVERY_BATCH_CONCURRENCY = int(os.environ.get("EMAIL_DELIVERY_BATCH_CONCURRENCY", 10))
+
+    # likewise for sms, with one deliver-sms-batch task per SMS_DELIVERY_BATCH_SIZE notifications. Their messages are
+    # sent by app.delivery.sms_send_engine, which has up to SMS_PROVIDER_SEND_CONCURRENCY requests in flight to each
+    # provider at a time
+    SMS_DELIVERY_BATCHING_ENABLED = os.environ.get("SMS_DELIVERY_BATCHING_ENABLED", "0") == "1"
+    SMS_DELIVERY_BATCH_SIZE = int(os.environ.get("SMS_DELIVERY_BATCH_SIZE", 50))
+    SMS_PROVIDER_SEND_CONCURRENCY = {
+        "mmg": int(os.environ.get("MMG_SEND_CONCURRENCY", 10)),
+        "firetext": int(os.environ.get("FIRETEXT_SEND_CONCURRENCY", 10)),
+    }
+
+    # pace sends to SES with a token bucket in redis (see app.delivery.ses_rate_governor) rather than sending as fast
+    # as we can until SES throttles us. SES_MAX_SEND_RATE is used until refresh-ses-max-send-rate has fetched the
+    # account's actual max send rate
+    SES_RATE_GOVERNOR_ENABLED = os.environ.get("SES_RATE_GOVERNOR_ENABLED", "0") == "1"
+    SES_MAX_SEND_RATE = float(os.environ.get("SES_MAX_SEND_RATE", 14))
+
+    # weight the choice of SMS provider by each provider's recent latency, error rate and delivery receipt lag as
+    # well as its priority (see app.delivery.sms_provider_health)
+    SMS_PROVIDER_HEALTH_ENABLED = os.environ.get("SMS_PROVIDER_HEALTH_ENABLED", "0") == "1"
+
+    # write the status updates made once a notification has been sent in coalesced batches with other updates made
+    # at the same time (see app.notifications.notification_status_buffer)
+    NOTIFICATION_STATUS_BUFFER_ENABLED = os.environ.get("NOTIFICATION_STATUS_BUFFER_ENABLED", "0") == "1"
+
+    # serve today's stats for services from counts kept in redis (see app.notifications.todays_stats_cache) rather
+    # than counting today's notifications for every request
+    TODAYS_STATS_CACHE_ENABLED = os.environ.get("TODAYS_STATS_CACHE_ENABLED", "0") == "1"
+
     NOTIFICATION_DEEP_HISTORY_MIN_AGE_DAYS = int(os.environ.get("NOTIFICATION_DEEP_HISTORY_MIN_AGE_DAYS", 365))
     NOTIFICATION_DEEP_HISTORY_MAX_HOURS_ARCHIVED_IN_RUN = int(
         os.environ.get("NOTIFICATION_DEEP_HISTORY_MAX_HOURS_ARCHIVED_IN_RUN", 24 * 10)
@@ -358,6 +358,10 @@ class Retention:
 # Redis cache keys
 class CacheKeys:
     FT_BILLING_FOR_TODAY_UPDATED_AT_UTC_ISOFORMAT = "update_ft_billing_for_today:updated-at-utc-isoformat"
+    # formatted with the day
+    FT_BILLING_FOR_DAY_CHANGES_PROCESSED_UP_TO_UTC_ISOFORMAT = (
+        "create-or-update-ft-billing-for-day:{}:changes-processed-up-to-utc-isoformat"
+    )
     NUMBER_OF_TIMES_OVER_SLOW_SMS_DELIVERY_THRESHOLD = "slow-sms-delivery:number-of-times-over-threshold"
 
 
@@ -1,6 +1,10 @@
+import io
 import itertools
+from collections.abc import Iterable, Sequence
 from functools import wraps
 
+from sqlalchemy import text
+
 from app import db
 from app.history_meta import create_history
 
@@ -64,6 +68,57 @@ def version_class(*version_options):
     return versioned
 
 
+def dao_get_replication_lag_seconds():
+    """
+    Returns how many seconds behind the primary the database the bulk session connects to is, or 0 if that's the
+    primary. This is read on the replica itself, as pg_stat_replication on the primary needs privileges our database
+    user doesn't have.
+
+    A replica that has replayed everything it's received is 0 seconds behind, however long ago the last transaction
+    it replayed was - otherwise a quiet primary would look like a lagging replica.
+    """
+    try:
+        lag = db.session_bulk.execute(
+            text(
+                """
+                SELECT CASE
+                    WHEN NOT pg_is_in_recovery() THEN 0
+                    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                    ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0)
+                END
+                """
+            )
+        ).scalar()
+    finally:
+        # now() is when the transaction started, so each check needs a new one
+        db.session_bulk.rollback()
+    return float(lag)
+
+
+def copy_rows(table_name: str, column_names: Sequence[str], rows: Iterable[Sequence]):
+    """
+    Writes `rows` (each a sequence of values in the order of `column_names`) into the table with a single COPY, in
+    the current transaction. COPY has much less per-row overhead than INSERTs, but can't skip conflicting rows.
+    """
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_format_copy_text_value(value) for value in row))
+        buffer.write("\n")
+    buffer.seek(0)
+
+    with db.session.connection().connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {table_name} ({', '.join(column_names)}) FROM STDIN", buffer)
+
+
+def _format_copy_text_value(value) -> str:
+    # see https://www.postgresql.org/docs/current/sql-copy.html#id-1.9.3.55.9.2 for COPY's text format
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
 def dao_rollback():
     db.session.rollback()
 
@@ -1,4 +1,5 @@
 from app import db
+from app.cache_invalidation import queue_email_branding_cache_invalidation
 from app.dao.dao_utils import autocommit
 from app.models import EmailBranding, Organisation, Service
 from app.utils import get_archived_db_column_value
@@ -41,6 +42,7 @@ def dao_update_email_branding(email_branding, **kwargs):
     for key, value in kwargs.items():
         setattr(email_branding, key, value or None)
     db.session.add(email_branding)
+    queue_email_branding_cache_invalidation(email_branding.id)
 
 
 @autocommit
@@ -50,6 +52,7 @@ def dao_archive_email_branding(email_branding_id):
     email_branding.active = False
     email_branding.name = get_archived_db_column_value(email_branding.name)
     db.session.add(email_branding)
+    queue_email_branding_cache_invalidation(email_branding_id)
 
 
 def dao_get_orgs_and_services_associated_with_email_branding(email_branding_id):
@@ -2,6 +2,7 @@ from collections import namedtuple
 from datetime import date, datetime, timedelta
 from itertools import chain, groupby
 from typing import Any
+from uuid import UUID
 
 from flask import current_app
 from notifications_utils.timezones import convert_utc_to_bst
@@ -524,6 +525,29 @@ def delete_billing_data_for_day(process_day: date, service_ids=None):
     return FactBilling.query.filter(*filters).delete()
 
 
+@retryable_query()
+def fetch_service_ids_with_billing_changes_for_day(
+    process_day: date, changed_since: datetime, session: Session | scoped_session = db.session
+) -> set[UUID]:
+    """
+    Returns the ids of services with notifications from `process_day` which have been created or updated since
+    `changed_since` - the services whose billing for the day might have changed since it was last worked out.
+    """
+    start_dt = get_london_midnight_in_utc(process_day)
+    end_dt = get_london_midnight_in_utc(process_day + timedelta(days=1))
+    return set(
+        session.scalars(
+            select(NotificationAllTimeView.service_id)
+            .where(
+                NotificationAllTimeView.created_at >= start_dt,
+                NotificationAllTimeView.created_at < end_dt,
+                func.coalesce(NotificationAllTimeView.updated_at, NotificationAllTimeView.created_at) >= changed_since,
+            )
+            .distinct()
+        )
+    )
+
+
 def fetch_billing_data_for_day(
     process_day: date,
     service_ids=None,
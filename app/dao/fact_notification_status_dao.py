@@ -1,12 +1,11 @@
-from collections import namedtuple
+from collections import defaultdict, namedtuple
 from collections.abc import Sequence
 from datetime import date, datetime, timedelta
 from itertools import chain, groupby
 from typing import Any, NamedTuple, cast
 from uuid import UUID
 
-from sqlalchemy import CursorResult, Date, Row, case, delete, func
-from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy import CursorResult, Date, Row, case, delete, func, text
 from sqlalchemy.orm import Session, scoped_session
 from sqlalchemy.sql.expression import extract, literal
 from sqlalchemy.types import DateTime, Integer
@@ -27,7 +26,7 @@ from app.constants import (
     NOTIFICATION_TECHNICAL_FAILURE,
     NOTIFICATION_TEMPORARY_FAILURE,
 )
-from app.dao.dao_utils import autocommit
+from app.dao.dao_utils import autocommit, copy_rows
 from app.models import (
     FactNotificationStatus,
     Notification,
@@ -47,7 +46,7 @@ from app.utils import (
 def _generate_fact_notification_status_rows_inner(
     process_day: date,
     notification_type: str,
-    service_id: UUID | str,
+    service_ids: Sequence[UUID | str],
     chunk_timedelta: timedelta,
     chunk_start_dt: datetime,
     end_dt: datetime,
@@ -57,7 +56,7 @@ def _generate_fact_notification_status_rows_inner(
         session.query(
             literal(process_day).label("bst_date"),
             NotificationAllTimeView.template_id,
-            literal(service_id).label("service_id"),
+            NotificationAllTimeView.service_id,
             func.coalesce(NotificationAllTimeView.job_id, "00000000-0000-0000-0000-000000000000").label("job_id"),
             literal(notification_type).label("notification_type"),
             NotificationAllTimeView.key_type,
@@ -68,11 +67,12 @@ def _generate_fact_notification_status_rows_inner(
             NotificationAllTimeView.created_at >= chunk_start_dt,
             NotificationAllTimeView.created_at < min(chunk_start_dt + chunk_timedelta, end_dt),
             NotificationAllTimeView.notification_type == notification_type,
-            NotificationAllTimeView.service_id == service_id,
+            NotificationAllTimeView.service_id.in_(service_ids),
             NotificationAllTimeView.key_type.in_((KEY_TYPE_NORMAL, KEY_TYPE_TEAM)),
         )
         .group_by(
             NotificationAllTimeView.template_id,
+            NotificationAllTimeView.service_id,
             "job_id",
             NotificationAllTimeView.key_type,
             NotificationAllTimeView.status,
@@ -81,17 +81,22 @@ def _generate_fact_notification_status_rows_inner(
     )
 
 
-def generate_fact_notification_status_rows(
+def generate_fact_notification_status_rows_for_services(
     process_day: date,
     notification_type: str,
-    service_id: UUID | str,
+    service_ids: Sequence[UUID | str],
     chunk_timedelta: timedelta = timedelta(minutes=15),
     session: Session | scoped_session = db.session,
     inner_retry_attempts: int = 0,
 ) -> Sequence[NamedTuple]:
+    """
+    Aggregates the day's notifications of `notification_type` for all of `service_ids` at once, a chunk of the day at
+    a time so that no one query runs for too long. Each chunk's counts are added into a running total keyed by the
+    rest of the row, so merging them takes time in proportion to the number of rows fetched.
+    """
     start_dt = get_london_midnight_in_utc(process_day)
     end_dt = get_london_midnight_in_utc(process_day + timedelta(days=1))
-    status_data = []  # type: ignore
+    notification_counts: dict[tuple, int] = defaultdict(int)
 
     # sqlalchemy's public api doesn't give us a way of constructing a new instance of a Row type, so
     # to do in-python aggregation, we need our own NamedTuple based of the fields of the Rows. but we
@@ -103,35 +108,50 @@ def generate_fact_notification_status_rows(
         partial_status_data = _generate_fact_notification_status_rows_inner(
             process_day,
             notification_type,
-            service_id,
+            service_ids,
             chunk_timedelta,
             chunk_start_dt,
             end_dt,
             session=session,
             retry_attempts=inner_retry_attempts,  # type: ignore
         )
-        if partial_status_data:
-            if nt_type is None:
-                nt_type = NamedTuple("StatusRow", ((f, Any) for f in partial_status_data[0]._fields))  # type: ignore
+        if partial_status_data and nt_type is None:
+            nt_type = NamedTuple("StatusRow", ((f, Any) for f in partial_status_data[0]._fields))  # type: ignore
 
-            # fold into running aggregation
-            status_data = [
-                nt_type(  # type: ignore
-                    *k,  # grp's common fields
-                    *(sum(v) for v in zip(*(r[-1:] for r in grp), strict=True)),
-                )
-                for k, grp in groupby(sorted(chain(status_data, partial_status_data)), key=lambda r: r[:-1])
-            ]
+        for row in partial_status_data:
+            notification_counts[tuple(row[:-1])] += row[-1]
 
         chunk_start_dt += chunk_timedelta
 
-    return status_data
+    return [nt_type(*key, count) for key, count in sorted(notification_counts.items())]  # type: ignore
+
+
+def generate_fact_notification_status_rows(
+    process_day: date,
+    notification_type: str,
+    service_id: UUID | str,
+    chunk_timedelta: timedelta = timedelta(minutes=15),
+    session: Session | scoped_session = db.session,
+    inner_retry_attempts: int = 0,
+) -> Sequence[NamedTuple]:
+    return generate_fact_notification_status_rows_for_services(
+        process_day,
+        notification_type,
+        [service_id],
+        chunk_timedelta=chunk_timedelta,
+        session=session,
+        inner_retry_attempts=inner_retry_attempts,
+    )
 
 
 @autocommit
-def update_fact_notification_status(
-    rows: Sequence[NamedTuple], process_day: date, notification_type: str, service_id: UUID | str
+def update_fact_notification_status_for_services(
+    rows: Sequence[NamedTuple], process_day: date, notification_type: str, service_ids: Sequence[UUID | str]
 ) -> int:
+    """
+    Replaces the ft_notification_status rows for `process_day` and `notification_type` for all of `service_ids` with
+    `rows`, returning the number of rows deleted. The new rows are written with COPY.
+    """
     if rows and {row.bst_date for row in rows} != {process_day}:  # type: ignore
         raise ValueError("Not all rows bst_date match process_day")
 
@@ -144,22 +164,48 @@ def update_fact_notification_status(
             .where(
                 FactNotificationStatus.bst_date == process_day,
                 FactNotificationStatus.notification_type == notification_type,
-                FactNotificationStatus.service_id == service_id,
+                FactNotificationStatus.service_id.in_(service_ids),
             )
             .execution_options(synchronize_session=False)
         ),
     ).rowcount
 
-    db.session.execute(
-        insert(FactNotificationStatus)
-        .on_conflict_do_nothing(constraint="ft_notification_status_pkey")
-        .execution_options(synchronize_session=False),
-        (row._asdict() for row in rows),  # type: ignore
-    )
+    if rows:
+        # COPY can't skip rows which conflict (eg if another task has written the same service's rows since they
+        # were deleted), so copy into a temporary table then insert from that
+        row_dicts = [row._asdict() for row in rows]  # type: ignore
+        row_column_names = list(row_dicts[0])
+        # created_at is NOT NULL with only a python-side default, so it has to be copied too
+        column_names = [*row_column_names, "created_at"]
+        created_at = datetime.utcnow()
+        db.session.execute(
+            text(
+                "CREATE TEMPORARY TABLE ft_notification_status_new "
+                f"(LIKE {FactNotificationStatus.__tablename__} INCLUDING DEFAULTS) ON COMMIT DROP"
+            )
+        )
+        copy_rows(
+            "ft_notification_status_new",
+            column_names,
+            ([*(row[c] for c in row_column_names), created_at] for row in row_dicts),
+        )
+        db.session.execute(
+            text(
+                f"INSERT INTO {FactNotificationStatus.__tablename__} ({', '.join(column_names)}) "
+                f"SELECT {', '.join(column_names)} FROM ft_notification_status_new "
+                "ON CONFLICT ON CONSTRAINT ft_notification_status_pkey DO NOTHING"
+            )
+        )
 
     return deleted_row_count
 
 
+def update_fact_notification_status(
+    rows: Sequence[NamedTuple], process_day: date, notification_type: str, service_id: UUID | str
+) -> int:
+    return update_fact_notification_status_for_services(rows, process_day, notification_type, [service_id])
+
+
 @retryable_query()
 def fetch_notification_status_for_service_by_month(
     start_date, end_date, service_id, session: Session | scoped_session = db.session
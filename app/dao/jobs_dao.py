@@ -7,7 +7,7 @@ from notifications_utils.letter_timings import (
     CANCELLABLE_JOB_LETTER_STATUSES,
     letter_can_be_cancelled,
 )
-from sqlalchemy import and_, asc, desc, func
+from sqlalchemy import and_, asc, case, desc, func, update
 from sqlalchemy.orm import Session, scoped_session
 
 from app import db, redis_store
@@ -165,6 +165,27 @@ def dao_update_job(job):
     db.session.commit()
 
 
+@autocommit
+def dao_record_job_partition_shattered(job_id, partition) -> int:
+    """
+    Adds `partition` to the job's shattered_partitions, returning how many of its partitions have now been
+    shattered. This is done in a single UPDATE so concurrent partition tasks can't lose each other's progress, and
+    only one of them will see the final count.
+    """
+    return db.session.execute(
+        update(Job)
+        .where(Job.id == job_id)
+        .values(
+            shattered_partitions=case(
+                (Job.shattered_partitions.any(partition), Job.shattered_partitions),
+                else_=func.array_append(Job.shattered_partitions, partition),
+            )
+        )
+        .returning(func.cardinality(Job.shattered_partitions))
+        .execution_options(synchronize_session=False)
+    ).scalar_one()
+
+
 def dao_get_jobs_older_than_data_retention(notification_types):
     flexible_data_retention = ServiceDataRetention.query.filter(
         ServiceDataRetention.notification_type.in_(notification_types)
@@ -0,0 +1,175 @@
+"""
+The notifications table is range partitioned by created_at, with a partition for each (UTC) day - apart from
+notifications_legacy, which holds everything from before it was partitioned, and notifications_default, which holds
+anything created on a day whose partition doesn't exist yet.
+
+Partitions are created ahead of time by create-notification-partitions, so notifications_default should stay empty.
+Once every notification in a partition is past its service's data retention, archive-notification-partitions moves it
+to notification_history and drops the partition, rather than it being deleted a chunk at a time.
+"""
+
+import re
+from datetime import date, datetime, timedelta
+from typing import NamedTuple
+
+from sqlalchemy import column, exists, select, table, text, tuple_
+from sqlalchemy.dialects.postgresql import UUID
+
+from app import db
+from app.constants import KEY_TYPE_NORMAL, KEY_TYPE_TEAM, LETTER_TYPE
+from app.dao.dao_utils import autocommit
+from app.dao.notifications_dao import FIELDS_TO_TRANSFER_TO_NOTIFICATION_HISTORY
+
+NOTIFICATION_PARTITION_NAME_FORMAT = "notifications_p%Y%m%d"
+# how many days of partitions create-notification-partitions keeps ahead, in case it fails for a few nights
+NOTIFICATION_PARTITIONS_TO_CREATE_AHEAD = 7
+# how long archiving a partition waits for the lock to detach it, so inserts don't queue behind it for long
+NOTIFICATION_PARTITION_DETACH_LOCK_TIMEOUT = "2s"
+
+_PARTITION_BOUND_REGEX = re.compile(r"FOR VALUES FROM \((?P<start>[^)]+)\) TO \((?P<end>[^)]+)\)")
+
+
+class NotificationPartition(NamedTuple):
+    name: str
+    # None for MINVALUE
+    start: datetime | None
+    end: datetime
+
+
+def _parse_partition_bound(bound):
+    return None if bound == "MINVALUE" else datetime.fromisoformat(bound.strip("'"))
+
+
+def dao_get_notification_partitions() -> list[NotificationPartition]:
+    """
+    Returns every partition of notifications, ordered by the day they start
+    """
+    rows = db.session.execute(
+        text(
+            """
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = 'notifications'::regclass
+            """
+        )
+    ).all()
+
+    partitions = []
+    for name, bound in rows:
+        if match := _PARTITION_BOUND_REGEX.match(bound):
+            partitions.append(
+                NotificationPartition(
+                    name=name,
+                    start=_parse_partition_bound(match["start"]),
+                    end=_parse_partition_bound(match["end"]),
+                )
+            )
+
+    return sorted(partitions, key=lambda partition: partition.start or datetime.min)
+
+
+class CreatedNotificationPartition(NamedTuple):
+    name: str
+    # how many notifications were moved into it from notifications_default
+    moved_from_default: int
+
+
+@autocommit
+def dao_create_notification_partitions(first_day: date, days: int) -> list[CreatedNotificationPartition]:
+    """
+    Creates the daily partitions from `first_day` for `days` days, skipping any which already exist (or are covered by
+    another partition). Returns the partitions created.
+
+    A partition can't be created for a day with notifications in notifications_default, so they're moved into it.
+    """
+    partitions = dao_get_notification_partitions()
+
+    created = []
+    for day in (first_day + timedelta(days=i) for i in range(days)):
+        start = datetime.combine(day, datetime.min.time())
+        end = start + timedelta(days=1)
+        if any(
+            (partition.start is None or partition.start < end) and start < partition.end for partition in partitions
+        ):
+            continue
+
+        name = day.strftime(NOTIFICATION_PARTITION_NAME_FORMAT)
+        moved = _move_notifications_out_of_default_partition(name, start, end)
+        db.session.execute(
+            text(f"CREATE TABLE {name} PARTITION OF notifications FOR VALUES FROM ('{start}') TO ('{end}')")
+        )
+        if moved:
+            db.session.execute(text(f"INSERT INTO notifications SELECT * FROM {name}_moving"))
+        created.append(CreatedNotificationPartition(name=name, moved_from_default=moved))
+
+    return created
+
+
+def _move_notifications_out_of_default_partition(name, start, end) -> int:
+    db.session.execute(text(f"CREATE TEMPORARY TABLE {name}_moving (LIKE notifications) ON COMMIT DROP"))
+    return db.session.execute(
+        text(
+            f"""
+            WITH moved AS (
+                DELETE FROM notifications_default WHERE created_at >= :start AND created_at < :end RETURNING *
+            )
+            INSERT INTO {name}_moving SELECT * FROM moved
+            """
+        ),
+        {"start": start, "end": end},
+    ).rowcount
+
+
+def dao_notification_partition_has_notifications_to_keep(partition_name, services_still_retaining):
+    """
+    Returns whether the partition still has notifications which shouldn't be archived yet - either because they're
+    letters (whose PDFs are removed from S3 as they're deleted one service at a time), or because they're from one of
+    `services_still_retaining`, a list of the (service_id, notification_type) pairs whose data retention hasn't
+    expired for the whole partition.
+    """
+    partition = table(partition_name, column("service_id", UUID(as_uuid=True)), column("notification_type"))
+
+    has_letters = exists().where(partition.c.notification_type == LETTER_TYPE)
+    query = select(has_letters)
+    if services_still_retaining:
+        query = select(
+            has_letters
+            | exists().where(
+                tuple_(partition.c.service_id, partition.c.notification_type).in_(services_still_retaining)
+            )
+        )
+
+    return db.session.execute(query).scalar()
+
+
+@autocommit
+def dao_archive_notification_partition(partition_name) -> int:
+    """
+    Moves the partition's notifications into notification_history (apart from those with test keys, which aren't kept)
+    then detaches and drops it. Returns the number of notifications moved.
+
+    Detaching takes an exclusive lock on notifications. It can't be done concurrently while there's a default partition,
+    so rather than have inserts queue behind it, it gives up after NOTIFICATION_PARTITION_DETACH_LOCK_TIMEOUT (rolling
+    back the copy too), and the partition is archived on a later night instead.
+    """
+    archived = _copy_notification_partition_to_history(partition_name)
+    db.session.execute(text(f"SET LOCAL lock_timeout = '{NOTIFICATION_PARTITION_DETACH_LOCK_TIMEOUT}'"))
+    db.session.execute(text(f"ALTER TABLE notifications DETACH PARTITION {partition_name}"))
+    db.session.execute(text(f"DROP TABLE {partition_name}"))
+    return archived
+
+
+def _copy_notification_partition_to_history(partition_name) -> int:
+    fields = ", ".join(FIELDS_TO_TRANSFER_TO_NOTIFICATION_HISTORY)
+    result = db.session.execute(
+        text(
+            f"""
+            INSERT INTO notification_history ({fields})
+            SELECT {fields} FROM {partition_name}
+            WHERE key_type IN ('{KEY_TYPE_NORMAL}', '{KEY_TYPE_TEAM}')
+            ON CONFLICT ON CONSTRAINT notification_history_pkey DO NOTHING
+            """
+        )
+    )
+    return result.rowcount
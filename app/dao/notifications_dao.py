@@ -1,5 +1,6 @@
 import uuid
-from collections.abc import Sequence
+from collections import defaultdict
+from collections.abc import Iterator, Sequence
 from dataclasses import dataclass
 from datetime import date, datetime, timedelta
 from itertools import groupby
@@ -14,8 +15,25 @@ from notifications_utils.international_billing_rates import (
 from notifications_utils.recipient_validation.email_address import validate_and_format_email_address
 from notifications_utils.recipient_validation.errors import InvalidEmailError
 from notifications_utils.timezones import convert_bst_to_utc, convert_utc_to_bst
-from sqlalchemy import Row, String, and_, asc, column, desc, func, not_, or_, select, text, union_all, values
-from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy import (
+    Row,
+    String,
+    and_,
+    asc,
+    cast,
+    column,
+    desc,
+    func,
+    not_,
+    or_,
+    select,
+    text,
+    tuple_,
+    union_all,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import UUID, insert
 from sqlalchemy.orm import Session, defer, joinedload, scoped_session, undefer
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.sql import functions
@@ -45,15 +63,19 @@ from app.constants import (
     NOTIFICATION_TEMPORARY_FAILURE,
     SMS_TYPE,
 )
-from app.dao.dao_utils import autocommit
+from app.dao.dao_utils import autocommit, copy_rows
 from app.letters.utils import LetterPDFNotFound, find_letter_pdf_in_s3
 from app.models import (
+    ApiKey,
     FactNotificationStatus,
+    Job,
     LetterCostThreshold,
     Notification,
     NotificationHistory,
     NotificationLetterDespatch,
     ProviderDetails,
+    TemplateHistory,
+    User,
 )
 from app.utils import (
     escape_special_characters,
@@ -147,11 +169,60 @@ def dao_create_notification(notification):
     db.session.add(notification)
 
 
-def _decide_permanent_temporary_failure(status, notification, detailed_status_code=None):
+@autocommit
+def dao_bulk_create_notifications(rows: Sequence[dict], use_copy: bool = False) -> list[uuid.UUID]:
+    """
+    Insert many notifications at once from plain dicts of column values, without creating any Notification
+    objects. Rows are keyed by Notification's column keys (so `status` and `_personalisation`, which should
+    already be signed), and any columns missing from a row get the same defaults as `dao_create_notification`.
+
+    Rows are written with multi-row INSERTs, or with a single COPY if `use_copy` is set. COPY has less per-row
+    overhead so is quicker for very large batches. Returns the ids of the new notifications in the order of `rows`.
+    """
+    if not rows:
+        return []
+
+    rows = [_complete_bulk_notification_row(row) for row in rows]
+
+    if use_copy:
+        _copy_notification_rows(rows)
+        return [row["id"] for row in rows]
+
+    table = Notification.__table__
+    return list(
+        db.session.execute(
+            insert(table).returning(table.c.id, sort_by_parameter_order=True),
+            rows,
+        ).scalars()
+    )
+
+
+def _complete_bulk_notification_row(row: dict) -> dict:
+    # every row in an executemany (or a COPY) needs the same set of columns
+    completed_row = {column.key: row.get(column.key) for column in Notification.__table__.columns}
+    completed_row["id"] = uuid.UUID(str(completed_row["id"])) if completed_row["id"] else uuid.uuid4()
+    completed_row["status"] = completed_row["status"] or NOTIFICATION_CREATED
+    completed_row["billable_units"] = completed_row["billable_units"] or 0
+    completed_row["international"] = bool(completed_row["international"])
+    return completed_row
+
+
+def _copy_notification_rows(rows: Sequence[dict]):
+    columns = Notification.__table__.columns
+    copy_rows(
+        Notification.__tablename__,
+        [column.name for column in columns],
+        ([row[column.key] for column in columns] for row in rows),
+    )
+
+
+def _decide_permanent_temporary_failure(
+    status, notification, detailed_status_code=None, sent_by=None, current_status=None
+):
     # Firetext will send us a pending status, followed by a success or failure status.
     # When we get a failure status we need to look at the detailed_status_code to determine if the failure type
     # is a permanent-failure or temporary-failure.
-    if notification.sent_by == "firetext":
+    if (sent_by or notification.sent_by) == "firetext":
         if status == NOTIFICATION_PERMANENT_FAILURE and detailed_status_code:
             try:
                 status, reason = get_message_status_and_reason_from_firetext_code(detailed_status_code)
@@ -179,11 +250,20 @@ def _decide_permanent_temporary_failure(status, notification, detailed_status_co
                     extra=extra,
                 )
         # fallback option:
-        if status == NOTIFICATION_PERMANENT_FAILURE and notification.status == NOTIFICATION_PENDING:
+        if status == NOTIFICATION_PERMANENT_FAILURE and (current_status or notification.status) == NOTIFICATION_PENDING:
             status = NOTIFICATION_TEMPORARY_FAILURE
     return status
 
 
+STATUSES_UPDATABLE_BY_PROVIDER_CALLBACK = {
+    NOTIFICATION_CREATED,
+    NOTIFICATION_SENDING,
+    NOTIFICATION_PENDING,
+    NOTIFICATION_SENT,
+    NOTIFICATION_PENDING_VIRUS_CHECK,
+}
+
+
 def country_records_delivery(phone_prefix):
     dlr = INTERNATIONAL_BILLING_RATES[phone_prefix]["attributes"]["dlr"]
     return dlr and dlr.lower() == "yes"
@@ -214,13 +294,7 @@ def update_notification_status_by_id(notification_id, status, sent_by=None, deta
         )
         return None
 
-    if notification.status not in {
-        NOTIFICATION_CREATED,
-        NOTIFICATION_SENDING,
-        NOTIFICATION_PENDING,
-        NOTIFICATION_SENT,
-        NOTIFICATION_PENDING_VIRUS_CHECK,
-    }:
+    if notification.status not in STATUSES_UPDATABLE_BY_PROVIDER_CALLBACK:
         _duplicate_update_warning(notification, status)
         return None
 
@@ -237,12 +311,195 @@ def update_notification_status_by_id(notification_id, status, sent_by=None, deta
     )
 
 
+@autocommit
+def dao_update_notification_statuses_by_id(updates):
+    """
+    Bulk version of `update_notification_status_by_id`. `updates` is a sequence of
+    (notification_id, status, sent_by, detailed_status_code) tuples, which are applied in order with one UPDATE per
+    resulting status.
+
+    Returns a list with an item for each update - the updated notification if the update was applied, or None if it
+    wasn't (because the notification couldn't be found, already had a final status, or a later update in the same
+    batch superseded it).
+    """
+    notifications_by_id = {
+        str(notification.id): notification
+        for notification in Notification.query.with_for_update().filter(
+            Notification.id.in_({str(notification_id) for notification_id, *_ in updates})
+        )
+    }
+
+    # the status and sent_by each notification will have once the updates so far have been applied
+    new_values_by_id = {}
+    applied_update_index_by_id = {}
+    duplicates = []
+    for index, (notification_id, status, sent_by, detailed_status_code) in enumerate(updates):
+        notification = notifications_by_id.get(str(notification_id))
+        if not notification:
+            current_app.logger.warning(
+                "Notification not found for id %s (when attempting to update to status %s)",
+                notification_id,
+                status,
+                extra={
+                    "notification_id": notification_id,
+                    "notification_status_new": status,
+                },
+            )
+            continue
+
+        current_status, current_sent_by = new_values_by_id.get(
+            notification.id, (notification.status, notification.sent_by)
+        )
+        if current_status not in STATUSES_UPDATABLE_BY_PROVIDER_CALLBACK:
+            duplicates.append((notification, status))
+            continue
+
+        if (
+            notification.notification_type == SMS_TYPE
+            and notification.international
+            and not country_records_delivery(notification.phone_prefix)
+        ):
+            continue
+
+        sent_by = current_sent_by or sent_by
+        status = _decide_permanent_temporary_failure(
+            status=status,
+            notification=notification,
+            detailed_status_code=detailed_status_code,
+            sent_by=sent_by,
+            current_status=current_status,
+        )
+        new_values_by_id[notification.id] = (status, sent_by)
+        applied_update_index_by_id[notification.id] = index
+
+    notification_ids_by_new_values = defaultdict(list)
+    for notification_id, new_values in new_values_by_id.items():
+        notification_ids_by_new_values[new_values].append(notification_id)
+
+    updated_at = datetime.utcnow()
+    for (status, sent_by), notification_ids in notification_ids_by_new_values.items():
+        Notification.query.filter(Notification.id.in_(notification_ids)).update(
+            {"status": status, "sent_by": sent_by, "updated_at": updated_at}, synchronize_session="evaluate"
+        )
+
+    # log these now the notifications have been updated, so they show the status they were updated to in this batch
+    for notification, status in duplicates:
+        _duplicate_update_warning(notification, status)
+
+    applied_update_indexes = set(applied_update_index_by_id.values())
+    return [
+        notifications_by_id[str(notification_id)] if index in applied_update_indexes else None
+        for index, (notification_id, *_) in enumerate(updates)
+    ]
+
+
 @autocommit
 def dao_update_notification(notification):
     notification.updated_at = datetime.utcnow()
     db.session.add(notification)
 
 
+@autocommit
+def dao_update_notifications_to_sending(sent_notifications, sent_by):
+    """
+    Records that a batch of notifications has been sent to the provider `sent_by`, with a single UPDATE.
+
+    `sent_notifications` is a list of (notification, values) tuples, `values` being a dict of any other columns to
+    set on the notification (eg the reference the provider gave it). Each dict must have the same keys.
+    """
+    now = datetime.utcnow()
+    _apply_notification_status_updates(
+        (
+            notification.id,
+            NOTIFICATION_SENT if notification.international else NOTIFICATION_SENDING,
+            {"sent_at": now, "sent_by": sent_by, **values},
+        )
+        for notification, values in sent_notifications
+    )
+
+
+# The order of the statuses in a notification's lifecycle - any other status is final. Status updates made with
+# dao_apply_notification_status_updates never move a notification back to an earlier status
+NOTIFICATION_STATUS_ORDER = {
+    NOTIFICATION_CREATED: 0,
+    NOTIFICATION_PENDING_VIRUS_CHECK: 0,
+    NOTIFICATION_SENDING: 1,
+    NOTIFICATION_SENT: 1,
+    NOTIFICATION_PENDING: 2,
+}
+FINAL_NOTIFICATION_STATUS_ORDER = 3
+
+
+def notification_status_order(status):
+    return NOTIFICATION_STATUS_ORDER.get(status, FINAL_NOTIFICATION_STATUS_ORDER)
+
+
+def _notification_status_order_expression(status):
+    return case(NOTIFICATION_STATUS_ORDER, value=status, else_=FINAL_NOTIFICATION_STATUS_ORDER)
+
+
+@autocommit
+def dao_apply_notification_status_updates(updates):
+    """
+    Applies a batch of status updates, each a (notification_id, status, values) tuple with `values` being a dict of
+    any other columns to set on the notification. There's one UPDATE ... FROM (VALUES ...) for each set of columns.
+
+    A notification's status is only changed if the new status comes later in its lifecycle than the one it already
+    has, so that eg. marking a notification as sending after its delivery receipt has arrived leaves it delivered. Its
+    other columns are always set.
+    """
+    _apply_notification_status_updates(updates)
+
+
+def _apply_notification_status_updates(updates):
+    updates_by_columns = defaultdict(list)
+    for notification_id, status, other_values in updates:
+        columns = tuple(sorted(other_values))
+        updates_by_columns[columns].append(
+            (str(notification_id), status, *(other_values[column_name] for column_name in columns))
+        )
+
+    updated_at = datetime.utcnow()
+    for columns, rows in updates_by_columns.items():
+        column_types = {column_name: Notification.__table__.c[column_name].type for column_name in columns}
+        new_values = values(
+            column("id", String),
+            column("status", String),
+            *(column(column_name, column_type) for column_name, column_type in column_types.items()),
+            name="new_values",
+        ).data(rows)
+
+        db.session.execute(
+            update(Notification)
+            .where(Notification.id == cast(new_values.c.id, UUID))
+            .values(
+                status=case(
+                    (
+                        _notification_status_order_expression(new_values.c.status)
+                        > _notification_status_order_expression(Notification.status),
+                        new_values.c.status,
+                    ),
+                    else_=Notification.status,
+                ),
+                updated_at=updated_at,
+                # a column of nulls in VALUES is text, so every column is cast to the type it's going into
+                **{
+                    column_name: cast(new_values.c[column_name], column_type)
+                    for column_name, column_type in column_types.items()
+                },
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+
+def _created_since_job(job_id):
+    """
+    A notification is never created before its job, so filtering on this lets postgres skip the partitions of
+    notifications from before the job was created
+    """
+    return Notification.created_at >= select(Job.created_at).where(Job.id == job_id).scalar_subquery()
+
+
 @retryable_query()
 def get_notifications_for_job(
     service_id,
@@ -254,13 +511,15 @@ def get_notifications_for_job(
 ):
     if page_size is None:
         page_size = current_app.config["PAGE_SIZE"]
-    query = session.query(Notification).filter_by(service_id=service_id, job_id=job_id)
+    query = session.query(Notification).filter(
+        Notification.service_id == service_id, Notification.job_id == job_id, _created_since_job(job_id)
+    )
     query = _filter_query(query, filter_dict)
     return query.order_by(asc(Notification.job_row_number)).paginate(page=page, per_page=page_size)
 
 
 def dao_get_notification_count_for_job_id(*, job_id):
-    return Notification.query.filter_by(job_id=job_id).count()
+    return Notification.query.filter_by(job_id=job_id).filter(_created_since_job(job_id)).count()
 
 
 def get_notification_with_personalisation(service_id, notification_id, key_type):
@@ -282,12 +541,42 @@ def get_notification_by_id(notification_id, service_id=None, _raise=False):
     return query.one() if _raise else query.first()
 
 
+def dao_get_notifications_by_ids(notification_ids):
+    return Notification.query.filter(Notification.id.in_(notification_ids)).all()
+
+
 def get_notification_by_job_and_job_row_number(job_id, job_row_number):
-    filters = [Notification.job_id == job_id, Notification.job_row_number == job_row_number]
+    filters = [
+        Notification.job_id == job_id,
+        Notification.job_row_number == job_row_number,
+        _created_since_job(job_id),
+    ]
     query = Notification.query.filter(*filters)
     return query.first()
 
 
+def dao_get_already_saved_notifications(notification_ids, job_id=None, job_row_numbers=()) -> list[Row]:
+    """
+    Returns the (id, job_row_number) of the notifications which have already been saved with one of `notification_ids`
+    or, for `job_id`, one of `job_row_numbers`.
+
+    Notifications are partitioned by created_at, which every unique constraint on them has to include, so the database
+    doesn't stop the same notification (or job row) being saved twice. The save tasks check this first instead, which
+    stops SQS delivering their messages again from saving duplicates, but not two copies of a message being processed
+    at the same moment.
+    """
+    already_saved = Notification.id.in_(notification_ids)
+    if job_id is not None:
+        already_saved = or_(
+            already_saved, and_(Notification.job_id == job_id, Notification.job_row_number.in_(job_row_numbers))
+        )
+        # a job's notifications are never created before it, so only the partitions since then need checking
+        created_since = func.coalesce(select(Job.created_at).where(Job.id == job_id).scalar_subquery(), datetime.min)
+        already_saved = and_(already_saved, Notification.created_at >= created_since)
+
+    return db.session.execute(select(Notification.id, Notification.job_row_number).where(already_saved)).all()
+
+
 def dao_get_notification_or_history_by_id(notification_id):
     if notification := Notification.query.get(notification_id):
         return notification
@@ -296,7 +585,7 @@ def dao_get_notification_or_history_by_id(notification_id):
 
 
 @retryable_query()
-def get_notifications_for_service(  # noqa: C901
+def get_notifications_for_service(
     service_id,
     filter_dict=None,
     page=1,
@@ -323,18 +612,16 @@ def get_notifications_for_service(  # noqa: C901
         filters.append(Notification.created_at >= midnight_n_days_ago(limit_days))
 
     if older_than is not None:
-        # fetching this separately and including in query as literal makes it visible to
-        # the planner
-        older_than_created_at = (
-            session.query(Notification.created_at)
-            .filter(Notification.id == older_than, Notification.service_id == service_id)
-            .scalar()
+        # Keyset pagination on (created_at, id), which ix_notifications_service_id_created_at_id can seek straight to
+        # however far through the notifications the page is. Comparing created_at alone would skip notifications
+        # created at the same time as the last one on the previous page, which jobs often are. The key is looked up
+        # in the same query - if there's no such notification it's null, so nothing is returned
+        older_than_key = (
+            select(Notification.created_at, Notification.id)
+            .where(Notification.id == older_than, Notification.service_id == service_id)
+            .scalar_subquery()
         )
-        if older_than_created_at is None:
-            # ensure we return no results
-            filters.append(False)
-        else:
-            filters.append(Notification.created_at < older_than_created_at)
+        filters.append(tuple_(Notification.created_at, Notification.id) < older_than_key)
 
     if not include_jobs:
         filters.append(Notification.job_id == None)  # noqa
@@ -360,7 +647,7 @@ def get_notifications_for_service(  # noqa: C901
 
     query = query.options(joinedload(Notification.api_key))  # type: ignore[arg-type]
 
-    return query.order_by(desc(Notification.created_at)).paginate(
+    return query.order_by(desc(Notification.created_at), desc(Notification.id)).paginate(
         page=page,
         per_page=page_size,
         count=count_pages,
@@ -368,6 +655,67 @@ def get_notifications_for_service(  # noqa: C901
     )
 
 
+def stream_notifications_for_csv_report(
+    service_id,
+    notification_type,
+    statuses,
+    limit_days,
+    chunk_size,
+    session: Session | scoped_session = db.session_bulk,
+) -> Iterator[Row]:
+    """
+    Yields the columns a notifications report needs, newest first, as plain rows rather than Notification objects -
+    so nothing is lazy loaded for each one. Rows are fetched `chunk_size` at a time through a server-side cursor, so
+    memory use doesn't grow with the size of the report.
+
+    Includes notifications from jobs and one-off notifications, but not those sent with test keys.
+    """
+    query = (
+        select(
+            Notification.to,
+            Notification.client_reference,
+            TemplateHistory.name.label("template_name"),
+            TemplateHistory.template_type,
+            User.name.label("created_by_name"),
+            User.email_address.label("created_by_email_address"),
+            Job.original_file_name.label("job_name"),
+            Notification.status,
+            Notification.created_at,
+            ApiKey.name.label("api_key_name"),
+        )
+        .join(
+            TemplateHistory,
+            and_(
+                TemplateHistory.id == Notification.template_id,
+                TemplateHistory.version == Notification.template_version,
+            ),
+        )
+        .outerjoin(Job, Job.id == Notification.job_id)
+        .outerjoin(ApiKey, ApiKey.id == Notification.api_key_id)
+        .outerjoin(User, User.id == Notification.created_by_id)
+        .where(
+            Notification.service_id == service_id,
+            Notification.notification_type == notification_type,
+            Notification.created_at >= midnight_n_days_ago(limit_days),
+            Notification.key_type != KEY_TYPE_TEST,
+        )
+        .order_by(desc(Notification.created_at))
+        .execution_options(yield_per=chunk_size)
+    )
+    if (status_filter := _status_filter(statuses)) is not None:
+        query = query.where(status_filter)
+
+    yield from session.execute(query)
+
+
+def _status_filter(statuses):
+    statuses = Notification.substitute_status(statuses)
+    if set(statuses).issuperset(set(NOTIFICATION_STATUS_TYPES) - set(NOTIFICATION_STATUS_TYPES_DEPRECATED)):
+        # every status, so there's nothing to filter
+        return None
+    return Notification.status.in_(statuses)
+
+
 def _filter_query(query, filter_dict=None):
     if filter_dict is None:
         return query
@@ -376,10 +724,8 @@ def _filter_query(query, filter_dict=None):
 
     # filter by status
     statuses = multidict.getlist("status")
-    if statuses:
-        statuses = Notification.substitute_status(statuses)
-        if not set(statuses).issuperset(set(NOTIFICATION_STATUS_TYPES) - set(NOTIFICATION_STATUS_TYPES_DEPRECATED)):
-            query = query.filter(Notification.status.in_(statuses))
+    if statuses and (status_filter := _status_filter(statuses)) is not None:
+        query = query.filter(status_filter)
 
     # filter by template
     template_types = multidict.getlist("template_type")
@@ -391,60 +737,61 @@ def _filter_query(query, filter_dict=None):
 
 @autocommit
 def insert_notification_history_delete_notifications(
-    notification_type, service_id, timestamp_to_delete_backwards_from, qry_limit=50000
+    notification_type, service_id, timestamp_to_delete_backwards_from, qry_limit=50000, after=None
 ):
     """
-    Delete up to 50,000 notifications that are past retention for a notification type and service.
-
-
-    Steps are as follows:
+    Delete up to 50,000 notifications that are past retention for a notification type and service, copying them into
+    notification_history as they're deleted, in a single statement.
 
-    Create a temporary notifications table
-    Populate that table with up to 50k notifications that are to be deleted. (Note: no specified order)
-    Insert everything in the temp table into notification history
-    Delete from notifications if notification id is in the temp table
-    Drop the temp table (automatically when the transaction commits)
+    Notifications are taken in (created_at, id) order, starting after the `after` cursor - the (created_at, id) of the
+    last notification deleted by the previous call. Without a cursor, each call would have to scan back over the index
+    entries of every notification the previous calls have deleted, until they're vacuumed.
 
-    Temporary tables are in a separate postgres schema, and only visible to the current session (db connection,
-    in a celery task there's one connection per thread.)
+    Returns the number of notifications deleted and the cursor to pass to the next call, which is None once there's
+    nothing left to delete.
     """
-    # Setting default query limit to 50,000 which take about 48 seconds on current table size
-    # 10, 000 took 11s and 100,000 took 1 min 30 seconds.
     fields_to_transfer_to_notification_history = ", ".join(FIELDS_TO_TRANSFER_TO_NOTIFICATION_HISTORY)
 
-    select_into_temp_table = f"""
-         CREATE TEMP TABLE NOTIFICATION_ARCHIVE ON COMMIT DROP AS
-         SELECT {fields_to_transfer_to_notification_history}
-          FROM notifications
-        WHERE service_id = :service_id
-          AND notification_type = :notification_type
-          AND created_at < :timestamp_to_delete_backwards_from
-          AND key_type in ('normal', 'team')
-        ORDER BY created_at
-        limit :qry_limit
-        """
-    select_into_temp_table_for_letters = f"""
-         CREATE TEMP TABLE NOTIFICATION_ARCHIVE ON COMMIT DROP AS
-         SELECT {fields_to_transfer_to_notification_history}
-          FROM notifications
-        WHERE service_id = :service_id
-          AND notification_type = :notification_type
-          AND created_at < :timestamp_to_delete_backwards_from
-          AND notification_status NOT IN ('pending-virus-check', 'created', 'sending')
-          AND key_type in ('normal', 'team')
-        ORDER BY created_at
-        limit :qry_limit
-        """
+    letter_status_filter = (
+        "AND notification_status NOT IN ('pending-virus-check', 'created', 'sending')"
+        if notification_type == LETTER_TYPE
+        else ""
+    )
+    # the created_at condition alone lets postgres start the index scan from the cursor
+    cursor_filter = (
+        "AND created_at >= :after_created_at AND (created_at, id) > (:after_created_at, :after_id)" if after else ""
+    )
+
     # Insert into NotificationHistory if the row already exists do nothing.
-    insert_query = f"""
-        insert into notification_history ({fields_to_transfer_to_notification_history})
-         SELECT {fields_to_transfer_to_notification_history} from NOTIFICATION_ARCHIVE
-          ON CONFLICT ON CONSTRAINT notification_history_pkey
-          DO NOTHING
-    """
-    delete_query = """
-        DELETE FROM notifications
-        where id in (select id from NOTIFICATION_ARCHIVE)
+    query = f"""
+        WITH batch AS (
+            SELECT id, created_at
+            FROM notifications
+            WHERE service_id = :service_id
+              AND notification_type = :notification_type
+              AND created_at < :timestamp_to_delete_backwards_from
+              AND key_type in ('normal', 'team')
+              {letter_status_filter}
+              {cursor_filter}
+            ORDER BY created_at, id
+            LIMIT :qry_limit
+        ),
+        deleted AS (
+            DELETE FROM notifications
+            USING batch
+            WHERE notifications.id = batch.id AND notifications.created_at = batch.created_at
+            RETURNING {", ".join(f"notifications.{field}" for field in FIELDS_TO_TRANSFER_TO_NOTIFICATION_HISTORY)}
+        ),
+        archived AS (
+            INSERT INTO notification_history ({fields_to_transfer_to_notification_history})
+            SELECT {fields_to_transfer_to_notification_history} FROM deleted
+            ON CONFLICT ON CONSTRAINT notification_history_pkey
+            DO NOTHING
+        )
+        SELECT (SELECT count(*) FROM deleted), created_at, id
+        FROM batch
+        ORDER BY created_at DESC, id DESC
+        LIMIT 1
     """
     input_params = {
         "service_id": service_id,
@@ -452,34 +799,37 @@ def insert_notification_history_delete_notifications(
         "timestamp_to_delete_backwards_from": timestamp_to_delete_backwards_from,
         "qry_limit": qry_limit,
     }
+    if after:
+        input_params["after_created_at"], input_params["after_id"] = after
 
-    select_to_use = select_into_temp_table_for_letters if notification_type == "letter" else select_into_temp_table
-    db.session.execute(text(select_to_use), input_params)
+    row = db.session.execute(text(query), input_params).fetchone()
+    if row is None:
+        return 0, None
 
-    result = db.session.execute(text("SELECT COUNT(*) FROM NOTIFICATION_ARCHIVE")).fetchone()[0]
-
-    db.session.execute(text(insert_query))
-
-    db.session.execute(text(delete_query))
-
-    return result
+    count_deleted, last_created_at, last_id = row
+    return count_deleted, (last_created_at, last_id)
 
 
 def move_notifications_to_notification_history(
-    notification_type, service_id, timestamp_to_delete_backwards_from, qry_limit=50000
+    notification_type, service_id, timestamp_to_delete_backwards_from, qry_limit=50000, after=None
 ):
+    """
+    Returns the number of notifications moved and the cursor to move the next batch from, as with
+    insert_notification_history_delete_notifications
+    """
     if notification_type == LETTER_TYPE:
         # reduced query limit so we don't run into issues trying to loop through 50k letters in python deleting from s3
         # use `min` so we can reduce query limit artificially during unit tests
         qry_limit = min(qry_limit, 5_000)
 
-        _delete_letters_from_s3(notification_type, service_id, timestamp_to_delete_backwards_from, qry_limit)
+        _delete_letters_from_s3(notification_type, service_id, timestamp_to_delete_backwards_from, qry_limit, after)
 
     return insert_notification_history_delete_notifications(
         notification_type=notification_type,
         service_id=service_id,
         timestamp_to_delete_backwards_from=timestamp_to_delete_backwards_from,
         qry_limit=qry_limit,
+        after=after,
     )
 
 
@@ -510,22 +860,29 @@ def delete_test_notifications(notification_type, service_id, timestamp_to_delete
     return count_of_deleted
 
 
-def _delete_letters_from_s3(notification_type, service_id, date_to_delete_from, query_limit):
+def _delete_letters_from_s3(notification_type, service_id, date_to_delete_from, query_limit, after=None):
     """
     Deletes all letters with a status in NOTIFICATION_STATUS_TYPES_COMPLETED, which includes those
-    which failed validation.
+    which failed validation, starting after the `after` (created_at, id) cursor if given.
 
     `find_letter_pdf_in_s3` finds the bucket to delete the letter from.
     """
+    filters = [
+        Notification.notification_type == notification_type,
+        Notification.created_at < date_to_delete_from,
+        Notification.service_id == service_id,
+        Notification.status.in_(NOTIFICATION_STATUS_TYPES_COMPLETED),
+    ]
+    if after:
+        filters += [
+            Notification.created_at >= after[0],
+            tuple_(Notification.created_at, Notification.id) > tuple_(*after),
+        ]
+
     letters_to_delete_from_s3 = (
         db.session.query(Notification)
-        .filter(
-            Notification.notification_type == notification_type,
-            Notification.created_at < date_to_delete_from,
-            Notification.service_id == service_id,
-            Notification.status.in_(NOTIFICATION_STATUS_TYPES_COMPLETED),
-        )
-        .order_by(Notification.created_at)
+        .filter(*filters)
+        .order_by(Notification.created_at, Notification.id)
         .limit(query_limit)
         .all()
     )
@@ -596,6 +953,8 @@ def dao_timeout_notifications(cutoff_time, limit=100000):
 
     Notification.query.filter(
         Notification.id.in_([n.id for n in notifications]),
+        # a notification's delivery receipt may have arrived since it was selected
+        Notification.status.in_(current_statuses),
     ).update({"status": new_status, "updated_at": updated_at}, synchronize_session=False)
 
     db.session.commit()
@@ -791,6 +1150,27 @@ def dao_get_notification_or_history_by_reference(reference):
         return NotificationHistory.query.filter(NotificationHistory.reference == reference).one()
 
 
+def dao_get_notifications_or_history_by_references(references):
+    """
+    Bulk version of `dao_get_notification_or_history_by_reference`, returning a dict of reference to notification
+    for those of `references` which could be found. Only references not in the notifications table are looked for in
+    notification_history.
+    """
+    references = set(references)
+    notifications_by_reference = {
+        notification.reference: notification
+        for notification in Notification.query.filter(Notification.reference.in_(references))
+    }
+
+    if missing_references := references - notifications_by_reference.keys():
+        notifications_by_reference |= {
+            notification.reference: notification
+            for notification in NotificationHistory.query.filter(NotificationHistory.reference.in_(missing_references))
+        }
+
+    return notifications_by_reference
+
+
 @retryable_query()
 def dao_get_notifications_processing_time_stats(
     start_dt: datetime, end_dt: datetime, session: Session | scoped_session = db.session
@@ -814,10 +1194,18 @@ def dao_get_notifications_processing_time_stats(
     )
 
 
-def dao_get_last_notification_added_for_job_id(job_id):
-    last_notification_added = (
-        Notification.query.filter(Notification.job_id == job_id).order_by(Notification.job_row_number.desc()).first()
-    )
+def dao_get_last_notification_added_for_job_id(job_id, start_row=None, stop_row=None):
+    """
+    Returns the notification with the highest row number added for the job, or only for rows from `start_row` up to
+    (but not including) `stop_row` if given
+    """
+    query = Notification.query.filter(Notification.job_id == job_id, _created_since_job(job_id))
+    if start_row is not None:
+        query = query.filter(Notification.job_row_number >= start_row)
+    if stop_row is not None:
+        query = query.filter(Notification.job_row_number < stop_row)
+
+    last_notification_added = query.order_by(Notification.job_row_number.desc()).first()
 
     return last_notification_added
 
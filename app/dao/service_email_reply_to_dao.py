@@ -1,6 +1,7 @@
 from sqlalchemy import desc
 
 from app import db
+from app.cache_invalidation import queue_service_and_templates_cache_invalidation
 from app.dao.dao_utils import autocommit
 from app.errors import InvalidRequest
 from app.exceptions import ArchiveValidationError
@@ -39,6 +40,7 @@ def add_reply_to_email_address_for_service(service_id, email_address, is_default
 
     new_reply_to = ServiceEmailReplyTo(service_id=service_id, email_address=email_address, is_default=is_default)
     db.session.add(new_reply_to)
+    queue_service_and_templates_cache_invalidation(service_id)
     return new_reply_to
 
 
@@ -55,6 +57,7 @@ def update_reply_to_email_address(service_id, reply_to_id, email_address, is_def
     reply_to_update.email_address = email_address
     reply_to_update.is_default = is_default
     db.session.add(reply_to_update)
+    queue_service_and_templates_cache_invalidation(service_id)
     return reply_to_update
 
 
@@ -68,6 +71,7 @@ def archive_reply_to_email_address(service_id, reply_to_id):
     reply_to_archive.archived = True
 
     db.session.add(reply_to_archive)
+    queue_service_and_templates_cache_invalidation(service_id)
     return reply_to_archive
 
 
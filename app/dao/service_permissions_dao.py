@@ -1,4 +1,5 @@
 from app import db
+from app.cache_invalidation import queue_service_cache_invalidation
 from app.dao.dao_utils import autocommit
 from app.models import ServicePermission
 
@@ -11,12 +12,14 @@ def dao_fetch_service_permissions(service_id):
 def dao_add_service_permission(service_id, permission):
     service_permission = ServicePermission(service_id=service_id, permission=permission)
     db.session.add(service_permission)
+    queue_service_cache_invalidation(service_id)
 
 
 def dao_remove_service_permission(service_id, permission, commit=True):
     result = ServicePermission.query.filter(
         ServicePermission.service_id == service_id, ServicePermission.permission == permission
     ).delete()
+    queue_service_cache_invalidation(service_id)
 
     if commit:
         db.session.commit()
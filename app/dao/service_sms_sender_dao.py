@@ -3,6 +3,7 @@ from uuid import UUID
 from sqlalchemy import desc
 
 from app import db
+from app.cache_invalidation import queue_service_and_templates_cache_invalidation
 from app.dao.dao_utils import autocommit
 from app.exceptions import ArchiveValidationError
 from app.models import ServiceSmsSender
@@ -41,6 +42,7 @@ def dao_add_sms_sender_for_service(service_id, sms_sender, is_default, inbound_n
     )
 
     db.session.add(new_sms_sender)
+    queue_service_and_templates_cache_invalidation(service_id)
     return new_sms_sender
 
 
@@ -58,6 +60,7 @@ def dao_update_service_sms_sender(service_id, service_sms_sender_id, is_default,
     if not sms_sender_to_update.inbound_number_id and sms_sender:
         sms_sender_to_update.sms_sender = sms_sender
     db.session.add(sms_sender_to_update)
+    queue_service_and_templates_cache_invalidation(service_id)
     return sms_sender_to_update
 
 
@@ -66,6 +69,7 @@ def update_existing_sms_sender_with_inbound_number(service_sms_sender, sms_sende
     service_sms_sender.sms_sender = sms_sender
     service_sms_sender.inbound_number_id = inbound_number_id
     db.session.add(service_sms_sender)
+    queue_service_and_templates_cache_invalidation(service_sms_sender.service_id)
     return service_sms_sender
 
 
@@ -81,6 +85,7 @@ def archive_sms_sender(service_id, sms_sender_id):
     sms_sender_to_archive.archived = True
 
     db.session.add(sms_sender_to_archive)
+    queue_service_and_templates_cache_invalidation(service_id)
     return sms_sender_to_archive
 
 
@@ -116,6 +121,7 @@ def dao_remove_inbound_sms_senders(service_id: UUID, commit=True):
         .filter(ServiceSmsSender.inbound_number_id.isnot(None))
         .delete(synchronize_session="fetch")
     )
+    queue_service_and_templates_cache_invalidation(service_id)
 
     if commit:
         db.session.commit()
@@ -1,4 +1,6 @@
 from datetime import date, datetime, timedelta
+from typing import NamedTuple
+from uuid import UUID
 
 from flask import current_app
 from sqlalchemy import Float, cast
@@ -6,6 +8,7 @@ from sqlalchemy.orm import Session, joinedload, scoped_session
 from sqlalchemy.sql.expression import and_, asc, case, func
 
 from app import db
+from app.cache_invalidation import queue_service_cache_invalidation, queue_template_cache_invalidation
 from app.constants import (
     CROWN_ORGANISATION_TYPES,
     EMAIL_TYPE,
@@ -59,6 +62,7 @@ from app.models import (
     User,
     VerifyCode,
 )
+from app.notifications.todays_stats_cache import get_todays_stats, todays_stats_available
 from app.utils import (
     email_address_is_nhs,
     escape_special_characters,
@@ -248,11 +252,14 @@ def dao_archive_service(service_id):
     for template in service.templates:
         if not template.archived:
             template.archived = True
+            queue_template_cache_invalidation(service.id, template.id)
 
     for api_key in service.api_keys:
         if not api_key.expiry_date:
             api_key.expiry_date = datetime.utcnow()
 
+    queue_service_cache_invalidation(service.id)
+
 
 def dao_fetch_service_by_id_and_user(service_id, user_id):
     return (
@@ -322,6 +329,7 @@ def dao_create_service(  # noqa: C901
 @version_class(Service)
 def dao_update_service(service):
     db.session.add(service)
+    queue_service_cache_invalidation(service.id)
 
 
 def dao_add_user_to_service(service, user, permissions=None, folder_permissions=None):
@@ -433,6 +441,9 @@ def delete_service_and_all_associated_db_objects(service):
 
 
 def dao_fetch_todays_stats_for_service(service_id):
+    if (cached_stats := get_todays_stats([service_id])) is not None:
+        return cached_stats[service_id]
+
     today = date.today()
     start_date = get_london_midnight_in_utc(today)
 
@@ -453,7 +464,41 @@ def dao_fetch_todays_stats_for_service(service_id):
     )
 
 
+class TodaysServiceStatsRow(NamedTuple):
+    service_id: UUID
+    name: str
+    restricted: bool
+    active: bool
+    created_at: datetime
+    notification_type: str | None
+    status: str | None
+    count: int | None
+
+
 def dao_fetch_todays_stats_for_all_services(include_from_test_key=True, only_active=True):
+    if todays_stats_available():
+        services_query = db.session.query(
+            Service.id.label("service_id"),
+            Service.name,
+            Service.restricted,
+            Service.active,
+            Service.created_at,
+        ).order_by(Service.id)
+        if only_active:
+            services_query = services_query.filter(Service.active)
+
+        services = services_query.all()
+        cached_stats = get_todays_stats(
+            [service.service_id for service in services], include_from_test_key=include_from_test_key
+        )
+        if cached_stats is not None:
+            # one row per service and notification type and status, or a row without stats for services with none
+            return [
+                TodaysServiceStatsRow(*service, *stats_row)
+                for service in services
+                for stats_row in (cached_stats[service.service_id] or [(None, None, None)])
+            ]
+
     today = date.today()
     start_date = get_london_midnight_in_utc(today)
     end_date = get_london_midnight_in_utc(today + timedelta(days=1))
@@ -495,6 +540,35 @@ def dao_fetch_todays_stats_for_all_services(include_from_test_key=True, only_act
     return query.all()
 
 
+@retryable_query()
+def dao_fetch_stats_by_service_and_key_type_for_day(
+    day: date, service_ids=None, session: Session | scoped_session = db.session
+):
+    """
+    Returns the count of the day's notifications for each service (or each of `service_ids`), notification type,
+    status and key type, for refreshing the counts in app.notifications.todays_stats_cache
+    """
+    start_date = get_london_midnight_in_utc(day)
+
+    query = session.query(
+        Notification.service_id,
+        Notification.notification_type,
+        Notification.status,
+        Notification.key_type,
+        func.count(Notification.id).label("count"),
+    ).filter(Notification.created_at >= start_date)
+
+    if service_ids is not None:
+        query = query.filter(Notification.service_id.in_(service_ids))
+
+    return query.group_by(
+        Notification.service_id,
+        Notification.notification_type,
+        Notification.status,
+        Notification.key_type,
+    ).all()
+
+
 def dao_fetch_active_users_for_service(service_id):
     query = User.query.filter(User.services.any(id=service_id), User.state == "active")
 
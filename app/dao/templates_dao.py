@@ -5,6 +5,7 @@ from sqlalchemy import asc, desc
 from sqlalchemy.orm import Session, defaultload, load_only, scoped_session
 
 from app import db
+from app.cache_invalidation import queue_template_cache_invalidation
 from app.constants import LETTER_TYPE, SECOND_CLASS
 from app.dao.dao_utils import VersionOptions, autocommit, version_class
 from app.dao.users_dao import get_user_by_id
@@ -35,6 +36,7 @@ def dao_create_template(template):
 @version_class(VersionOptions(Template, history_class=TemplateHistory))
 def dao_update_template(template):
     db.session.add(template)
+    queue_template_cache_invalidation(template.service_id, template.id)
 
 
 @autocommit
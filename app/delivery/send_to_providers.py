@@ -1,7 +1,13 @@
+import os
 import random
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from typing import NamedTuple
 from urllib import parse
 
+import cachetools
 from flask import current_app
 from notifications_utils.sanitise_text import SanitiseSMS
 from notifications_utils.template import (
@@ -9,17 +15,20 @@ from notifications_utils.template import (
     PlainTextEmailTemplate,
     SMSMessageTemplate,
 )
+from sqlalchemy import inspect
 
 from app import create_uuid, db, notification_provider_clients, redis_store
 from app.celery.research_mode_tasks import (
     send_email_response,
     send_sms_response,
 )
+from app.clients.email.aws_ses import AwsSesClientThrottlingSendRateException
 from app.constants import (
     BRANDING_BOTH,
     BRANDING_ORG_BANNER,
     EMAIL_TYPE,
     KEY_TYPE_TEST,
+    NOTIFICATION_CREATED,
     NOTIFICATION_SENDING,
     NOTIFICATION_SENT,
     NOTIFICATION_STATUS_TYPES_COMPLETED,
@@ -28,15 +37,119 @@ from app.constants import (
     SMS_PROVIDER_ERROR_THRESHOLD,
     SMS_TYPE,
 )
-from app.dao.email_branding_dao import dao_get_email_branding_by_id
-from app.dao.notifications_dao import dao_update_notification
+from app.dao.notifications_dao import dao_update_notification, dao_update_notifications_to_sending
 from app.dao.provider_details_dao import (
     dao_reduce_sms_provider_priority,
 )
+from app.delivery.ses_rate_governor import record_ses_throttled, wait_for_ses_send_slot
+from app.delivery.sms_provider_health import get_sms_provider_health, send_sms_recording_health
+from app.delivery.sms_send_engine import sms_send_engine
 from app.exceptions import NotificationTechnicalFailureException
 from app.models import Notification
+from app.notifications.notification_status_buffer import notification_status_buffer
 from app.otel_metrics.notification import record_international_sms, record_send_duration
-from app.serialised_models import SerialisedProviders, SerialisedService, SerialisedTemplate
+from app.serialised_models import (
+    SerialisedEmailBranding,
+    SerialisedProviders,
+    SerialisedService,
+    SerialisedTemplate,
+)
+
+# how long rendered content is reused for. Branding changes can take this long to show up in emails.
+RENDERED_CONTENT_CACHE_TTL = 30
+
+_rendered_content_cache: cachetools.TTLCache = cachetools.TTLCache(maxsize=1024, ttl=RENDERED_CONTENT_CACHE_TTL)
+_rendered_content_cache_lock = threading.RLock()
+
+# send_emails_to_provider sends emails from these threads. They live as long as the process, so each thread's SES
+# client keeps its connections alive between tasks.
+_email_sending_executor: ThreadPoolExecutor | None = None
+_email_sending_executor_pid: int | None = None
+_email_sending_executor_lock = threading.Lock()
+
+
+class RenderedSMS(NamedTuple):
+    content: str
+    unsanitised_content: str
+    fragment_count: int
+
+
+class RenderedEmail(NamedTuple):
+    subject: str
+    plain_text_body: str
+    html_body: str
+
+
+def _cached_render(key, render):
+    """
+    Returns the content `render` returns, reusing it for other notifications with the same `key` - the template
+    version and everything about the service the content depends on - if TEMPLATE_RENDER_CACHE_ENABLED. Only content
+    which doesn't depend on personalisation is cached, so nothing about recipients is kept in the cache.
+    """
+    if not current_app.config["TEMPLATE_RENDER_CACHE_ENABLED"]:
+        return render()
+
+    with _rendered_content_cache_lock:
+        if (rendered := _rendered_content_cache.get(key)) is not None:
+            return rendered
+
+    rendered = render()
+    with _rendered_content_cache_lock:
+        _rendered_content_cache[key] = rendered
+    return rendered
+
+
+def render_sms(service, template_model, personalisation) -> RenderedSMS:
+    template = SMSMessageTemplate(
+        template_model.__dict__,
+        values=personalisation,
+        prefix=service.name,
+        show_prefix=service.prefix_sms,
+    )
+
+    def render():
+        return RenderedSMS(
+            content=str(template),
+            unsanitised_content=template.unsanitised_content,
+            fragment_count=template.fragment_count,
+        )
+
+    if template.placeholders:
+        # the content is different for every recipient, so there's no point caching it
+        return render()
+
+    return _cached_render(
+        (SMS_TYPE, str(template_model.id), template_model.version, service.name, service.prefix_sms), render
+    )
+
+
+def render_email(service, template_model, personalisation, unsubscribe_link) -> RenderedEmail:
+    plain_text_email = PlainTextEmailTemplate(
+        template_model.__dict__,
+        values=personalisation,
+        unsubscribe_link=unsubscribe_link,
+    )
+
+    def render():
+        html_email = HTMLEmailTemplate(
+            template_model.__dict__,
+            values=personalisation,
+            unsubscribe_link=unsubscribe_link,
+            **get_html_email_options(service),
+        )
+        return RenderedEmail(
+            subject=plain_text_email.subject,
+            plain_text_body=str(plain_text_email),
+            html_body=str(html_email),
+        )
+
+    if plain_text_email.placeholders or unsubscribe_link:
+        # the content (or the link) is different for every recipient, so there's no point caching it
+        return render()
+
+    return _cached_render(
+        (EMAIL_TYPE, str(template_model.id), template_model.version, str(service.email_branding)), render
+    )
 
 
 def send_sms_to_provider(notification: Notification) -> None:
@@ -53,25 +166,9 @@ def send_sms_to_provider(notification: Notification) -> None:
             template_id=notification.template_id, service_id=service.id, version=notification.template_version
         )
 
-        template = SMSMessageTemplate(
-            template_model.__dict__,
-            values=notification.personalisation,
-            prefix=service.name,
-            show_prefix=service.prefix_sms,
-        )
+        template = render_sms(service, template_model, notification.personalisation)
 
-        if non_gsm_characters := SanitiseSMS.get_non_gsm_characters(template.unsanitised_content):
-            current_app.logger.warning(
-                "%s character(s) replaced with ? in SMS content for service %s and notification %s",
-                len(non_gsm_characters),
-                service.id,
-                notification.id,
-                extra={
-                    "non_compatible_character_count": len(non_gsm_characters),
-                    "service_id": service.id,
-                    "notification_id": notification.id,
-                },
-            )
+        _log_non_gsm_characters(service, notification, template)
 
         created_at = notification.created_at
         key_type = notification.key_type
@@ -90,26 +187,17 @@ def send_sms_to_provider(notification: Notification) -> None:
                     # closing the session (as otherwise it would be reopened immediately)
                     send_sms_kwargs = {
                         "to": notification.normalised_to,
-                        "content": str(template),
+                        "content": template.content,
                         "reference": str(notification.id),
                         "sender": notification.reply_to_text,
                         "international": notification.international,
                     }
                     db.session.close()  # no commit needed as no changes to objects have been made above
-                    provider.send_sms(**send_sms_kwargs)
+                    send_sms_recording_health(provider, **send_sms_kwargs)
                 except Exception as e:
                     notification.billable_units = template.fragment_count
                     dao_update_notification(notification)
-
-                    if redis_store.exceeded_rate_limit(
-                        f"{provider.name}-error-rate", SMS_PROVIDER_ERROR_THRESHOLD, SMS_PROVIDER_ERROR_INTERVAL
-                    ):
-                        dao_reduce_sms_provider_priority(provider.name, time_threshold=timedelta(minutes=1))
-                        current_app.logger.warning(
-                            "Error threshold exceeded for provider %s",
-                            provider.name,
-                            extra={"provider_name": provider.name},
-                        )
+                    _record_sms_provider_error(provider)
                     raise e
                 else:
                     notification.billable_units = template.fragment_count
@@ -136,6 +224,106 @@ def send_sms_to_provider(notification: Notification) -> None:
         )
 
 
+def send_sms_batch_to_providers(notifications):
+    """
+    Sends a batch of SMS notifications through the SMS send engine, so that many of them can be in flight to the
+    providers at once, then records the ones which were sent with a single UPDATE per provider.
+
+    Notifications which aren't in created or have a test key, or whose service is inactive, are handed to
+    send_sms_to_provider one at a time afterwards instead.
+
+    Returns a dict of the exception raised for each notification which failed, by notification id.
+    """
+    failures = {}
+    to_send = []
+    one_at_a_time = []
+
+    for notification in notifications:
+        try:
+            service = SerialisedService.from_id(notification.service_id)
+            can_be_batched = notification.status == NOTIFICATION_CREATED and notification.key_type != KEY_TYPE_TEST
+            if not (service.active and can_be_batched):
+                one_at_a_time.append(notification)
+                continue
+
+            provider = provider_to_use(SMS_TYPE, notification.international)
+            template_model = SerialisedTemplate.from_id_service_id_and_version(
+                template_id=notification.template_id, service_id=service.id, version=notification.template_version
+            )
+            template = render_sms(service, template_model, notification.personalisation)
+            _log_non_gsm_characters(service, notification, template)
+        except Exception as e:
+            failures[notification.id] = e
+            continue
+
+        send_sms_kwargs = {
+            "to": notification.normalised_to,
+            "content": template.content,
+            "reference": str(notification.id),
+            "sender": notification.reply_to_text,
+            "international": notification.international,
+        }
+        to_send.append((notification, provider, template, send_sms_kwargs))
+
+    # like send_sms_to_provider, don't hold a database connection open while waiting on the providers
+    db.session.close()
+    futures = [sms_send_engine.submit(provider, send_sms_kwargs) for _, provider, _, send_sms_kwargs in to_send]
+
+    sent_notifications_by_provider = defaultdict(list)
+    for (notification, provider, template, _), future in zip(to_send, futures, strict=True):
+        try:
+            future.result()
+        except Exception as e:
+            _record_send_duration(notification, provider)
+            failures[notification.id] = e
+            notification.billable_units = template.fragment_count
+            dao_update_notification(notification)
+            _record_sms_provider_error(provider)
+        else:
+            _record_send_duration(notification, provider)
+            sent_notifications_by_provider[provider.name].append(
+                (notification, {"billable_units": template.fragment_count})
+            )
+            if notification.international:
+                record_international_sms(
+                    1, notification_status=NOTIFICATION_SENT, sms_country_code=notification.phone_prefix
+                )
+
+    for provider_name, sent_notifications in sent_notifications_by_provider.items():
+        dao_update_notifications_to_sending(sent_notifications, provider_name)
+
+    _send_one_at_a_time(one_at_a_time, send_sms_to_provider, failures)
+
+    return failures
+
+
+def _log_non_gsm_characters(service, notification, template):
+    if non_gsm_characters := SanitiseSMS.get_non_gsm_characters(template.unsanitised_content):
+        current_app.logger.warning(
+            "%s character(s) replaced with ? in SMS content for service %s and notification %s",
+            len(non_gsm_characters),
+            service.id,
+            notification.id,
+            extra={
+                "non_compatible_character_count": len(non_gsm_characters),
+                "service_id": service.id,
+                "notification_id": notification.id,
+            },
+        )
+
+
+def _record_sms_provider_error(provider):
+    if redis_store.exceeded_rate_limit(
+        f"{provider.name}-error-rate", SMS_PROVIDER_ERROR_THRESHOLD, SMS_PROVIDER_ERROR_INTERVAL
+    ):
+        dao_reduce_sms_provider_priority(provider.name, time_threshold=timedelta(minutes=1))
+        current_app.logger.warning(
+            "Error threshold exceeded for provider %s",
+            provider.name,
+            extra={"provider_name": provider.name},
+        )
+
+
 def _get_email_headers(notification: Notification, template: SerialisedTemplate) -> list[dict[str, str]]:
     if unsubscribe_link := notification.get_unsubscribe_link_for_headers(
         template_has_unsubscribe_link=template.has_unsubscribe_link
@@ -148,6 +336,11 @@ def _get_email_headers(notification: Notification, template: SerialisedTemplate)
     return []
 
 
+def _get_email_from_address(service):
+    email_sender_name = service.custom_email_sender_name or service.name
+    return f'"{email_sender_name}" <{service.email_sender_local_part}@{current_app.config["NOTIFY_EMAIL_DOMAIN"]}>'
+
+
 def send_email_to_provider(notification):
     service = SerialisedService.from_id(notification.service_id)
 
@@ -165,18 +358,8 @@ def send_email_to_provider(notification):
             template_has_unsubscribe_link=template.has_unsubscribe_link
         )
 
-        html_email = HTMLEmailTemplate(
-            template.__dict__,
-            values=notification.personalisation,
-            unsubscribe_link=unsubscribe_link_for_body,
-            **get_html_email_options(service),
-        )
+        email = render_email(service, template, notification.personalisation, unsubscribe_link_for_body)
 
-        plain_text_email = PlainTextEmailTemplate(
-            template.__dict__,
-            values=notification.personalisation,
-            unsubscribe_link=unsubscribe_link_for_body,
-        )
         created_at = notification.created_at
         key_type = notification.key_type
         try:
@@ -185,18 +368,19 @@ def send_email_to_provider(notification):
                 update_notification_to_sending(notification, provider)
                 send_email_response(notification.reference, notification.to, notification.service_id)
             else:
-                email_sender_name = service.custom_email_sender_name or service.name
-                from_address = f'"{email_sender_name}" <{service.email_sender_local_part}@{current_app.config["NOTIFY_EMAIL_DOMAIN"]}>'  # noqa: E501
-
-                reference = provider.send_email(
-                    from_address=from_address,
-                    to_address=notification.normalised_to,
-                    subject=plain_text_email.subject,
-                    body=str(plain_text_email),
-                    html_body=str(html_email),
-                    reply_to_address=notification.reply_to_text,
-                    headers=_get_email_headers(notification, template),
-                )
+                # As with SMS, end the DB session so that we don't have a connection stuck open waiting on SES, which
+                # pulls everything the send needs from our DB models into `email_kwargs` first
+                email_kwargs = {
+                    "from_address": _get_email_from_address(service),
+                    "to_address": notification.normalised_to,
+                    "subject": email.subject,
+                    "body": email.plain_text_body,
+                    "html_body": email.html_body,
+                    "reply_to_address": notification.reply_to_text,
+                    "headers": _get_email_headers(notification, template),
+                }
+                db.session.close()  # no commit needed as no changes to objects have been made above
+                reference = _send_email(provider, **email_kwargs)
                 notification.reference = reference
                 update_notification_to_sending(notification, provider)
         finally:
@@ -208,12 +392,150 @@ def send_email_to_provider(notification):
             )
 
 
+def send_emails_to_provider(notifications):
+    """
+    Sends a batch of email notifications to the provider, EMAIL_DELIVERY_BATCH_CONCURRENCY at a time, then records
+    the references of the ones which were sent with a single UPDATE.
+
+    Notifications which aren't in created or have a test key, or whose service is inactive, are handed to
+    send_email_to_provider one at a time afterwards instead.
+
+    Returns a dict of the exception raised for each notification which failed, by notification id.
+    """
+    failures = {}
+    to_send = []
+    one_at_a_time = []
+    provider = provider_to_use(EMAIL_TYPE)
+
+    for notification in notifications:
+        try:
+            service = SerialisedService.from_id(notification.service_id)
+            can_be_batched = notification.status == NOTIFICATION_CREATED and notification.key_type != KEY_TYPE_TEST
+            if not (service.active and can_be_batched):
+                one_at_a_time.append(notification)
+                continue
+
+            template = SerialisedTemplate.from_id_service_id_and_version(
+                template_id=notification.template_id, service_id=service.id, version=notification.template_version
+            )
+            unsubscribe_link_for_body = notification.get_unsubscribe_link_for_body(
+                template_has_unsubscribe_link=template.has_unsubscribe_link
+            )
+            email = render_email(service, template, notification.personalisation, unsubscribe_link_for_body)
+        except Exception as e:
+            failures[notification.id] = e
+            continue
+
+        to_send.append(
+            (
+                notification,
+                {
+                    "from_address": _get_email_from_address(service),
+                    "to_address": notification.normalised_to,
+                    "subject": email.subject,
+                    "body": email.plain_text_body,
+                    "html_body": email.html_body,
+                    "reply_to_address": notification.reply_to_text,
+                    "headers": _get_email_headers(notification, template),
+                },
+            )
+        )
+
+    # don't hold a DB connection while waiting on SES - everything the sends need is in `to_send`
+    db.session.close()
+
+    app = current_app._get_current_object()
+    executor = _get_email_sending_executor()
+    futures = [executor.submit(_send_email_in_app_context, app, provider, email_kwargs) for _, email_kwargs in to_send]
+
+    sent_notifications = []
+    for (notification, _), future in zip(to_send, futures, strict=True):
+        try:
+            reference = future.result()
+        except Exception as e:
+            _record_send_duration(notification, provider)
+            failures[notification.id] = e
+        else:
+            _record_send_duration(notification, provider)
+            sent_notifications.append((notification, {"reference": reference}))
+
+    if sent_notifications:
+        dao_update_notifications_to_sending(sent_notifications, provider.name)
+
+    _send_one_at_a_time(one_at_a_time, send_email_to_provider, failures)
+
+    return failures
+
+
+def _send_one_at_a_time(notifications, send_to_provider, failures):
+    # These are sent after the batch, because each of them commits - which would expire the batch's notifications
+    # while they're still in the session, leaving them unusable once it's closed for the sends
+    for notification in notifications:
+        try:
+            send_to_provider(notification)
+        except Exception as e:
+            failures[notification.id] = e
+
+
+def _send_email_in_app_context(app, provider, email_kwargs):
+    # provider is a proxy, so each of the executor's threads sends with its own (non thread-safe) client
+    with app.app_context():
+        return _send_email(provider, **email_kwargs)
+
+
+def _send_email(provider, **email_kwargs):
+    wait_for_ses_send_slot()
+    try:
+        return provider.send_email(**email_kwargs)
+    except AwsSesClientThrottlingSendRateException:
+        record_ses_throttled()
+        raise
+
+
+def _record_send_duration(notification, provider):
+    record_send_duration(
+        (datetime.utcnow() - notification.created_at).total_seconds(),
+        key_type=notification.key_type,
+        notification_type=notification.notification_type,
+        provider_name=provider.name,
+    )
+
+
+def _get_email_sending_executor():
+    global _email_sending_executor, _email_sending_executor_pid
+
+    # a forked process doesn't inherit the executor's threads, so needs its own
+    if _email_sending_executor_pid != os.getpid():
+        with _email_sending_executor_lock:
+            if _email_sending_executor_pid != os.getpid():
+                _email_sending_executor = ThreadPoolExecutor(
+                    max_workers=current_app.config["EMAIL_DELIVERY_BATCH_CONCURRENCY"],
+                    thread_name_prefix="email-sending",
+                )
+                _email_sending_executor_pid = os.getpid()
+
+    return _email_sending_executor
+
+
 def update_notification_to_sending(notification, provider):
     notification.sent_at = datetime.utcnow()
     notification.sent_by = provider.name
     if notification.status not in NOTIFICATION_STATUS_TYPES_COMPLETED:
         notification.status = NOTIFICATION_SENT if notification.international else NOTIFICATION_SENDING
-    dao_update_notification(notification)
+
+    if notification_status_buffer.enabled() and inspect(notification).detached:
+        # the session was closed for the send, so rather than adding the notification back to it just to commit this
+        # on its own, it can be written along with other notifications' updates made at the same time
+        notification_status_buffer.write(
+            notification.id,
+            notification.status,
+            sent_at=notification.sent_at,
+            sent_by=notification.sent_by,
+            reference=notification.reference,
+            billable_units=notification.billable_units,
+        )
+    else:
+        dao_update_notification(notification)
 
 
 def provider_to_use(notification_type, international=False):
@@ -231,6 +553,9 @@ def provider_to_use(notification_type, international=False):
 
     if len(active_providers) == 1:
         weights = [100]
+    elif notification_type == SMS_TYPE:
+        health = get_sms_provider_health(p.identifier for p in active_providers)
+        weights = [p.priority * health[p.identifier] for p in active_providers]
     else:
         weights = [p.priority for p in active_providers]
 
@@ -268,11 +593,11 @@ def get_html_email_options(service):
             "rebrand": True,
         }
     if isinstance(service, SerialisedService):
-        branding = dao_get_email_branding_by_id(service.email_branding)
+        branding = SerialisedEmailBranding.from_id(service.email_branding)
+        logo_url = branding.logo_url
     else:
         branding = service.email_branding
-
-    logo_url = get_logo_url(current_app.config["ADMIN_BASE_URL"], branding.logo) if branding.logo else None
+        logo_url = get_logo_url(current_app.config["ADMIN_BASE_URL"], branding.logo) if branding.logo else None
 
     return {
         "govuk_banner": branding.brand_type == BRANDING_BOTH,
@@ -0,0 +1,196 @@
+"""
+Paces the emails every process sends to SES, using a token bucket shared between processes in redis, so that bursts
+wait for a send slot here rather than being throttled by SES and retried.
+
+The bucket refills at the governor's allowed rate. That starts at the account's max send rate, which
+refresh-ses-max-send-rate keeps up to date. Whenever SES throttles a send anyway, the allowed rate is halved (at most
+once a second). It then creeps back up towards the max send rate while sends keep succeeding.
+"""
+
+import time
+
+from flask import current_app
+
+from app import redis_store
+from app.clients.email.aws_ses import AwsSesClientThrottlingSendRateException
+from app.otel_metrics.provider import record_ses_allowed_send_rate
+
+SES_RATE_GOVERNOR_KEY = "ses-rate-governor"
+
+# the allowed rate never goes below this, in emails per second
+SES_MIN_SEND_RATE = 1
+# how much the allowed rate is multiplied by when SES throttles a send
+SES_SEND_RATE_DECREASE_FACTOR = 0.5
+# how much of the max send rate is added to the allowed rate after each second's worth of sends at the allowed rate
+SES_SEND_RATE_INCREASE_PROPORTION = 0.05
+# how long the allowed rate is held after SES throttles a send before it starts increasing again
+SES_SEND_RATE_HOLD_SECONDS = 10
+# the longest a send will wait for a slot. If it would have to wait longer it's treated as throttled instead
+SES_SEND_MAX_WAIT_SECONDS = 2
+
+# KEYS[1]: governor key
+# ARGV[1]: current unix time
+# ARGV[2]: max send rate to use if refresh-ses-max-send-rate hasn't stored one
+# ARGV[3:6]: min send rate, increase proportion, hold seconds, max wait seconds
+#
+# Returns {1 if a send slot was reserved else 0, milliseconds to wait for it, allowed rate in millisends per second}
+ACQUIRE_SEND_SLOT_LUA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local min_rate = tonumber(ARGV[3])
+local increase_proportion = tonumber(ARGV[4])
+local hold_seconds = tonumber(ARGV[5])
+local max_wait = tonumber(ARGV[6])
+
+local governor = redis.call(
+    "HMGET", KEYS[1], "max_rate", "rate", "tokens", "replenished_at", "decreased_at", "sends_since_change"
+)
+local max_rate = tonumber(governor[1]) or tonumber(ARGV[2])
+local rate = math.max(min_rate, math.min(tonumber(governor[2]) or max_rate, max_rate))
+local replenished_at = tonumber(governor[4]) or now
+-- the bucket holds up to a second's worth of sends
+local tokens = math.min(rate, (tonumber(governor[3]) or rate) + math.max(0, now - replenished_at) * rate)
+local decreased_at = tonumber(governor[5]) or 0
+local sends_since_change = tonumber(governor[6]) or 0
+
+local wait = 0
+if tokens < 1 then
+    wait = (1 - tokens) / rate
+end
+
+local reserved = 0
+if wait <= max_wait then
+    reserved = 1
+    tokens = tokens - 1
+    sends_since_change = sends_since_change + 1
+
+    if rate < max_rate and now - decreased_at >= hold_seconds and sends_since_change >= rate then
+        rate = math.min(max_rate, rate + max_rate * increase_proportion)
+        sends_since_change = 0
+    end
+end
+
+redis.call(
+    "HSET", KEYS[1],
+    "rate", tostring(rate),
+    "tokens", tostring(tokens),
+    "replenished_at", tostring(now),
+    "sends_since_change", sends_since_change
+)
+redis.call("EXPIRE", KEYS[1], 86400)
+return {reserved, math.ceil(wait * 1000), math.floor(rate * 1000)}
+"""
+
+# KEYS[1]: governor key
+# ARGV[1]: current unix time
+# ARGV[2]: max send rate to use if refresh-ses-max-send-rate hasn't stored one
+# ARGV[3:4]: min send rate, decrease factor
+#
+# Returns the allowed rate in millisends per second
+RECORD_THROTTLED_LUA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local min_rate = tonumber(ARGV[3])
+local decrease_factor = tonumber(ARGV[4])
+
+local governor = redis.call("HMGET", KEYS[1], "max_rate", "rate", "decreased_at")
+local max_rate = tonumber(governor[1]) or tonumber(ARGV[2])
+local rate = math.min(tonumber(governor[2]) or max_rate, max_rate)
+local decreased_at = tonumber(governor[3]) or 0
+
+-- sends throttled together were all sent at the same rate, so should only decrease it once
+if now - decreased_at >= 1 then
+    rate = math.max(min_rate, rate * decrease_factor)
+    redis.call(
+        "HSET", KEYS[1], "rate", tostring(rate), "decreased_at", tostring(now), "sends_since_change", 0, "tokens", 0
+    )
+    redis.call("EXPIRE", KEYS[1], 86400)
+end
+return math.floor(rate * 1000)
+"""
+
+_acquire_send_slot_script = None
+_record_throttled_script = None
+
+
+class SesRateGovernorThrottledException(AwsSesClientThrottlingSendRateException):
+    pass
+
+
+def _get_acquire_send_slot_script():
+    global _acquire_send_slot_script
+    if _acquire_send_slot_script is None:
+        _acquire_send_slot_script = redis_store.redis_store.register_script(ACQUIRE_SEND_SLOT_LUA_SCRIPT)
+    return _acquire_send_slot_script
+
+
+def _get_record_throttled_script():
+    global _record_throttled_script
+    if _record_throttled_script is None:
+        _record_throttled_script = redis_store.redis_store.register_script(RECORD_THROTTLED_LUA_SCRIPT)
+    return _record_throttled_script
+
+
+def ses_rate_governor_enabled():
+    return redis_store.active and current_app.config["SES_RATE_GOVERNOR_ENABLED"]
+
+
+def wait_for_ses_send_slot():
+    """
+    Waits until the allowed send rate lets another email be sent to SES. Raises SesRateGovernorThrottledException
+    (a kind of AwsSesClientThrottlingSendRateException) if that would take more than SES_SEND_MAX_WAIT_SECONDS.
+
+    If redis can't be reached the email can be sent straight away.
+    """
+    if not ses_rate_governor_enabled():
+        return
+
+    try:
+        reserved, wait_ms, rate = _get_acquire_send_slot_script()(
+            keys=[SES_RATE_GOVERNOR_KEY],
+            args=[
+                time.time(),
+                current_app.config["SES_MAX_SEND_RATE"],
+                SES_MIN_SEND_RATE,
+                SES_SEND_RATE_INCREASE_PROPORTION,
+                SES_SEND_RATE_HOLD_SECONDS,
+                SES_SEND_MAX_WAIT_SECONDS,
+            ],
+        )
+    except Exception:
+        current_app.logger.exception("Failed to acquire SES send slot")
+        return
+
+    record_ses_allowed_send_rate(rate / 1000)
+
+    if not reserved:
+        raise SesRateGovernorThrottledException(f"SES send slot not available for {wait_ms / 1000} seconds")
+    if wait_ms:
+        time.sleep(wait_ms / 1000)
+
+
+def record_ses_throttled():
+    if not ses_rate_governor_enabled():
+        return
+
+    try:
+        rate = _get_record_throttled_script()(
+            keys=[SES_RATE_GOVERNOR_KEY],
+            args=[
+                time.time(),
+                current_app.config["SES_MAX_SEND_RATE"],
+                SES_MIN_SEND_RATE,
+                SES_SEND_RATE_DECREASE_FACTOR,
+            ],
+        )
+    except Exception:
+        current_app.logger.exception("Failed to record SES throttling")
+        return
+
+    record_ses_allowed_send_rate(rate / 1000)
+    extra = {"ses_allowed_send_rate": rate / 1000}
+    current_app.logger.warning(
+        "SES throttled a send, allowed send rate is now %(ses_allowed_send_rate)s", extra, extra=extra
+    )
+
+
+def set_ses_max_send_rate(max_send_rate):
+    redis_store.redis_store.hset(SES_RATE_GOVERNOR_KEY, "max_rate", str(max_send_rate))
@@ -0,0 +1,141 @@
+"""
+Keeps rolling measures of each SMS provider's health in redis - how long requests to it take, how many of them fail,
+and how long its delivery receipts take to arrive - so that provider_to_use can shift traffic towards the healthier
+provider as soon as the other starts to struggle.
+
+Each minute's measures are kept in their own redis hash, and a provider's health is worked out from the last
+SMS_PROVIDER_HEALTH_WINDOW_MINUTES of them. Its health is a score between SMS_PROVIDER_MIN_HEALTH and 1, which its
+priority is multiplied by when choosing a provider. So the priorities in the database are still the baseline, and
+with both providers healthy traffic is split exactly as before.
+"""
+
+import time
+from threading import RLock
+
+import cachetools
+from flask import current_app
+
+from app import redis_store
+from app.otel_metrics.provider import record_sms_health
+from app.utils import batched
+
+SMS_PROVIDER_HEALTH_WINDOW_MINUTES = 5
+# a measure isn't used until there are at least this many samples of it in the window
+SMS_PROVIDER_HEALTH_MIN_SAMPLES = 20
+# requests and delivery receipts taking longer than these on average start to count against a provider
+SMS_PROVIDER_LATENCY_TARGET_SECONDS = 1
+SMS_PROVIDER_RECEIPT_LAG_TARGET_SECONDS = 60
+# a provider whose requests fail at this rate or worse gets the minimum health
+SMS_PROVIDER_MAX_ERROR_RATE = 0.5
+# so that an unhealthy provider still gets a little traffic, and we notice when it recovers
+SMS_PROVIDER_MIN_HEALTH = 0.05
+
+_health_cache: cachetools.TTLCache = cachetools.TTLCache(maxsize=16, ttl=5)
+_health_cache_lock = RLock()
+
+
+def _health_key(provider_name, minute):
+    return f"sms-provider-health-{provider_name}-{minute}"
+
+
+def _record(provider_name, increments):
+    if not (redis_store.active and current_app.config["SMS_PROVIDER_HEALTH_ENABLED"]):
+        return
+
+    key = _health_key(provider_name, int(time.time() // 60))
+    try:
+        pipeline = redis_store.redis_store.pipeline(transaction=False)
+        for field, amount in increments.items():
+            pipeline.hincrbyfloat(key, field, amount)
+        pipeline.expire(key, (SMS_PROVIDER_HEALTH_WINDOW_MINUTES + 1) * 60)
+        pipeline.execute()
+    except Exception:
+        current_app.logger.exception("Failed to record SMS provider health")
+
+
+def record_sms_provider_request(provider_name, duration, succeeded):
+    _record(provider_name, {"requests": 1, "errors": 0 if succeeded else 1, "request_seconds": duration})
+
+
+def record_sms_provider_receipt_lag(provider_name, lag):
+    _record(provider_name, {"receipts": 1, "receipt_lag_seconds": lag})
+
+
+def send_sms_recording_health(provider, **send_sms_kwargs):
+    start_time = time.monotonic()
+    succeeded = False
+    try:
+        response = provider.send_sms(**send_sms_kwargs)
+        succeeded = True
+        return response
+    finally:
+        record_sms_provider_request(provider.name, time.monotonic() - start_time, succeeded)
+
+
+def _fetch_measures(provider_names):
+    this_minute = int(time.time() // 60)
+    pipeline = redis_store.redis_store.pipeline(transaction=False)
+    for provider_name in provider_names:
+        for minute in range(this_minute - SMS_PROVIDER_HEALTH_WINDOW_MINUTES + 1, this_minute + 1):
+            pipeline.hgetall(_health_key(provider_name, minute))
+    results = pipeline.execute()
+
+    measures = {}
+    for provider_name, provider_results in zip(
+        provider_names, batched(results, SMS_PROVIDER_HEALTH_WINDOW_MINUTES), strict=True
+    ):
+        totals = {}
+        for minute_measures in provider_results:
+            for field, value in minute_measures.items():
+                field = field.decode() if isinstance(field, bytes) else field
+                totals[field] = totals.get(field, 0) + float(value)
+        measures[provider_name] = totals
+    return measures
+
+
+def health_score(measures):
+    """
+    Returns a provider's health, between SMS_PROVIDER_MIN_HEALTH and 1, from its totals over the window
+    """
+    score = 1.0
+
+    if (requests := measures.get("requests", 0)) >= SMS_PROVIDER_HEALTH_MIN_SAMPLES:
+        error_rate = measures.get("errors", 0) / requests
+        score *= max(0.0, 1 - error_rate / SMS_PROVIDER_MAX_ERROR_RATE)
+        average_latency = measures.get("request_seconds", 0) / requests
+        if average_latency > SMS_PROVIDER_LATENCY_TARGET_SECONDS:
+            score *= SMS_PROVIDER_LATENCY_TARGET_SECONDS / average_latency
+
+    if (receipts := measures.get("receipts", 0)) >= SMS_PROVIDER_HEALTH_MIN_SAMPLES:
+        average_lag = measures.get("receipt_lag_seconds", 0) / receipts
+        if average_lag > SMS_PROVIDER_RECEIPT_LAG_TARGET_SECONDS:
+            score *= SMS_PROVIDER_RECEIPT_LAG_TARGET_SECONDS / average_lag
+
+    return max(SMS_PROVIDER_MIN_HEALTH, score)
+
+
+def get_sms_provider_health(provider_names):
+    """
+    Returns a dict of each provider's health, by name. Every provider is healthy if health scoring is turned off, or
+    redis can't be reached. Results are cached in memory for a few seconds.
+    """
+    provider_names = tuple(sorted(provider_names))
+    if not (redis_store.active and current_app.config["SMS_PROVIDER_HEALTH_ENABLED"]):
+        return dict.fromkeys(provider_names, 1.0)
+
+    with _health_cache_lock:
+        if (health := _health_cache.get(provider_names)) is not None:
+            return health
+
+    try:
+        measures = _fetch_measures(provider_names)
+    except Exception:
+        current_app.logger.exception("Failed to fetch SMS provider health")
+        return dict.fromkeys(provider_names, 1.0)
+
+    health = {provider_name: health_score(measures[provider_name]) for provider_name in provider_names}
+    for provider_name, provider_health in health.items():
+        record_sms_health(provider_health, provider_name)
+    with _health_cache_lock:
+        _health_cache[provider_names] = health
+    return health
@@ -0,0 +1,64 @@
+"""
+Sends SMS from a pool of threads for each provider, so one worker can have many requests to a provider in flight at
+once rather than waiting on each in turn.
+
+Each thread sends with its own thread-local client, and so over its own connection. The size of a provider's pool,
+SMS_PROVIDER_SEND_CONCURRENCY[provider name], bounds how many requests can be in flight to it from a process.
+"""
+
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from flask import current_app
+
+from app.delivery.sms_provider_health import send_sms_recording_health
+from app.otel_metrics.provider import record_sms_send_in_flight, record_sms_send_queued
+
+
+class SmsSendEngine:
+    def __init__(self):
+        self._executors = {}
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self, provider_name):
+        with self._lock:
+            # a forked process doesn't inherit the executors' threads, so needs its own
+            if self._pid != os.getpid():
+                self._executors = {}
+                self._pid = os.getpid()
+
+            if provider_name not in self._executors:
+                self._executors[provider_name] = ThreadPoolExecutor(
+                    max_workers=current_app.config["SMS_PROVIDER_SEND_CONCURRENCY"][provider_name],
+                    thread_name_prefix=f"sms-send-{provider_name}",
+                )
+
+            return self._executors[provider_name]
+
+    def submit(self, provider, send_sms_kwargs) -> Future:
+        """
+        Queues an SMS to be sent with `provider.send_sms(**send_sms_kwargs)`, returning a Future for the result.
+        `provider` should be a proxy for a thread-local client, such as one returned by `provider_to_use`.
+        """
+        app = current_app._get_current_object()
+        record_sms_send_queued(1, provider.name)
+        try:
+            return self._get_executor(provider.name).submit(self._send, app, provider, send_sms_kwargs)
+        except Exception:
+            record_sms_send_queued(-1, provider.name)
+            raise
+
+    @staticmethod
+    def _send(app, provider, send_sms_kwargs):
+        with app.app_context():
+            record_sms_send_queued(-1, provider.name)
+            record_sms_send_in_flight(1, provider.name)
+            try:
+                return send_sms_recording_health(provider, **send_sms_kwargs)
+            finally:
+                record_sms_send_in_flight(-1, provider.name)
+
+
+sms_send_engine = SmsSendEngine()
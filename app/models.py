@@ -26,7 +26,7 @@ from sqlalchemy import (
     and_,
     func,
 )
-from sqlalchemy.dialects.postgresql import JSON, JSONB, UUID
+from sqlalchemy.dialects.postgresql import ARRAY, JSON, JSONB, UUID
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.ext.hybrid import hybrid_property
@@ -1456,6 +1456,17 @@ class Job(db.Model):
     )
     archived = db.Column(db.Boolean, nullable=False, default=False)
     contact_list_id = db.Column(UUID(as_uuid=True), db.ForeignKey("service_contact_list.id"), nullable=True, index=True)
+    # set when the job is split into row-range partitions - partition n covers rows
+    # [n * shatter_partition_size, (n + 1) * shatter_partition_size)
+    shatter_partition_size = db.Column(db.Integer, nullable=True)
+    # the partitions which have been completely shattered
+    shattered_partitions = db.Column(ARRAY(db.Integer), nullable=False, default=list, server_default="{}")
+
+    @property
+    def shatter_partition_count(self):
+        if not self.shatter_partition_size:
+            return None
+        return -(-self.notification_count // self.shatter_partition_size)
 
     __extended_statistics__ = (
         # dependencies
@@ -1554,7 +1565,8 @@ class Notification(db.Model):
     key_type = db.Column(db.String, db.ForeignKey("key_types.name"), unique=False, nullable=False)
     billable_units = db.Column(db.Integer, nullable=False, default=0)
     notification_type = db.Column(notification_types, nullable=False)
-    created_at = db.Column(db.DateTime, index=True, unique=False, nullable=False)
+    # the table is partitioned by created_at, so it's part of the primary key (see __mapper_args__)
+    created_at = db.Column(db.DateTime, primary_key=True, index=True, unique=False, nullable=False)
     sent_at = db.Column(db.DateTime, index=False, unique=False, nullable=True)  # can be null even if successfully sent
     sent_by = db.Column(db.String, nullable=True)
     updated_at = db.Column(db.DateTime, index=False, unique=False, nullable=True, onupdate=datetime.datetime.utcnow)
@@ -1590,9 +1602,12 @@ class Notification(db.Model):
             ["template_id", "template_version"],
             ["templates_history.id", "templates_history.version"],
         ),
-        UniqueConstraint("job_id", "job_row_number", name="uq_notifications_job_row_number"),
+        # unique constraints have to include the partition key, so this doesn't stop a job row being saved twice -
+        # the save tasks check for that with dao_get_already_saved_notifications
+        UniqueConstraint("job_id", "job_row_number", "created_at", name="uq_notifications_job_row_number"),
         Index("ix_notifications_notification_type_composite", "notification_type", "status", "created_at"),
         Index("ix_notifications_service_created_at", "service_id", "created_at"),
+        Index("ix_notifications_service_id_created_at_id", "service_id", "created_at", "id"),
         Index("ix_notifications_service_id_ntype_created_at", "service_id", "notification_type", "created_at"),
         # unsubscribe_link value should be null for non-email notifications
         CheckConstraint(
@@ -1622,8 +1637,12 @@ class Notification(db.Model):
             "created_at",
             postgresql_where=(status != NOTIFICATION_DELIVERED),
         ),
+        {"postgresql_partition_by": "RANGE (created_at)"},
     )
 
+    # notifications are still identified by their id alone
+    __mapper_args__ = {"primary_key": [id]}
+
     __extended_statistics__ = (
         # dependencies
         ("st_dep_notifications_service_id_api_key_id", ("service_id", "api_key_id"), ("dependencies",)),
@@ -1702,6 +1721,10 @@ class Notification(db.Model):
 
     @property
     def formatted_status(self):
+        return self.format_status(self.template.template_type, self.status)
+
+    @staticmethod
+    def format_status(template_type, status):
         return {
             "email": {
                 "failed": "Failed",
@@ -1731,7 +1754,7 @@ class Notification(db.Model):
                 "delivered": "Received",
                 "returned-letter": "Returned",
             },
-        }[self.template.template_type].get(self.status, self.status)
+        }[template_type].get(status, status)
 
     def get_letter_status(self):
         """
@@ -0,0 +1,209 @@
+"""
+Coalesces the status updates each process makes when it has sent a notification, and writes them in batches with
+dao_apply_notification_status_updates rather than committing each one on its own.
+
+A background thread writes the buffered updates as soon as there are any, and updates added while it's writing are
+written together in its next batch. Whoever adds an update waits until it has been written, so a sending task isn't
+acked before its notification's status and reference are in the database - if the worker was killed before they were
+written, the notification would be left as created without a reference, and sent again. The notification has already
+been sent by then, so if it takes too long that's logged rather than raised, and timeout-sending-notifications deals
+with any notification whose update is never written.
+
+If a batch can't be written because the database can't be reached, it's tried again until it can. Otherwise each
+update in it is written on its own, so that one which can't be written doesn't hold up the others, and it's dropped
+after NOTIFICATION_STATUS_BUFFER_MAX_ATTEMPTS tries.
+
+Updates to the same notification are coalesced, and never move it back to an earlier status. Nor does the UPDATE that
+writes them - so if a notification's delivery receipt has already been recorded when its sending update is written,
+it stays delivered.
+"""
+
+import atexit
+import os
+import threading
+
+from celery.signals import worker_process_shutdown
+from flask import current_app
+from sqlalchemy.exc import OperationalError
+
+from app.dao.notifications_dao import dao_apply_notification_status_updates, notification_status_order
+
+# how long to wait before trying again to write updates which couldn't be written
+NOTIFICATION_STATUS_BUFFER_FLUSH_INTERVAL = 0.25
+# how long write waits for its update to be written before giving up
+NOTIFICATION_STATUS_BUFFER_WRITE_TIMEOUT = 30
+# how many times an update is tried on its own before it's dropped
+NOTIFICATION_STATUS_BUFFER_MAX_ATTEMPTS = 5
+
+
+class NotificationStatusBuffer:
+    def __init__(self):
+        self._updates = {}
+        # how many times each update which couldn't be written on its own has been tried
+        self._attempts = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flush_requested = threading.Event()
+        self._written = threading.Condition(self._lock)
+        # each flush writes one generation of updates. _generation is the one updates are being added to now, and
+        # _written_generation the latest whose updates have all been written
+        self._generation = 0
+        self._written_generation = -1
+        self._app = None
+        self._pid = None
+
+    @staticmethod
+    def enabled():
+        return current_app.config["NOTIFICATION_STATUS_BUFFER_ENABLED"]
+
+    def write(self, notification_id, status, **values):
+        """
+        Writes an update setting the notification's status, and any other columns given as keyword arguments, along
+        with any other updates buffered at the same time. Returns once it has been written, or
+        NOTIFICATION_STATUS_BUFFER_WRITE_TIMEOUT seconds have passed.
+        """
+        generation = self.add(notification_id, status, **values)
+        self._flush_requested.set()
+        if not self.wait_until_written(generation):
+            extra = {"notification_id": notification_id, "timeout": NOTIFICATION_STATUS_BUFFER_WRITE_TIMEOUT}
+            current_app.logger.warning(
+                "Buffered status update for notification %(notification_id)s not written within %(timeout)s seconds",
+                extra,
+                extra=extra,
+            )
+
+    def add(self, notification_id, status, **values):
+        """
+        Buffers an update setting the notification's status, and any other columns given as keyword arguments,
+        returning the generation it will be written with
+        """
+        self._ensure_started()
+
+        with self._lock:
+            self._coalesce(notification_id, status, values)
+            return self._generation
+
+    def wait_until_written(self, generation, timeout=NOTIFICATION_STATUS_BUFFER_WRITE_TIMEOUT) -> bool:
+        """
+        Returns whether the updates buffered in `generation` were written within `timeout` seconds
+        """
+        with self._written:
+            return self._written.wait_for(lambda: self._written_generation >= generation, timeout=timeout)
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                updates, self._updates = self._updates, {}
+                generation = self._generation
+                self._generation += 1
+
+            if updates and (unwritten := self._write(updates)):
+                # put them back for the next flush to try again, underneath any updates buffered since. Anyone
+                # waiting for them carries on waiting until that flush has written them.
+                with self._lock:
+                    newer_updates, self._updates = self._updates, unwritten
+                    for notification_id, (status, values) in newer_updates.items():
+                        self._coalesce(notification_id, status, values)
+                return
+
+            with self._written:
+                self._written_generation = generation
+                self._written.notify_all()
+
+    def _write(self, updates):
+        """
+        Writes the updates, returning those which couldn't be written and should be tried again
+        """
+        try:
+            self._apply(updates)
+            return {}
+        except OperationalError:
+            current_app.logger.exception("Failed to write %s buffered notification status updates", len(updates))
+            return updates
+        except Exception:
+            current_app.logger.exception("Failed to write %s buffered notification status updates", len(updates))
+            if len(updates) == 1:
+                return self._unwritten_after_attempt(updates)
+
+        unwritten = {}
+        for notification_id, update in updates.items():
+            try:
+                self._apply({notification_id: update})
+            except OperationalError:
+                unwritten[notification_id] = update
+            except Exception:
+                current_app.logger.exception(
+                    "Failed to write buffered status update for notification %s", notification_id
+                )
+                unwritten |= self._unwritten_after_attempt({notification_id: update})
+        return unwritten
+
+    def _apply(self, updates):
+        dao_apply_notification_status_updates(
+            [(notification_id, status, values) for notification_id, (status, values) in updates.items()]
+        )
+        with self._lock:
+            for notification_id in updates:
+                self._attempts.pop(notification_id, None)
+
+    def _unwritten_after_attempt(self, updates):
+        ((notification_id, update),) = updates.items()
+        with self._lock:
+            attempts = self._attempts[notification_id] = self._attempts.get(notification_id, 0) + 1
+            if attempts < NOTIFICATION_STATUS_BUFFER_MAX_ATTEMPTS:
+                return updates
+            del self._attempts[notification_id]
+
+        extra = {"notification_id": notification_id, "attempts": attempts}
+        current_app.logger.error(
+            "Dropped buffered status update for notification %(notification_id)s after %(attempts)s attempts",
+            extra,
+            extra=extra,
+        )
+        return {}
+
+    def _coalesce(self, notification_id, status, values):
+        if (buffered := self._updates.get(notification_id)) is not None:
+            buffered_status, buffered_values = buffered
+            if notification_status_order(buffered_status) > notification_status_order(status):
+                status = buffered_status
+            values = {**buffered_values, **values}
+
+        self._updates[notification_id] = (status, values)
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+
+        with self._flush_lock:
+            if self._pid == os.getpid():
+                return
+
+            # a forked process doesn't inherit the flushing thread, and its parent will write anything it buffered
+            self._pid = os.getpid()
+            self._updates = {}
+            self._attempts = {}
+            self._app = current_app._get_current_object()
+
+            threading.Thread(target=self._flush_periodically, name="notification-status-buffer", daemon=True).start()
+            atexit.register(self.flush_on_shutdown)
+
+    def _flush_periodically(self):
+        while True:
+            self._flush_requested.wait(timeout=NOTIFICATION_STATUS_BUFFER_FLUSH_INTERVAL)
+            self._flush_requested.clear()
+            with self._app.app_context():
+                self.flush()
+
+    def flush_on_shutdown(self):
+        if self._app is not None and self._pid == os.getpid():
+            with self._app.app_context():
+                self.flush()
+
+
+notification_status_buffer = NotificationStatusBuffer()
+
+
+@worker_process_shutdown.connect
+def _flush_notification_status_buffer(**kwargs):
+    notification_status_buffer.flush_on_shutdown()
@@ -1,3 +1,4 @@
+from collections import defaultdict
 from datetime import datetime
 
 from flask import current_app
@@ -7,6 +8,7 @@ from app.celery.service_callback_tasks import (
     create_delivery_status_callback_data,
     send_complaint_to_service,
     send_delivery_status_to_service,
+    send_delivery_statuses_to_service,
 )
 from app.config import QueueNames
 from app.dao.complaint_dao import save_complaint
@@ -74,13 +76,56 @@ def check_and_queue_callback_task(notification, *, receipt_dt: datetime | None =
     # queue callback task only if the service_callback_api exists
     service_callback_api = get_delivery_status_callback_api_for_service(service_id=notification.service_id)
     if service_callback_api:
-        notification_data = create_delivery_status_callback_data(notification, service_callback_api)
-        send_delivery_status_to_service.apply_async(
-            [str(notification.id), notification_data],
-            {"receipt_iso_timestamp": receipt_dt and receipt_dt.isoformat()},
-            queue=QueueNames.CALLBACKS,
-            MessageGroupId=str(notification.service_id),
-        )
+        _queue_delivery_status_callback_task(notification, service_callback_api, receipt_dt)
+
+
+def check_and_queue_callback_tasks(notifications_and_receipt_dts):
+    """
+    Like `check_and_queue_callback_task` for each of an iterable of (notification, receipt_dt) pairs, but only
+    looking up each service's callback api once. With SERVICE_CALLBACK_BATCHING_ENABLED, each service's callbacks
+    are sent together by send-delivery-statuses tasks.
+    """
+    batching = current_app.config["SERVICE_CALLBACK_BATCHING_ENABLED"]
+    service_callback_apis = {}
+    status_updates_by_service_id = defaultdict(list)
+    for notification, receipt_dt in notifications_and_receipt_dts:
+        if notification.service_id not in service_callback_apis:
+            service_callback_apis[notification.service_id] = get_delivery_status_callback_api_for_service(
+                service_id=notification.service_id
+            )
+
+        if not (service_callback_api := service_callback_apis[notification.service_id]):
+            continue
+
+        if batching:
+            status_updates_by_service_id[notification.service_id].append(
+                [
+                    str(notification.id),
+                    create_delivery_status_callback_data(notification, service_callback_api),
+                    receipt_dt and receipt_dt.isoformat(),
+                ]
+            )
+        else:
+            _queue_delivery_status_callback_task(notification, service_callback_api, receipt_dt)
+
+    batch_size = current_app.config["SERVICE_CALLBACK_BATCH_SIZE"]
+    for service_id, status_updates in status_updates_by_service_id.items():
+        for i in range(0, len(status_updates), batch_size):
+            send_delivery_statuses_to_service.apply_async(
+                [status_updates[i : i + batch_size]],
+                queue=QueueNames.CALLBACKS,
+                MessageGroupId=str(service_id),
+            )
+
+
+def _queue_delivery_status_callback_task(notification, service_callback_api, receipt_dt):
+    notification_data = create_delivery_status_callback_data(notification, service_callback_api)
+    send_delivery_status_to_service.apply_async(
+        [str(notification.id), notification_data],
+        {"receipt_iso_timestamp": receipt_dt and receipt_dt.isoformat()},
+        queue=QueueNames.CALLBACKS,
+        MessageGroupId=str(notification.service_id),
+    )
 
 
 def _check_and_queue_complaint_callback_task(complaint, notification, recipient):
@@ -3,10 +3,7 @@ from datetime import UTC, datetime
 from flask import Blueprint, json, jsonify, request
 from notifications_utils.timezones import local_timezone
 
-from app.celery.process_sms_client_response_tasks import (
-    process_sms_client_response,
-)
-from app.config import QueueNames
+from app.celery.process_sms_client_response_tasks import queue_sms_client_response
 from app.errors import InvalidRequest, register_errors
 
 sms_callback_blueprint = Blueprint("sms_callback", __name__, url_prefix="/notifications/sms")
@@ -38,7 +35,7 @@ def process_mmg_response():
     except ValueError:
         pass  # None it is, then
 
-    process_sms_client_response.apply_async(
+    queue_sms_client_response(
         [
             status,
             provider_reference,
@@ -46,8 +43,7 @@ def process_mmg_response():
             detailed_status_code,
             delivery_iso_timestamp,
             uniform_now.isoformat(),
-        ],
-        queue=QueueNames.SMS_CALLBACKS,
+        ]
     )
 
     return jsonify(result="success"), 200
@@ -76,7 +72,7 @@ def process_firetext_response():
     except ValueError:
         pass  # None it is, then
 
-    process_sms_client_response.apply_async(
+    queue_sms_client_response(
         [
             status,
             provider_reference,
@@ -84,8 +80,7 @@ def process_firetext_response():
             detailed_status_code,
             delivery_iso_timestamp,
             uniform_now.isoformat(),
-        ],
-        queue=QueueNames.SMS_CALLBACKS,
+        ]
     )
 
     return jsonify(result="success"), 200
@@ -1,4 +1,5 @@
 import uuid
+from collections import Counter
 from datetime import datetime
 
 from flask import current_app
@@ -16,7 +17,7 @@ from notifications_utils.template import (
     SMSMessageTemplate,
 )
 
-from app import document_download_client, redis_store
+from app import document_download_client, redis_store, signing
 from app.celery import provider_tasks
 from app.celery.letters_pdf_tasks import get_pdf_for_templated_letter
 from app.config import QueueNames
@@ -34,6 +35,8 @@ from app.dao.notifications_dao import (
     dao_delete_notifications_by_id,
 )
 from app.models import Notification
+from app.notifications.rate_limit_script import DailyLimit, run_rate_limit_script
+from app.notifications.todays_stats_cache import record_notifications_created
 from app.utils import (
     parse_and_format_phone_number,
     try_download_template_email_file_from_s3,
@@ -142,6 +145,7 @@ def persist_notification(
     postage=None,
     document_download_count=None,
     updated_at=None,
+    increment_daily_limit=True,
     _autocommit=True,
 ):
     notification_created_at = created_at or datetime.utcnow()
@@ -191,31 +195,130 @@ def persist_notification(
     if not simulated:
         dao_create_notification(notification=notification, _autocommit=_autocommit)
         # Not sure how we can rollback
-        increment_daily_limit_caches(service, notification, key_type)
+        if increment_daily_limit:
+            increment_daily_limit_caches(service, notification, key_type)
+        record_notifications_created(service.id, key_type, {notification_type: 1})
 
     return notification
 
 
+def build_notification_row(
+    *,
+    template_id,
+    template_version,
+    recipient,
+    service,
+    personalisation,
+    notification_type,
+    key_type,
+    created_at=None,
+    job_id=None,
+    job_row_number=None,
+    client_reference=None,
+    notification_id=None,
+    reply_to_text=None,
+):
+    """
+    Returns the column values `persist_notification` would give a new sms or email notification, as a plain
+    dict suitable for `dao_bulk_create_notifications`
+    """
+    to = strip_and_remove_obscure_whitespace(
+        recipient["unformatted_recipient"] if type(recipient) is dict else recipient
+    )
+    row = {
+        "id": notification_id or uuid.uuid4(),
+        "template_id": template_id,
+        "template_version": template_version,
+        "to": to,
+        "service_id": service.id,
+        "_personalisation": signing.encode(personalisation or {}),
+        "notification_type": notification_type,
+        "api_key_id": None,
+        "key_type": key_type,
+        "created_at": created_at or datetime.utcnow(),
+        "job_id": job_id,
+        "job_row_number": job_row_number,
+        "client_reference": client_reference,
+        "status": NOTIFICATION_CREATED,
+        "reply_to_text": reply_to_text,
+    }
+
+    if notification_type == SMS_TYPE:
+        row["normalised_to"] = recipient["normalised_to"]
+        row["international"] = recipient["international"]
+        row["phone_prefix"] = recipient["phone_prefix"]
+        row["rate_multiplier"] = recipient["rate_multiplier"]
+    elif notification_type == EMAIL_TYPE:
+        row["normalised_to"] = format_email_address(to)
+    else:
+        raise TypeError(f"Notification type must be {SMS_TYPE} or {EMAIL_TYPE}")
+
+    return row
+
+
 def increment_daily_limit_caches(service, notification, key_type):
     if key_type == KEY_TYPE_TEST or not current_app.config["REDIS_ENABLED"]:
         return
 
-    increment_daily_limit_cache(service.id, notification.notification_type)
+    counts = {notification.notification_type: 1}
 
     if notification.notification_type == SMS_TYPE and str(notification.phone_prefix) != UK_PREFIX:
-        increment_daily_limit_cache(service.id, INTERNATIONAL_SMS_TYPE)
+        counts[INTERNATIONAL_SMS_TYPE] = 1
+
+    _increment_daily_limit_caches_by_type(service.id, counts)
+
+
+def increment_daily_limit_caches_for_batch(service, notification_rows, key_type):
+    """
+    Equivalent to calling `increment_daily_limit_caches` for each of `notification_rows` (as built by
+    `build_notification_row`), but touching each cache key once with the total count.
+    """
+    if key_type == KEY_TYPE_TEST or not current_app.config["REDIS_ENABLED"]:
+        return
+
+    counts = dict(Counter(row["notification_type"] for row in notification_rows))
 
+    international_sms_count = sum(
+        1
+        for row in notification_rows
+        if row["notification_type"] == SMS_TYPE and str(row.get("phone_prefix")) != UK_PREFIX
+    )
+    if international_sms_count:
+        counts[INTERNATIONAL_SMS_TYPE] = international_sms_count
+
+    _increment_daily_limit_caches_by_type(service.id, counts)
+
+
+def _increment_daily_limit_caches_by_type(service_id, counts):
+    if current_app.config["REDIS_RATE_LIMIT_SCRIPT_ENABLED"]:
+        # increment every counter in one round trip
+        run_rate_limit_script(
+            [
+                DailyLimit(
+                    cache_key=redis.daily_limit_cache_key(service_id, notification_type=notification_type), amount=count
+                )
+                for notification_type, count in counts.items()
+            ]
+        )
+        return
 
-def increment_daily_limit_cache(service_id, notification_type):
+    for notification_type, count in counts.items():
+        increment_daily_limit_cache(service_id, notification_type, count=count)
+
+
+def increment_daily_limit_cache(service_id, notification_type, count=1):
     cache_key = redis.daily_limit_cache_key(service_id, notification_type=notification_type)
     if redis_store.get(cache_key) is None:
-        # if cache does not exist set the cache to 1 with an expiry of 24 hours,
+        # if cache does not exist set the cache to the count with an expiry of 24 hours,
         # The cache should be set by the time we create the notification
         # but in case it is this will make sure the expiry is set to 24 hours,
         # where if we let the incr method create the cache it will be set a ttl.
-        redis_store.set(cache_key, 1, ex=86400)
-    else:
+        redis_store.set(cache_key, count, ex=86400)
+    elif count == 1:
         redis_store.incr(cache_key)
+    else:
+        # DECRBY with a negative amount is redis' atomic increment-by-n
+        redis_store.decrby(cache_key, -count)
 
 
 def send_notification_to_queue_detached(
@@ -0,0 +1,151 @@
+"""
+Checks and increments a service's daily limit counters, and takes a token from its API rate limit token bucket, in a
+single round trip to redis. This is done by a lua script, so it's atomic - either every check passes and every
+counter is incremented, or nothing changes apart from the token bucket.
+"""
+
+import time
+from typing import NamedTuple
+
+from flask import current_app
+
+from app import redis_store
+
+DAILY_LIMIT_CACHE_EXPIRY_SECONDS = 86400
+
+# KEYS[1]: token bucket key, or "" to skip the token bucket
+# KEYS[2:]: daily limit counter keys
+# ARGV[1]: current unix time
+# ARGV[2]: expiry of newly created daily limit counters, in seconds
+# ARGV[3:5]: token bucket tokens replenished per second, maximum tokens and minimum tokens
+# ARGV[6:]: amount, limit (-1 for no limit) and 1 to add the amount or 0 to only check it, for each daily limit
+# counter, in threes
+#
+# Returns {0, 0} if everything passed, {-1, 0} if the token bucket was empty, or {n, count} if the nth daily limit
+# counter would have gone over its limit, with count being its current value.
+RATE_LIMIT_LUA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local counter_expiry = tonumber(ARGV[2])
+
+if KEYS[1] ~= "" then
+    local replenish_per_sec = tonumber(ARGV[3])
+    local bucket_max = tonumber(ARGV[4])
+    local bucket_min = tonumber(ARGV[5])
+
+    local bucket = redis.call("HMGET", KEYS[1], "tokens", "replenished_at")
+    local tokens = tonumber(bucket[1]) or bucket_max
+    local replenished_at = tonumber(bucket[2]) or now
+    tokens = math.min(bucket_max, tokens + math.max(0, now - replenished_at) * replenish_per_sec)
+
+    local allowed = tokens >= 1
+    if allowed then
+        tokens = tokens - 1
+    end
+    tokens = math.max(tokens, bucket_min)
+
+    redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "replenished_at", tostring(now))
+    if replenish_per_sec > 0 then
+        -- once the bucket has refilled it's the same as a bucket which doesn't exist
+        redis.call("EXPIRE", KEYS[1], math.ceil(bucket_max / replenish_per_sec) + 1)
+    end
+
+    if not allowed then
+        return {-1, 0}
+    end
+end
+
+local current = {}
+for i = 2, #KEYS do
+    local amount = tonumber(ARGV[3 * i])
+    local limit = tonumber(ARGV[3 * i + 1])
+    current[i] = redis.call("GET", KEYS[i])
+    local count = tonumber(current[i] or "0")
+    if limit >= 0 and count + amount > limit then
+        return {i - 1, count}
+    end
+end
+
+for i = 2, #KEYS do
+    local amount = 0
+    if ARGV[3 * i + 2] == "1" then
+        amount = tonumber(ARGV[3 * i])
+    end
+    if not current[i] then
+        redis.call("SET", KEYS[i], amount, "EX", counter_expiry)
+    elseif amount > 0 then
+        redis.call("INCRBY", KEYS[i], amount)
+    end
+end
+
+return {0, 0}
+"""
+
+_rate_limit_script = None
+
+
+class TokenBucket(NamedTuple):
+    key: str
+    replenish_per_sec: float
+    bucket_max: int
+    bucket_min: int
+
+
+class DailyLimit(NamedTuple):
+    cache_key: str
+    amount: int
+    # None for a counter which should be incremented without being checked
+    limit: int | None = None
+    # False to only check there's room on the counter for `amount`, without adding it
+    increment: bool = True
+
+
+class LimitExceeded(NamedTuple):
+    # None if it was the token bucket which was exceeded
+    daily_limit: DailyLimit | None
+    count: int
+
+
+def _get_rate_limit_script():
+    global _rate_limit_script
+    if _rate_limit_script is None:
+        # redis-py scripts are run with EVALSHA, falling back to loading the script if redis doesn't have it yet
+        _rate_limit_script = redis_store.redis_store.register_script(RATE_LIMIT_LUA_SCRIPT)
+    return _rate_limit_script
+
+
+def run_rate_limit_script(daily_limits, token_bucket=None):
+    """
+    Takes a token from `token_bucket` (if given), then adds each DailyLimit's amount to its counter (or for those
+    which aren't to be incremented, just checks it could be) - unless that would take any of them over their limit.
+
+    Returns a LimitExceeded if the token bucket was empty or a daily limit would have been exceeded, or None if
+    everything was within limits. Like the rest of our rate limiting, if redis can't be reached the request is allowed.
+    """
+    keys = [token_bucket.key if token_bucket else ""]
+    args = [
+        time.time(),
+        DAILY_LIMIT_CACHE_EXPIRY_SECONDS,
+        token_bucket.replenish_per_sec if token_bucket else 0,
+        token_bucket.bucket_max if token_bucket else 0,
+        token_bucket.bucket_min if token_bucket else 0,
+    ]
+    for daily_limit in daily_limits:
+        keys.append(daily_limit.cache_key)
+        args.extend(
+            (
+                daily_limit.amount,
+                -1 if daily_limit.limit is None else daily_limit.limit,
+                1 if daily_limit.increment else 0,
+            )
+        )
+
+    try:
+        exceeded, count = _get_rate_limit_script()(keys=keys, args=args)
+    except Exception:
+        current_app.logger.exception("Failed to run rate limit script")
+        return None
+
+    if exceeded == 0:
+        return None
+
+    return LimitExceeded(daily_limit=None if exceeded == -1 else daily_limits[exceeded - 1], count=count)
@@ -0,0 +1,209 @@
+"""
+A circuit breaker for each service callback url, with its state shared between processes in redis.
+
+While a url's callbacks are succeeding the circuit is closed and they're sent as normal. Once enough of them have
+failed within a window it opens, and callbacks are parked on the retry queue rather than sent. When it has been open
+long enough a single callback is let through to probe the url. If that succeeds the circuit closes again, otherwise it
+reopens for twice as long as before.
+"""
+
+import hashlib
+import time
+from typing import NamedTuple
+
+from flask import current_app
+
+from app import redis_store
+from app.otel_metrics.service_callback import record_service_callback_circuit_transition
+
+# a circuit opens once at least CIRCUIT_MIN_REQUESTS callbacks have been sent within CIRCUIT_WINDOW_SECONDS and
+# at least CIRCUIT_FAILURE_RATE of them have failed
+CIRCUIT_WINDOW_SECONDS = 60
+CIRCUIT_MIN_REQUESTS = 20
+CIRCUIT_FAILURE_RATE = 0.5
+# how long a circuit stays open the first time, doubling each time its probe fails, up to CIRCUIT_MAX_OPEN_SECONDS
+CIRCUIT_OPEN_SECONDS = 30
+CIRCUIT_MAX_OPEN_SECONDS = 3600
+# how long a probe has to report back before another callback is allowed to probe instead
+CIRCUIT_PROBE_TIMEOUT_SECONDS = 30
+# SQS can't delay messages for longer than this. Celery holds on to messages with a later ETA without acking them,
+# so past the queue's visibility timeout they're redelivered and sent twice. Callbacks parked for the longest time
+# they can be check the circuit again when they wake, and are parked again if it's still open.
+CIRCUIT_MAX_PARK_SECONDS = 900
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+# KEYS[1]: circuit key
+# ARGV[1]: current unix time
+# ARGV[2]: probe timeout, in seconds
+#
+# Returns {seconds to park the callback for, 1 if the callback is the half open circuit's probe else 0}
+CHECK_CIRCUIT_LUA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local circuit = redis.call("HMGET", KEYS[1], "open_until", "probe_until")
+local open_until = tonumber(circuit[1]) or 0
+local probe_until = tonumber(circuit[2]) or 0
+
+if open_until == 0 then
+    return {0, 0}
+end
+if now < open_until then
+    return {math.ceil(open_until - now), 0}
+end
+
+-- half open, so let a single probe through at a time
+if now < probe_until then
+    return {math.ceil(probe_until - now), 0}
+end
+redis.call("HSET", KEYS[1], "probe_until", tostring(now + tonumber(ARGV[2])))
+return {0, 1}
+"""
+
+# KEYS[1]: circuit key
+# ARGV[1]: current unix time
+# ARGV[2]: 1 if the callback succeeded, 0 if it failed
+# ARGV[3:8]: window seconds, minimum requests, failure rate, open seconds, max open seconds
+#
+# Returns 1 if the circuit opened, 2 if it closed, or 0 if its state didn't change
+RECORD_CIRCUIT_RESULT_LUA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local succeeded = ARGV[2] == "1"
+local window_seconds = tonumber(ARGV[3])
+local min_requests = tonumber(ARGV[4])
+local failure_rate = tonumber(ARGV[5])
+local open_seconds = tonumber(ARGV[6])
+local max_open_seconds = tonumber(ARGV[7])
+
+local circuit = redis.call("HMGET", KEYS[1], "open_until", "opens", "window_start", "requests", "failures")
+local open_until = tonumber(circuit[1]) or 0
+local opens = tonumber(circuit[2]) or 0
+
+if open_until > 0 then
+    if now < open_until then
+        -- a straggler sent before the circuit opened
+        return 0
+    end
+
+    -- the half open circuit's probe
+    if succeeded then
+        redis.call("DEL", KEYS[1])
+        return 2
+    end
+
+    local reopen_seconds = math.min(open_seconds * 2 ^ opens, max_open_seconds)
+    redis.call("HSET", KEYS[1], "open_until", tostring(now + reopen_seconds), "opens", opens + 1, "probe_until", 0)
+    redis.call("EXPIRE", KEYS[1], math.ceil(reopen_seconds + max_open_seconds))
+    return 0
+end
+
+local window_start = tonumber(circuit[3]) or now
+local requests = tonumber(circuit[4]) or 0
+local failures = tonumber(circuit[5]) or 0
+if now - window_start >= window_seconds then
+    window_start = now
+    requests = 0
+    failures = 0
+end
+
+requests = requests + 1
+if not succeeded then
+    failures = failures + 1
+end
+
+if requests >= min_requests and failures >= requests * failure_rate then
+    redis.call("DEL", KEYS[1])
+    redis.call("HSET", KEYS[1], "open_until", tostring(now + open_seconds), "opens", 1, "probe_until", 0)
+    redis.call("EXPIRE", KEYS[1], math.ceil(open_seconds + max_open_seconds))
+    return 1
+end
+
+redis.call("HSET", KEYS[1], "window_start", tostring(window_start), "requests", requests, "failures", failures)
+redis.call("EXPIRE", KEYS[1], window_seconds)
+return 0
+"""
+
+_check_circuit_script = None
+_record_circuit_result_script = None
+
+
+class CircuitCheck(NamedTuple):
+    # seconds the callback should be parked for (at most CIRCUIT_MAX_PARK_SECONDS), or 0 if it can be sent now
+    park_for: int
+    # whether the callback is the half open circuit's probe, in which case it should be sent on its own
+    probe: bool
+
+
+def _circuit_key(service_callback_url):
+    return f"service-callback-circuit-{hashlib.sha256(service_callback_url.encode()).hexdigest()[:32]}"
+
+
+def _get_check_circuit_script():
+    global _check_circuit_script
+    if _check_circuit_script is None:
+        _check_circuit_script = redis_store.redis_store.register_script(CHECK_CIRCUIT_LUA_SCRIPT)
+    return _check_circuit_script
+
+
+def _get_record_circuit_result_script():
+    global _record_circuit_result_script
+    if _record_circuit_result_script is None:
+        _record_circuit_result_script = redis_store.redis_store.register_script(RECORD_CIRCUIT_RESULT_LUA_SCRIPT)
+    return _record_circuit_result_script
+
+
+def _circuit_breaker_enabled():
+    return redis_store.active and current_app.config["SERVICE_CALLBACK_CIRCUIT_BREAKER_ENABLED"]
+
+
+def check_service_callback_circuit(service_callback_url) -> CircuitCheck:
+    """
+    Returns whether a callback to `service_callback_url` can be sent now. If redis can't be reached it can be.
+    """
+    if not _circuit_breaker_enabled():
+        return CircuitCheck(park_for=0, probe=False)
+
+    try:
+        park_for, probe = _get_check_circuit_script()(
+            keys=[_circuit_key(service_callback_url)], args=[time.time(), CIRCUIT_PROBE_TIMEOUT_SECONDS]
+        )
+    except Exception:
+        current_app.logger.exception("Failed to check service callback circuit")
+        return CircuitCheck(park_for=0, probe=False)
+
+    if probe:
+        record_service_callback_circuit_transition(CIRCUIT_HALF_OPEN)
+
+    return CircuitCheck(park_for=min(int(park_for), CIRCUIT_MAX_PARK_SECONDS), probe=bool(probe))
+
+
+def record_service_callback_circuit_result(service_callback_url, succeeded):
+    if not _circuit_breaker_enabled():
+        return
+
+    try:
+        transition = _get_record_circuit_result_script()(
+            keys=[_circuit_key(service_callback_url)],
+            args=[
+                time.time(),
+                1 if succeeded else 0,
+                CIRCUIT_WINDOW_SECONDS,
+                CIRCUIT_MIN_REQUESTS,
+                CIRCUIT_FAILURE_RATE,
+                CIRCUIT_OPEN_SECONDS,
+                CIRCUIT_MAX_OPEN_SECONDS,
+            ],
+        )
+    except Exception:
+        current_app.logger.exception("Failed to record service callback circuit result")
+        return
+
+    if transition == 1:
+        extra = {"service_callback_url": service_callback_url}
+        current_app.logger.warning("Service callback circuit opened for %(service_callback_url)s", extra, extra=extra)
+        record_service_callback_circuit_transition(CIRCUIT_OPEN)
+    elif transition == 2:
+        extra = {"service_callback_url": service_callback_url}
+        current_app.logger.info("Service callback circuit closed for %(service_callback_url)s", extra, extra=extra)
+        record_service_callback_circuit_transition(CIRCUIT_CLOSED)
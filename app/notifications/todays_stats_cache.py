@@ -0,0 +1,245 @@
+"""
+Keeps counts of each service's notifications from today, by notification type, status and key type, in redis, so
+that today's stats for a service (or for every service) can be read from there rather than worked out from the
+notifications table on every request.
+
+Each service has a redis hash of today's counts. New notifications are added to it as they're created, and every
+minute refresh-todays-stats-cache replaces the counts with ones worked out from the database, which picks up the
+notifications' status changes and corrects anything the increments got wrong. The counts aren't used until it has
+run for the day.
+
+After its first run of the day, the refresh only covers services which have created notifications since it last ran,
+or which had notifications whose status could still change. The database counts come from the replica, so
+notifications created since the replica's snapshot are added back on top of them, from a hash of each service's
+recent increments by minute, rather than lost until the next refresh.
+"""
+
+import json
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import NamedTuple
+
+from flask import current_app
+
+from app import redis_store
+from app.constants import KEY_TYPE_TEST, NOTIFICATION_CREATED, NOTIFICATION_STATUS_TYPES_COMPLETED
+
+TODAYS_STATS_EXPIRY_SECONDS = int(timedelta(days=2).total_seconds())
+# comfortably longer than the replica could be behind
+TODAYS_STATS_RECENT_EXPIRY_SECONDS = int(timedelta(hours=1).total_seconds())
+
+# Replaces a service's counts (KEYS[1]) with those from the database (ARGV[3], as JSON), then adds the counts of
+# notifications created in or after the minute of the database's snapshot (ARGV[1]) from the service's recent
+# increments (KEYS[2]), forgetting older ones. Adds the service (ARGV[5]) to the in flight set (KEYS[3]) if any of its
+# counts have a status other than the completed ones (ARGV[4], as JSON), and removes it otherwise.
+REFRESH_TODAYS_STATS_LUA_SCRIPT = """
+local stats_key, recent_key, in_flight_key = KEYS[1], KEYS[2], KEYS[3]
+local snapshot_minute = tonumber(ARGV[1])
+local expiry_seconds = ARGV[2]
+local counts = cjson.decode(ARGV[3])
+local completed_statuses = {}
+for _, status in ipairs(cjson.decode(ARGV[4])) do
+    completed_statuses[status] = true
+end
+local service_id = ARGV[5]
+local created_status = ARGV[6]
+
+redis.call("DEL", stats_key)
+for field, count in pairs(counts) do
+    redis.call("HSET", stats_key, field, count)
+end
+
+local recent = redis.call("HGETALL", recent_key)
+for i = 1, #recent, 2 do
+    local minute, notification_type, key_type = string.match(recent[i], "^(%d+):([^:]+):([^:]+)$")
+    if tonumber(minute) >= snapshot_minute then
+        redis.call("HINCRBY", stats_key, notification_type .. ":" .. created_status .. ":" .. key_type, recent[i + 1])
+    else
+        redis.call("HDEL", recent_key, recent[i])
+    end
+end
+
+local in_flight = false
+for _, field in ipairs(redis.call("HKEYS", stats_key)) do
+    if not completed_statuses[string.match(field, "^[^:]+:([^:]+):")] then
+        in_flight = true
+        break
+    end
+end
+
+redis.call("EXPIRE", stats_key, expiry_seconds)
+if in_flight then
+    redis.call("SADD", in_flight_key, service_id)
+    redis.call("EXPIRE", in_flight_key, expiry_seconds)
+else
+    redis.call("SREM", in_flight_key, service_id)
+end
+"""
+
+_refresh_todays_stats_script = None
+
+
+class TodaysStatsRow(NamedTuple):
+    notification_type: str
+    status: str
+    count: int
+
+
+def _todays_stats_key(service_id, day):
+    return f"service-{service_id}-todays-stats-{day}"
+
+
+def _todays_stats_recent_key(service_id, day):
+    return f"service-{service_id}-todays-stats-{day}-recent"
+
+
+def _todays_stats_refreshed_key(day):
+    return f"todays-stats-refreshed-{day}"
+
+
+def _todays_stats_changed_key(day):
+    # services which have created notifications since the last refresh
+    return f"todays-stats-changed-{day}"
+
+
+def _todays_stats_in_flight_key(day):
+    # services whose counts at the last refresh included notifications with statuses that could still change
+    return f"todays-stats-in-flight-{day}"
+
+
+def _get_refresh_todays_stats_script():
+    global _refresh_todays_stats_script
+    if _refresh_todays_stats_script is None:
+        _refresh_todays_stats_script = redis_store.redis_store.register_script(REFRESH_TODAYS_STATS_LUA_SCRIPT)
+    return _refresh_todays_stats_script
+
+
+def _enabled():
+    return redis_store.active and current_app.config["TODAYS_STATS_CACHE_ENABLED"]
+
+
+def record_notifications_created(service_id, key_type, counts):
+    """
+    Adds `counts`, a dict of notification type to the number of notifications of that type just created for the
+    service, to today's stats
+    """
+    if not _enabled():
+        return
+
+    day = date.today()
+    key = _todays_stats_key(service_id, day)
+    recent_key = _todays_stats_recent_key(service_id, day)
+    minute = int(time.time() // 60)
+    try:
+        pipeline = redis_store.redis_store.pipeline(transaction=False)
+        for notification_type, count in counts.items():
+            pipeline.hincrby(key, f"{notification_type}:{NOTIFICATION_CREATED}:{key_type}", count)
+            pipeline.hincrby(recent_key, f"{minute}:{notification_type}:{key_type}", count)
+        pipeline.expire(key, TODAYS_STATS_EXPIRY_SECONDS)
+        pipeline.expire(recent_key, TODAYS_STATS_RECENT_EXPIRY_SECONDS)
+        pipeline.sadd(_todays_stats_changed_key(day), str(service_id))
+        pipeline.expire(_todays_stats_changed_key(day), TODAYS_STATS_EXPIRY_SECONDS)
+        pipeline.execute()
+    except Exception:
+        current_app.logger.exception("Failed to record created notifications in today's stats")
+
+
+def get_service_ids_to_refresh(day) -> list[str] | None:
+    """
+    Returns the services whose stats for `day` could have changed since they were last refreshed, or None if they
+    haven't been refreshed yet that day, so every service's need to be
+    """
+    if not redis_store.redis_store.exists(_todays_stats_refreshed_key(day)):
+        return None
+
+    pipeline = redis_store.redis_store.pipeline(transaction=True)
+    pipeline.sunion(_todays_stats_changed_key(day), _todays_stats_in_flight_key(day))
+    # services which create notifications after this are refreshed next time
+    pipeline.delete(_todays_stats_changed_key(day))
+    service_ids, _ = pipeline.execute()
+
+    return sorted(service_id.decode() if isinstance(service_id, bytes) else service_id for service_id in service_ids)
+
+
+def refresh_todays_stats(rows, day, service_ids, snapshot_at):
+    """
+    Replaces the stats for `day` of each of `service_ids` (or every service in `rows` if None) with their counts from
+    `rows` (with service_id, notification_type, status, key_type and count), plus any notifications created since
+    `snapshot_at`, the unix time the counts were worked out as of. Then marks the day's stats as usable.
+    """
+    counts = defaultdict(dict)
+    for row in rows:
+        counts[str(row.service_id)][f"{row.notification_type}:{row.status}:{row.key_type}"] = row.count
+
+    script = _get_refresh_todays_stats_script()
+    # each service's stats are replaced atomically, so are never read half replaced
+    pipeline = redis_store.redis_store.pipeline(transaction=False)
+    for service_id in counts.keys() if service_ids is None else service_ids:
+        script(
+            keys=[
+                _todays_stats_key(service_id, day),
+                _todays_stats_recent_key(service_id, day),
+                _todays_stats_in_flight_key(day),
+            ],
+            args=[
+                int(snapshot_at // 60),
+                TODAYS_STATS_EXPIRY_SECONDS,
+                json.dumps(counts.get(str(service_id), {})),
+                json.dumps(NOTIFICATION_STATUS_TYPES_COMPLETED),
+                str(service_id),
+                NOTIFICATION_CREATED,
+            ],
+            client=pipeline,
+        )
+    pipeline.set(_todays_stats_refreshed_key(day), 1, ex=TODAYS_STATS_EXPIRY_SECONDS)
+    pipeline.execute()
+
+
+def todays_stats_available():
+    """
+    Returns whether today's stats can be read from redis. get_todays_stats can still return None if redis errors.
+    """
+    if not _enabled():
+        return False
+
+    try:
+        return bool(redis_store.redis_store.exists(_todays_stats_refreshed_key(date.today())))
+    except Exception:
+        current_app.logger.exception("Failed to check whether today's stats are available")
+        return False
+
+
+def get_todays_stats(service_ids, include_from_test_key=False) -> dict[str, list[TodaysStatsRow]] | None:
+    """
+    Returns a list of today's counts by notification type and status for each of `service_ids`, or None if they
+    aren't available and should be worked out from the database instead
+    """
+    if not _enabled():
+        return None
+
+    day = date.today()
+    try:
+        pipeline = redis_store.redis_store.pipeline(transaction=False)
+        pipeline.exists(_todays_stats_refreshed_key(day))
+        for service_id in service_ids:
+            pipeline.hgetall(_todays_stats_key(service_id, day))
+        refreshed, *results = pipeline.execute()
+    except Exception:
+        current_app.logger.exception("Failed to get today's stats")
+        return None
+
+    if not refreshed:
+        return None
+
+    stats = {}
+    for service_id, service_counts in zip(service_ids, results, strict=True):
+        counts: dict[tuple[str, str], int] = defaultdict(int)
+        for field, count in service_counts.items():
+            field = field.decode() if isinstance(field, bytes) else field
+            notification_type, status, key_type = field.split(":")
+            if include_from_test_key or key_type != KEY_TYPE_TEST:
+                counts[(notification_type, status)] += int(count)
+        stats[service_id] = [TodaysStatsRow(*key, count) for key, count in sorted(counts.items())]
+
+    return stats
@@ -30,6 +30,7 @@ from app.dao.service_sms_sender_dao import dao_get_service_sms_senders_by_id
 from app.notifications.process_notifications import (
     create_content_for_notification,
 )
+from app.notifications.rate_limit_script import DailyLimit, TokenBucket, run_rate_limit_script
 from app.serialised_models import SerialisedTemplate
 from app.service.utils import service_allowed_to_send_to
 from app.utils import get_public_notify_type_text
@@ -62,7 +63,7 @@ def token_bucket_rate_limit_exceeded(service, key_type):
         remaining = redis_store.get_remaining_bucket_tokens(
             key=f"{service.id}-tokens-{key_type}",
             replenish_per_sec=service.rate_limit / SECONDS_IN_1_MINUTE,
-            bucket_max=min(ceil(service.rate_limit / 3) + 1, TOKEN_BUCKET_MAX),
+            bucket_max=get_token_bucket_max(service),
             bucket_min=TOKEN_BUCKET_MIN,
         )
 
@@ -73,6 +74,10 @@ def token_bucket_rate_limit_exceeded(service, key_type):
         return remaining < 1
 
 
+def get_token_bucket_max(service):
+    return min(ceil(service.rate_limit / 3) + 1, TOKEN_BUCKET_MAX)
+
+
 def get_daily_rate_limit_value(service, key_type, notification_type):
     if key_type == KEY_TYPE_TEST and service.restricted:
         rate_limits = current_app.config["DEFAULT_LIVE_SERVICE_RATE_LIMITS"]
@@ -102,26 +107,71 @@ def check_service_over_daily_message_limit(service, key_type, notification_type,
         service_stats = 0
 
     if int(service_stats) + num_notifications > limit_value:
-        extra = {
-            "service_id": service.id,
-            "sent_count": int(service_stats),
-            "notification_type": limit_name,
-            "limit": limit_value,
-        }
-        current_app.logger.info(
-            "Service %(service_id)s has been rate limited for %(sent_count)s daily use "
-            "sent %(notification_type)s limit %(limit)s",
-            extra,
-            extra=extra,
-        )
-        raise TooManyRequestsError(limit_name, limit_value)
+        _raise_daily_message_limit_exceeded(service, limit_name, limit_value, int(service_stats))
+
+
+def _raise_daily_message_limit_exceeded(service, limit_name, limit_value, sent_count):
+    extra = {
+        "service_id": service.id,
+        "sent_count": sent_count,
+        "notification_type": limit_name,
+        "limit": limit_value,
+    }
+    current_app.logger.info(
+        "Service %(service_id)s has been rate limited for %(sent_count)s daily use "
+        "sent %(notification_type)s limit %(limit)s",
+        extra,
+        extra=extra,
+    )
+    raise TooManyRequestsError(limit_name, limit_value)
 
 
 def check_rate_limiting(service, api_key, notification_type):
+    if current_app.config["REDIS_RATE_LIMIT_SCRIPT_ENABLED"] and current_app.config["REDIS_ENABLED"]:
+        check_rate_limits_with_script(service, api_key.key_type, notification_type)
+        return
+
     check_service_over_api_rate_limit(service, api_key.key_type)
     check_service_over_daily_message_limit(service, api_key.key_type, notification_type=notification_type)
 
 
+def check_rate_limits_with_script(service, key_type, notification_type):
+    """
+    Does the same checks as `check_service_over_api_rate_limit` and `check_service_over_daily_message_limit`, but
+    in one round trip to redis. The daily limit counter is only checked here, for room for this notification - it's
+    incremented once the notification has been persisted.
+    """
+    token_bucket = None
+    if current_app.config["API_RATE_LIMIT_ENABLED"]:
+        token_bucket = TokenBucket(
+            # the script keeps its bucket in a different format to RedisClient.get_remaining_bucket_tokens
+            key=f"{service.id}-token-bucket-{key_type}",
+            replenish_per_sec=service.rate_limit / SECONDS_IN_1_MINUTE,
+            bucket_max=get_token_bucket_max(service),
+            bucket_min=TOKEN_BUCKET_MIN,
+        )
+
+    limit_value = get_daily_rate_limit_value(service, key_type, notification_type)
+    daily_limit = DailyLimit(
+        cache_key=daily_limit_cache_key(service.id, notification_type=notification_type, key_type=key_type),
+        amount=1,
+        limit=limit_value,
+        increment=False,
+    )
+
+    with REDIS_EXCEEDED_RATE_LIMIT_DURATION_SECONDS.labels(algorithm="lua_script").time():
+        exceeded = run_rate_limit_script([daily_limit], token_bucket=token_bucket)
+
+    if exceeded is None:
+        return
+
+    if exceeded.daily_limit is None:
+        current_app.logger.info("service %s has been rate limited for token bucket", service.id)
+        raise RateLimitError(service.rate_limit, SECONDS_IN_1_MINUTE, key_type)
+
+    _raise_daily_message_limit_exceeded(service, notification_type, limit_value, exceeded.count)
+
+
 def check_template_is_for_notification_type(notification_type, template_type):
     if notification_type != template_type:
         message = f"{template_type} template is not suitable for {notification_type} notification"
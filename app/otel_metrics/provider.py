@@ -118,3 +118,55 @@ def record_info(
         "notification.type": notification_type,
     }
     _info.set(1, attributes)
+
+
+_sms_send_queued = _meter.create_up_down_counter(
+    "provider.sms.send.queued",
+    unit="1",
+    description="Number of SMS waiting for one of the SMS send engine's threads for a Provider",
+)
+
+_sms_send_in_flight = _meter.create_up_down_counter(
+    "provider.sms.send.in_flight",
+    unit="1",
+    description="Number of SMS the SMS send engine is currently sending to a Provider",
+)
+
+
+def record_sms_send_queued(change: int, provider_name: str) -> None:
+    attributes: dict[str, AttributeValue] = {
+        "provider.name": provider_name,
+    }
+    _sms_send_queued.add(change, attributes)
+
+
+def record_sms_send_in_flight(change: int, provider_name: str) -> None:
+    attributes: dict[str, AttributeValue] = {
+        "provider.name": provider_name,
+    }
+    _sms_send_in_flight.add(change, attributes)
+
+
+_ses_allowed_send_rate = _meter.create_gauge(
+    "provider.email.ses.allowed_send_rate",
+    unit="1/s",
+    description="Emails per second the SES rate governor is currently allowing to be sent to SES",
+)
+
+
+def record_ses_allowed_send_rate(rate: float) -> None:
+    _ses_allowed_send_rate.set(rate)
+
+
+_sms_health = _meter.create_gauge(
+    "provider.sms.health",
+    unit="1",
+    description="Health score (0-1) of a Provider, which its priority is multiplied by when choosing a Provider",
+)
+
+
+def record_sms_health(health: float, provider_name: str) -> None:
+    attributes: dict[str, AttributeValue] = {
+        "provider.name": provider_name,
+    }
+    _sms_health.set(health, attributes)
@@ -46,3 +46,24 @@ def record_service_callback_forward_duration(
     set_error_type(attrs)
 
     _service_callback_forward_duration.record(duration, attrs)
+
+
+_service_callback_circuit_transitions = _meter.create_counter(
+    "service_callback.circuit.transitions",
+    unit="1",
+    description="Number of times service callback circuit breakers have changed state",
+)
+
+_service_callback_parked = _meter.create_counter(
+    "service_callback.parked",
+    unit="1",
+    description="Number of service callbacks parked on the retry queue because their url's circuit was open",
+)
+
+
+def record_service_callback_circuit_transition(circuit_state: str):
+    _service_callback_circuit_transitions.add(1, {"circuit.state": circuit_state})
+
+
+def record_service_callback_parked(celery_task: str, count: int = 1):
+    _service_callback_parked.add(count, {"celery.task": celery_task})
@@ -1,4 +1,5 @@
 import csv
+from collections.abc import Iterator
 from io import StringIO
 from typing import Any
 from uuid import UUID
@@ -14,9 +15,11 @@ from notifications_utils.s3 import (
 
 from app import db
 from app.constants import NOTIFICATION_REPORT_REQUEST_MAPPING
-from app.dao.notifications_dao import get_notifications_for_service
+from app.dao.notifications_dao import stream_notifications_for_csv_report
 from app.dao.report_requests_dao import dao_get_report_request_by_id
 from app.dao.service_data_retention_dao import fetch_service_data_retention_by_notification_type
+from app.models import Notification
+from app.utils import utc_string_to_bst_string
 
 
 class ReportRequestProcessor:
@@ -69,64 +72,38 @@ class ReportRequestProcessor:
     def _fetch_and_upload_notifications(self) -> None:
         service_retention = fetch_service_data_retention_by_notification_type(self.service_id, self.notification_type)
         limit_days = service_retention.days_of_retention if service_retention else 7
-        older_than = None
-        is_notification = True
-        while is_notification:
-            serialized_notifications = self._fetch_serialized_notifications(limit_days, older_than)
 
-            is_notification = len(serialized_notifications) != 0
-
-            csv_data = self._convert_notifications_to_csv(serialized_notifications)
-            self.csv_writer.writerows(csv_data)
-            self._upload_csv_part_if_needed()
-            older_than = serialized_notifications[-1]["id"] if is_notification else None
+        for row in self._stream_csv_rows(limit_days):
+            self.csv_writer.writerow(row)
+            # cheaper than encoding the buffer for every row, and there are never fewer characters than bytes
+            if self.csv_buffer.tell() >= S3_MULTIPART_UPLOAD_MIN_PART_SIZE:
+                self._upload_csv_part_if_needed()
         # Upload any remaining data
         self._upload_remaining_data()
 
-    def _fetch_serialized_notifications(self, limit_days: int, older_than: str | None) -> list[dict[str, Any]]:
-        statuses = NOTIFICATION_REPORT_REQUEST_MAPPING[self.notification_status]
-
-        notifications = get_notifications_for_service(  # type: ignore[call-arg]
+    def _stream_csv_rows(self, limit_days: int) -> Iterator[tuple]:
+        notifications = stream_notifications_for_csv_report(
             service_id=self.service_id,
-            filter_dict={
-                "template_type": self.notification_type,
-                "status": statuses,
-            },
-            page_size=self.page_size,
-            count_pages=False,
+            notification_type=self.notification_type,
+            statuses=NOTIFICATION_REPORT_REQUEST_MAPPING[self.notification_status],
             limit_days=limit_days,
-            include_jobs=True,
-            with_personalisation=False,
-            include_from_test_key=False,
-            error_out=False,
-            include_one_off=True,
-            older_than=older_than,
+            chunk_size=self.page_size,
             session=db.session_bulk,
-            retry_attempts=2,
         )
-
-        serialized_notifications = [notification.serialize_for_csv() for notification in notifications]
-        return serialized_notifications
-
-    def _convert_notifications_to_csv(self, serialized_notifications: list[dict[str, Any]]) -> list[tuple]:
-        values = []
-        for notification in serialized_notifications:
-            values.append(
-                (
-                    # the recipient for precompiled letters is the full address block
-                    notification["recipient"].splitlines()[0].lstrip().rstrip(" ,"),
-                    notification["client_reference"],
-                    notification["template_name"],
-                    notification["template_type"],
-                    notification["created_by_name"] or "",
-                    notification["created_by_email_address"] or "",
-                    notification["job_name"] or "",
-                    notification["status"],
-                    notification["created_at"],
-                    notification["api_key_name"] or "",
-                )
+        for notification in notifications:
+            yield (
+                # the recipient for precompiled letters is the full address block
+                notification.to.splitlines()[0].lstrip().rstrip(" ,"),
+                notification.client_reference or "",
+                notification.template_name,
+                notification.template_type,
+                notification.created_by_name or "",
+                notification.created_by_email_address or "",
+                notification.job_name or "",
+                Notification.format_status(notification.template_type, notification.status),
+                utc_string_to_bst_string(notification.created_at),
+                notification.api_key_name or "",
             )
-        return values
 
     def _upload_csv_part_if_needed(self) -> None:
         data_bytes = self.csv_buffer.getvalue().encode("utf-8")
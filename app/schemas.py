@@ -515,6 +515,8 @@ class JobSchema(BaseSchema):
             "notifications_delivered",
             "notifications_failed",
             "notifications_sent",
+            "shatter_partition_size",
+            "shattered_partitions",
         )
 
 
@@ -3,6 +3,7 @@ from threading import RLock
 from typing import Any
 
 import cachetools
+from flask import current_app
 from notifications_utils.clients.redis import RequestCache
 from notifications_utils.serialised_model import (
     SerialisedModel,
@@ -11,7 +12,9 @@ from notifications_utils.serialised_model import (
 from werkzeug.utils import cached_property
 
 from app import db, redis_store
+from app.cache_invalidation import cache_invalidation_listener
 from app.dao.api_key_dao import get_model_api_keys
+from app.dao.email_branding_dao import dao_get_email_branding_by_id
 from app.dao.provider_details_dao import get_provider_details_by_notification_type
 from app.dao.services_dao import dao_fetch_service_by_id
 from app.utils import is_classmethod
@@ -19,19 +22,29 @@ from app.utils import is_classmethod
 redis_cache = RequestCache(redis_store)
 
 
-def memory_cache(*args, ttl=2):
+# how long results are cached for by memory caches which are evicted by the cache invalidation listener
+INVALIDATED_MEMORY_CACHE_TTL = 300
+
+
+def memory_cache(*args, ttl=2, invalidated_by=None):
+    """
+    Caches the results of a classmethod in memory for `ttl` seconds.
+
+    If `invalidated_by` names a model (eg "service"), results are evicted as soon as that model is changed (see
+    `app.cache_invalidation`). While this process is listening for those changes, results are cached for
+    INVALIDATED_MEMORY_CACHE_TTL seconds instead.
+    """
+
     def make_cached(func):
-        @cachetools.cached(
-            cache=cachetools.TTLCache(maxsize=1024, ttl=ttl),
-            lock=RLock(),
-            key=ignore_first_argument_cache_key,
-        )
-        def wrapper(*args, **kwargs):
+        def checked(*args, **kwargs):
             if not is_classmethod(func, args[0]):
                 raise TypeError("memory_cache can only be used on classmethods")
             return func(*args, **kwargs)
 
-        return wrapper
+        if invalidated_by is None:
+            return _ttl_cached(checked, ttl)
+
+        return _invalidated_ttl_cached(checked, ttl, invalidated_by)
 
     if args:
         # Decorator is being used without parentheses, eg @memory_cache
@@ -41,6 +54,34 @@ def memory_cache(*args, ttl=2):
     return make_cached
 
 
+def _ttl_cached(func, ttl):
+    return cachetools.cached(
+        cache=cachetools.TTLCache(maxsize=1024, ttl=ttl),
+        lock=RLock(),
+        key=ignore_first_argument_cache_key,
+    )(func)
+
+
+def _invalidated_ttl_cached(func, ttl, model):
+    short_lived = _ttl_cached(func, ttl)
+    long_lived = _ttl_cached(func, INVALIDATED_MEMORY_CACHE_TTL)
+    for cached in (short_lived, long_lived):
+        cache_invalidation_listener.register(model, cached.cache, cached.cache_lock)
+
+    def wrapper(*args, **kwargs):
+        cache_invalidation_listener.ensure_started()
+        if cache_invalidation_listener.listening:
+            return long_lived(*args, **kwargs)
+        return short_lived(*args, **kwargs)
+
+    def cache_clear():
+        short_lived.cache_clear()
+        long_lived.cache_clear()
+
+    wrapper.cache_clear = cache_clear
+    return wrapper
+
+
 def ignore_first_argument_cache_key(cls, *args, **kwargs):
     return cachetools.keys.hashkey(*args, **kwargs)
 
@@ -59,7 +100,7 @@ class SerialisedTemplate(SerialisedModel):
     email_files: list
 
     @classmethod
-    @memory_cache
+    @memory_cache(invalidated_by="template")
     def from_id_and_service_id(cls, template_id, service_id):
         return cls(cls.get_dict(template_id, service_id, None)["data"])
 
@@ -126,7 +167,7 @@ class SerialisedService(SerialisedModel):
     email_branding: Any
 
     @classmethod
-    @memory_cache
+    @memory_cache(invalidated_by="service")
     def from_id(cls, service_id):
         return cls(cls.get_dict(service_id)["data"])
 
@@ -148,6 +189,34 @@ class SerialisedService(SerialisedModel):
         return permission in self.permissions
 
 
+class SerialisedEmailBranding(SerialisedModel):
+    id: Any
+    alt_text: str
+    brand_type: str
+    colour: str
+    logo: str
+    text: str
+
+    @classmethod
+    @memory_cache(invalidated_by="email_branding")
+    def from_id(cls, email_branding_id):
+        return cls(cls.get_dict(email_branding_id)["data"])
+
+    @staticmethod
+    @redis_cache.set("api-email_branding-{email_branding_id}")
+    def get_dict(email_branding_id):
+        email_branding = dao_get_email_branding_by_id(email_branding_id).serialize()
+        db.session.commit()
+
+        return {"data": {key: email_branding[key] for key in SerialisedEmailBranding.__annotations__}}
+
+    @cached_property
+    def logo_url(self):
+        from app.delivery.send_to_providers import get_logo_url
+
+        return get_logo_url(current_app.config["ADMIN_BASE_URL"], self.logo) if self.logo else None
+
+
 class SerialisedAPIKey(SerialisedModel):
     id: Any
     secret: str
@@ -500,7 +500,10 @@ def get_all_notifications_for_service(service_id):
             notification_type=notification_type,
         )
 
-    page = data.get("page", 1)
+    # given older_than, the page is the notifications after that one rather than an offset into all of them, which
+    # takes as long to fetch however far through the notifications it is
+    older_than = data.get("older_than")
+    page = 1 if older_than else data.get("page", 1)
 
     page_size = data["page_size"] if "page_size" in data else current_app.config.get("PAGE_SIZE")
     limit_days = data.get("limit_days")
@@ -511,6 +514,7 @@ def get_all_notifications_for_service(service_id):
     current_notifications_batch = notifications_dao.get_notifications_for_service(
         service_id,
         filter_dict=data,
+        older_than=older_than,
         page=page,
         page_size=page_size,
         count_pages=False,
@@ -533,10 +537,17 @@ def get_all_notifications_for_service(service_id):
     # this way is much more performant for services with many results (unlike Flask SqlAlchemy, this approach
     # doesn't do an additional query to count all the results of which there could be millions but instead only
     # asks for a single extra page of results).
+    if older_than:
+        next_page_kwargs = {
+            "older_than": current_notifications_batch.items[-1].id if current_notifications_batch.items else older_than,
+            "page": 1,
+        }
+    else:
+        next_page_kwargs = {"page": page + 1}
     next_notifications_batch = notifications_dao.get_notifications_for_service(
         service_id,
         filter_dict=data,
-        page=page + 1,
+        **next_page_kwargs,
         page_size=page_size,
         count_pages=False,
         limit_days=limit_days,
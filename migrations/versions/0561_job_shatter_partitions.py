@@ -0,0 +1,30 @@
+"""
+Create Date: 2026-10-17 10:12:41.530912
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+
+revision = '0561_job_shatter_partitions'
+down_revision = '0560_add_nhs_notify_org'
+
+
+def upgrade():
+    conn = op.get_bind()
+    conn.execute(text("SET lock_timeout = '60s'"))
+    conn.execute(text("SET statement_timeout = '60s'"))
+    op.add_column('jobs', sa.Column('shatter_partition_size', sa.Integer(), nullable=True))
+    op.add_column(
+        'jobs',
+        sa.Column('shattered_partitions', postgresql.ARRAY(sa.Integer()), nullable=False, server_default='{}'),
+    )
+
+
+def downgrade():
+    conn = op.get_bind()
+    conn.execute(text("SET lock_timeout = '60s'"))
+    conn.execute(text("SET statement_timeout = '60s'"))
+    op.drop_column('jobs', 'shattered_partitions')
+    op.drop_column('jobs', 'shatter_partition_size')
@@ -0,0 +1,196 @@
+"""
+Create Date: 2026-10-17 14:20:00.000000
+
+Range partitions notifications by created_at, a day per partition.
+
+The existing table becomes notifications_legacy, the partition for everything created up to the day after tomorrow,
+so nothing is copied. Its new unique indexes and the check constraint bounding its created_at are built concurrently
+first, so attaching it to the new partitioned table takes no more than a brief lock. The
+create-notification-partitions task keeps a week of daily partitions ahead, with a default partition in case it
+falls behind.
+
+Unique constraints on a partitioned table have to include the partition key, so the primary key and the job row number
+constraint no longer stop the same notification being saved twice (eg when SQS delivers a save task's message again).
+The save tasks check whether a notification has already been saved instead.
+"""
+
+from datetime import datetime, timedelta
+
+from alembic import op
+from sqlalchemy import text
+
+revision = "0562_partition_notifications"
+down_revision = "0561_job_shatter_partitions"
+
+NOTIFICATIONS_ALL_TIME_VIEW_COLUMNS = """
+    id,
+    job_id,
+    job_row_number,
+    service_id,
+    template_id,
+    template_version,
+    api_key_id,
+    key_type,
+    billable_units,
+    notification_type,
+    created_at,
+    sent_at,
+    sent_by,
+    updated_at,
+    notification_status,
+    reference,
+    client_reference,
+    international,
+    phone_prefix,
+    rate_multiplier,
+    created_by_id,
+    postage,
+    document_download_count
+"""
+
+CREATE_NOTIFICATIONS_ALL_TIME_VIEW = f"""
+    CREATE OR REPLACE VIEW notifications_all_time_view AS
+    (SELECT {NOTIFICATIONS_ALL_TIME_VIEW_COLUMNS} FROM notifications)
+    UNION ALL
+    (SELECT {NOTIFICATIONS_ALL_TIME_VIEW_COLUMNS} FROM notification_history)
+"""
+
+def _partition_name(day):
+    return f"notifications_p{day:%Y%m%d}"
+
+
+def upgrade():
+    legacy_until = (datetime.utcnow() + timedelta(days=2)).date()
+
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS notifications_legacy_id_created_at "
+            "ON notifications (id, created_at)"
+        )
+        op.execute(
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_notifications_legacy_job_row_number_created_at "
+            "ON notifications (job_id, job_row_number, created_at)"
+        )
+        op.execute(
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ix_notifications_legacy_id_status_created_at "
+            "ON notifications (id, notification_status, created_at)"
+        )
+        op.execute(
+            "ALTER TABLE notifications ADD CONSTRAINT ck_notifications_legacy_created_at "
+            f"CHECK (created_at < '{legacy_until}') NOT VALID"
+        )
+        op.execute("ALTER TABLE notifications VALIDATE CONSTRAINT ck_notifications_legacy_created_at")
+
+    conn = op.get_bind()
+    conn.execute(text("SET lock_timeout = '60s'"))
+
+    op.execute("ALTER TABLE notifications RENAME TO notifications_legacy")
+    op.execute("ALTER TABLE notifications_legacy RENAME CONSTRAINT notifications_pkey TO notifications_legacy_pkey")
+    op.execute(
+        "ALTER TABLE notifications_legacy "
+        "RENAME CONSTRAINT uq_notifications_job_row_number TO uq_notifications_legacy_job_row_number"
+    )
+    op.execute("ALTER INDEX IF EXISTS ix_notifications_id_status RENAME TO ix_notifications_id_status_legacy")
+
+    op.execute(
+        "CREATE TABLE notifications "
+        "(LIKE notifications_legacy INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STATISTICS) "
+        "PARTITION BY RANGE (created_at)"
+    )
+    op.execute("ALTER TABLE notifications DROP CONSTRAINT ck_notifications_legacy_created_at")
+    op.execute("ALTER TABLE notifications ADD CONSTRAINT notifications_pkey PRIMARY KEY (id, created_at)")
+    op.execute(
+        "ALTER TABLE notifications "
+        "ADD CONSTRAINT uq_notifications_job_row_number UNIQUE (job_id, job_row_number, created_at)"
+    )
+    op.execute("CREATE UNIQUE INDEX ix_notifications_id_status ON notifications (id, notification_status, created_at)")
+
+    # Give the partitioned table the same (non-unique) indexes and foreign keys as the old one. The old table's
+    # indexes are renamed so that the new table's can have their names, and attaching it uses them rather than
+    # building new ones
+    op.execute(
+        """
+        DO $$
+        DECLARE
+            legacy_index record;
+            legacy_foreign_key record;
+        BEGIN
+            FOR legacy_index IN
+                SELECT indexrelid::regclass::text AS name, pg_get_indexdef(indexrelid) AS definition
+                FROM pg_index
+                WHERE indrelid = 'notifications_legacy'::regclass AND NOT indisunique
+            LOOP
+                EXECUTE format('ALTER INDEX %I RENAME TO %I', legacy_index.name, legacy_index.name || '_legacy');
+                EXECUTE replace(legacy_index.definition, ' ON public.notifications_legacy ', ' ON public.notifications ');
+            END LOOP;
+
+            FOR legacy_foreign_key IN
+                SELECT conname, pg_get_constraintdef(oid) AS definition
+                FROM pg_constraint
+                WHERE conrelid = 'notifications_legacy'::regclass AND contype = 'f'
+            LOOP
+                EXECUTE format(
+                    'ALTER TABLE notifications ADD CONSTRAINT %I %s',
+                    legacy_foreign_key.conname,
+                    -- partitioned tables can't have NOT VALID foreign keys, and this one's empty anyway
+                    replace(legacy_foreign_key.definition, ' NOT VALID', '')
+                );
+            END LOOP;
+        END
+        $$
+        """
+    )
+
+    op.execute(
+        f"ALTER TABLE notifications ATTACH PARTITION notifications_legacy FOR VALUES FROM (MINVALUE) TO ('{legacy_until}')"
+    )
+    for day in (legacy_until + timedelta(days=i) for i in range(7)):
+        op.execute(
+            f"CREATE TABLE {_partition_name(day)} PARTITION OF notifications "
+            f"FOR VALUES FROM ('{day}') TO ('{day + timedelta(days=1)}')"
+        )
+    op.execute("CREATE TABLE notifications_default PARTITION OF notifications DEFAULT")
+
+    # the view followed the old table when it was renamed
+    op.execute(CREATE_NOTIFICATIONS_ALL_TIME_VIEW)
+
+
+def downgrade():
+    conn = op.get_bind()
+    conn.execute(text("SET lock_timeout = '60s'"))
+
+    op.execute("ALTER TABLE notifications DETACH PARTITION notifications_legacy")
+    op.execute("ALTER TABLE notifications_legacy DROP CONSTRAINT ck_notifications_legacy_created_at")
+    op.execute("INSERT INTO notifications_legacy SELECT * FROM notifications")
+    op.execute("DROP TABLE notifications CASCADE")
+
+    op.execute("ALTER TABLE notifications_legacy RENAME TO notifications")
+    op.execute("ALTER TABLE notifications RENAME CONSTRAINT notifications_legacy_pkey TO notifications_pkey")
+    op.execute(
+        "ALTER TABLE notifications "
+        "RENAME CONSTRAINT uq_notifications_legacy_job_row_number TO uq_notifications_job_row_number"
+    )
+    op.execute("DROP INDEX notifications_legacy_id_created_at")
+    op.execute("DROP INDEX uq_notifications_legacy_job_row_number_created_at")
+    op.execute("DROP INDEX ix_notifications_legacy_id_status_created_at")
+    op.execute(
+        """
+        DO $$
+        DECLARE
+            legacy_index record;
+        BEGIN
+            FOR legacy_index IN
+                SELECT indexrelid::regclass::text AS name
+                FROM pg_index
+                WHERE indrelid = 'notifications'::regclass AND indexrelid::regclass::text LIKE '%\\_legacy'
+            LOOP
+                EXECUTE format(
+                    'ALTER INDEX %I RENAME TO %I', legacy_index.name, left(legacy_index.name, -length('_legacy'))
+                );
+            END LOOP;
+        END
+        $$
+        """
+    )
+
+    op.execute(CREATE_NOTIFICATIONS_ALL_TIME_VIEW)
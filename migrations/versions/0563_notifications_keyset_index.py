@@ -0,0 +1,50 @@
+"""
+Create Date: 2026-10-17 16:05:00.000000
+
+Indexes notifications on (service_id, created_at, id), for paginating a service's notifications by
+(created_at, id) rather than by offset.
+
+Indexes can't be created concurrently on a partitioned table, so the index is created on the partitioned table
+only (where it starts off invalid), then concurrently on each partition, which are attached to it one at a time.
+Once every partition's index is attached it becomes valid, and partitions created after that get it automatically.
+"""
+
+from alembic import op
+from sqlalchemy import text
+
+revision = "0563_notifications_keyset_index"
+down_revision = "0562_partition_notifications"
+
+
+def upgrade():
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_notifications_service_id_created_at_id "
+        "ON ONLY notifications (service_id, created_at, id)"
+    )
+
+    conn = op.get_bind()
+    partitions = conn.execute(
+        text(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = 'notifications'::regclass
+            ORDER BY child.relname
+            """
+        )
+    ).scalars().all()
+
+    for partition in partitions:
+        index_name = f"ix_{partition}_service_id_created_at_id"
+        with op.get_context().autocommit_block():
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name} "
+                f"ON {partition} (service_id, created_at, id)"
+            )
+        op.execute(f"ALTER INDEX ix_notifications_service_id_created_at_id ATTACH PARTITION {index_name}")
+
+
+def downgrade():
+    # dropping the partitioned index drops each partition's too
+    op.execute("DROP INDEX IF EXISTS ix_notifications_service_id_created_at_id")
@@ -5,3 +5,7 @@ def load_example_csv(file):
     file_path = os.path.join("test_csv_files", f"{file}.csv")
     with open(file_path) as f:
         return f.read()
+
+
+def load_example_csv_lines(file):
+    return load_example_csv(file).splitlines(keepends=True)
@@ -28,8 +28,10 @@ from app.celery.nightly_tasks import (
     _deep_archive_notification_history_hour_starting,
     _delete_notifications_older_than_retention_by_type,
     archive_batched_unsubscribe_requests,
+    archive_notification_partitions,
     archive_old_unsubscribe_requests,
     archive_unsubscribe_requests,
+    create_notification_partitions,
     deep_archive_notification_history_up_to_limit,
     delete_email_notifications_older_than_retention,
     delete_inbound_sms,
@@ -47,6 +49,7 @@ from app.celery.nightly_tasks import (
     timeout_notifications,
 )
 from app.constants import EMAIL_TYPE, LETTER_TYPE, SMS_TYPE
+from app.dao.notification_partitions_dao import CreatedNotificationPartition, NotificationPartition
 from app.models import (
     FactProcessingTime,
     NotificationHistory,
@@ -482,6 +485,83 @@ def test_delete_letter_notifications_older_than_retention_calls_child_task(notif
     mocked.assert_called_once_with("letter")
 
 
+@freeze_time("2021-06-20 00:20")
+def test_create_notification_partitions(notify_api, mocker):
+    mock_create = mocker.patch(
+        "app.celery.nightly_tasks.dao_create_notification_partitions",
+        return_value=[CreatedNotificationPartition("notifications_p20210627", moved_from_default=0)],
+    )
+    mock_logger = mocker.patch("app.celery.nightly_tasks.current_app.logger")
+
+    create_notification_partitions()
+
+    mock_create.assert_called_once_with(date(2021, 6, 20), days=7)
+    assert not mock_logger.error.called
+
+
+@freeze_time("2021-06-20 00:20")
+def test_create_notification_partitions_logs_error_if_notifications_were_in_default_partition(notify_api, mocker):
+    mocker.patch(
+        "app.celery.nightly_tasks.dao_create_notification_partitions",
+        return_value=[CreatedNotificationPartition("notifications_p20210620", moved_from_default=3)],
+    )
+    mock_logger = mocker.patch("app.celery.nightly_tasks.current_app.logger")
+
+    create_notification_partitions()
+
+    assert mock_logger.error.call_args.args[1] == {"partition": "notifications_p20210620", "moved_count": 3}
+
+
+@freeze_time("2021-06-20 02:30")
+def test_archive_notification_partitions(sample_service, mocker):
+    create_service_data_retention(sample_service, notification_type=SMS_TYPE, days_of_retention=10)
+    create_service_data_retention(sample_service, notification_type=EMAIL_TYPE, days_of_retention=3)
+    mocker.patch(
+        "app.celery.nightly_tasks.dao_get_notification_partitions",
+        return_value=[
+            NotificationPartition("notifications_legacy", None, datetime(2021, 6, 10)),
+            NotificationPartition("notifications_p20210610", datetime(2021, 6, 10), datetime(2021, 6, 11)),
+            NotificationPartition("notifications_p20210611", datetime(2021, 6, 11), datetime(2021, 6, 12)),
+            # 7 days ago is midnight on the 13th in London, which is 11pm on the 12th in UTC
+            NotificationPartition("notifications_p20210612", datetime(2021, 6, 12), datetime(2021, 6, 13)),
+        ],
+    )
+    mock_has_notifications_to_keep = mocker.patch(
+        "app.celery.nightly_tasks.dao_notification_partition_has_notifications_to_keep",
+        side_effect=[True, False],
+    )
+    mock_archive = mocker.patch("app.celery.nightly_tasks.dao_archive_notification_partition", return_value=5)
+
+    archive_notification_partitions()
+
+    assert mock_has_notifications_to_keep.call_args_list == [
+        # the service keeps sms for 10 days, so both partitions still have sms it might keep
+        call("notifications_p20210610", [(sample_service.id, SMS_TYPE)]),
+        call("notifications_p20210611", [(sample_service.id, SMS_TYPE)]),
+    ]
+    mock_archive.assert_called_once_with("notifications_p20210611")
+
+
+@freeze_time("2021-06-20 02:30")
+def test_archive_notification_partitions_carries_on_if_detaching_times_out(notify_db_session, mocker):
+    mocker.patch(
+        "app.celery.nightly_tasks.dao_get_notification_partitions",
+        return_value=[
+            NotificationPartition("notifications_p20210610", datetime(2021, 6, 10), datetime(2021, 6, 11)),
+            NotificationPartition("notifications_p20210611", datetime(2021, 6, 11), datetime(2021, 6, 12)),
+        ],
+    )
+    mocker.patch("app.celery.nightly_tasks.dao_notification_partition_has_notifications_to_keep", return_value=False)
+    mock_archive = mocker.patch(
+        "app.celery.nightly_tasks.dao_archive_notification_partition",
+        side_effect=[OperationalError("ALTER TABLE", {}, Exception("lock timeout")), 5],
+    )
+
+    archive_notification_partitions()
+
+    assert mock_archive.call_args_list == [call("notifications_p20210610"), call("notifications_p20210611")]
+
+
 def test_should_not_update_status_of_letter_notifications(client, sample_letter_template):
     created_at = datetime.utcnow() - timedelta(days=5)
     not1 = create_notification(template=sample_letter_template, status="sending", created_at=created_at)
@@ -865,7 +945,12 @@ def test_delete_notifications_task_calls_task_for_services_that_have_sent_notifi
 
 
 def test_delete_notifications_for_service_and_type_queues_up_second_task_if_things_deleted(mocker, mock_celery_task):
-    mock_move = mocker.patch("app.celery.nightly_tasks.move_notifications_to_notification_history", return_value=1)
+    cursor = (datetime(2021, 6, 1, 12), uuid.uuid4())
+    mocker.patch("app.celery.nightly_tasks.dao_get_replication_lag_seconds", return_value=0)
+    mocker.patch("app.celery.nightly_tasks.RETENTION_DELETE_TASK_DURATION", timedelta(0))
+    mock_move = mocker.patch(
+        "app.celery.nightly_tasks.move_notifications_to_notification_history", return_value=(1, cursor)
+    )
     mock_task_call = mock_celery_task(delete_notifications_for_service_and_type)
     mock_delete_tests = mocker.patch("app.celery.nightly_tasks.delete_test_notifications")
     service_id = uuid.uuid4()
@@ -875,20 +960,110 @@ def test_delete_notifications_for_service_and_type_queues_up_second_task_if_thin
     with _with_message_group_id(delete_notifications_for_service_and_type, str(service_id)):
         delete_notifications_for_service_and_type(service_id, notification_type, datetime_to_delete_before)
 
-    mock_move.assert_called_once_with(notification_type, service_id, datetime_to_delete_before)
-    # the next task is queued up with the exact same args
+    mock_move.assert_called_once_with(
+        notification_type, service_id, datetime_to_delete_before, qry_limit=10_000, after=None
+    )
+    # the next task carries on from the last notification deleted
     mock_task_call.assert_called_once_with(
         args=(service_id, notification_type, datetime_to_delete_before),
+        kwargs={"after_created_at": cursor[0], "after_id": cursor[1], "replication_lag_backoffs": 0},
         queue="reporting-tasks",
+        countdown=0,
         MessageGroupId=str(service_id),
     )
     assert not mock_delete_tests.called
 
 
+def test_delete_notifications_for_service_and_type_deletes_batches_from_cursor(mocker, mock_celery_task):
+    first_cursor = (datetime(2021, 6, 1, 12), uuid.uuid4())
+    second_cursor = (datetime(2021, 6, 1, 13), uuid.uuid4())
+    mocker.patch("app.celery.nightly_tasks.dao_get_replication_lag_seconds", return_value=0)
+    mock_move = mocker.patch(
+        "app.celery.nightly_tasks.move_notifications_to_notification_history",
+        side_effect=[(2, second_cursor), (0, None)],
+    )
+    mock_delete_live_notis_task_call = mock_celery_task(delete_notifications_for_service_and_type)
+    mock_delete_tests_task_call = mock_celery_task(delete_test_notifications_for_service_and_type)
+    service_id = uuid.uuid4()
+    datetime_to_delete_before = datetime.utcnow()
+
+    with _with_message_group_id(delete_notifications_for_service_and_type, str(service_id)):
+        delete_notifications_for_service_and_type(
+            service_id, "sms", datetime_to_delete_before, after_created_at=first_cursor[0], after_id=first_cursor[1]
+        )
+
+    assert mock_move.call_args_list == [
+        call("sms", service_id, datetime_to_delete_before, qry_limit=10_000, after=first_cursor),
+        call("sms", service_id, datetime_to_delete_before, qry_limit=10_000, after=second_cursor),
+    ]
+    assert not mock_delete_live_notis_task_call.called
+    assert mock_delete_tests_task_call.called
+
+
+def test_delete_notifications_for_service_and_type_backs_off_while_replication_lagging(mocker, mock_celery_task):
+    cursor = (datetime(2021, 6, 1, 12), uuid.uuid4())
+    mocker.patch("app.celery.nightly_tasks.dao_get_replication_lag_seconds", return_value=31)
+    mock_move = mocker.patch("app.celery.nightly_tasks.move_notifications_to_notification_history")
+    mock_delete_live_notis_task_call = mock_celery_task(delete_notifications_for_service_and_type)
+    mock_delete_tests_task_call = mock_celery_task(delete_test_notifications_for_service_and_type)
+    service_id = uuid.uuid4()
+    datetime_to_delete_before = datetime.utcnow()
+
+    with _with_message_group_id(delete_notifications_for_service_and_type, str(service_id)):
+        delete_notifications_for_service_and_type(
+            service_id,
+            "sms",
+            datetime_to_delete_before,
+            after_created_at=cursor[0],
+            after_id=cursor[1],
+            replication_lag_backoffs=3,
+        )
+
+    assert not mock_move.called
+    mock_delete_live_notis_task_call.assert_called_once_with(
+        args=(service_id, "sms", datetime_to_delete_before),
+        kwargs={"after_created_at": cursor[0], "after_id": cursor[1], "replication_lag_backoffs": 4},
+        queue="reporting-tasks",
+        countdown=60,
+        MessageGroupId=str(service_id),
+    )
+    assert not mock_delete_tests_task_call.called
+
+
+def test_delete_notifications_for_service_and_type_gives_up_after_too_many_replication_lag_backoffs(
+    mocker, mock_celery_task
+):
+    cursor = (datetime(2021, 6, 1, 12), uuid.uuid4())
+    mocker.patch("app.celery.nightly_tasks.dao_get_replication_lag_seconds", return_value=31)
+    mock_move = mocker.patch("app.celery.nightly_tasks.move_notifications_to_notification_history")
+    mock_delete_live_notis_task_call = mock_celery_task(delete_notifications_for_service_and_type)
+    mock_delete_tests_task_call = mock_celery_task(delete_test_notifications_for_service_and_type)
+    mock_logger = mocker.patch("app.celery.nightly_tasks.current_app.logger.error")
+    service_id = uuid.uuid4()
+
+    with _with_message_group_id(delete_notifications_for_service_and_type, str(service_id)):
+        delete_notifications_for_service_and_type(
+            service_id,
+            "sms",
+            datetime.utcnow(),
+            after_created_at=cursor[0],
+            after_id=cursor[1],
+            replication_lag_backoffs=60,
+        )
+
+    assert not mock_move.called
+    assert not mock_delete_live_notis_task_call.called
+    assert not mock_delete_tests_task_call.called
+    assert mock_logger.called
+
+
 def test_delete_notifications_for_service_and_type_removes_test_notifications_if_no_normal_ones_deleted(
     mocker, mock_celery_task
 ):
-    mock_move = mocker.patch("app.celery.nightly_tasks.move_notifications_to_notification_history", return_value=0)
+    mocker.patch("app.celery.nightly_tasks.dao_get_replication_lag_seconds", return_value=0)
+    mock_move = mocker.patch(
+        "app.celery.nightly_tasks.move_notifications_to_notification_history", return_value=(0, None)
+    )
     mock_delete_live_notis_task_call = mock_celery_task(delete_notifications_for_service_and_type)
     mock_delete_tests_task_call = mock_celery_task(delete_test_notifications_for_service_and_type)
 
@@ -899,7 +1074,9 @@ def test_delete_notifications_for_service_and_type_removes_test_notifications_if
     with _with_message_group_id(delete_notifications_for_service_and_type, str(service_id)):
         delete_notifications_for_service_and_type(service_id, notification_type, datetime_to_delete_before)
 
-    mock_move.assert_called_once_with(notification_type, service_id, datetime_to_delete_before)
+    mock_move.assert_called_once_with(
+        notification_type, service_id, datetime_to_delete_before, qry_limit=10_000, after=None
+    )
     # the next task is not queued up
     assert not mock_delete_live_notis_task_call.called
     mock_delete_tests_task_call.assert_called_once_with(
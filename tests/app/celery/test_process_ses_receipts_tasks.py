@@ -1,19 +1,24 @@
 import json
 from datetime import datetime
+from unittest.mock import call
 
+import pytest
+from celery.exceptions import Retry
 from freezegun import freeze_time
 
 from app import signing
-from app.celery.process_ses_receipts_tasks import process_ses_results
+from app.celery.process_ses_receipts_tasks import process_ses_results, process_ses_results_batch
 from app.celery.research_mode_tasks import (
     ses_hard_bounce_callback,
     ses_notification_callback,
     ses_soft_bounce_callback,
 )
-from app.celery.service_callback_tasks import send_complaint_to_service
+from app.celery.service_callback_tasks import send_complaint_to_service, send_delivery_status_to_service
+from app.dao import notifications_dao
 from app.dao.notifications_dao import get_notification_by_id
 from app.models import Complaint, Notification
 from app.notifications.notifications_ses_callback import (
+    check_and_queue_callback_tasks,
     remove_emails_from_bounce,
     remove_emails_from_complaint,
 )
@@ -278,3 +283,166 @@ def test_ses_callback_should_send_on_complaint_to_user_callback_api(sample_email
         "service_callback_api_url": "https://original_url.com",
         "to": "recipient1@example.com",
     }
+
+
+def test_process_ses_results_batch_updates_notifications(sample_email_template, mock_celery_task, mocker):
+    send_mock = mock_celery_task(send_delivery_status_to_service)
+    create_service_callback_api(
+        callback_type="delivery_status", service=sample_email_template.service, url="https://original_url.com"
+    )
+    mock_update = mocker.patch(
+        "app.celery.process_ses_receipts_tasks.notifications_dao.dao_update_notifications_by_reference",
+        wraps=notifications_dao.dao_update_notifications_by_reference,
+    )
+    delivered = create_notification(sample_email_template, reference="ref1", status="sending")
+    also_delivered = create_notification(sample_email_template, reference="ref2", status="sending")
+    bounced = create_notification(sample_email_template, reference="ref3", status="pending")
+
+    process_ses_results_batch(
+        [
+            [ses_notification_callback(reference="ref1"), None],
+            [ses_notification_callback(reference="ref2"), None],
+            [ses_hard_bounce_callback(reference="ref3"), "2001-01-01T12:00:00"],
+        ]
+    )
+
+    assert get_notification_by_id(delivered.id).status == "delivered"
+    assert get_notification_by_id(also_delivered.id).status == "delivered"
+    assert get_notification_by_id(bounced.id).status == "permanent-failure"
+
+    assert sorted(mock_update.call_args_list, key=lambda c: c.kwargs["update_dict"]["status"]) == [
+        call(references=["ref1", "ref2"], update_dict={"status": "delivered"}, _autocommit=False),
+        call(references=["ref3"], update_dict={"status": "permanent-failure"}, _autocommit=False),
+    ]
+    assert sorted(c.args[0][0] for c in send_mock.call_args_list) == sorted(
+        [str(delivered.id), str(also_delivered.id), str(bounced.id)]
+    )
+
+
+def test_process_ses_results_batch_treats_repeated_reference_as_duplicate(sample_email_template, mocker):
+    mock_dup = mocker.patch("app.celery.process_ses_receipts_tasks.notifications_dao._duplicate_update_warning")
+    mocker.patch("app.celery.process_ses_receipts_tasks.check_and_queue_callback_tasks")
+    notification = create_notification(sample_email_template, reference="ref1", status="sending")
+
+    process_ses_results_batch(
+        [
+            [ses_notification_callback(reference="ref1"), None],
+            [ses_soft_bounce_callback(reference="ref1"), None],
+        ]
+    )
+
+    assert get_notification_by_id(notification.id).status == "delivered"
+    mock_dup.assert_called_once_with(notification=notification, status="temporary-failure")
+
+
+def test_process_ses_results_batch_retries_new_missing_notifications_individually(
+    client, notify_db_session, mock_celery_task
+):
+    mock_process = mock_celery_task(process_ses_results)
+
+    with freeze_time("2017-11-17T12:14:03.646Z") as frozen_time:
+        new_payload = ses_notification_callback(reference="new")
+        frozen_time.tick(-400)
+        old_payload = ses_notification_callback(reference="old")
+        frozen_time.tick(400)
+
+        process_ses_results_batch([[new_payload, "2017-11-17T12:14:03"], [old_payload, None]])
+
+    mock_process.assert_called_once_with(
+        [new_payload],
+        {"receipt_iso_timestamp": "2017-11-17T12:14:03"},
+        queue="retry-tasks",
+        countdown=300,
+    )
+
+
+def test_process_ses_results_batch_processes_unparseable_receipts_individually(sample_email_template, mock_celery_task):
+    mock_process = mock_celery_task(process_ses_results)
+    notification = create_notification(sample_email_template, reference="ref1", status="sending")
+
+    process_ses_results_batch([[{"Message": "not json"}, None], [ses_notification_callback(reference="ref1"), None]])
+
+    mock_process.assert_called_once_with(
+        [{"Message": "not json"}], {"receipt_iso_timestamp": None}, queue="retry-tasks", countdown=None
+    )
+    assert get_notification_by_id(notification.id).status == "delivered"
+
+
+def test_process_ses_results_batch_handles_complaints(sample_email_template):
+    notification = create_notification(template=sample_email_template, reference="ref1")
+
+    process_ses_results_batch([[ses_complaint_callback(), None]])
+
+    assert Complaint.query.one().notification_id == notification.id
+
+
+def test_process_ses_results_batch_retries_receipts_not_yet_dealt_with(sample_email_template, mocker):
+    create_notification(template=sample_email_template, reference="ref1")
+    create_notification(sample_email_template, reference="ref2", status="sending")
+    mocker.patch("app.dao.notifications_dao.dao_update_notifications_by_reference", side_effect=Exception("EXPECTED"))
+    mock_retry = mocker.patch(
+        "app.celery.process_ses_receipts_tasks.process_ses_results_batch.retry", side_effect=Retry
+    )
+    delivery_receipt = [ses_notification_callback(reference="ref2"), None]
+
+    with pytest.raises(Retry):
+        process_ses_results_batch([[ses_complaint_callback(), None], delivery_receipt])
+
+    # the complaint was handled before the batch failed, so isn't retried with it
+    mock_retry.assert_called_once_with(args=[[delivery_receipt]], kwargs={"updated_receipts": []}, queue="retry-tasks")
+
+
+def test_process_ses_results_batch_updates_all_statuses_or_none(sample_email_template, mocker):
+    delivered = create_notification(sample_email_template, reference="ref1", status="sending")
+    bounced = create_notification(sample_email_template, reference="ref2", status="sending")
+    dao_update_notifications_by_reference = notifications_dao.dao_update_notifications_by_reference
+
+    def update_first_status_only(**kwargs):
+        if kwargs["update_dict"]["status"] != "delivered":
+            raise Exception("EXPECTED")
+        return dao_update_notifications_by_reference(**kwargs)
+
+    mocker.patch(
+        "app.celery.process_ses_receipts_tasks.notifications_dao.dao_update_notifications_by_reference",
+        side_effect=update_first_status_only,
+    )
+    mock_retry = mocker.patch(
+        "app.celery.process_ses_receipts_tasks.process_ses_results_batch.retry", side_effect=Retry
+    )
+    receipts = [[ses_notification_callback(reference="ref1"), None], [ses_hard_bounce_callback(reference="ref2"), None]]
+
+    with pytest.raises(Retry):
+        process_ses_results_batch(receipts)
+
+    assert get_notification_by_id(delivered.id).status == "sending"
+    assert get_notification_by_id(bounced.id).status == "sending"
+    mock_retry.assert_called_once_with(args=[receipts], kwargs={"updated_receipts": []}, queue="retry-tasks")
+
+
+def test_process_ses_results_batch_queues_callbacks_for_updated_notifications_when_retried(
+    sample_email_template, mock_celery_task, mocker
+):
+    send_mock = mock_celery_task(send_delivery_status_to_service)
+    create_service_callback_api(
+        callback_type="delivery_status", service=sample_email_template.service, url="https://original_url.com"
+    )
+    notification = create_notification(sample_email_template, reference="ref1", status="sending")
+    mock_queue_callbacks = mocker.patch(
+        "app.celery.process_ses_receipts_tasks.check_and_queue_callback_tasks", side_effect=Exception("EXPECTED")
+    )
+    mock_retry = mocker.patch(
+        "app.celery.process_ses_receipts_tasks.process_ses_results_batch.retry", side_effect=Retry
+    )
+    receipt = [ses_notification_callback(reference="ref1"), "2001-01-01T12:00:00"]
+
+    with pytest.raises(Retry):
+        process_ses_results_batch([receipt])
+
+    # the notification was updated, so only its callback is retried
+    assert get_notification_by_id(notification.id).status == "delivered"
+    mock_retry.assert_called_once_with(args=[[]], kwargs={"updated_receipts": [receipt]}, queue="retry-tasks")
+
+    mock_queue_callbacks.side_effect = check_and_queue_callback_tasks
+    process_ses_results_batch(*mock_retry.call_args.kwargs["args"], **mock_retry.call_args.kwargs["kwargs"])
+
+    assert [c.args[0][0] for c in send_mock.call_args_list] == [str(notification.id)]
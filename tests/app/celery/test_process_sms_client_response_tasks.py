@@ -2,14 +2,25 @@ import uuid
 from datetime import datetime
 
 import pytest
+from flask import json
 from freezegun import freeze_time
+from redis.exceptions import LockError
 
+from app import redis_store
 from app.celery.process_sms_client_response_tasks import (
+    SMS_CLIENT_RESPONSE_BUFFER_KEY,
+    SMS_CLIENT_RESPONSE_PROCESSING_KEY,
+    drain_sms_client_responses,
     process_sms_client_response,
+    process_sms_client_responses,
+    queue_sms_client_response,
 )
 from app.clients import ClientException
 from app.constants import NOTIFICATION_TECHNICAL_FAILURE
+from app.dao import notifications_dao
 from app.otel_metrics.notification import _callback_duration, _deliver_duration, _international_sms
+from tests.app.db import create_notification
+from tests.conftest import set_config
 
 
 def test_process_sms_client_response_raises_error_if_reference_is_not_a_valid_uuid(client):
@@ -171,6 +182,23 @@ def test_process_sms_client_response_records_metrics(sample_notification, client
     )
 
 
+@freeze_time("2001-01-01T12:00:00")
+def test_process_sms_client_response_records_provider_receipt_lag(sample_notification, mocker):
+    mock_record_lag = mocker.patch("app.celery.process_sms_client_response_tasks.record_sms_provider_receipt_lag")
+
+    sample_notification.status = "sending"
+    sample_notification.sent_at = datetime.utcnow()
+
+    process_sms_client_response(
+        "0",
+        str(sample_notification.id),
+        "Firetext",
+        receipt_iso_timestamp="2001-01-01T12:00:50",
+    )
+
+    mock_record_lag.assert_called_once_with("firetext", 50.0)
+
+
 def test_process_sms_client_response_records_international_sms_metrics(sample_notification, mocker):
     add_international_sms_mock = mocker.patch.object(_international_sms, "add")
 
@@ -214,3 +242,195 @@ def test_process_sms_updates_sent_by_with_client_name_if_not_in_noti(sample_noti
     process_sms_client_response("3", str(sample_notification.id), "MMG")
 
     assert sample_notification.sent_by == "mmg"
+
+
+def test_process_sms_client_responses_updates_notifications_with_one_update_per_status(sample_template, mocker):
+    send_mock = mocker.patch("app.celery.process_sms_client_response_tasks.check_and_queue_callback_tasks")
+    mock_update = mocker.patch(
+        "app.dao.notifications_dao.dao_update_notification_statuses_by_id",
+        wraps=notifications_dao.dao_update_notification_statuses_by_id,
+    )
+    delivered = create_notification(sample_template, status="sending", sent_by="mmg")
+    also_delivered = create_notification(sample_template, status="sending", sent_by="mmg")
+    failed = create_notification(sample_template, status="sending", sent_by="firetext")
+
+    process_sms_client_responses(
+        [
+            ["3", str(delivered.id), "MMG", "2", None, "2020-10-20T03:05:06.2"],
+            ["3", str(also_delivered.id), "MMG", "2", None, None],
+            ["1", str(failed.id), "Firetext", "101", None, None],
+        ]
+    )
+
+    assert mock_update.call_count == 1
+    assert delivered.status == "delivered"
+    assert also_delivered.status == "delivered"
+    assert failed.status == "permanent-failure"
+    send_mock.assert_called_once_with(
+        [
+            (delivered, datetime(2020, 10, 20, 3, 5, 6, 200000)),
+            (also_delivered, None),
+            (failed, None),
+        ]
+    )
+
+
+def test_process_sms_client_responses_applies_receipts_for_a_notification_in_order(sample_template, mocker, caplog):
+    send_mock = mocker.patch("app.celery.process_sms_client_response_tasks.check_and_queue_callback_tasks")
+    pending_then_delivered = create_notification(sample_template, status="sending", sent_by="firetext")
+    delivered_then_pending = create_notification(sample_template, status="sending", sent_by="firetext")
+
+    with caplog.at_level("INFO"):
+        process_sms_client_responses(
+            [
+                ["2", str(pending_then_delivered.id), "Firetext", None, None, None],
+                ["0", str(delivered_then_pending.id), "Firetext", None, None, None],
+                ["0", str(pending_then_delivered.id), "Firetext", None, None, None],
+                ["2", str(delivered_then_pending.id), "Firetext", None, None, None],
+            ]
+        )
+
+    assert pending_then_delivered.status == "delivered"
+    assert delivered_then_pending.status == "delivered"
+    send_mock.assert_called_once_with([(delivered_then_pending, None), (pending_then_delivered, None)])
+    assert (
+        f"Notification ID {delivered_then_pending.id} with type sms sent by firetext. "
+        "New status was pending, current status is delivered."
+    ) in "".join(caplog.messages)
+
+
+def test_process_sms_client_responses_skips_invalid_receipts(sample_notification, mocker, caplog):
+    mocker.patch("app.celery.process_sms_client_response_tasks.check_and_queue_callback_tasks")
+    unknown_status_notification = create_notification(sample_notification.template, status="sending")
+
+    process_sms_client_responses(
+        [
+            ["3", "something-bad", "MMG", None, None, None],
+            ["000", str(unknown_status_notification.id), "MMG", None, None, None],
+            ["3", str(uuid.uuid4()), "MMG", None, None, None],
+            ["3", str(sample_notification.id), "MMG", None, None, None],
+        ]
+    )
+
+    assert "MMG callback with invalid reference something-bad" in caplog.messages
+    assert "MMG callback failed: status 000 not found." in caplog.messages
+    assert unknown_status_notification.status == NOTIFICATION_TECHNICAL_FAILURE
+    assert sample_notification.status == "delivered"
+
+
+def test_queue_sms_client_response_queues_task_if_batching_disabled(notify_api, mock_celery_task):
+    mock_task = mock_celery_task(process_sms_client_response)
+
+    with set_config(notify_api, "SMS_CALLBACK_BATCHING_ENABLED", False):
+        queue_sms_client_response(["3", "ref", "MMG", None, None, None])
+
+    mock_task.assert_called_once_with(["3", "ref", "MMG", None, None, None], queue="sms-callbacks")
+
+
+@pytest.mark.parametrize("buffered_count, drain_queued", [(1, True), (2, False)])
+def test_queue_sms_client_response_buffers_receipt_if_batching_enabled(
+    notify_api, mocker, mock_celery_task, buffered_count, drain_queued
+):
+    mocker.patch.object(redis_store, "active", True)
+    mock_redis = mocker.patch.object(redis_store, "redis_store")
+    mock_redis.rpush.return_value = buffered_count
+    mock_task = mock_celery_task(process_sms_client_response)
+    mock_drain = mock_celery_task(drain_sms_client_responses)
+
+    with set_config(notify_api, "SMS_CALLBACK_BATCHING_ENABLED", True):
+        queue_sms_client_response(["3", "ref", "MMG", None, None, None])
+
+    mock_redis.rpush.assert_called_once_with(SMS_CLIENT_RESPONSE_BUFFER_KEY, '["3", "ref", "MMG", null, null, null]')
+    assert not mock_task.called
+    assert mock_drain.called is drain_queued
+
+
+def test_queue_sms_client_response_queues_task_if_buffering_fails(notify_api, mocker, mock_celery_task):
+    mocker.patch.object(redis_store, "active", True)
+    mocker.patch.object(redis_store, "redis_store").rpush.side_effect = ConnectionError
+    mock_task = mock_celery_task(process_sms_client_response)
+
+    with set_config(notify_api, "SMS_CALLBACK_BATCHING_ENABLED", True):
+        queue_sms_client_response(["3", "ref", "MMG", None, None, None])
+
+    mock_task.assert_called_once_with(["3", "ref", "MMG", None, None, None], queue="sms-callbacks")
+
+
+@pytest.fixture
+def mock_drain_redis(mocker):
+    mocker.patch.object(redis_store, "active", True)
+    mocker.patch.object(redis_store, "get_lock")
+    mocker.patch("app.celery.process_sms_client_response_tasks._claim_sms_client_responses_script", None)
+    mock_redis = mocker.patch.object(redis_store, "redis_store")
+    mock_redis.lrange.return_value = []
+    return mock_redis
+
+
+def test_drain_sms_client_responses_queues_batches_until_buffer_empty(
+    notify_api, mocker, mock_celery_task, mock_drain_redis
+):
+    mock_claim = mock_drain_redis.register_script.return_value
+    mock_claim.side_effect = [
+        [json.dumps(["3", "ref1", "MMG", None, None, None]), json.dumps(["3", "ref2", "MMG", None, None, None])],
+        [json.dumps(["0", "ref3", "Firetext", None, None, None])],
+        [],
+    ]
+    mock_task = mock_celery_task(process_sms_client_responses)
+
+    with set_config(notify_api, "SMS_CALLBACK_BATCH_SIZE", 2):
+        drain_sms_client_responses()
+
+    assert (
+        mock_claim.call_args_list
+        == [mocker.call(keys=[SMS_CLIENT_RESPONSE_BUFFER_KEY, SMS_CLIENT_RESPONSE_PROCESSING_KEY], args=[2])] * 3
+    )
+    assert mock_task.call_args_list == [
+        mocker.call(
+            [[["3", "ref1", "MMG", None, None, None], ["3", "ref2", "MMG", None, None, None]]], queue="sms-callbacks"
+        ),
+        mocker.call([[["0", "ref3", "Firetext", None, None, None]]], queue="sms-callbacks"),
+    ]
+    # each batch is removed from the processing list once it's been queued
+    assert mock_drain_redis.delete.call_args_list == [mocker.call(SMS_CLIENT_RESPONSE_PROCESSING_KEY)] * 2
+
+
+def test_drain_sms_client_responses_leaves_receipts_in_processing_list_if_queuing_fails(
+    notify_api, mocker, mock_celery_task, mock_drain_redis
+):
+    mock_drain_redis.register_script.return_value.return_value = [json.dumps(["3", "ref1", "MMG", None, None, None])]
+    mock_task = mock_celery_task(process_sms_client_responses)
+    mock_task.side_effect = ConnectionError
+
+    with set_config(notify_api, "SMS_CALLBACK_BATCH_SIZE", 2), pytest.raises(ConnectionError):
+        drain_sms_client_responses()
+
+    assert not mock_drain_redis.delete.called
+
+
+def test_drain_sms_client_responses_queues_receipts_left_in_processing_list_first(
+    notify_api, mocker, mock_celery_task, mock_drain_redis
+):
+    mock_drain_redis.lrange.side_effect = [[json.dumps(["3", "ref1", "MMG", None, None, None])], [], []]
+    mock_claim = mock_drain_redis.register_script.return_value
+    mock_claim.side_effect = [[json.dumps(["3", "ref2", "MMG", None, None, None])], []]
+    mock_task = mock_celery_task(process_sms_client_responses)
+
+    with set_config(notify_api, "SMS_CALLBACK_BATCH_SIZE", 2):
+        drain_sms_client_responses()
+
+    assert mock_task.call_args_list == [
+        mocker.call([[["3", "ref1", "MMG", None, None, None]]], queue="sms-callbacks"),
+        mocker.call([[["3", "ref2", "MMG", None, None, None]]], queue="sms-callbacks"),
+    ]
+
+
+def test_drain_sms_client_responses_does_nothing_if_another_drain_is_running(
+    notify_api, mocker, mock_celery_task, mock_drain_redis
+):
+    redis_store.get_lock.return_value.__enter__.side_effect = LockError
+    mock_task = mock_celery_task(process_sms_client_responses)
+
+    drain_sms_client_responses()
+
+    assert not mock_drain_redis.register_script.called
+    assert not mock_task.called
@@ -17,8 +17,10 @@ from app.celery import provider_tasks
 from app.celery.provider_tasks import (
     _get_callback_url,
     deliver_email,
+    deliver_emails,
     deliver_letter,
     deliver_sms,
+    deliver_sms_batch,
     update_letter_to_sending,
 )
 from app.clients.email import EmailClientNonRetryableException
@@ -47,7 +49,9 @@ from tests.app.db import create_notification
 
 def test_should_have_decorated_tasks_functions():
     assert deliver_sms.__wrapped__.__name__ == "deliver_sms"
+    assert deliver_sms_batch.__wrapped__.__name__ == "deliver_sms_batch"
     assert deliver_email.__wrapped__.__name__ == "deliver_email"
+    assert deliver_emails.__wrapped__.__name__ == "deliver_emails"
     assert deliver_letter.__wrapped__.__name__ == "deliver_letter"
 
 
@@ -129,6 +133,20 @@ def test_should_go_into_technical_error_if_exceeds_retries_on_deliver_sms_task(s
 # end of deliver_sms task tests, now deliver_email task tests
 
 
+def test_deliver_sms_batch_retries_only_failed_notifications(sample_template, mocker):
+    sent, failed = (create_notification(template=sample_template) for _ in range(2))
+    mock_send_sms_batch = mocker.patch(
+        "app.delivery.send_to_providers.send_sms_batch_to_providers",
+        return_value={failed.id: SmsClientResponseException("failed")},
+    )
+    mock_deliver_sms = mocker.patch("app.celery.provider_tasks.deliver_sms.apply_async")
+
+    deliver_sms_batch([str(sent.id), str(failed.id)])
+
+    assert {notification.id for notification in mock_send_sms_batch.call_args[0][0]} == {sent.id, failed.id}
+    mock_deliver_sms.assert_called_once_with([str(failed.id)], queue="retry-tasks", countdown=0, retries=1)
+
+
 def test_should_call_send_email_to_provider_from_deliver_email_task(sample_notification, mocker):
     mocker.patch("app.delivery.send_to_providers.send_email_to_provider")
 
@@ -196,6 +214,65 @@ def test_should_retry_and_log_exception_for_deliver_email_task(sample_notificati
     assert f"RETRY: Email notification {sample_notification.id} failed" in caplog.messages
 
 
+def test_deliver_email_spreads_out_throttled_retries_if_rate_governor_enabled(sample_notification, mocker):
+    mocker.patch(
+        "app.delivery.send_to_providers.send_email_to_provider",
+        side_effect=AwsSesClientThrottlingSendRateException("throttled"),
+    )
+    mocker.patch("app.celery.provider_tasks.ses_rate_governor_enabled", return_value=True)
+    mocker.patch("app.celery.provider_tasks.random.randint", return_value=123)
+    mocker.patch("app.celery.provider_tasks.deliver_email.retry")
+
+    deliver_email(sample_notification.id)
+
+    provider_tasks.deliver_email.retry.assert_called_once_with(queue="retry-tasks", countdown=123)
+
+
+def test_deliver_emails_sends_batch_to_provider(sample_email_template, mocker):
+    notifications = [create_notification(template=sample_email_template) for _ in range(2)]
+    mock_send_emails = mocker.patch("app.delivery.send_to_providers.send_emails_to_provider", return_value={})
+    mock_deliver_email = mocker.patch("app.celery.provider_tasks.deliver_email.apply_async")
+
+    deliver_emails([str(notification.id) for notification in notifications])
+
+    assert {notification.id for notification in mock_send_emails.call_args[0][0]} == {
+        notification.id for notification in notifications
+    }
+    assert not mock_deliver_email.called
+
+
+def test_deliver_emails_retries_only_failed_notifications(sample_email_template, mocker, caplog):
+    sent, throttled, failed, not_retryable = (create_notification(template=sample_email_template) for _ in range(4))
+    missing_notification_id = str(app.create_uuid())
+    mocker.patch(
+        "app.delivery.send_to_providers.send_emails_to_provider",
+        return_value={
+            throttled.id: AwsSesClientThrottlingSendRateException(),
+            failed.id: AwsSesClientException(),
+            not_retryable.id: EmailClientNonRetryableException("bad email"),
+        },
+    )
+    mock_deliver_email = mocker.patch("app.celery.provider_tasks.deliver_email.apply_async")
+
+    with caplog.at_level("WARNING"):
+        deliver_emails(
+            [str(n.id) for n in (sent, throttled, failed, not_retryable)] + [missing_notification_id],
+        )
+
+    assert {deliver_email_call.args[0][0] for deliver_email_call in mock_deliver_email.call_args_list} == {
+        str(throttled.id),
+        str(failed.id),
+        missing_notification_id,
+    }
+    for deliver_email_call in mock_deliver_email.call_args_list:
+        assert deliver_email_call.kwargs == {"queue": "retry-tasks", "countdown": 300, "retries": 1}
+
+    assert not_retryable.status == NOTIFICATION_TECHNICAL_FAILURE
+    assert sent.status == throttled.status == failed.status == NOTIFICATION_CREATED
+    assert f"RETRY: Email notification {throttled.id} was rate limited by SES" in caplog.messages
+    assert f"RETRY: Email notification {failed.id} failed" in caplog.messages
+
+
 def test_if_ses_send_rate_throttle_then_should_retry_and_log_warning(sample_notification, mocker, caplog):
     error_response = {
         "Error": {"Code": "TooManyRequestsException", "Message": "Maximum sending rate exceeded.", "Type": "Sender"}
@@ -9,6 +9,7 @@ from app.celery.reporting_tasks import (
     create_nightly_billing,
     create_nightly_notification_status,
     create_nightly_notification_status_for_service_and_day,
+    create_nightly_notification_status_for_services_and_day,
     create_or_update_ft_billing_for_day,
     create_or_update_ft_billing_letter_despatch_for_day,
 )
@@ -32,6 +33,7 @@ from tests.app.db import (
     create_service,
     create_template,
 )
+from tests.conftest import set_config
 
 
 def mocker_get_rate(
@@ -70,18 +72,34 @@ def test_create_nightly_notification_status_triggers_tasks(
     sample_template,
     mock_celery_task,
 ):
-    mock_celery = mock_celery_task(create_nightly_notification_status_for_service_and_day)
+    mock_celery = mock_celery_task(create_nightly_notification_status_for_services_and_day)
 
     create_notification(template=sample_template, created_at="2019-07-31")
     create_nightly_notification_status()
 
     mock_celery.assert_called_with(
-        kwargs={"service_id": sample_service.id, "process_day": "2019-07-31", "notification_type": SMS_TYPE},
+        kwargs={"service_ids": [str(sample_service.id)], "process_day": "2019-07-31", "notification_type": SMS_TYPE},
         queue=QueueNames.REPORTING,
-        MessageGroupId=str(sample_service.id),
     )
 
 
+@freeze_time("2019-08-01T00:30")
+def test_create_nightly_notification_status_batches_services(notify_api, mock_celery_task):
+    mock_celery = mock_celery_task(create_nightly_notification_status_for_services_and_day)
+    services = sorted((create_service(service_name=f"service {i}") for i in range(3)), key=lambda s: s.id)
+    for service in services:
+        create_notification(template=create_template(service), created_at="2019-07-31")
+
+    with set_config(notify_api, "FT_NOTIFICATION_STATUS_SERVICES_PER_TASK", 2):
+        create_nightly_notification_status()
+
+    assert [
+        call.kwargs["kwargs"]["service_ids"]
+        for call in mock_celery.call_args_list
+        if call.kwargs["kwargs"]["process_day"] == "2019-07-31"
+    ] == [[str(services[0].id), str(services[1].id)], [str(services[2].id)]]
+
+
 @freeze_time("2019-08-01T00:30")
 @pytest.mark.parametrize(
     "notification_date, expected_types_aggregated",
@@ -100,7 +118,7 @@ def test_create_nightly_notification_status_triggers_relevant_tasks(
     notification_date,
     expected_types_aggregated,
 ):
-    mock_celery = mock_celery_task(create_nightly_notification_status_for_service_and_day)
+    mock_celery = mock_celery_task(create_nightly_notification_status_for_services_and_day)
 
     for notification_type in NOTIFICATION_TYPES:
         template = create_template(sample_service, template_type=notification_type)
@@ -519,6 +537,64 @@ def test_create_or_update_ft_billing_for_day_update_when_record_exists(sample_se
     assert records[0].updated_at
 
 
+@freeze_time("2018-01-15T03:30:00")
+def test_create_or_update_ft_billing_for_day_only_fetches_services_with_changes(sample_service, mocker):
+    mock_redis_get = mocker.patch("app.celery.reporting_tasks.redis_store.get", return_value=b"2018-01-15T02:00:00")
+    mock_redis_set = mocker.patch("app.celery.reporting_tasks.redis_store.set")
+    mock_fetch_service_ids = mocker.patch(
+        "app.celery.reporting_tasks.fetch_service_ids_with_billing_changes_for_day", return_value={sample_service.id}
+    )
+    mock_fetch_billing_data = mocker.patch("app.celery.reporting_tasks.fetch_billing_data_for_day", return_value=[])
+
+    create_or_update_ft_billing_for_day("2018-01-14", only_changed_services=True)
+
+    mock_redis_get.assert_called_once_with(
+        "create-or-update-ft-billing-for-day:2018-01-14:changes-processed-up-to-utc-isoformat"
+    )
+    assert mock_fetch_service_ids.call_args.args == (date(2018, 1, 14), datetime(2018, 1, 15, 1, 50))
+    assert mock_fetch_billing_data.call_args.kwargs["service_ids"] == [sample_service.id]
+    mock_redis_set.assert_called_once_with(
+        "create-or-update-ft-billing-for-day:2018-01-14:changes-processed-up-to-utc-isoformat",
+        "2018-01-15T03:30:00",
+        ex=1_209_600,
+    )
+
+
+@freeze_time("2018-01-15T03:30:00")
+def test_create_or_update_ft_billing_for_day_skips_days_without_changes(notify_api, mocker):
+    mocker.patch("app.celery.reporting_tasks.redis_store.get", return_value=b"2018-01-15T02:00:00")
+    mock_redis_set = mocker.patch("app.celery.reporting_tasks.redis_store.set")
+    mocker.patch("app.celery.reporting_tasks.fetch_service_ids_with_billing_changes_for_day", return_value=set())
+    mock_fetch_billing_data = mocker.patch("app.celery.reporting_tasks.fetch_billing_data_for_day")
+
+    create_or_update_ft_billing_for_day("2018-01-14", only_changed_services=True)
+
+    assert not mock_fetch_billing_data.called
+    mock_redis_set.assert_called_once_with(
+        "create-or-update-ft-billing-for-day:2018-01-14:changes-processed-up-to-utc-isoformat",
+        "2018-01-15T03:30:00",
+        ex=1_209_600,
+    )
+
+
+@freeze_time("2018-01-15T03:30:00")
+def test_create_or_update_ft_billing_for_day_fetches_every_service_unless_only_changed_services(notify_api, mocker):
+    mocker.patch("app.celery.reporting_tasks.redis_store.get", return_value=b"2018-01-15T02:00:00")
+    mock_redis_set = mocker.patch("app.celery.reporting_tasks.redis_store.set")
+    mock_fetch_service_ids = mocker.patch("app.celery.reporting_tasks.fetch_service_ids_with_billing_changes_for_day")
+    mock_fetch_billing_data = mocker.patch("app.celery.reporting_tasks.fetch_billing_data_for_day", return_value=[])
+
+    create_or_update_ft_billing_for_day("2018-01-14")
+
+    assert not mock_fetch_service_ids.called
+    assert mock_fetch_billing_data.call_args.kwargs["service_ids"] is None
+    mock_redis_set.assert_called_once_with(
+        "create-or-update-ft-billing-for-day:2018-01-14:changes-processed-up-to-utc-isoformat",
+        "2018-01-15T03:30:00",
+        ex=1_209_600,
+    )
+
+
 def test_create_nightly_notification_status_for_service_and_day(notify_db_session):
     first_service = create_service(service_name="First Service")
     first_template = create_template(service=first_service)
@@ -594,6 +670,28 @@ def test_create_nightly_notification_status_for_service_and_day(notify_db_sessio
     assert sms_delivered_row.key_type == KEY_TYPE_NORMAL
 
 
+def test_create_nightly_notification_status_for_services_and_day(notify_db_session):
+    first_template = create_template(service=create_service(service_name="First Service"))
+    second_template = create_template(service=create_service(service_name="Second Service"))
+    other_template = create_template(service=create_service(service_name="Other Service"))
+
+    process_day = date.today() - timedelta(days=5)
+    with freeze_time(datetime.combine(process_day, time.min)):
+        create_notification(template=first_template, status="delivered")
+        create_notification(template=second_template, status="delivered")
+        create_notification_history(template=second_template, status="delivered")
+        create_notification(template=other_template, status="delivered")
+
+    create_nightly_notification_status_for_services_and_day(
+        str(process_day), [str(first_template.service_id), str(second_template.service_id)], "sms"
+    )
+
+    assert {(row.service_id, row.notification_count) for row in FactNotificationStatus.query.all()} == {
+        (first_template.service_id, 1),
+        (second_template.service_id, 2),
+    }
+
+
 def test_create_nightly_notification_status_for_service_and_day_overwrites_old_data(notify_db_session):
     first_service = create_service(service_name="First Service")
     first_template = create_template(service=first_service)
@@ -39,6 +39,7 @@ from app.celery.scheduled_tasks import (
     delete_verify_codes,
     generate_sms_delivery_stats,
     populate_annual_billing,
+    refresh_ses_max_send_rate,
     replay_created_notifications,
     run_populate_annual_billing,
     run_scheduled_jobs,
@@ -81,7 +82,7 @@ from app.otel_metrics.provider import (
 from app.otel_metrics.provider import (
     _updated_at as provider_updated_at_metric,
 )
-from tests.app import load_example_csv
+from tests.app import load_example_csv_lines
 from tests.app.db import (
     create_email_branding,
     create_job,
@@ -228,6 +229,18 @@ def test_switch_current_sms_provider_on_slow_delivery_does_nothing_if_no_need(
     assert mock_reduce.called is False
 
 
+@pytest.mark.parametrize("governor_enabled, expect_refresh", [(True, True), (False, False)])
+def test_refresh_ses_max_send_rate(notify_api, mocker, governor_enabled, expect_refresh):
+    mocker.patch("app.celery.scheduled_tasks.ses_rate_governor_enabled", return_value=governor_enabled)
+    mock_get_max_send_rate = mocker.patch("app.aws_ses_client.get_max_send_rate", return_value=50.0)
+    mock_set_max_send_rate = mocker.patch("app.celery.scheduled_tasks.set_ses_max_send_rate")
+
+    refresh_ses_max_send_rate()
+
+    assert mock_get_max_send_rate.called is expect_refresh
+    assert mock_set_max_send_rate.call_args_list == ([call(50.0)] if expect_refresh else [])
+
+
 @pytest.mark.parametrize(
     "slow_delivery_config_option, expect_check_slow_delivery",
     (
@@ -1124,8 +1137,8 @@ def test_check_for_missing_rows_in_completed_jobs_ignores_old_and_new_jobs(
     offset,
 ):
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("multiple_email"), {"sender_id": None}),
+        "app.celery.tasks.s3.get_job_lines_and_metadata_from_s3",
+        return_value=(load_example_csv_lines("multiple_email"), {"sender_id": None}),
     )
     mocker.patch("app.signing.encode", return_value="something_encoded")
     get_id_task_args_kwargs_for_job_row = mocker.patch("app.celery.scheduled_tasks.get_id_task_args_kwargs_for_job_row")
@@ -1160,8 +1173,8 @@ def test_check_for_missing_rows_in_completed_jobs(
         create_notification(job=job, job_row_number=i)
 
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("multiple_email"), {"sender_id": None}),
+        "app.celery.tasks.s3.get_job_lines_and_metadata_from_s3",
+        return_value=(load_example_csv_lines("multiple_email"), {"sender_id": None}),
     )
     mock_encode = mocker.patch("app.signing.encode", return_value="something_encoded")
     mocker.patch("app.celery.tasks.create_uuid", return_value="some-uuid")
@@ -1205,8 +1218,8 @@ def test_check_for_missing_rows_in_completed_jobs_uses_sender_id(
         create_notification(job=job, job_row_number=i)
 
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("multiple_email"), {"sender_id": fake_uuid}),
+        "app.celery.tasks.s3.get_job_lines_and_metadata_from_s3",
+        return_value=(load_example_csv_lines("multiple_email"), {"sender_id": fake_uuid}),
     )
     mock_encode = mocker.patch("app.signing.encode", return_value="something_encoded")
     mocker.patch("app.celery.tasks.create_uuid", return_value="some-uuid")
@@ -16,6 +16,7 @@ from app.celery.service_callback_tasks import (
     create_returned_letter_callback_data,
     send_complaint_to_service,
     send_delivery_status_to_service,
+    send_delivery_statuses_to_service,
     send_inbound_sms_to_service,
     send_returned_letter_to_service,
 )
@@ -24,6 +25,7 @@ from app.constants import (
     NOTIFICATION_RETURNED_LETTER,
     ServiceCallbackTypes,
 )
+from app.notifications.service_callback_circuit_breaker import CircuitCheck
 from app.otel_metrics.service_callback import _service_callback_forward_duration
 from app.utils import DATETIME_FORMAT
 from tests.app.db import (
@@ -349,6 +351,137 @@ def test_send_returned_letter_to_service_sends_callback_to_service(
     )
 
 
+def test_send_delivery_statuses_to_service_sends_callbacks(notify_db_session, mock_celery_task):
+    callback_api, template = _set_up_test_data("sms", "delivery_status")
+    notifications = [create_notification(template=template, status="delivered") for _ in range(3)]
+    mock_retry = mock_celery_task(send_delivery_status_to_service)
+
+    with requests_mock.Mocker() as request_mock:
+        request_mock.post(callback_api.url, json={}, status_code=200)
+        send_delivery_statuses_to_service(
+            [
+                [str(notification.id), _set_up_data_for_status_update(callback_api, notification), None]
+                for notification in notifications
+            ]
+        )
+
+    assert sorted(json.loads(request.text)["id"] for request in request_mock.request_history) == sorted(
+        str(notification.id) for notification in notifications
+    )
+    assert all(
+        request.headers["Authorization"] == "Bearer something_unique" for request in request_mock.request_history
+    )
+    assert not mock_retry.called
+
+
+@pytest.mark.parametrize("status_code, retried", [(500, True), (429, True), (400, False)])
+def test_send_delivery_statuses_to_service_retries_failed_callbacks_individually(
+    notify_db_session, mock_celery_task, status_code, retried
+):
+    callback_api, template = _set_up_test_data("sms", "delivery_status")
+    notification = create_notification(template=template, status="delivered")
+    encoded_status_update = _set_up_data_for_status_update(callback_api, notification)
+    mock_retry = mock_celery_task(send_delivery_status_to_service)
+
+    with requests_mock.Mocker() as request_mock:
+        request_mock.post(callback_api.url, json={}, status_code=status_code)
+        send_delivery_statuses_to_service([[str(notification.id), encoded_status_update, "2017-06-20T12:34:55"]])
+
+    if retried:
+        mock_retry.assert_called_once_with(
+            [str(notification.id), encoded_status_update],
+            {"receipt_iso_timestamp": "2017-06-20T12:34:55"},
+            queue="service-callbacks-retry",
+            countdown=300,
+            retries=1,
+        )
+    else:
+        assert not mock_retry.called
+
+
+def test_send_delivery_statuses_to_service_parks_callbacks_while_circuit_open(
+    notify_db_session, mocker, mock_celery_task
+):
+    callback_api, template = _set_up_test_data("sms", "delivery_status")
+    notification = create_notification(template=template, status="delivered")
+    status_updates = [[str(notification.id), _set_up_data_for_status_update(callback_api, notification), None]]
+    mocker.patch(
+        "app.celery.service_callback_tasks.check_service_callback_circuit",
+        return_value=CircuitCheck(park_for=25, probe=False),
+    )
+    mock_park = mock_celery_task(send_delivery_statuses_to_service)
+
+    with requests_mock.Mocker() as request_mock:
+        send_delivery_statuses_to_service(status_updates)
+
+    assert request_mock.call_count == 0
+    mock_park.assert_called_once_with([status_updates], queue="service-callbacks-retry", countdown=25)
+
+
+def test_send_delivery_statuses_to_service_only_sends_probe_while_circuit_half_open(
+    notify_db_session, mocker, mock_celery_task
+):
+    callback_api, template = _set_up_test_data("sms", "delivery_status")
+    notifications = [create_notification(template=template, status="delivered") for _ in range(3)]
+    status_updates = [
+        [str(notification.id), _set_up_data_for_status_update(callback_api, notification), None]
+        for notification in notifications
+    ]
+    mocker.patch(
+        "app.celery.service_callback_tasks.check_service_callback_circuit",
+        return_value=CircuitCheck(park_for=0, probe=True),
+    )
+    mock_record_result = mocker.patch("app.celery.service_callback_tasks.record_service_callback_circuit_result")
+    mock_park = mock_celery_task(send_delivery_statuses_to_service)
+
+    with requests_mock.Mocker() as request_mock:
+        request_mock.post(callback_api.url, json={}, status_code=200)
+        send_delivery_statuses_to_service(status_updates)
+
+    assert [json.loads(request.text)["id"] for request in request_mock.request_history] == [str(notifications[0].id)]
+    mock_record_result.assert_called_once_with(callback_api.url, succeeded=True)
+    mock_park.assert_called_once_with([status_updates[1:]], queue="service-callbacks-retry", countdown=30)
+
+
+def test__send_data_to_service_callback_api_parks_callback_while_circuit_open(notify_db_session, mocker):
+    celery_task_mock = mock.MagicMock()
+    celery_task_mock.name = "my-task-name"
+    celery_task_mock.request.args = ["some-id", "some-data"]
+    celery_task_mock.request.kwargs = {}
+    celery_task_mock.request.retries = 2
+    mocker.patch(
+        "app.celery.service_callback_tasks.check_service_callback_circuit",
+        return_value=CircuitCheck(park_for=25, probe=False),
+    )
+
+    with requests_mock.Mocker() as request_mock:
+        _send_data_to_service_callback_api(
+            celery_task_mock, {"id": "hello"}, "https://www.example.com/callback", "my-token", "hello", {}
+        )
+
+    assert request_mock.call_count == 0
+    celery_task_mock.apply_async.assert_called_once_with(
+        ["some-id", "some-data"], {}, queue="service-callbacks-retry", countdown=25, retries=2
+    )
+    celery_task_mock.retry.assert_not_called()
+
+
+@pytest.mark.parametrize("status_code, circuit_failure", [(200, False), (400, False), (429, True), (500, True)])
+def test__send_data_to_service_callback_api_records_circuit_result(
+    notify_db_session, mocker, status_code, circuit_failure
+):
+    celery_task_mock = mock.MagicMock()
+    celery_task_mock.name = "my-task-name"
+    mock_record_result = mocker.patch("app.celery.service_callback_tasks.record_service_callback_circuit_result")
+    callback_url = "https://www.example.com/callback"
+
+    with requests_mock.Mocker() as request_mock:
+        request_mock.post(callback_url, json={}, status_code=status_code)
+        _send_data_to_service_callback_api(celery_task_mock, {"id": "hello"}, callback_url, "my-token", "hello", {})
+
+    mock_record_result.assert_called_once_with(callback_url, succeeded=not circuit_failure)
+
+
 def test__send_data_to_service_callback_api_posts_https_request_to_service(notify_db_session, mocker):
     data = {"id": "hello"}
     callback_url = "https://www.example.com/callback"
@@ -9,7 +9,7 @@ import pytest
 from botocore.exceptions import ClientError as BotoClientError
 from celery.exceptions import Retry
 from freezegun import freeze_time
-from notifications_utils.recipients import Row
+from notifications_utils.recipients import RecipientCSV, Row
 from notifications_utils.template import (
     LetterPrintTemplate,
     PlainTextEmailTemplate,
@@ -27,22 +27,27 @@ from app.celery.tasks import (
     UnprocessableJobRow,
     _check_and_queue_returned_letter_callback_task,
     get_id_task_args_kwargs_for_job_row,
-    get_recipient_csv_and_template_and_sender_id,
+    get_job_rows_and_template_and_sender_id,
+    iter_job_csv_rows,
     process_incomplete_job,
     process_incomplete_jobs,
     process_job,
+    process_job_partition,
     process_job_row,
     process_report_request,
     process_returned_letters_list,
     s3,
     save_email,
+    save_email_batch,
     save_letter,
     save_sms,
+    save_sms_batch,
     shatter_job_rows,
 )
 from app.config import QueueNames
 from app.constants import (
     EMAIL_TYPE,
+    JOB_STATUS_CANCELLED,
     JOB_STATUS_ERROR,
     JOB_STATUS_FINISHED,
     JOB_STATUS_IN_PROGRESS,
@@ -57,7 +62,7 @@ from app.dao import jobs_dao, report_requests_dao, service_email_reply_to_dao, s
 from app.models import Job, Notification, NotificationHistory, ReturnedLetter
 from app.serialised_models import SerialisedService, SerialisedTemplate
 from app.v2.errors import TooManyRequestsError
-from tests.app import load_example_csv
+from tests.app import load_example_csv_lines
 from tests.app.celery.test_service_callback_tasks import (
     _set_up_test_data_for_returned_letter_callback,
 )
@@ -74,7 +79,7 @@ from tests.app.db import (
     create_template_email_file,
     create_user,
 )
-from tests.conftest import _with_message_group_id
+from tests.conftest import _with_message_group_id, set_config
 
 
 class AnyStringWith(str):
@@ -104,6 +109,8 @@ def test_should_have_decorated_tasks_functions():
     assert save_sms.__wrapped__.__name__ == "save_sms"
     assert save_email.__wrapped__.__name__ == "save_email"
     assert save_letter.__wrapped__.__name__ == "save_letter"
+    assert save_sms_batch.__wrapped__.__name__ == "save_sms_batch"
+    assert save_email_batch.__wrapped__.__name__ == "save_email_batch"
     assert process_returned_letters_list.__wrapped__.__name__ == "process_returned_letters_list"
     assert process_incomplete_jobs.__wrapped__.__name__ == "process_incomplete_jobs"
 
@@ -127,8 +134,8 @@ def email_job_with_file_placeholders(notify_db_session, sample_email_template_wi
 
 def test_should_process_sms_job(sample_job, mocker, mock_celery_task):
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("sms"), {"sender_id": None}),
+        "app.celery.tasks.s3.get_job_lines_and_metadata_from_s3",
+        return_value=(load_example_csv_lines("sms"), {"sender_id": None}),
     )
     mock_task = mock_celery_task(shatter_job_rows)
     mock_encode = mocker.patch("app.signing.encode", return_value="something_encoded")
@@ -137,7 +144,7 @@ def test_should_process_sms_job(sample_job, mocker, mock_celery_task):
     with _with_message_group_id(process_job, str(sample_job.service_id)):
         process_job(sample_job.id)
 
-    s3.get_job_and_metadata_from_s3.assert_called_once_with(
+    s3.get_job_lines_and_metadata_from_s3.assert_called_once_with(
         service_id=str(sample_job.service.id), job_id=str(sample_job.id)
     )
     assert mock_encode.mock_calls == [
@@ -179,8 +186,8 @@ def test_should_process_sms_job_passes_none_message_group_id_when_not_set_by_bro
 ):
     # When the task is run with message_group_id=None (e.g. broker did not set it), None is passed.
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("sms"), {"sender_id": None}),
+        "app.celery.tasks.s3.get_job_lines_and_metadata_from_s3",
+        return_value=(load_example_csv_lines("sms"), {"sender_id": None}),
     )
     mock_task = mock_celery_task(shatter_job_rows)
     mocker.patch("app.signing.encode", return_value="something_encoded")
@@ -211,8 +218,8 @@ def test_should_process_sms_job_passes_none_message_group_id_when_not_set_by_bro
 
 def test_should_process_sms_job_with_sender_id(sample_job, mocker, mock_celery_task, fake_uuid):
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("sms"), {"sender_id": fake_uuid}),
+        "app.celery.tasks.s3.get_job_lines_and_metadata_from_s3",
+        return_value=(load_example_csv_lines("sms"), {"sender_id": fake_uuid}),
     )
     mock_task = mock_celery_task(shatter_job_rows)
     mock_encode = mocker.patch("app.signing.encode", return_value="something_encoded")
@@ -221,7 +228,7 @@ def test_should_process_sms_job_with_sender_id(sample_job, mocker, mock_celery_t
     with _with_message_group_id(process_job, str(sample_job.service_id)):
         process_job(sample_job.id, sender_id=fake_uuid)
 
-    s3.get_job_and_metadata_from_s3.assert_called_once_with(
+    s3.get_job_lines_and_metadata_from_s3.assert_called_once_with(
         service_id=str(sample_job.service.id), job_id=str(sample_job.id)
     )
     assert mock_encode.mock_calls == [
@@ -261,12 +268,12 @@ def test_should_process_sms_job_with_sender_id(sample_job, mocker, mock_celery_t
 def test_should_not_process_job_if_already_pending(sample_template, mocker, mock_celery_task):
     job = create_job(template=sample_template, job_status="scheduled")
 
-    mocker.patch("app.celery.tasks.s3.get_job_and_metadata_from_s3")
+    mocker.patch("app.celery.tasks.s3.get_job_lines_and_metadata_from_s3")
     mock_shatter_job_rows = mock_celery_task(shatter_job_rows)
 
     process_job(job.id)
 
-    assert s3.get_job_and_metadata_from_s3.called is False
+    assert s3.get_job_lines_and_metadata_from_s3.called is False
     assert mock_shatter_job_rows.called is False
 
 
@@ -275,8 +282,8 @@ def test_should_not_process_if_send_limit_is_exceeded(notify_api, notify_db_sess
     template = create_template(service=service)
     job = create_job(template=template, notification_count=10, original_file_name="multiple_sms.csv")
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("multiple_sms"), {"sender_id": None}),
+        "app.celery.tasks.s3.get_job_lines_and_metadata_from_s3",
+        return_value=(load_example_csv_lines("multiple_sms"), {"sender_id": None}),
     )
     mock_shatter_job_rows = mock_celery_task(shatter_job_rows)
     mock_check_message_limit = mocker.patch(
@@ -287,7 +294,7 @@ def test_should_not_process_if_send_limit_is_exceeded(notify_api, notify_db_sess
 
     job = jobs_dao.dao_get_job_by_id(job.id)
     assert job.job_status == "sending limits exceeded"
-    assert s3.get_job_and_metadata_from_s3.called is False
+    assert s3.get_job_lines_and_metadata_from_s3.called is False
     assert mock_shatter_job_rows.called is False
     assert mock_check_message_limit.mock_calls == [
         call(service, "normal", notification_type=SMS_TYPE, num_notifications=10),
@@ -301,8 +308,8 @@ def test_should_not_process_if_send_limit_is_exceeded_by_job_notification_count(
     template = create_template(service=service)
     job = create_job(template=template, notification_count=10, original_file_name="multiple_sms.csv")
     mock_s3 = mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("multiple_sms"), {"sender_id": None}),
+        "app.celery.tasks.s3.get_job_lines_and_metadata_from_s3",
+        return_value=(load_example_csv_lines("multiple_sms"), {"sender_id": None}),
     )
     mock_shatter_job_rows = mock_celery_task(shatter_job_rows)
     mock_check_message_limit = mocker.patch(
@@ -326,8 +333,8 @@ def test_should_process_job_if_send_limits_are_not_exceeded(notify_api, notify_d
     job = create_job(template=template, notification_count=10)
 
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("multiple_email"), {"sender_id": None}),
+        "app.celery.tasks.s3.get_job_lines_and_metadata_from_s3",
+        return_value=(load_example_csv_lines("multiple_email"), {"sender_id": None}),
     )
     mock_shatter_job_rows = mock_celery_task(shatter_job_rows)
     mocker.patch("app.signing.encode", side_effect=(f"something-encoded-{i}" for i in count()))
@@ -339,7 +346,7 @@ def test_should_process_job_if_send_limits_are_not_exceeded(notify_api, notify_d
     with _with_message_group_id(process_job, str(job.service_id)):
         process_job(job.id, shatter_batch_size=3)
 
-    s3.get_job_and_metadata_from_s3.assert_called_once_with(service_id=str(job.service.id), job_id=str(job.id))
+    s3.get_job_lines_and_metadata_from_s3.assert_called_once_with(service_id=str(job.service.id), job_id=str(job.id))
     job = jobs_dao.dao_get_job_by_id(job.id)
     assert mock_shatter_job_rows.mock_calls == [
         call(
@@ -402,14 +409,14 @@ def test_should_process_job_if_send_limits_are_not_exceeded(notify_api, notify_d
 
 def test_should_not_create_shatter_task_for_empty_file(sample_job, mocker, mock_celery_task):
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("empty"), {"sender_id": None}),
+        "app.celery.tasks.s3.get_job_lines_and_metadata_from_s3",
+        return_value=(load_example_csv_lines("empty"), {"sender_id": None}),
     )
     mock_shatter_job_rows = mock_celery_task(shatter_job_rows)
 
     process_job(sample_job.id)
 
-    s3.get_job_and_metadata_from_s3.assert_called_once_with(
+    s3.get_job_lines_and_metadata_from_s3.assert_called_once_with(
         service_id=str(sample_job.service.id), job_id=str(sample_job.id)
     )
     job = jobs_dao.dao_get_job_by_id(sample_job.id)
@@ -430,8 +437,8 @@ def test_job_with_files_creates_save_email_task_on_correct_queue(
     encoded_notification = base64.b64encode(b"my notification")
 
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(email_csv, {"sender_id": fake_uuid}),
+        "app.celery.tasks.s3.get_job_lines_and_metadata_from_s3",
+        return_value=(email_csv.splitlines(keepends=True), {"sender_id": fake_uuid}),
     )
     mocker.patch("app.signing.encode", return_value="something_encoded")
     mocker.patch("app.celery.tasks.create_uuid", return_value="some_uuid")
@@ -483,8 +490,8 @@ def test_should_process_email_job(
     test@test.com,foo
     """
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(email_csv, {"sender_id": None}),
+        "app.celery.tasks.s3.get_job_lines_and_metadata_from_s3",
+        return_value=(email_csv.splitlines(keepends=True), {"sender_id": None}),
     )
     mock_shatter_job_rows = mock_celery_task(shatter_job_rows)
     mock_encode = mocker.patch("app.signing.encode", return_value="something_encoded")
@@ -495,7 +502,7 @@ def test_should_process_email_job(
     with _with_message_group_id(process_job, str(email_job_with_placeholders.service_id)):
         process_job(email_job.id)
 
-        s3.get_job_and_metadata_from_s3.assert_called_once_with(
+        s3.get_job_lines_and_metadata_from_s3.assert_called_once_with(
             service_id=str(email_job.service.id),
             job_id=str(email_job.id),
         )
@@ -547,8 +554,8 @@ def test_should_process_email_job_with_sender_id(
     test@test.com,foo
     """
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(email_csv, {"sender_id": fake_uuid}),
+        "app.celery.tasks.s3.get_job_lines_and_metadata_from_s3",
+        return_value=(email_csv.splitlines(keepends=True), {"sender_id": fake_uuid}),
     )
     mock_shatter_job_rows = mock_celery_task(shatter_job_rows)
     mock_encode = mocker.patch("app.signing.encode", return_value="something_encoded")
@@ -558,7 +565,7 @@ def test_should_process_email_job_with_sender_id(
     with _with_message_group_id(process_job, str(email_job.service_id)):
         process_job(email_job.id, sender_id=fake_uuid)
 
-    s3.get_job_and_metadata_from_s3.assert_called_once_with(
+    s3.get_job_lines_and_metadata_from_s3.assert_called_once_with(
         service_id=str(email_job.service.id),
         job_id=str(email_job.id),
     )
@@ -608,8 +615,8 @@ def test_should_process_letter_job(sample_letter_job, mocker, mock_celery_task):
     A1,A2,A3,A4,A_POST,Alice
     """
     s3_mock = mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(csv, {"sender_id": None}),
+        "app.celery.tasks.s3.get_job_lines_and_metadata_from_s3",
+        return_value=(csv.splitlines(keepends=True), {"sender_id": None}),
     )
     mock_encode = mocker.patch("app.signing.encode", return_value="something_encoded")
     mock_shatter_job_rows = mock_celery_task(shatter_job_rows)
@@ -667,8 +674,8 @@ def test_should_process_letter_job(sample_letter_job, mocker, mock_celery_task):
 
 def test_should_process_all_sms_job(sample_job_with_placeholdered_template, mocker, mock_celery_task):
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("multiple_sms"), {"sender_id": None}),
+        "app.celery.tasks.s3.get_job_lines_and_metadata_from_s3",
+        return_value=(load_example_csv_lines("multiple_sms"), {"sender_id": None}),
     )
     mock_shatter_job_rows = mock_celery_task(shatter_job_rows)
     mock_encode = mocker.patch("app.signing.encode", side_effect=(f"something-encoded-{i}" for i in count()))
@@ -677,7 +684,7 @@ def test_should_process_all_sms_job(sample_job_with_placeholdered_template, mock
     with _with_message_group_id(process_job, str(sample_job_with_placeholdered_template.service_id)):
         process_job(sample_job_with_placeholdered_template.id, shatter_batch_size=5)
 
-    s3.get_job_and_metadata_from_s3.assert_called_once_with(
+    s3.get_job_lines_and_metadata_from_s3.assert_called_once_with(
         service_id=str(sample_job_with_placeholdered_template.service.id),
         job_id=str(sample_job_with_placeholdered_template.id),
     )
@@ -771,8 +778,8 @@ def test_should_process_all_sms_job(sample_job_with_placeholdered_template, mock
 
 def test_should_raise_exception_if_job_row_too_big(sample_job_with_placeholdered_template, mocker, mock_celery_task):
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("multiple_sms"), {"sender_id": None}),
+        "app.celery.tasks.s3.get_job_lines_and_metadata_from_s3",
+        return_value=(load_example_csv_lines("multiple_sms"), {"sender_id": None}),
     )
 
     mock_shatter_job_rows = mock_celery_task(shatter_job_rows)
@@ -790,7 +797,7 @@ def test_should_raise_exception_if_job_row_too_big(sample_job_with_placeholdered
         with pytest.raises(UnprocessableJobRow):
             process_job(sample_job_with_placeholdered_template.id, shatter_batch_size=5)
 
-    s3.get_job_and_metadata_from_s3.assert_called_once_with(
+    s3.get_job_lines_and_metadata_from_s3.assert_called_once_with(
         service_id=str(sample_job_with_placeholdered_template.service.id),
         job_id=str(sample_job_with_placeholdered_template.id),
     )
@@ -932,8 +939,8 @@ def test_should_split_shatter_tasks_if_too_big_together(
     sample_job_with_placeholdered_template, mocker, mock_celery_task
 ):
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("multiple_sms"), {"sender_id": None}),
+        "app.celery.tasks.s3.get_job_lines_and_metadata_from_s3",
+        return_value=(load_example_csv_lines("multiple_sms"), {"sender_id": None}),
     )
 
     mock_shatter_job_rows = mock_celery_task(shatter_job_rows)
@@ -954,7 +961,7 @@ def test_should_split_shatter_tasks_if_too_big_together(
     with _with_message_group_id(process_job, str(sample_job_with_placeholdered_template.service_id)):
         process_job(sample_job_with_placeholdered_template.id, shatter_batch_size=5)
 
-    s3.get_job_and_metadata_from_s3.assert_called_once_with(
+    s3.get_job_lines_and_metadata_from_s3.assert_called_once_with(
         service_id=str(sample_job_with_placeholdered_template.service.id),
         job_id=str(sample_job_with_placeholdered_template.id),
     )
@@ -1315,6 +1322,58 @@ def test_shatter_job_rows_passes_none_message_group_id_when_not_set_by_broker(mo
     )
 
 
+@pytest.mark.parametrize(
+    "template_type,batch_fn",
+    [
+        (SMS_TYPE, save_sms_batch),
+        (EMAIL_TYPE, save_email_batch),
+    ],
+)
+def test_shatter_job_rows_sends_whole_batch_to_batch_task_when_enabled(
+    notify_api, template_type, batch_fn, mock_celery_task
+):
+    mock_batch_fn = mock_celery_task(batch_fn)
+    args_kwargs_seq = [
+        (("service-id-0", "notification-id-0", "encoded-0"), {"sender_id": "0"}),
+        (("service-id-0", "notification-id-1", "encoded-1"), {"sender_id": "0"}),
+    ]
+
+    with set_config(notify_api, "BATCH_SAVE_JOB_ROWS_ENABLED", True):
+        with _with_message_group_id(shatter_job_rows, "service-id-0"):
+            shatter_job_rows(template_type, args_kwargs_seq, False)
+
+    mock_batch_fn.assert_called_once_with(
+        (args_kwargs_seq,),
+        queue="database-tasks",
+        MessageGroupId="service-id-0",
+    )
+
+
+@pytest.mark.parametrize(
+    "template_type,has_files,send_fn",
+    [
+        (LETTER_TYPE, False, save_letter),
+        (EMAIL_TYPE, True, save_email),
+    ],
+)
+def test_shatter_job_rows_does_not_batch_letters_or_emails_with_files(
+    notify_api, template_type, has_files, send_fn, mock_celery_task
+):
+    mock_send_fn = mock_celery_task(send_fn)
+    mock_save_email_batch = mock_celery_task(save_email_batch)
+
+    with set_config(notify_api, "BATCH_SAVE_JOB_ROWS_ENABLED", True):
+        with _with_message_group_id(shatter_job_rows, "service-id-0"):
+            shatter_job_rows(
+                template_type,
+                [(("service-id-0", "notification-id-0", "encoded-0"), {})],
+                has_files,
+            )
+
+    assert mock_send_fn.call_count == 1
+    assert mock_save_email_batch.called is False
+
+
 # -------- save_sms and save_email tests -------- #
 
 
@@ -2331,6 +2390,191 @@ def test_save_sms_doesnt_check_international_sms_limit(
     assert persisted_notification.normalised_to == "48697894044"
 
 
+def _batch_args_kwargs(service_id, notification_jsons, sender_id=None):
+    return [
+        (
+            (str(service_id), str(uuid.uuid4()), signing.encode(notification)),
+            {"sender_id": sender_id} if sender_id else {},
+        )
+        for notification in notification_jsons
+    ]
+
+
+def test_save_sms_batch_persists_all_rows_and_sends_to_deliver_sms(notify_api, sample_job, mock_celery_task, mocker):
+    template = sample_job.template
+    args_kwargs_seq = _batch_args_kwargs(
+        template.service_id,
+        [_notification_json(template, f"+44770090000{i}", job_id=sample_job.id, row_number=i) for i in range(3)],
+    )
+    mock_deliver_sms = mock_celery_task(provider_tasks.deliver_sms)
+    mock_increment = mocker.patch("app.notifications.process_notifications.increment_daily_limit_cache")
+
+    with set_config(notify_api, "REDIS_ENABLED", True):
+        with _with_message_group_id(save_sms_batch, str(template.service_id)):
+            save_sms_batch(args_kwargs_seq)
+
+    notifications = Notification.query.order_by(Notification.job_row_number).all()
+    assert [n.job_row_number for n in notifications] == [0, 1, 2]
+    assert [str(n.id) for n in notifications] == [args[1] for args, _ in args_kwargs_seq]
+    assert all(n.status == "created" and n.job_id == sample_job.id for n in notifications)
+    assert notifications[0].normalised_to == "+447700900000"
+
+    assert mock_deliver_sms.call_args_list == [
+        call([str(n.id)], queue="send-sms-tasks", MessageGroupId=str(template.service_id)) for n in notifications
+    ]
+    mock_increment.assert_called_once_with(str(template.service_id), SMS_TYPE, count=3)
+
+
+def test_save_sms_batch_sends_to_deliver_sms_batch(notify_api, sample_template, mock_celery_task):
+    args_kwargs_seq = _batch_args_kwargs(
+        sample_template.service_id,
+        [_notification_json(sample_template, f"+44770090000{i}", row_number=i) for i in range(3)],
+    )
+    mock_deliver_sms = mock_celery_task(provider_tasks.deliver_sms)
+    mock_deliver_sms_batch = mock_celery_task(provider_tasks.deliver_sms_batch)
+
+    with set_config(notify_api, "SMS_DELIVERY_BATCHING_ENABLED", True):
+        with _with_message_group_id(save_sms_batch, str(sample_template.service_id)):
+            save_sms_batch(args_kwargs_seq)
+
+    mock_deliver_sms_batch.assert_called_once_with(
+        [[args[1] for args, _ in args_kwargs_seq]],
+        queue="send-sms-tasks",
+        MessageGroupId=str(sample_template.service_id),
+    )
+    assert not mock_deliver_sms.called
+
+
+def test_save_email_batch_uses_reply_to_text_for_sender_id(sample_email_template, mock_celery_task):
+    reply_to = create_reply_to_email(sample_email_template.service, "reply@example.gov.uk", is_default=False)
+    args_kwargs_seq = _batch_args_kwargs(
+        sample_email_template.service_id,
+        [_notification_json(sample_email_template, f"test{i}@example.gov.uk", row_number=i) for i in range(2)],
+        sender_id=str(reply_to.id),
+    )
+    mock_deliver_email = mock_celery_task(provider_tasks.deliver_email)
+
+    with _with_message_group_id(save_email_batch, None):
+        save_email_batch(args_kwargs_seq)
+
+    notifications = Notification.query.all()
+    assert len(notifications) == 2
+    assert {n.reply_to_text for n in notifications} == {"reply@example.gov.uk"}
+    assert mock_deliver_email.call_count == 2
+
+
+def test_save_email_batch_sends_to_deliver_emails_in_batches(notify_api, sample_email_template, mock_celery_task):
+    args_kwargs_seq = _batch_args_kwargs(
+        sample_email_template.service_id,
+        [_notification_json(sample_email_template, f"test{i}@example.gov.uk", row_number=i) for i in range(3)],
+    )
+    mock_deliver_email = mock_celery_task(provider_tasks.deliver_email)
+    mock_deliver_emails = mock_celery_task(provider_tasks.deliver_emails)
+
+    with set_config(notify_api, "EMAIL_DELIVERY_BATCHING_ENABLED", True):
+        with set_config(notify_api, "EMAIL_DELIVERY_BATCH_SIZE", 2):
+            with _with_message_group_id(save_email_batch, str(sample_email_template.service_id)):
+                save_email_batch(args_kwargs_seq)
+
+    notification_ids = [args[1] for args, _ in args_kwargs_seq]
+    assert mock_deliver_emails.call_args_list == [
+        call([notification_ids[:2]], queue="send-email-tasks", MessageGroupId=str(sample_email_template.service_id)),
+        call([notification_ids[2:]], queue="send-email-tasks", MessageGroupId=str(sample_email_template.service_id)),
+    ]
+    assert not mock_deliver_email.called
+
+
+def test_save_sms_batch_skips_rows_already_saved(sample_job, mock_celery_task):
+    template = sample_job.template
+    args_kwargs_seq = _batch_args_kwargs(
+        template.service_id,
+        [_notification_json(template, "+447700900000", job_id=sample_job.id, row_number=i) for i in range(3)],
+    )
+    mock_deliver_sms = mock_celery_task(provider_tasks.deliver_sms)
+    # one row's notification id has already been saved, and another's job row number
+    saved_by_id = create_notification(template)
+    (service_id, _, encoded_notification), kwargs = args_kwargs_seq[0]
+    args_kwargs_seq[0] = ((service_id, str(saved_by_id.id), encoded_notification), kwargs)
+    create_notification(template, job=sample_job, job_row_number=1)
+
+    with _with_message_group_id(save_sms_batch, None):
+        save_sms_batch(args_kwargs_seq)
+
+    assert Notification.query.count() == 3
+    mock_deliver_sms.assert_called_once_with([args_kwargs_seq[2][0][1]], queue="send-sms-tasks", MessageGroupId=None)
+
+
+def test_save_sms_batch_sends_rows_failing_validation_to_save_sms(sample_template, mock_celery_task):
+    args_kwargs_seq = _batch_args_kwargs(
+        sample_template.service_id,
+        [
+            _notification_json(sample_template, "+447700900000", row_number=0),
+            _notification_json(sample_template, "+447234123122343253243425324233", row_number=1),
+        ],
+    )
+    mock_celery_task(provider_tasks.deliver_sms)
+    mock_save_sms = mock_celery_task(save_sms)
+
+    with _with_message_group_id(save_sms_batch, "group-id"):
+        save_sms_batch(args_kwargs_seq)
+
+    assert Notification.query.one().job_row_number == 0
+    mock_save_sms.assert_called_once_with(
+        *args_kwargs_seq[1],
+        queue="database-tasks",
+        MessageGroupId="group-id",
+    )
+
+
+def test_save_sms_batch_sends_all_rows_to_save_sms_if_database_errors(sample_template, mock_celery_task, mocker):
+    args_kwargs_seq = _batch_args_kwargs(
+        sample_template.service_id,
+        [_notification_json(sample_template, "+447700900000", row_number=i) for i in range(2)],
+    )
+    mock_deliver_sms = mock_celery_task(provider_tasks.deliver_sms)
+    mock_save_sms = mock_celery_task(save_sms)
+    mocker.patch("app.celery.tasks.dao_bulk_create_notifications", side_effect=SQLAlchemyError)
+
+    with _with_message_group_id(save_sms_batch, None):
+        save_sms_batch(args_kwargs_seq)
+
+    assert Notification.query.count() == 0
+    assert mock_deliver_sms.called is False
+    assert mock_save_sms.call_args_list == [
+        call(*args_kwargs, queue="database-tasks", MessageGroupId=None) for args_kwargs in args_kwargs_seq
+    ]
+
+
+@pytest.mark.parametrize(
+    "batch_task, template_type, recipient",
+    [
+        (save_sms_batch, SMS_TYPE, "+447700900000"),
+        (save_email_batch, EMAIL_TYPE, "test@example.gov.uk"),
+    ],
+)
+def test_save_batch_should_go_to_retry_queue_if_database_errors(
+    sample_service, mock_celery_task, mocker, batch_task, template_type, recipient
+):
+    template = create_template(sample_service, template_type=template_type)
+    args_kwargs_seq = _batch_args_kwargs(
+        sample_service.id, [_notification_json(template, recipient, row_number=i) for i in range(2)]
+    )
+    mock_save_sms = mock_celery_task(save_sms)
+    mock_save_email = mock_celery_task(save_email)
+    expected_exception = SQLAlchemyError()
+    mocker.patch("app.celery.tasks._get_reply_to_text_for_job_row", side_effect=expected_exception)
+    mock_retry = mocker.patch.object(batch_task, "retry", side_effect=Retry)
+
+    with pytest.raises(Retry):
+        with _with_message_group_id(batch_task, "group-id"):
+            batch_task(args_kwargs_seq)
+
+    mock_retry.assert_called_once_with(exc=expected_exception, queue="retry-tasks", MessageGroupId="group-id")
+    assert Notification.query.count() == 0
+    assert not mock_save_sms.called
+    assert not mock_save_email.called
+
+
 def test_save_letter_calls_get_pdf_for_templated_letter_task(
     mocker, mock_celery_task, notify_db_session, sample_letter_job
 ):
@@ -2381,40 +2625,40 @@ def test_should_cancel_job_if_service_is_inactive(sample_service, sample_job, mo
 
 def test_get_email_template_instance(mocker, mock_celery_task, sample_email_template, sample_job):
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=("", {}),
+        "app.celery.tasks.s3.get_job_lines_and_metadata_from_s3",
+        return_value=(["email address\n", "test@example.com\n"], {}),
     )
     sample_job.template_id = sample_email_template.id
     (
-        recipient_csv,
+        job_rows,
         template,
         _sender_id,
-    ) = get_recipient_csv_and_template_and_sender_id(sample_job)
+    ) = get_job_rows_and_template_and_sender_id(sample_job)
 
     assert isinstance(template, PlainTextEmailTemplate)
-    assert recipient_csv.placeholders == ["email address"]
+    assert [row.recipient for row in job_rows] == ["test@example.com"]
 
 
 def test_get_sms_template_instance(mocker, mock_celery_task, sample_template, sample_job):
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=("", {}),
+        "app.celery.tasks.s3.get_job_lines_and_metadata_from_s3",
+        return_value=(["phone number\n", "07700900001\n"], {}),
     )
     sample_job.template = sample_template
     (
-        recipient_csv,
+        job_rows,
         template,
         _sender_id,
-    ) = get_recipient_csv_and_template_and_sender_id(sample_job)
+    ) = get_job_rows_and_template_and_sender_id(sample_job)
 
     assert isinstance(template, SMSMessageTemplate)
-    assert recipient_csv.placeholders == ["phone number"]
+    assert [row.recipient for row in job_rows] == ["07700900001"]
 
 
 def test_get_letter_template_instance(mocker, mock_celery_task, sample_job):
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=("", {}),
+        "app.celery.tasks.s3.get_job_lines_and_metadata_from_s3",
+        return_value=([], {}),
     )
     sample_contact_block = create_letter_contact(service=sample_job.service, contact_block="((reference number))")
     sample_template = create_template(
@@ -2425,25 +2669,286 @@ def test_get_letter_template_instance(mocker, mock_celery_task, sample_job):
     sample_job.template_id = sample_template.id
 
     (
-        recipient_csv,
+        job_rows,
         template,
         _sender_id,
-    ) = get_recipient_csv_and_template_and_sender_id(sample_job)
+    ) = get_job_rows_and_template_and_sender_id(sample_job)
 
     assert isinstance(template, LetterPrintTemplate)
     assert template.contact_block == ("((reference number))")
     assert template.placeholders == {"reference number"}
-    assert recipient_csv.placeholders == [
-        "reference number",
-        "address line 1",
-        "address line 2",
-        "address line 3",
-        "address line 4",
-        "address line 5",
-        "address line 6",
-        "postcode",
-        "address line 7",
+    assert list(job_rows) == []
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 1000])
+def test_iter_job_csv_rows_gives_same_rows_as_parsing_whole_file(sample_template_with_placeholders, chunk_size):
+    csv_file = (
+        "phone number,name\r\n"
+        "\r\n"
+        "07700900001,Alice\r\n"
+        '07700900002,"Bob\r\nwith a newline"\r\n'
+        ",\r\n"
+        "07700900003,Carol\r\n"
+        "07700900004,\r\n"
+    )
+    template = sample_template_with_placeholders._as_utils_template()
+
+    rows = list(iter_job_csv_rows(csv_file.splitlines(keepends=True), template, chunk_size=chunk_size))
+
+    expected_rows = list(RecipientCSV(csv_file, template=template))
+    assert [row.index for row in rows] == [row.index for row in expected_rows] == [0, 1, 2, 3]
+    assert [row.recipient for row in rows] == [row.recipient for row in expected_rows]
+    assert [dict(row.personalisation) for row in rows] == [dict(row.personalisation) for row in expected_rows]
+
+
+def test_iter_job_csv_rows_with_empty_file(sample_template):
+    assert list(iter_job_csv_rows([], sample_template._as_utils_template())) == []
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 1000])
+@pytest.mark.parametrize(
+    "start, stop, expected_indexes",
+    [
+        (0, None, list(range(10))),
+        (3, 7, [3, 4, 5, 6]),
+        (8, 20, [8, 9]),
+    ],
+)
+def test_iter_job_csv_rows_with_start_and_stop(sample_template, chunk_size, start, stop, expected_indexes):
+    rows = list(
+        iter_job_csv_rows(
+            load_example_csv_lines("multiple_sms"),
+            sample_template._as_utils_template(),
+            chunk_size=chunk_size,
+            start=start,
+            stop=stop,
+        )
+    )
+
+    assert [row.index for row in rows] == expected_indexes
+    assert [row.recipient for row in rows] == [f"+44123412312{(i + 1) % 10}" for i in expected_indexes]
+
+
+def _create_partitioned_job(template, shattered_partitions=()):
+    job = create_job(
+        template=template,
+        notification_count=10,
+        job_status=JOB_STATUS_IN_PROGRESS,
+        processing_started=datetime.utcnow() - timedelta(minutes=5),
+    )
+    job.shatter_partition_size = 4
+    job.shattered_partitions = list(shattered_partitions)
+    jobs_dao.dao_update_job(job)
+    return job
+
+
+def test_process_job_splits_large_job_into_partitions(notify_api, sample_template, mocker, mock_celery_task):
+    job = create_job(template=sample_template, notification_count=10)
+    mock_get_s3 = mocker.patch("app.celery.tasks.s3.get_job_lines_and_metadata_from_s3")
+    mock_partition_task = mock_celery_task(process_job_partition)
+    mock_shatter_task = mock_celery_task(shatter_job_rows)
+
+    with set_config(notify_api, "PARALLEL_JOB_SHATTERING_ENABLED", True):
+        with set_config(notify_api, "JOB_SHATTER_PARTITION_SIZE", 4):
+            with _with_message_group_id(process_job, str(job.service_id)):
+                process_job(job.id, shatter_batch_size=3)
+
+    assert mock_partition_task.mock_calls == [
+        call(
+            (str(job.id), partition),
+            {"shatter_batch_size": 3},
+            queue="job-tasks",
+            MessageGroupId=str(job.service_id),
+        )
+        for partition in (0, 1, 2)
     ]
+    assert not mock_get_s3.called
+    assert not mock_shatter_task.called
+
+    job = jobs_dao.dao_get_job_by_id(job.id)
+    assert job.job_status == JOB_STATUS_IN_PROGRESS
+    assert job.shatter_partition_size == 4
+    assert job.shatter_partition_count == 3
+    assert job.shattered_partitions == []
+
+
+def test_process_job_does_not_partition_job_no_bigger_than_partition_size(
+    notify_api, sample_template, mocker, mock_celery_task
+):
+    job = create_job(template=sample_template, notification_count=10)
+    mocker.patch(
+        "app.celery.tasks.s3.get_job_lines_and_metadata_from_s3",
+        return_value=(load_example_csv_lines("multiple_sms"), {"sender_id": None}),
+    )
+    mock_partition_task = mock_celery_task(process_job_partition)
+    mock_shatter_task = mock_celery_task(shatter_job_rows)
+
+    with set_config(notify_api, "PARALLEL_JOB_SHATTERING_ENABLED", True):
+        with set_config(notify_api, "JOB_SHATTER_PARTITION_SIZE", 10):
+            with _with_message_group_id(process_job, str(job.service_id)):
+                process_job(job.id)
+
+    assert not mock_partition_task.called
+    assert mock_shatter_task.called
+
+    job = jobs_dao.dao_get_job_by_id(job.id)
+    assert job.job_status == JOB_STATUS_FINISHED
+    assert job.shatter_partition_size is None
+
+
+def test_process_job_partition_shatters_rows_in_its_range(sample_template, mocker, mock_celery_task):
+    job = _create_partitioned_job(sample_template)
+    mocker.patch(
+        "app.celery.tasks.s3.get_job_lines_and_metadata_from_s3",
+        return_value=(load_example_csv_lines("multiple_sms"), {"sender_id": None}),
+    )
+    mock_shatter_job_rows = mock_celery_task(shatter_job_rows)
+    mock_encode = mocker.patch("app.signing.encode", side_effect=(f"something-encoded-{i}" for i in count()))
+    mocker.patch("app.celery.tasks.create_uuid", side_effect=(f"uuid-{i}" for i in count()))
+
+    with _with_message_group_id(process_job_partition, str(job.service_id)):
+        process_job_partition(str(job.id), 1, shatter_batch_size=3)
+
+    assert [encode_call.args[0]["row_number"] for encode_call in mock_encode.mock_calls] == [4, 5, 6, 7]
+    assert mock_shatter_job_rows.mock_calls == [
+        call(
+            (
+                SMS_TYPE,
+                [((str(job.service_id), f"uuid-{i}", f"something-encoded-{i}"), {}) for i in range(3)],
+                False,
+            ),
+            queue="job-tasks",
+            MessageGroupId=str(job.service_id),
+        ),
+        call(
+            (SMS_TYPE, [((str(job.service_id), "uuid-3", "something-encoded-3"), {})], False),
+            queue="job-tasks",
+            MessageGroupId=str(job.service_id),
+        ),
+    ]
+
+    job = jobs_dao.dao_get_job_by_id(job.id)
+    assert job.shattered_partitions == [1]
+    assert job.job_status == JOB_STATUS_IN_PROGRESS
+    assert job.processing_finished is None
+
+
+def test_process_job_partition_finishes_job_after_last_partition(sample_template, mocker, mock_celery_task):
+    job = _create_partitioned_job(sample_template, shattered_partitions=[0, 1])
+    mocker.patch(
+        "app.celery.tasks.s3.get_job_lines_and_metadata_from_s3",
+        return_value=(load_example_csv_lines("multiple_sms"), {"sender_id": None}),
+    )
+    mock_shatter_job_rows = mock_celery_task(shatter_job_rows)
+    mock_encode = mocker.patch("app.signing.encode", return_value="something_encoded")
+
+    with _with_message_group_id(process_job_partition, str(job.service_id)):
+        process_job_partition(str(job.id), 2)
+
+    # the last partition only has the two rows left over
+    assert [encode_call.args[0]["row_number"] for encode_call in mock_encode.mock_calls] == [8, 9]
+    assert mock_shatter_job_rows.call_count == 1
+
+    job = jobs_dao.dao_get_job_by_id(job.id)
+    assert sorted(job.shattered_partitions) == [0, 1, 2]
+    assert job.job_status == JOB_STATUS_FINISHED
+    assert job.processing_finished is not None
+
+
+def test_process_job_partition_resumes_after_rows_already_saved(sample_template, mocker, mock_celery_task):
+    job = _create_partitioned_job(sample_template)
+    # rows 4 and 5 were saved by an earlier, unfinished run of partition 1; row 8 is in partition 2
+    create_notification(sample_template, job, 4)
+    create_notification(sample_template, job, 5)
+    create_notification(sample_template, job, 8)
+    mocker.patch(
+        "app.celery.tasks.s3.get_job_lines_and_metadata_from_s3",
+        return_value=(load_example_csv_lines("multiple_sms"), {"sender_id": None}),
+    )
+    mock_shatter_job_rows = mock_celery_task(shatter_job_rows)
+    mock_encode = mocker.patch("app.signing.encode", return_value="something_encoded")
+
+    with _with_message_group_id(process_job_partition, str(job.service_id)):
+        process_job_partition(str(job.id), 1)
+
+    assert [encode_call.args[0]["row_number"] for encode_call in mock_encode.mock_calls] == [6, 7]
+    assert mock_shatter_job_rows.call_count == 1
+    assert jobs_dao.dao_get_job_by_id(job.id).shattered_partitions == [1]
+
+
+def test_process_job_partition_sends_nothing_if_all_its_rows_already_saved(sample_template, mocker, mock_celery_task):
+    job = _create_partitioned_job(sample_template)
+    create_notification(sample_template, job, 7)
+    mocker.patch(
+        "app.celery.tasks.s3.get_job_lines_and_metadata_from_s3",
+        return_value=(load_example_csv_lines("multiple_sms"), {"sender_id": None}),
+    )
+    mock_shatter_job_rows = mock_celery_task(shatter_job_rows)
+
+    with _with_message_group_id(process_job_partition, str(job.service_id)):
+        process_job_partition(str(job.id), 1)
+
+    assert not mock_shatter_job_rows.called
+    assert jobs_dao.dao_get_job_by_id(job.id).shattered_partitions == [1]
+
+
+@pytest.mark.parametrize(
+    "job_status, shattered_partitions",
+    [
+        (JOB_STATUS_IN_PROGRESS, [1]),
+        (JOB_STATUS_CANCELLED, []),
+    ],
+)
+def test_process_job_partition_does_nothing_if_already_shattered_or_job_not_in_progress(
+    sample_template, mocker, mock_celery_task, job_status, shattered_partitions
+):
+    job = _create_partitioned_job(sample_template, shattered_partitions=shattered_partitions)
+    job.job_status = job_status
+    jobs_dao.dao_update_job(job)
+    mock_get_s3 = mocker.patch("app.celery.tasks.s3.get_job_lines_and_metadata_from_s3")
+    mock_shatter_job_rows = mock_celery_task(shatter_job_rows)
+
+    process_job_partition(str(job.id), 1)
+
+    assert not mock_get_s3.called
+    assert not mock_shatter_job_rows.called
+    assert jobs_dao.dao_get_job_by_id(job.id).shattered_partitions == shattered_partitions
+
+
+def test_process_incomplete_job_resumes_partitioned_job_from_remaining_partitions(
+    sample_template, mocker, mock_celery_task
+):
+    job = _create_partitioned_job(sample_template, shattered_partitions=[1])
+    # rows from the unfinished partitions don't affect where the job resumes from
+    create_notification(sample_template, job, 0)
+    mock_get_s3 = mocker.patch("app.celery.tasks.s3.get_job_lines_and_metadata_from_s3")
+    mock_partition_task = mock_celery_task(process_job_partition)
+
+    process_incomplete_job(str(job.id), shatter_batch_size=3)
+
+    assert mock_partition_task.mock_calls == [
+        call(
+            (str(job.id), partition),
+            {"shatter_batch_size": 3},
+            queue="job-tasks",
+            MessageGroupId=str(job.service_id),
+        )
+        for partition in (0, 2)
+    ]
+    assert not mock_get_s3.called
+    assert jobs_dao.dao_get_job_by_id(job.id).job_status == JOB_STATUS_IN_PROGRESS
+
+
+def test_process_incomplete_job_finishes_partitioned_job_with_all_partitions_shattered(
+    sample_template, mock_celery_task
+):
+    job = _create_partitioned_job(sample_template, shattered_partitions=[0, 1, 2])
+    mock_partition_task = mock_celery_task(process_job_partition)
+
+    process_incomplete_job(str(job.id))
+
+    assert not mock_partition_task.called
+    assert jobs_dao.dao_get_job_by_id(job.id).job_status == JOB_STATUS_FINISHED
 
 
 def test_process_incomplete_job_sms(mocker, mock_celery_task, sample_template):
@@ -2462,8 +2967,8 @@ def test_process_incomplete_job_sms(mocker, mock_celery_task, sample_template):
     assert Notification.query.filter(Notification.job_id == job.id).count() == 2
 
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("multiple_sms"), {"sender_id": None}),
+        "app.celery.tasks.s3.get_job_lines_and_metadata_from_s3",
+        return_value=(load_example_csv_lines("multiple_sms"), {"sender_id": None}),
     )
     mock_shatter_job_rows = mock_celery_task(shatter_job_rows)
     mock_encode = mocker.patch("app.signing.encode", side_effect=(f"something-encoded-{i}" for i in count()))
@@ -2561,8 +3066,8 @@ def test_process_incomplete_job_sms(mocker, mock_celery_task, sample_template):
 
 def test_process_incomplete_job_with_notifications_all_sent(mocker, mock_celery_task, sample_template):
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("multiple_sms"), {"sender_id": None}),
+        "app.celery.tasks.s3.get_job_lines_and_metadata_from_s3",
+        return_value=(load_example_csv_lines("multiple_sms"), {"sender_id": None}),
     )
     mock_shatter_job_rows = mock_celery_task(shatter_job_rows)
 
@@ -2631,8 +3136,8 @@ def test_process_incomplete_jobs_sms(mocker, mock_celery_task, sample_template):
     assert Notification.query.filter(Notification.job_id == job2.id).count() == 5
 
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("multiple_sms"), {"sender_id": None}),
+        "app.celery.tasks.s3.get_job_lines_and_metadata_from_s3",
+        return_value=(load_example_csv_lines("multiple_sms"), {"sender_id": None}),
     )
     mock_shatter_job_rows = mock_celery_task(shatter_job_rows)
     mocker.patch(
@@ -2824,8 +3329,8 @@ def test_process_incomplete_jobs_raises_exception_if_row_too_big(mocker, mock_ce
     assert Notification.query.filter(Notification.job_id == job2.id).count() == 5
 
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("multiple_sms"), {"sender_id": None}),
+        "app.celery.tasks.s3.get_job_lines_and_metadata_from_s3",
+        return_value=(load_example_csv_lines("multiple_sms"), {"sender_id": None}),
     )
 
     mock_shatter_job_rows = mock_celery_task(shatter_job_rows)
@@ -3018,8 +3523,8 @@ def test_process_incomplete_jobs_raises_exception_if_row_too_big(mocker, mock_ce
 
 def test_process_incomplete_jobs_no_notifications_added(mocker, mock_celery_task, sample_template):
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("multiple_sms"), {"sender_id": None}),
+        "app.celery.tasks.s3.get_job_lines_and_metadata_from_s3",
+        return_value=(load_example_csv_lines("multiple_sms"), {"sender_id": None}),
     )
     mock_shatter_job_rows = mock_celery_task(shatter_job_rows)
 
@@ -3049,8 +3554,8 @@ def test_process_incomplete_jobs_no_notifications_added(mocker, mock_celery_task
 
 def test_process_incomplete_jobs_empty_ids_arg(mocker, mock_celery_task, sample_template):
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("multiple_sms"), {"sender_id": None}),
+        "app.celery.tasks.s3.get_job_lines_and_metadata_from_s3",
+        return_value=(load_example_csv_lines("multiple_sms"), {"sender_id": None}),
     )
     mock_shatter_job_rows = mock_celery_task(shatter_job_rows)
 
@@ -3062,8 +3567,8 @@ def test_process_incomplete_jobs_empty_ids_arg(mocker, mock_celery_task, sample_
 
 def test_process_incomplete_job_no_job_in_database(mocker, mock_celery_task, fake_uuid):
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("multiple_sms"), {"sender_id": None}),
+        "app.celery.tasks.s3.get_job_lines_and_metadata_from_s3",
+        return_value=(load_example_csv_lines("multiple_sms"), {"sender_id": None}),
     )
     mock_shatter_job_rows = mock_celery_task(shatter_job_rows)
 
@@ -3075,8 +3580,8 @@ def test_process_incomplete_job_no_job_in_database(mocker, mock_celery_task, fak
 
 def test_process_incomplete_job_email(mocker, mock_celery_task, sample_email_template):
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("multiple_email"), {"sender_id": None}),
+        "app.celery.tasks.s3.get_job_lines_and_metadata_from_s3",
+        return_value=(load_example_csv_lines("multiple_email"), {"sender_id": None}),
     )
     mock_shatter_job_rows = mock_celery_task(shatter_job_rows)
 
@@ -3105,8 +3610,8 @@ def test_process_incomplete_job_email(mocker, mock_celery_task, sample_email_tem
 
 def test_process_incomplete_job_letter(mocker, mock_celery_task, sample_letter_template):
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("multiple_letter"), {"sender_id": None}),
+        "app.celery.tasks.s3.get_job_lines_and_metadata_from_s3",
+        return_value=(load_example_csv_lines("multiple_letter"), {"sender_id": None}),
     )
     mock_shatter_job_rows = mock_celery_task(shatter_job_rows)
 
@@ -219,3 +219,20 @@ def test_stub_client_is_compatible_with_real_client():
     )
     # send_email should match exactly
     assert inspect.signature(AwsSesClient.send_email) == inspect.signature(AwsSesStubClient.send_email)
+
+
+def test_get_max_send_rate(notify_api, mocker):
+    boto_mock = mocker.patch.object(aws_ses_client, "_client", create=True)
+    boto_mock.get_account.return_value = {"SendQuota": {"Max24HourSend": 50000.0, "MaxSendRate": 14.0}}
+
+    assert aws_ses_client.get_max_send_rate() == 14.0
+
+
+def test_get_max_send_rate_raises_aws_ses_client_exception(notify_api, mocker):
+    boto_mock = mocker.patch.object(aws_ses_client, "_client", create=True)
+    boto_mock.get_account.side_effect = botocore.exceptions.ClientError(
+        {"Error": {"Code": "AccessDeniedException", "Message": "denied"}}, "GetAccount"
+    )
+
+    with pytest.raises(AwsSesClientException):
+        aws_ses_client.get_max_send_rate()
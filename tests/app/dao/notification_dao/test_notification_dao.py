@@ -7,7 +7,7 @@ from freezegun import freeze_time
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.orm.exc import NoResultFound
 
-from app import db
+from app import db, signing
 from app.constants import (
     JOB_STATUS_IN_PROGRESS,
     KEY_TYPE_NORMAL,
@@ -23,8 +23,11 @@ from app.constants import (
     SMS_TYPE,
 )
 from app.dao.notifications_dao import (
+    dao_apply_notification_status_updates,
+    dao_bulk_create_notifications,
     dao_create_notification,
     dao_delete_notifications_by_id,
+    dao_get_already_saved_notifications,
     dao_get_last_notification_added_for_job_id,
     dao_get_letters_and_sheets_volume_by_postage,
     dao_get_letters_to_be_printed,
@@ -33,12 +36,14 @@ from app.dao.notifications_dao import (
     dao_get_notification_or_history_by_id,
     dao_get_notification_or_history_by_reference,
     dao_get_notifications_by_recipient_or_reference,
+    dao_get_notifications_or_history_by_references,
     dao_get_notifications_processing_time_stats,
     dao_letters_in_technical_failure,
     dao_precompiled_letters_still_pending_virus_check,
     dao_record_letter_despatched_on_by_id,
     dao_timeout_notifications,
     dao_update_notification,
+    dao_update_notification_statuses_by_id,
     dao_update_notifications_by_reference,
     get_notification_by_id,
     get_notification_by_job_and_job_row_number,
@@ -166,6 +171,89 @@ def test_should_not_update_status_by_id_if_sent_to_country_with_delivery_receipt
     assert notification.status == NOTIFICATION_DELIVERED
 
 
+def test_dao_update_notification_statuses_by_id(sample_template, caplog):
+    sending = create_notification(template=sample_template, status="sending")
+    pending = create_notification(template=sample_template, status="pending", sent_by="firetext")
+    delivered = create_notification(template=sample_template, status="delivered", sent_by="mmg")
+    missing_id = uuid.uuid4()
+
+    result = dao_update_notification_statuses_by_id(
+        [
+            (sending.id, "pending", "mmg", None),
+            (pending.id, "permanent-failure", "firetext", "102"),
+            (delivered.id, "permanent-failure", "mmg", None),
+            (missing_id, "delivered", "mmg", None),
+            (sending.id, "delivered", "firetext", None),
+        ]
+    )
+
+    assert result == [None, pending, None, None, sending]
+    assert sending.status == "delivered"
+    assert sending.sent_by == "mmg"
+    assert pending.status == "temporary-failure"
+    assert delivered.status == "delivered"
+    assert f"Notification not found for id {missing_id} (when attempting to update to status delivered)" in (
+        caplog.messages
+    )
+
+
+def test_dao_update_notification_statuses_by_id_decides_failure_type_from_status_earlier_in_batch(sample_template):
+    notification = create_notification(template=sample_template, status="sending", sent_by="firetext")
+
+    result = dao_update_notification_statuses_by_id(
+        [
+            (notification.id, "pending", "firetext", None),
+            (notification.id, "permanent-failure", "firetext", None),
+        ]
+    )
+
+    assert result == [None, notification]
+    # the same as if the updates had been applied one at a time
+    assert notification.status == "temporary-failure"
+
+
+@freeze_time("2016-01-01 12:00:00")
+def test_dao_apply_notification_status_updates_never_moves_status_backwards(sample_template):
+    created = create_notification(template=sample_template, status="created")
+    pending = create_notification(template=sample_template, status="pending")
+    delivered = create_notification(template=sample_template, status="delivered")
+    sent_at = datetime(2016, 1, 1, 11, 59)
+
+    dao_apply_notification_status_updates(
+        [
+            (notification.id, "sending", {"sent_at": sent_at, "sent_by": "mmg", "billable_units": 2})
+            for notification in (created, pending, delivered)
+        ]
+        + [(uuid.uuid4(), "sending", {"sent_at": sent_at, "sent_by": "mmg", "billable_units": 2})]
+    )
+
+    for notification, expected_status in ((created, "sending"), (pending, "pending"), (delivered, "delivered")):
+        notification = Notification.query.get(notification.id)
+        assert notification.status == expected_status
+        assert notification.sent_at == sent_at
+        assert notification.sent_by == "mmg"
+        assert notification.billable_units == 2
+        assert notification.updated_at == datetime(2016, 1, 1, 12, 0)
+
+
+def test_dao_apply_notification_status_updates_groups_updates_by_columns(sample_template, notify_db_session_log):
+    first, second, third = (create_notification(template=sample_template, status="created") for _ in range(3))
+    notify_db_session_log.clear()
+
+    dao_apply_notification_status_updates(
+        [
+            (first.id, "sending", {"reference": "first-reference", "sent_by": "ses"}),
+            (second.id, "sent", {"reference": None, "sent_by": "ses"}),
+            (third.id, "pending", {"billable_units": 3}),
+        ]
+    )
+
+    assert len([query for query, *_ in notify_db_session_log if query.startswith("UPDATE notifications")]) == 2
+    assert Notification.query.get(first.id).reference == "first-reference"
+    assert Notification.query.get(second.id).status == "sent"
+    assert Notification.query.get(third.id).billable_units == 3
+
+
 def test_should_by_able_to_update_status_by_id_from_pending_to_delivered(sample_template, sample_job):
     notification = create_notification(template=sample_template, job=sample_job, status="sending")
 
@@ -241,6 +329,93 @@ def test_save_notification_creates_sms(sample_template, sample_job):
     assert notification_from_db.status == "created"
 
 
+def _bulk_notification_row(sample_template, job_id=None, row_number=None, **kwargs):
+    return {
+        "to": "+447700900123",
+        "normalised_to": "447700900123",
+        "service_id": sample_template.service_id,
+        "template_id": sample_template.id,
+        "template_version": sample_template.version,
+        "created_at": datetime.utcnow(),
+        "notification_type": sample_template.template_type,
+        "key_type": KEY_TYPE_NORMAL,
+        "job_id": job_id,
+        "job_row_number": row_number,
+        "_personalisation": signing.encode({"name": "Jo"}),
+        **kwargs,
+    }
+
+
+@pytest.mark.parametrize("use_copy", [False, True])
+def test_dao_bulk_create_notifications_inserts_rows_and_returns_ids_in_order(sample_template, sample_job, use_copy):
+    ids = [uuid.uuid4() for _ in range(3)]
+    rows = [
+        _bulk_notification_row(sample_template, job_id=sample_job.id, row_number=i, id=ids[i], reply_to_text="\tab\\")
+        for i in range(3)
+    ]
+
+    assert dao_bulk_create_notifications(rows, use_copy=use_copy) == ids
+
+    notifications = Notification.query.order_by(Notification.job_row_number).all()
+    assert [n.id for n in notifications] == ids
+    for notification in notifications:
+        assert notification.job_id == sample_job.id
+        assert notification.to == "+447700900123"
+        assert notification.personalisation == {"name": "Jo"}
+        assert notification.reply_to_text == "\tab\\"
+        assert notification.sent_at is None
+
+
+@pytest.mark.parametrize("use_copy", [False, True])
+def test_dao_bulk_create_notifications_fills_in_defaults(sample_template, use_copy):
+    (notification_id,) = dao_bulk_create_notifications([_bulk_notification_row(sample_template)], use_copy=use_copy)
+
+    notification = Notification.query.one()
+    assert notification.id == notification_id
+    assert notification.status == "created"
+    assert notification.billable_units == 0
+    assert notification.international is False
+
+
+def test_dao_bulk_create_notifications_with_no_rows(notify_db_session):
+    assert dao_bulk_create_notifications([]) == []
+    assert Notification.query.count() == 0
+
+
+def test_dao_bulk_create_notifications_rolls_back_whole_batch_on_error(sample_template, sample_job):
+    created_at = datetime.utcnow()
+    rows = [
+        _bulk_notification_row(sample_template, job_id=sample_job.id, row_number=0, created_at=created_at)
+        for _ in range(2)
+    ]
+
+    with pytest.raises(IntegrityError):
+        dao_bulk_create_notifications(rows)
+
+    assert Notification.query.count() == 0
+
+
+def test_dao_get_already_saved_notifications(sample_template, sample_job):
+    saved_by_id = create_notification(sample_template, job=sample_job, job_row_number=0)
+    saved_by_job_row = create_notification(sample_template, job=sample_job, job_row_number=1)
+    create_notification(sample_template, job=sample_job, job_row_number=2)
+    other_job = create_notification(sample_template, job=create_job(sample_template), job_row_number=1)
+
+    assert {
+        tuple(row) for row in dao_get_already_saved_notifications([saved_by_id.id, uuid.uuid4()], sample_job.id, [1, 3])
+    } == {(saved_by_id.id, 0), (saved_by_job_row.id, 1)}
+    assert dao_get_already_saved_notifications([other_job.id]) == [(other_job.id, 1)]
+    assert dao_get_already_saved_notifications([uuid.uuid4()], sample_job.id, [3]) == []
+
+
+def test_dao_get_already_saved_notifications_only_checks_since_job_was_created(sample_template, sample_job):
+    saved_before_job = create_notification(
+        sample_template, job=sample_job, job_row_number=0, created_at=sample_job.created_at - timedelta(days=1)
+    )
+
+    assert dao_get_already_saved_notifications([saved_before_job.id], sample_job.id, [0]) == []
+
+
 def test_save_notification_and_create_email(sample_email_template, sample_job):
     assert Notification.query.count() == 0
 
@@ -705,6 +880,33 @@ def test_should_not_count_pages_when_given_a_flag(sample_user, sample_template):
     assert pagination.items[0].id == notification.id
 
 
+def test_get_notifications_for_service_older_than_pages_through_notifications_created_at_the_same_time(
+    sample_template,
+):
+    created_at = datetime.utcnow()
+    notifications = [create_notification(sample_template, created_at=created_at) for _ in range(5)]
+    create_notification(sample_template, created_at=created_at - timedelta(seconds=1))
+
+    first_page = get_notifications_for_service(sample_template.service_id, count_pages=False, page_size=2).items
+    second_page = get_notifications_for_service(
+        sample_template.service_id, older_than=first_page[-1].id, count_pages=False, page_size=2
+    ).items
+    third_page = get_notifications_for_service(
+        sample_template.service_id, older_than=second_page[-1].id, count_pages=False, page_size=2
+    ).items
+
+    assert [n.id for n in first_page + second_page + third_page[:1]] == sorted(
+        (n.id for n in notifications), reverse=True
+    )
+    assert third_page[1].created_at == created_at - timedelta(seconds=1)
+
+
+def test_get_notifications_for_service_older_than_unknown_notification_returns_nothing(sample_template):
+    create_notification(sample_template)
+
+    assert get_notifications_for_service(sample_template.service_id, older_than=uuid.uuid4()).items == []
+
+
 def test_get_notifications_created_by_api_or_csv_are_returned_correctly_excluding_test_key_notifications(
     notify_db_session, sample_service, sample_job, sample_api_key, sample_team_api_key, sample_test_api_key
 ):
@@ -1819,6 +2021,15 @@ def test_dao_get_last_notification_added_for_job_id_no_notifications(sample_temp
     assert dao_get_last_notification_added_for_job_id(job.id) is None
 
 
+def test_dao_get_last_notification_added_for_job_id_in_row_range(sample_template):
+    job = create_job(sample_template, notification_count=10)
+    for row_number in (1, 4, 5, 8):
+        create_notification(sample_template, job, row_number)
+
+    assert dao_get_last_notification_added_for_job_id(job.id, start_row=4, stop_row=8).job_row_number == 5
+    assert dao_get_last_notification_added_for_job_id(job.id, start_row=6, stop_row=8) is None
+
+
 def test_dao_get_last_notification_added_for_job_id_no_job(fake_uuid):
     assert dao_get_last_notification_added_for_job_id(fake_uuid) is None
 
@@ -1942,6 +2153,16 @@ def test_dao_get_notification_or_history_by_reference_with_no_matches_raises_err
         dao_get_notification_or_history_by_reference("REF1")
 
 
+def test_dao_get_notifications_or_history_by_references(sample_template):
+    notification = create_notification(template=sample_template, reference="ref1")
+    notification_history = create_notification_history(template=sample_template, reference="ref2")
+
+    assert dao_get_notifications_or_history_by_references(["ref1", "ref2", "ref3"]) == {
+        "ref1": notification,
+        "ref2": notification_history,
+    }
+
+
 @pytest.mark.parametrize("session", (db.session, db.session_bulk), ids=("default", "bulk"))
 @pytest.mark.parametrize("notification_type", ["letter", "email", "sms"])
 def test_notifications_not_yet_sent(sample_service, notification_type, session):
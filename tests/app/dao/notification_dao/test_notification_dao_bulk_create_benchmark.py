@@ -0,0 +1,74 @@
+"""
+Compares dao_bulk_create_notifications against persisting the same notifications one at a time with
+dao_create_notification. These are slow so don't run by default - run with
+
+    RUN_BENCHMARKS=1 pytest tests/app/dao/notification_dao/test_notification_dao_bulk_create_benchmark.py -s
+"""
+
+import os
+import time
+import uuid
+from datetime import datetime
+
+import pytest
+
+from app import signing
+from app.constants import KEY_TYPE_NORMAL
+from app.dao.notifications_dao import dao_bulk_create_notifications, dao_create_notification
+from app.models import Notification
+
+pytestmark = pytest.mark.skipif(os.environ.get("RUN_BENCHMARKS") != "1", reason="RUN_BENCHMARKS not set")
+
+BATCH_SIZE = 1000
+
+
+def _rows(template, count):
+    personalisation = signing.encode({"name": "Jo"})
+    return [
+        {
+            "id": uuid.uuid4(),
+            "to": f"+4477009{i:05}",
+            "normalised_to": f"4477009{i:05}",
+            "service_id": template.service_id,
+            "template_id": template.id,
+            "template_version": template.version,
+            "created_at": datetime.utcnow(),
+            "notification_type": template.template_type,
+            "key_type": KEY_TYPE_NORMAL,
+            "_personalisation": personalisation,
+        }
+        for i in range(count)
+    ]
+
+
+def _per_row(rows):
+    for row in rows:
+        dao_create_notification(Notification(**row))
+
+
+def _bulk(rows, use_copy=False):
+    # commit per BATCH_SIZE rows as a save batch task would, rather than one enormous transaction
+    for i in range(0, len(rows), BATCH_SIZE):
+        dao_bulk_create_notifications(rows[i : i + BATCH_SIZE], use_copy=use_copy)
+
+
+@pytest.mark.parametrize("count", [1_000, 10_000, 100_000])
+@pytest.mark.parametrize(
+    "method",
+    [
+        pytest.param(_per_row, id="per-row"),
+        pytest.param(_bulk, id="bulk-insert"),
+        pytest.param(lambda rows: _bulk(rows, use_copy=True), id="bulk-copy"),
+    ],
+)
+def test_bulk_create_notifications_benchmark(sample_template, request, method, count):
+    rows = _rows(sample_template, count)
+
+    start = time.perf_counter()
+    method(rows)
+    elapsed = time.perf_counter() - start
+
+    assert Notification.query.count() == count
+    print(  # noqa: T201
+        f"\n{request.node.callspec.id}: {count} notifications in {elapsed:.2f}s ({count / elapsed:.0f} rows/sec)"
+    )
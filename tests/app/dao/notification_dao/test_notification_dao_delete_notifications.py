@@ -255,7 +255,7 @@ def test_move_notifications_only_moves_notifications_older_than_provided_timesta
     # need to take a copy of the ID since the old_notification object will stop being accessible once removed
     old_notification_id = old_notification.id
 
-    result = move_notifications_to_notification_history("sms", sample_template.service_id, delete_time)
+    result, _ = move_notifications_to_notification_history("sms", sample_template.service_id, delete_time)
     assert result == 1
 
     assert Notification.query.one().id == new_notification.id
@@ -273,7 +273,7 @@ def test_move_notifications_only_moves_for_given_notification_type(sample_servic
     create_notification(email_template, created_at=one_second_before)
     create_notification(letter_template, created_at=one_second_before)
 
-    result = move_notifications_to_notification_history("sms", sample_service.id, delete_time)
+    result, _ = move_notifications_to_notification_history("sms", sample_service.id, delete_time)
     assert result == 1
     assert {x.notification_type for x in Notification.query} == {"email", "letter"}
     assert NotificationHistory.query.one().notification_type == "sms"
@@ -292,7 +292,7 @@ def test_move_notifications_only_moves_for_given_service(notify_db_session):
     create_notification(template, created_at=one_second_before)
     create_notification(other_template, created_at=one_second_before)
 
-    result = move_notifications_to_notification_history("sms", service.id, delete_time)
+    result, _ = move_notifications_to_notification_history("sms", service.id, delete_time)
     assert result == 1
 
     assert NotificationHistory.query.one().service_id == service.id
@@ -306,7 +306,7 @@ def test_move_notifications_doesnt_touch_test_notifications(sample_template):
     create_notification(template=sample_template, created_at=one_second_before, key_type=KEY_TYPE_TEAM)
     create_notification(template=sample_template, created_at=one_second_before, key_type=KEY_TYPE_TEST)
 
-    result = move_notifications_to_notification_history("sms", sample_template.service_id, delete_time)
+    result, _ = move_notifications_to_notification_history("sms", sample_template.service_id, delete_time)
 
     assert result == 2
 
@@ -495,7 +495,7 @@ def test_insert_notification_history_delete_notifications(sample_email_template)
 
     ids_to_move = sorted([n1.id, n2.id, n3.id, n4.id, n5.id, n6.id, n7.id, n8.id])
     ids_to_keep = sorted([n9.id, n10.id, n11.id])
-    del_count = insert_notification_history_delete_notifications(
+    del_count, _ = insert_notification_history_delete_notifications(
         notification_type=sample_email_template.template_type,
         service_id=sample_email_template.service_id,
         timestamp_to_delete_backwards_from=datetime.utcnow() - timedelta(days=1),
@@ -520,7 +520,7 @@ def test_insert_notification_history_delete_notifications_more_notifications_tha
         template=sample_template, created_at=datetime.utcnow() + timedelta(minutes=30), status="temporary-failure"
     )
 
-    del_count = insert_notification_history_delete_notifications(
+    del_count, _ = insert_notification_history_delete_notifications(
         notification_type=sample_template.template_type,
         service_id=sample_template.service_id,
         timestamp_to_delete_backwards_from=datetime.utcnow() + timedelta(hours=1),
@@ -534,6 +534,53 @@ def test_insert_notification_history_delete_notifications_more_notifications_tha
     assert len(notifications) == 2
 
 
+def test_insert_notification_history_delete_notifications_walks_through_notifications_with_cursor(sample_template):
+    created_at = datetime.utcnow() - timedelta(hours=2)
+    first = create_notification(template=sample_template, created_at=created_at - timedelta(minutes=1))
+    # notifications created at the same time are taken in id order
+    same_time = sorted(
+        (create_notification(template=sample_template, created_at=created_at) for _ in range(2)), key=lambda n: n.id
+    )
+    expected_cursors = [(first.created_at, first.id)] + [(n.created_at, n.id) for n in same_time]
+
+    cursors = []
+    after = None
+    while True:
+        del_count, after = insert_notification_history_delete_notifications(
+            notification_type=sample_template.template_type,
+            service_id=sample_template.service_id,
+            timestamp_to_delete_backwards_from=datetime.utcnow(),
+            qry_limit=1,
+            after=after,
+        )
+        if after is None:
+            assert del_count == 0
+            break
+        assert del_count == 1
+        cursors.append(after)
+
+    assert cursors == expected_cursors
+    assert Notification.query.count() == 0
+    assert NotificationHistory.query.count() == 3
+
+
+def test_insert_notification_history_delete_notifications_skips_notifications_before_cursor(sample_template):
+    created_at = datetime.utcnow() - timedelta(hours=2)
+    before_cursor = create_notification(template=sample_template, created_at=created_at - timedelta(minutes=1))
+    after_cursor = create_notification(template=sample_template, created_at=created_at + timedelta(minutes=1))
+
+    del_count, after = insert_notification_history_delete_notifications(
+        notification_type=sample_template.template_type,
+        service_id=sample_template.service_id,
+        timestamp_to_delete_backwards_from=datetime.utcnow(),
+        after=(created_at, before_cursor.id),
+    )
+
+    assert del_count == 1
+    assert after == (after_cursor.created_at, after_cursor.id)
+    assert Notification.query.one().id == before_cursor.id
+
+
 def test_insert_notification_history_delete_notifications_only_insert_delete_for_given_service(sample_email_template):
     notification_to_move = create_notification(
         template=sample_email_template, created_at=datetime.utcnow() + timedelta(minutes=4), status="delivered"
@@ -544,7 +591,7 @@ def test_insert_notification_history_delete_notifications_only_insert_delete_for
         template=another_template, created_at=datetime.utcnow() + timedelta(minutes=4), status="delivered"
     )
 
-    del_count = insert_notification_history_delete_notifications(
+    del_count, _ = insert_notification_history_delete_notifications(
         notification_type=sample_email_template.template_type,
         service_id=sample_email_template.service_id,
         timestamp_to_delete_backwards_from=datetime.utcnow() + timedelta(hours=1),
@@ -573,7 +620,7 @@ def test_insert_notification_history_delete_notifications_insert_for_key_type(sa
         template=sample_template, created_at=datetime.utcnow() - timedelta(hours=4), status="delivered", key_type="test"
     )
 
-    del_count = insert_notification_history_delete_notifications(
+    del_count, _ = insert_notification_history_delete_notifications(
         notification_type=sample_template.template_type,
         service_id=sample_template.service_id,
         timestamp_to_delete_backwards_from=datetime.utcnow(),
@@ -620,7 +667,7 @@ def test_insert_notification_history_delete_notifications_can_handle_different_c
         notify_db_session.execute(text("alter table notification_history drop column client_reference"))
         notify_db_session.execute(text("alter table notification_history add column client_reference varchar"))
 
-        del_count = insert_notification_history_delete_notifications(
+        del_count, _ = insert_notification_history_delete_notifications(
             notification_type=sample_template.template_type,
             service_id=sample_template.service_id,
             timestamp_to_delete_backwards_from=datetime.utcnow(),
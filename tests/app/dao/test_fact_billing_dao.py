@@ -14,6 +14,7 @@ from app.dao.fact_billing_dao import (
     fetch_daily_sms_provider_volumes_for_platform,
     fetch_daily_volumes_for_platform,
     fetch_dvla_billing_facts,
+    fetch_service_ids_with_billing_changes_for_day,
     fetch_usage_for_all_services_letter,
     fetch_usage_for_all_services_letter_breakdown,
     fetch_usage_for_all_services_sms,
@@ -250,6 +251,32 @@ def test_fetch_billing_data_for_day_straddling(
     ]
 
 
+def test_fetch_service_ids_with_billing_changes_for_day(notify_db_session):
+    created_template = create_template(service=create_service(service_name="created"))
+    updated_template = create_template(service=create_service(service_name="updated"))
+    archived_template = create_template(service=create_service(service_name="archived"))
+    unchanged_template = create_template(service=create_service(service_name="unchanged"))
+    other_day_template = create_template(service=create_service(service_name="other day"))
+
+    create_notification(template=created_template, created_at=datetime(2021, 2, 3, 12))
+    create_notification(
+        template=updated_template, created_at=datetime(2021, 2, 3, 1), updated_at=datetime(2021, 2, 3, 12)
+    )
+    create_notification_history(
+        template=archived_template, created_at=datetime(2021, 2, 3, 1), updated_at=datetime(2021, 2, 3, 12)
+    )
+    create_notification(
+        template=unchanged_template, created_at=datetime(2021, 2, 3, 1), updated_at=datetime(2021, 2, 3, 2)
+    )
+    create_notification(template=other_day_template, created_at=datetime(2021, 2, 4, 12))
+
+    assert fetch_service_ids_with_billing_changes_for_day(date(2021, 2, 3), datetime(2021, 2, 3, 6)) == {
+        created_template.service_id,
+        updated_template.service_id,
+        archived_template.service_id,
+    }
+
+
 @pytest.mark.parametrize(
     "session,expected_bind_key",
     (
@@ -33,6 +33,7 @@ from app.dao.fact_notification_status_dao import (
     fetch_notification_statuses_for_job,
     fetch_stats_for_all_services_by_date_range,
     generate_fact_notification_status_rows,
+    generate_fact_notification_status_rows_for_services,
     get_total_notifications_for_date_range,
     update_fact_notification_status,
 )
@@ -41,6 +42,7 @@ from tests.app.db import (
     create_ft_notification_status,
     create_job,
     create_notification,
+    create_notification_history,
     create_service,
     create_template,
 )
@@ -735,6 +737,34 @@ def test_generate_fact_notification_status_rows_respects_gmt_bst(
     assert {query_info.bind_key for query_info in query_recorder.queries} == {expected_bind_key}
 
 
+def test_generate_fact_notification_status_rows_for_services_sums_chunks(notify_db_session):
+    first_template = create_template(service=create_service(service_name="First Service"))
+    second_template = create_template(service=create_service(service_name="Second Service"))
+    other_template = create_template(service=create_service(service_name="Other Service"))
+
+    # 2022-01-01 is in GMT, so its chunks start on the hour
+    for created_at in ("2022-01-01T00:10", "2022-01-01T05:20", "2022-01-01T23:50"):
+        create_notification(template=first_template, status="delivered", created_at=created_at)
+    create_notification_history(template=second_template, status="delivered", created_at="2022-01-01T12:00")
+    create_notification(template=second_template, status="sending", created_at="2022-01-01T12:00")
+    create_notification(template=other_template, status="delivered", created_at="2022-01-01T12:00")
+
+    rows = generate_fact_notification_status_rows_for_services(
+        date(2022, 1, 1),
+        SMS_TYPE,
+        [first_template.service_id, second_template.service_id],
+        chunk_timedelta=timedelta(hours=1),
+    )
+
+    assert sorted((row.service_id, row.notification_status, row.notification_count) for row in rows) == sorted(
+        [
+            (first_template.service_id, "delivered", 3),
+            (second_template.service_id, "delivered", 1),
+            (second_template.service_id, "sending", 1),
+        ]
+    )
+
+
 def _mock_row_from_dict(row_dict):
     m = mock.Mock(spec_set=list(row_dict.keys()) + ["_asdict"])
     m.configure_mock(**row_dict)
@@ -742,6 +772,7 @@ def _mock_row_from_dict(row_dict):
     return m
 
 
+@freeze_time("2021-03-01 04:00")
 def test_update_fact_notification_status(
     sample_job,
     sample_template,
@@ -861,6 +892,10 @@ def test_update_fact_notification_status(
             87,
         ),
     }
+    assert {
+        row.created_at
+        for row in FactNotificationStatus.query.filter(FactNotificationStatus.bst_date == date(2021, 2, 28))
+    } == {datetime(2021, 3, 1, 4, 0)}
 
 
 def test_update_fact_notification_status_empty_new_rows(
@@ -20,6 +20,7 @@ from app.dao.jobs_dao import (
     dao_get_notification_outcomes_for_job,
     dao_get_scheduled_job_by_id_and_service_id,
     dao_get_scheduled_job_stats,
+    dao_record_job_partition_shattered,
     dao_set_scheduled_jobs_to_pending,
     dao_update_job,
     find_jobs_that_completed_processing,
@@ -217,6 +218,17 @@ def test_update_job(sample_job):
     assert job_from_db.job_status == "in progress"
 
 
+def test_dao_record_job_partition_shattered(sample_job):
+    assert sample_job.shattered_partitions == []
+
+    assert dao_record_job_partition_shattered(sample_job.id, 2) == 1
+    assert dao_record_job_partition_shattered(sample_job.id, 0) == 2
+    # recording the same partition again doesn't count it twice
+    assert dao_record_job_partition_shattered(sample_job.id, 2) == 2
+
+    assert sorted(Job.query.get(sample_job.id).shattered_partitions) == [0, 2]
+
+
 def test_set_scheduled_jobs_to_pending_gets_all_jobs_in_scheduled_state_before_now(sample_template):
     one_minute_ago = datetime.utcnow() - timedelta(minutes=1)
     one_hour_ago = datetime.utcnow() - timedelta(minutes=60)
@@ -0,0 +1,95 @@
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import text
+
+from app import db
+from app.constants import KEY_TYPE_TEST, SMS_TYPE
+from app.dao.notification_partitions_dao import (
+    CreatedNotificationPartition,
+    NotificationPartition,
+    dao_archive_notification_partition,
+    dao_create_notification_partitions,
+    dao_get_notification_partitions,
+    dao_notification_partition_has_notifications_to_keep,
+)
+from app.models import Notification, NotificationHistory
+from tests.app.db import create_notification
+
+
+@pytest.fixture
+def far_future_partitions(notify_db_session):
+    # partitions in 2100, well clear of the ones the migrations create
+    yield
+
+    notify_db_session.rollback()
+    for partition in dao_get_notification_partitions():
+        if partition.start and partition.start.year == 2100:
+            notify_db_session.execute(text(f"DROP TABLE {partition.name}"))
+    notify_db_session.commit()
+
+
+def test_dao_create_notification_partitions(far_future_partitions):
+    assert dao_create_notification_partitions(date(2100, 1, 1), days=2) == [
+        CreatedNotificationPartition("notifications_p21000101", moved_from_default=0),
+        CreatedNotificationPartition("notifications_p21000102", moved_from_default=0),
+    ]
+
+    partitions = dao_get_notification_partitions()
+    assert partitions[0].name == "notifications_legacy"
+    assert partitions[0].start is None
+    assert partitions[-2:] == [
+        NotificationPartition("notifications_p21000101", datetime(2100, 1, 1), datetime(2100, 1, 2)),
+        NotificationPartition("notifications_p21000102", datetime(2100, 1, 2), datetime(2100, 1, 3)),
+    ]
+
+
+def test_dao_create_notification_partitions_skips_existing_partitions(far_future_partitions):
+    dao_create_notification_partitions(date(2100, 1, 2), days=1)
+
+    assert [partition.name for partition in dao_create_notification_partitions(date(2100, 1, 1), days=3)] == [
+        "notifications_p21000101",
+        "notifications_p21000103",
+    ]
+
+
+def test_dao_create_notification_partitions_moves_notifications_from_default_partition(
+    far_future_partitions, sample_template
+):
+    moved = create_notification(sample_template, created_at=datetime(2100, 1, 1, 12))
+    left = create_notification(sample_template, created_at=datetime(2100, 1, 5, 12))
+
+    assert dao_create_notification_partitions(date(2100, 1, 1), days=1) == [
+        CreatedNotificationPartition("notifications_p21000101", moved_from_default=1),
+    ]
+
+    assert db.session.execute(text("SELECT id FROM notifications_p21000101")).scalars().all() == [moved.id]
+    assert db.session.execute(text("SELECT id FROM notifications_default")).scalars().all() == [left.id]
+
+
+def test_dao_notification_partition_has_notifications_to_keep(
+    far_future_partitions, sample_template, sample_letter_template
+):
+    dao_create_notification_partitions(date(2100, 1, 1), days=2)
+    create_notification(sample_template, created_at=datetime(2100, 1, 1, 12))
+    create_notification(sample_letter_template, created_at=datetime(2100, 1, 2, 12))
+
+    assert not dao_notification_partition_has_notifications_to_keep("notifications_p21000101", [])
+    assert dao_notification_partition_has_notifications_to_keep(
+        "notifications_p21000101", [(sample_template.service_id, SMS_TYPE)]
+    )
+    assert dao_notification_partition_has_notifications_to_keep("notifications_p21000102", [])
+
+
+def test_dao_archive_notification_partition(far_future_partitions, sample_template):
+    dao_create_notification_partitions(date(2100, 1, 1), days=2)
+    archived = create_notification(sample_template, created_at=datetime(2100, 1, 1, 12))
+    create_notification(sample_template, created_at=datetime(2100, 1, 1, 13), key_type=KEY_TYPE_TEST)
+    kept = create_notification(sample_template, created_at=datetime(2100, 1, 2, 12))
+
+    assert dao_archive_notification_partition("notifications_p21000101") == 1
+
+    assert "notifications_p21000101" not in {partition.name for partition in dao_get_notification_partitions()}
+    assert [notification.id for notification in Notification.query.all()] == [kept.id]
+    assert [notification.id for notification in NotificationHistory.query.all()] == [archived.id]
+    assert db.session.execute(text("SELECT to_regclass('notifications_p21000101')")).scalar() is None
@@ -1,5 +1,5 @@
 import uuid
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from unittest import mock
 
 import pytest
@@ -42,6 +42,7 @@ from app.dao.services_dao import (
     dao_fetch_live_services_data,
     dao_fetch_service_by_id,
     dao_fetch_service_by_inbound_number,
+    dao_fetch_stats_by_service_and_key_type_for_day,
     dao_fetch_todays_stats_for_all_services,
     dao_fetch_todays_stats_for_service,
     dao_find_services_sending_to_tv_numbers,
@@ -70,6 +71,7 @@ from app.models import (
     VerifyCode,
     user_folder_permissions,
 )
+from app.notifications.todays_stats_cache import TodaysStatsRow
 from tests.app.db import (
     create_annual_billing,
     create_api_key,
@@ -1132,6 +1134,71 @@ def test_dao_fetch_todays_stats_for_all_services_can_exclude_from_test_key(notif
     assert stats[0].count == 2
 
 
+def test_dao_fetch_todays_stats_for_all_services_uses_cached_stats(notify_db_session, mocker):
+    service_with_stats = create_service(service_name="with stats")
+    service_without_stats = create_service(service_name="without stats")
+    create_service(service_name="inactive", active=False)
+    mocker.patch("app.dao.services_dao.todays_stats_available", return_value=True)
+    mock_get_todays_stats = mocker.patch(
+        "app.dao.services_dao.get_todays_stats",
+        return_value={
+            service_with_stats.id: [
+                TodaysStatsRow(EMAIL_TYPE, "created", 3),
+                TodaysStatsRow(SMS_TYPE, "delivered", 2),
+            ],
+            service_without_stats.id: [],
+        },
+    )
+
+    stats = dao_fetch_todays_stats_for_all_services(include_from_test_key=False)
+
+    assert set(mock_get_todays_stats.call_args.args[0]) == {service_with_stats.id, service_without_stats.id}
+    assert mock_get_todays_stats.call_args.kwargs == {"include_from_test_key": False}
+    assert sorted((row.name, row.notification_type, row.status, row.count) for row in stats) == [
+        ("with stats", EMAIL_TYPE, "created", 3),
+        ("with stats", SMS_TYPE, "delivered", 2),
+        ("without stats", None, None, None),
+    ]
+
+
+def test_dao_fetch_todays_stats_for_all_services_only_reads_cache_if_available(notify_db_session, mocker):
+    template = create_template(service=create_service())
+    create_notification(template=template)
+    mocker.patch("app.dao.services_dao.todays_stats_available", return_value=False)
+    mock_get_todays_stats = mocker.patch("app.dao.services_dao.get_todays_stats")
+
+    stats = dao_fetch_todays_stats_for_all_services()
+
+    assert not mock_get_todays_stats.called
+    assert [(row.service_id, row.count) for row in stats] == [(template.service_id, 1)]
+
+
+def test_dao_fetch_stats_by_service_and_key_type_for_day(notify_db_session):
+    template = create_template(service=create_service())
+    create_notification(template=template, key_type=KEY_TYPE_NORMAL)
+    create_notification(template=template, key_type=KEY_TYPE_NORMAL)
+    create_notification(template=template, key_type=KEY_TYPE_TEST, status="delivered")
+    create_notification(template=template, created_at=datetime.utcnow() - timedelta(days=2))
+
+    stats = dao_fetch_stats_by_service_and_key_type_for_day(date.today())
+
+    assert sorted(stats) == [
+        (template.service_id, SMS_TYPE, "created", KEY_TYPE_NORMAL, 2),
+        (template.service_id, SMS_TYPE, "delivered", KEY_TYPE_TEST, 1),
+    ]
+
+
+def test_dao_fetch_stats_by_service_and_key_type_for_day_for_some_services(notify_db_session):
+    template = create_template(service=create_service(service_name="one"))
+    other_template = create_template(service=create_service(service_name="two"))
+    create_notification(template=template)
+    create_notification(template=other_template)
+
+    stats = dao_fetch_stats_by_service_and_key_type_for_day(date.today(), service_ids=[template.service_id])
+
+    assert stats == [(template.service_id, SMS_TYPE, "created", KEY_TYPE_NORMAL, 1)]
+
+
 def test_dao_fetch_active_users_for_service_returns_active_only(notify_db_session):
     active_user = create_user(email="active@foo.com", state="active")
     pending_user = create_user(email="pending@foo.com", state="pending")
@@ -10,7 +10,9 @@ from freezegun import freeze_time
 from requests import HTTPError
 
 import app
-from app import firetext_client, mmg_client, notification_provider_clients
+from app import db, firetext_client, mmg_client, notification_provider_clients
+from app.clients.email.aws_ses import AwsSesClientException, AwsSesClientThrottlingSendRateException
+from app.clients.sms import SmsClientResponseException
 from app.constants import (
     BRANDING_BOTH,
     BRANDING_ORG,
@@ -25,6 +27,7 @@ from app.dao import notifications_dao
 from app.dao.provider_details_dao import get_provider_details_by_identifier
 from app.delivery import send_to_providers
 from app.delivery.send_to_providers import get_html_email_options, get_logo_url
+from app.delivery.ses_rate_governor import SesRateGovernorThrottledException
 from app.exceptions import NotificationTechnicalFailureException
 from app.models import EmailBranding, Notification
 from app.otel_metrics.notification import _international_sms
@@ -44,6 +47,7 @@ from tests.app.db import (
     create_service_with_defined_sms_sender,
     create_template,
 )
+from tests.conftest import set_config
 
 
 def setup_function(_function):
@@ -67,6 +71,25 @@ def test_provider_to_use_should_return_random_provider(mocker, notify_db_session
     assert ret.name == "mmg"
 
 
+def test_provider_to_use_weights_sms_providers_by_health(mocker, notify_db_session):
+    mmg = get_provider_details_by_identifier("mmg")
+    firetext = get_provider_details_by_identifier("firetext")
+    mmg.priority = 50
+    firetext.priority = 50
+    mock_health = mocker.patch(
+        "app.delivery.send_to_providers.get_sms_provider_health", return_value={"mmg": 0.1, "firetext": 1.0}
+    )
+    mock_choices = mocker.patch("app.delivery.send_to_providers.random.choices", return_value=[firetext])
+
+    ret = send_to_providers.provider_to_use("sms", international=False)
+
+    assert set(mock_health.call_args.args[0]) == {"mmg", "firetext"}
+    mock_choices.assert_called_once_with(
+        [SerialisedProvider(mmg.serialize()), SerialisedProvider(firetext.serialize())], weights=[5.0, 50.0]
+    )
+    assert ret.name == "firetext"
+
+
 def test_provider_to_use_should_call_random_choice_every_time(mocker, notify_db_session):
     mock_choices = mocker.patch(
         "app.delivery.send_to_providers.random.choices",
@@ -201,6 +224,57 @@ def test_should_send_personalised_template_to_correct_email_provider_and_persist
     assert notification.personalisation == {"name": "Jo"}
 
 
+def test_send_email_to_provider_does_not_hold_db_connection_while_sending(sample_email_notification, mocker):
+    connections_checked_out = []
+
+    def send_email(**kwargs):
+        connections_checked_out.append(db.engine.pool.checkedout())
+        return "reference"
+
+    mocker.patch("app.aws_ses_client.send_email", side_effect=send_email)
+
+    send_to_providers.send_email_to_provider(sample_email_notification)
+
+    assert connections_checked_out == [0]
+    notification = Notification.query.get(sample_email_notification.id)
+    assert notification.status == "sending"
+    assert notification.reference == "reference"
+
+
+def test_send_sms_to_provider_writes_sending_update_with_buffer_if_enabled(
+    notify_api, sample_sms_template_with_html, mocker
+):
+    db_notification = create_notification(template=sample_sms_template_with_html, personalisation={"name": "Jo"})
+    mocker.patch("app.mmg_client.send_sms")
+    mock_buffer_write = mocker.patch("app.delivery.send_to_providers.notification_status_buffer.write")
+    mock_update = mocker.patch("app.delivery.send_to_providers.dao_update_notification")
+
+    with set_config(notify_api, "NOTIFICATION_STATUS_BUFFER_ENABLED", True):
+        send_to_providers.send_sms_to_provider(db_notification)
+
+    mock_buffer_write.assert_called_once_with(
+        db_notification.id,
+        "sending",
+        sent_at=ANY,
+        sent_by="mmg",
+        reference=None,
+        billable_units=1,
+    )
+    assert not mock_update.called
+
+
+def test_send_email_to_provider_with_test_key_does_not_buffer_sending_update(notify_api, sample_email_template, mocker):
+    notification = create_notification(template=sample_email_template, key_type=KEY_TYPE_TEST)
+    mocker.patch("app.delivery.send_to_providers.send_email_response")
+    mock_buffer_write = mocker.patch("app.delivery.send_to_providers.notification_status_buffer.write")
+
+    with set_config(notify_api, "NOTIFICATION_STATUS_BUFFER_ENABLED", True):
+        send_to_providers.send_email_to_provider(notification)
+
+    assert not mock_buffer_write.called
+    assert Notification.query.get(notification.id).status == "sending"
+
+
 def test_should_not_send_email_message_when_service_is_inactive_notifcation_is_in_tech_failure(
     sample_service, sample_notification, mocker
 ):
@@ -1016,3 +1090,229 @@ def test_send_email_to_provider_sends_unsubscribe_link_if_template_is_unsubscrib
 
     assert mock_html_email.call_args[1]["unsubscribe_link"] == "https://www.notify.example.com"
     assert mock_plain_text_email.call_args[1]["unsubscribe_link"] == "https://www.notify.example.com"
+
+
+@pytest.fixture
+def template_render_cache(notify_api):
+    send_to_providers._rendered_content_cache.clear()
+    with set_config(notify_api, "TEMPLATE_RENDER_CACHE_ENABLED", True):
+        yield
+    send_to_providers._rendered_content_cache.clear()
+
+
+def test_send_sms_to_provider_reuses_rendered_content(sample_service, mocker, template_render_cache):
+    mocker.patch("app.mmg_client.send_sms")
+    mock_render = mocker.patch("app.delivery.send_to_providers.RenderedSMS", wraps=send_to_providers.RenderedSMS)
+    template = create_template(sample_service, content="Hello & welcome")
+
+    for _ in range(3):
+        send_to_providers.send_sms_to_provider(create_notification(template=template))
+
+    assert mock_render.call_count == 1
+    assert [call.kwargs["content"] for call in mmg_client.send_sms.call_args_list] == [
+        "Sample service: Hello & welcome"
+    ] * 3
+
+
+def test_send_email_to_provider_reuses_rendered_content(sample_service, mocker, template_render_cache):
+    mocker.patch("app.aws_ses_client.send_email", return_value="reference")
+    mock_render_html = mocker.patch(
+        "app.delivery.send_to_providers.HTMLEmailTemplate", wraps=send_to_providers.HTMLEmailTemplate
+    )
+    mock_get_html_email_options = mocker.patch(
+        "app.delivery.send_to_providers.get_html_email_options", wraps=get_html_email_options
+    )
+    template = create_template(sample_service, template_type="email", subject="Hi", content="Some **markdown**")
+
+    for _ in range(3):
+        send_to_providers.send_email_to_provider(create_notification(template=template))
+
+    assert mock_render_html.call_count == 1
+    assert mock_get_html_email_options.call_count == 1
+    html_bodies = [call.kwargs["html_body"] for call in app.aws_ses_client.send_email.call_args_list]
+    assert len(html_bodies) == 3
+    assert html_bodies[0] == html_bodies[1] == html_bodies[2]
+    assert "<strong>markdown</strong>" in html_bodies[0]
+
+
+def test_send_sms_to_provider_doesnt_reuse_personalised_content(
+    sample_sms_template_with_html, mocker, template_render_cache
+):
+    mocker.patch("app.mmg_client.send_sms")
+    mock_render = mocker.patch("app.delivery.send_to_providers.RenderedSMS", wraps=send_to_providers.RenderedSMS)
+
+    for name in ("Jo", "Jo", "Sam"):
+        send_to_providers.send_sms_to_provider(
+            create_notification(template=sample_sms_template_with_html, personalisation={"name": name})
+        )
+
+    assert mock_render.call_count == 3
+    assert [call.kwargs["content"] for call in mmg_client.send_sms.call_args_list] == [
+        "Hello Jo\nHere is <em>some HTML</em> & entities",
+        "Hello Jo\nHere is <em>some HTML</em> & entities",
+        "Hello Sam\nHere is <em>some HTML</em> & entities",
+    ]
+    assert len(send_to_providers._rendered_content_cache) == 0
+
+
+def test_send_email_to_provider_doesnt_reuse_content_with_unsubscribe_link(
+    sample_service, mocker, template_render_cache
+):
+    mocker.patch("app.aws_ses_client.send_email", return_value="reference")
+    mocker.patch("app.models.url_with_token", side_effect=lambda *args, url, **kwargs: url)
+    template = create_template(service=sample_service, template_type="email", has_unsubscribe_link=True)
+    mock_render_html = mocker.patch(
+        "app.delivery.send_to_providers.HTMLEmailTemplate", wraps=send_to_providers.HTMLEmailTemplate
+    )
+
+    for _ in range(2):
+        send_to_providers.send_email_to_provider(create_notification(template=template))
+
+    assert mock_render_html.call_count == 2
+    assert len(send_to_providers._rendered_content_cache) == 0
+
+
+def test_send_sms_to_provider_doesnt_reuse_content_if_cache_disabled(notify_api, sample_service, mocker):
+    send_to_providers._rendered_content_cache.clear()
+    mocker.patch("app.mmg_client.send_sms")
+    mock_render = mocker.patch("app.delivery.send_to_providers.RenderedSMS", wraps=send_to_providers.RenderedSMS)
+    template = create_template(sample_service)
+
+    with set_config(notify_api, "TEMPLATE_RENDER_CACHE_ENABLED", False):
+        for _ in range(2):
+            send_to_providers.send_sms_to_provider(create_notification(template=template))
+
+    assert mock_render.call_count == 2
+    assert len(send_to_providers._rendered_content_cache) == 0
+
+
+def test_send_emails_to_provider_sends_batch_and_updates_sent_notifications(sample_email_template, mocker):
+    def send_email(*, to_address, **kwargs):
+        if to_address == "fail@example.com":
+            raise AwsSesClientException("failed")
+        return f"reference-{to_address}"
+
+    mock_send_email = mocker.patch("app.clients.email.aws_ses.AwsSesClient.send_email", side_effect=send_email)
+    sent, failed = (
+        create_notification(template=sample_email_template, to_field=to, normalised_to=to)
+        for to in ("sent@example.com", "fail@example.com")
+    )
+    test_key_notification = create_notification(template=sample_email_template, key_type=KEY_TYPE_TEST)
+    mock_send_email_response = mocker.patch("app.delivery.send_to_providers.send_email_response")
+
+    failures = send_to_providers.send_emails_to_provider([sent, failed, test_key_notification])
+
+    assert list(failures) == [failed.id]
+    assert isinstance(failures[failed.id], AwsSesClientException)
+    assert mock_send_email.call_count == 2
+    assert {send_email_call.kwargs["to_address"] for send_email_call in mock_send_email.call_args_list} == {
+        "sent@example.com",
+        "fail@example.com",
+    }
+
+    sent = Notification.query.get(sent.id)
+    assert sent.status == "sending"
+    assert sent.reference == "reference-sent@example.com"
+    assert sent.sent_by == "ses"
+    assert sent.sent_at is not None
+
+    failed = Notification.query.get(failed.id)
+    assert failed.status == "created"
+    assert failed.reference is None
+
+    assert Notification.query.get(test_key_notification.id).status == "sending"
+    mock_send_email_response.assert_called_once_with(
+        test_key_notification.reference, test_key_notification.to, test_key_notification.service_id
+    )
+
+
+def test_send_emails_to_provider_does_not_hold_db_connection_while_sending(sample_email_template, mocker):
+    connections_checked_out = []
+
+    def send_email(**kwargs):
+        connections_checked_out.append(db.engine.pool.checkedout())
+        return "reference"
+
+    mocker.patch("app.clients.email.aws_ses.AwsSesClient.send_email", side_effect=send_email)
+    notifications = [create_notification(template=sample_email_template) for _ in range(3)]
+
+    failures = send_to_providers.send_emails_to_provider(notifications)
+
+    assert failures == {}
+    assert connections_checked_out == [0, 0, 0]
+
+
+def test_send_sms_batch_to_providers_sends_batch_and_updates_sent_notifications(sample_template, mocker):
+    def send_sms(*, to, **kwargs):
+        if to == "447700900002":
+            raise SmsClientResponseException("failed")
+
+    mock_send_sms = mocker.patch("app.clients.sms.mmg.MMGClient.send_sms", side_effect=send_sms)
+    mocker.patch("app.delivery.send_to_providers.provider_to_use", return_value=mmg_client)
+    mock_exceeded_rate_limit = mocker.patch(
+        "app.delivery.send_to_providers.redis_store.exceeded_rate_limit", return_value=False
+    )
+    sent, failed = (
+        create_notification(template=sample_template, to_field=f"+{to}", normalised_to=to)
+        for to in ("447700900001", "447700900002")
+    )
+
+    failures = send_to_providers.send_sms_batch_to_providers([sent, failed])
+
+    assert list(failures) == [failed.id]
+    assert isinstance(failures[failed.id], SmsClientResponseException)
+    assert {send_sms_call.kwargs["reference"] for send_sms_call in mock_send_sms.call_args_list} == {
+        str(sent.id),
+        str(failed.id),
+    }
+    mock_exceeded_rate_limit.assert_called_once_with("mmg-error-rate", ANY, ANY)
+
+    sent = Notification.query.get(sent.id)
+    assert sent.status == "sending"
+    assert sent.sent_by == "mmg"
+    assert sent.sent_at is not None
+    assert sent.billable_units == 1
+
+    failed = Notification.query.get(failed.id)
+    assert failed.status == "created"
+    assert failed.sent_by is None
+    assert failed.billable_units == 1
+
+
+def test_send_email_to_provider_waits_for_ses_send_slot(sample_email_notification, mocker):
+    mock_wait = mocker.patch("app.delivery.send_to_providers.wait_for_ses_send_slot")
+    mock_record_throttled = mocker.patch("app.delivery.send_to_providers.record_ses_throttled")
+    mocker.patch("app.aws_ses_client.send_email", return_value="reference")
+
+    send_to_providers.send_email_to_provider(sample_email_notification)
+
+    mock_wait.assert_called_once_with()
+    assert not mock_record_throttled.called
+    assert sample_email_notification.reference == "reference"
+
+
+def test_send_email_to_provider_records_ses_throttling(sample_email_notification, mocker):
+    mocker.patch("app.delivery.send_to_providers.wait_for_ses_send_slot")
+    mock_record_throttled = mocker.patch("app.delivery.send_to_providers.record_ses_throttled")
+    mocker.patch("app.aws_ses_client.send_email", side_effect=AwsSesClientThrottlingSendRateException("throttled"))
+
+    with pytest.raises(AwsSesClientThrottlingSendRateException):
+        send_to_providers.send_email_to_provider(sample_email_notification)
+
+    mock_record_throttled.assert_called_once_with()
+    assert sample_email_notification.status == "created"
+
+
+def test_send_email_to_provider_doesnt_send_if_no_ses_send_slot(sample_email_notification, mocker):
+    mocker.patch(
+        "app.delivery.send_to_providers.wait_for_ses_send_slot",
+        side_effect=SesRateGovernorThrottledException("no slot"),
+    )
+    mock_record_throttled = mocker.patch("app.delivery.send_to_providers.record_ses_throttled")
+    mock_send_email = mocker.patch("app.aws_ses_client.send_email")
+
+    with pytest.raises(AwsSesClientThrottlingSendRateException):
+        send_to_providers.send_email_to_provider(sample_email_notification)
+
+    assert not mock_send_email.called
+    assert not mock_record_throttled.called
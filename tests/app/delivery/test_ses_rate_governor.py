@@ -0,0 +1,103 @@
+import pytest
+from freezegun import freeze_time
+
+from app import redis_store
+from app.delivery.ses_rate_governor import (
+    SES_RATE_GOVERNOR_KEY,
+    SesRateGovernorThrottledException,
+    record_ses_throttled,
+    set_ses_max_send_rate,
+    wait_for_ses_send_slot,
+)
+from app.otel_metrics.provider import _ses_allowed_send_rate
+from tests.conftest import set_config
+
+
+@pytest.fixture
+def rate_governor_enabled(notify_api, mocker):
+    mocker.patch.object(redis_store, "active", True)
+    with set_config(notify_api, "SES_RATE_GOVERNOR_ENABLED", True), set_config(notify_api, "SES_MAX_SEND_RATE", 14):
+        yield
+
+
+@pytest.fixture
+def mock_acquire_script(mocker):
+    return mocker.patch("app.delivery.ses_rate_governor._get_acquire_send_slot_script").return_value
+
+
+@pytest.fixture
+def mock_record_throttled_script(mocker):
+    return mocker.patch("app.delivery.ses_rate_governor._get_record_throttled_script").return_value
+
+
+@pytest.fixture
+def mock_sleep(mocker):
+    return mocker.patch("app.delivery.ses_rate_governor.time.sleep")
+
+
+def test_wait_for_ses_send_slot_does_nothing_if_disabled(notify_api, mock_acquire_script, mock_sleep):
+    with set_config(notify_api, "SES_RATE_GOVERNOR_ENABLED", False):
+        wait_for_ses_send_slot()
+
+    assert not mock_acquire_script.called
+    assert not mock_sleep.called
+
+
+@freeze_time("2016-01-01 12:00:00")
+@pytest.mark.parametrize("wait_ms, expected_sleeps", [(0, []), (250, [0.25])])
+def test_wait_for_ses_send_slot_waits_for_reserved_slot(
+    rate_governor_enabled, mock_acquire_script, mock_sleep, mocker, wait_ms, expected_sleeps
+):
+    mock_set_rate = mocker.patch.object(_ses_allowed_send_rate, "set")
+    mock_acquire_script.return_value = [1, wait_ms, 7000]
+
+    wait_for_ses_send_slot()
+
+    mock_acquire_script.assert_called_once_with(keys=[SES_RATE_GOVERNOR_KEY], args=[1451649600.0, 14, 1, 0.05, 10, 2])
+    assert [sleep_call.args[0] for sleep_call in mock_sleep.call_args_list] == expected_sleeps
+    mock_set_rate.assert_called_once_with(7.0)
+
+
+def test_wait_for_ses_send_slot_raises_if_slot_not_reserved(rate_governor_enabled, mock_acquire_script, mock_sleep):
+    mock_acquire_script.return_value = [0, 3500, 2000]
+
+    with pytest.raises(SesRateGovernorThrottledException):
+        wait_for_ses_send_slot()
+
+    assert not mock_sleep.called
+
+
+def test_wait_for_ses_send_slot_allows_send_if_redis_errors(rate_governor_enabled, mock_acquire_script, mock_sleep):
+    mock_acquire_script.side_effect = ConnectionError
+
+    wait_for_ses_send_slot()
+
+    assert not mock_sleep.called
+
+
+@freeze_time("2016-01-01 12:00:00")
+def test_record_ses_throttled(rate_governor_enabled, mock_record_throttled_script, mocker, caplog):
+    mock_set_rate = mocker.patch.object(_ses_allowed_send_rate, "set")
+    mock_record_throttled_script.return_value = 3500
+
+    with caplog.at_level("WARNING"):
+        record_ses_throttled()
+
+    mock_record_throttled_script.assert_called_once_with(keys=[SES_RATE_GOVERNOR_KEY], args=[1451649600.0, 14, 1, 0.5])
+    mock_set_rate.assert_called_once_with(3.5)
+    assert "SES throttled a send, allowed send rate is now 3.5" in caplog.messages
+
+
+def test_record_ses_throttled_does_nothing_if_disabled(notify_api, mock_record_throttled_script):
+    with set_config(notify_api, "SES_RATE_GOVERNOR_ENABLED", False):
+        record_ses_throttled()
+
+    assert not mock_record_throttled_script.called
+
+
+def test_set_ses_max_send_rate(mocker):
+    mock_redis_client = mocker.patch.object(redis_store, "redis_store")
+
+    set_ses_max_send_rate(50.0)
+
+    mock_redis_client.hset.assert_called_once_with(SES_RATE_GOVERNOR_KEY, "max_rate", "50.0")
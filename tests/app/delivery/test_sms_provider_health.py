@@ -0,0 +1,136 @@
+import pytest
+from freezegun import freeze_time
+
+from app import redis_store
+from app.delivery import sms_provider_health
+from app.delivery.sms_provider_health import (
+    SMS_PROVIDER_MIN_HEALTH,
+    get_sms_provider_health,
+    health_score,
+    record_sms_provider_receipt_lag,
+    record_sms_provider_request,
+    send_sms_recording_health,
+)
+from app.otel_metrics.provider import _sms_health
+from tests.conftest import set_config
+
+
+@pytest.fixture
+def provider_health_enabled(notify_api, mocker):
+    mocker.patch.object(redis_store, "active", True)
+    mocker.patch.object(sms_provider_health, "_health_cache", {})
+    with set_config(notify_api, "SMS_PROVIDER_HEALTH_ENABLED", True):
+        yield
+
+
+@pytest.fixture
+def mock_pipeline(mocker):
+    return mocker.patch.object(redis_store, "redis_store").pipeline.return_value
+
+
+@pytest.mark.parametrize(
+    "measures, expected_health",
+    [
+        ({}, 1.0),
+        # too few samples to count
+        ({"requests": 19, "errors": 19, "request_seconds": 100}, 1.0),
+        ({"requests": 100, "errors": 0, "request_seconds": 50}, 1.0),
+        ({"requests": 100, "errors": 25, "request_seconds": 50}, 0.5),
+        ({"requests": 100, "errors": 50, "request_seconds": 50}, SMS_PROVIDER_MIN_HEALTH),
+        ({"requests": 100, "errors": 0, "request_seconds": 400}, 0.25),
+        ({"requests": 100, "errors": 25, "request_seconds": 200}, 0.25),
+        ({"receipts": 20, "receipt_lag_seconds": 600}, 1.0),
+        ({"receipts": 20, "receipt_lag_seconds": 2400}, 0.5),
+    ],
+)
+def test_health_score(measures, expected_health):
+    assert health_score(measures) == pytest.approx(expected_health)
+
+
+def test_get_sms_provider_health_is_healthy_if_disabled(notify_api, mock_pipeline):
+    with set_config(notify_api, "SMS_PROVIDER_HEALTH_ENABLED", False):
+        assert get_sms_provider_health(["mmg", "firetext"]) == {"mmg": 1.0, "firetext": 1.0}
+
+    assert not mock_pipeline.execute.called
+
+
+def test_get_sms_provider_health_is_healthy_if_redis_errors(provider_health_enabled, mock_pipeline):
+    mock_pipeline.execute.side_effect = ConnectionError
+
+    assert get_sms_provider_health(["mmg", "firetext"]) == {"mmg": 1.0, "firetext": 1.0}
+
+
+@freeze_time("2016-01-01 12:00:00")
+def test_get_sms_provider_health_sums_measures_over_window(provider_health_enabled, mock_pipeline, mocker):
+    mock_set_health = mocker.patch.object(_sms_health, "set")
+    # results are for firetext's minutes then mmg's, as providers are sorted by name
+    mock_pipeline.execute.return_value = [
+        {b"requests": b"50", b"errors": b"0", b"request_seconds": b"25"},
+        {},
+        {},
+        {},
+        {b"requests": b"50", b"errors": b"0", b"request_seconds": b"25"},
+        {b"requests": b"60", b"errors": b"15", b"request_seconds": b"30"},
+        {},
+        {},
+        {},
+        {b"requests": b"40", b"errors": b"10", b"request_seconds": b"20"},
+    ]
+
+    assert get_sms_provider_health(["mmg", "firetext"]) == {"firetext": 1.0, "mmg": 0.5}
+
+    this_minute = 1451649600 // 60
+    assert [hgetall_call.args[0] for hgetall_call in mock_pipeline.hgetall.call_args_list] == [
+        f"sms-provider-health-{provider}-{minute}"
+        for provider in ("firetext", "mmg")
+        for minute in range(this_minute - 4, this_minute + 1)
+    ]
+    assert mock_set_health.call_count == 2
+
+
+def test_get_sms_provider_health_is_cached(provider_health_enabled, mock_pipeline):
+    mock_pipeline.execute.return_value = [{}] * 10
+
+    get_sms_provider_health(["mmg", "firetext"])
+    get_sms_provider_health(["firetext", "mmg"])
+
+    assert mock_pipeline.execute.call_count == 1
+
+
+@freeze_time("2016-01-01 12:00:00")
+def test_record_sms_provider_request(provider_health_enabled, mock_pipeline):
+    record_sms_provider_request("mmg", 0.5, succeeded=False)
+
+    key = f"sms-provider-health-mmg-{1451649600 // 60}"
+    assert [hincrbyfloat_call.args for hincrbyfloat_call in mock_pipeline.hincrbyfloat.call_args_list] == [
+        (key, "requests", 1),
+        (key, "errors", 1),
+        (key, "request_seconds", 0.5),
+    ]
+    mock_pipeline.expire.assert_called_once_with(key, 360)
+    mock_pipeline.execute.assert_called_once_with()
+
+
+def test_record_sms_provider_receipt_lag_does_nothing_if_disabled(notify_api, mock_pipeline):
+    with set_config(notify_api, "SMS_PROVIDER_HEALTH_ENABLED", False):
+        record_sms_provider_receipt_lag("mmg", 30)
+
+    assert not mock_pipeline.execute.called
+
+
+@pytest.mark.parametrize("side_effect, succeeded", [(None, True), (ConnectionError, False)])
+def test_send_sms_recording_health_records_request(mocker, side_effect, succeeded):
+    mock_record = mocker.patch("app.delivery.sms_provider_health.record_sms_provider_request")
+    provider = mocker.Mock(name="provider")
+    provider.name = "mmg"
+    provider.send_sms.side_effect = side_effect
+
+    if side_effect:
+        with pytest.raises(side_effect):
+            send_sms_recording_health(provider, to="07700900000")
+    else:
+        send_sms_recording_health(provider, to="07700900000")
+
+    provider.send_sms.assert_called_once_with(to="07700900000")
+    assert mock_record.call_args.args[0] == "mmg"
+    assert mock_record.call_args.args[2] is succeeded
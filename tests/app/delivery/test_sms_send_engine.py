@@ -0,0 +1,66 @@
+import threading
+from unittest.mock import call
+
+import pytest
+from flask import current_app
+
+from app import firetext_client, mmg_client
+from app.clients.sms import SmsClientResponseException
+from app.delivery.sms_send_engine import SmsSendEngine
+from tests.conftest import set_config
+
+
+@pytest.fixture
+def mock_metrics(mocker):
+    return (
+        mocker.patch("app.delivery.sms_send_engine.record_sms_send_queued"),
+        mocker.patch("app.delivery.sms_send_engine.record_sms_send_in_flight"),
+    )
+
+
+def test_submit_sends_sms_from_engine_thread_with_app_context(notify_api, mocker, mock_metrics):
+    sending_threads = []
+
+    def send_sms(**kwargs):
+        assert current_app.config["NOTIFY_ENVIRONMENT"]
+        sending_threads.append(threading.current_thread())
+        return "response"
+
+    mock_send_sms = mocker.patch("app.clients.sms.mmg.MMGClient.send_sms", side_effect=send_sms)
+
+    future = SmsSendEngine().submit(mmg_client, {"to": "447700900000", "reference": "ref"})
+
+    assert future.result() == "response"
+    mock_send_sms.assert_called_once_with(to="447700900000", reference="ref")
+    assert sending_threads[0].name.startswith("sms-send-mmg")
+
+    mock_queued, mock_in_flight = mock_metrics
+    assert mock_queued.call_args_list == [call(1, "mmg"), call(-1, "mmg")]
+    assert mock_in_flight.call_args_list == [call(1, "mmg"), call(-1, "mmg")]
+
+
+def test_submit_returns_future_raising_send_sms_errors(notify_api, mocker, mock_metrics):
+    mocker.patch("app.clients.sms.mmg.MMGClient.send_sms", side_effect=SmsClientResponseException("failed"))
+
+    future = SmsSendEngine().submit(mmg_client, {})
+
+    with pytest.raises(SmsClientResponseException):
+        future.result()
+    assert mock_metrics[1].call_args_list == [call(1, "mmg"), call(-1, "mmg")]
+
+
+def test_each_provider_has_its_own_bounded_pool(notify_api, mocker, mock_metrics):
+    engine = SmsSendEngine()
+
+    with set_config(notify_api, "SMS_PROVIDER_SEND_CONCURRENCY", {"mmg": 3, "firetext": 5}):
+        mmg_executor = engine._get_executor(mmg_client.name)
+        firetext_executor = engine._get_executor(firetext_client.name)
+
+    assert mmg_executor is not firetext_executor
+    assert mmg_executor._max_workers == 3
+    assert firetext_executor._max_workers == 5
+    assert engine._get_executor(mmg_client.name) is mmg_executor
+
+    # a forked process needs its own pools
+    mocker.patch("app.delivery.sms_send_engine.os.getpid", return_value=-1)
+    assert engine._get_executor(mmg_client.name) is not mmg_executor
@@ -0,0 +1,170 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app.models import Notification
+from app.notifications.notification_status_buffer import (
+    NOTIFICATION_STATUS_BUFFER_MAX_ATTEMPTS,
+    NotificationStatusBuffer,
+)
+from tests.app.db import create_notification
+
+
+@pytest.fixture
+def buffer(notify_api, mocker):
+    mocker.patch("app.notifications.notification_status_buffer.threading.Thread")
+    mocker.patch("app.notifications.notification_status_buffer.atexit")
+    return NotificationStatusBuffer()
+
+
+@pytest.fixture
+def mock_apply_updates(mocker):
+    return mocker.patch("app.notifications.notification_status_buffer.dao_apply_notification_status_updates")
+
+
+def test_add_coalesces_updates_to_the_same_notification(buffer, mock_apply_updates):
+    buffer.add("abc", "sending", sent_by="mmg", billable_units=1)
+    buffer.add("def", "sending", sent_by="firetext")
+    # eg the updates from a retry which raced the first attempt
+    buffer.add("abc", "created", billable_units=2)
+
+    buffer.flush()
+
+    mock_apply_updates.assert_called_once_with(
+        [
+            ("abc", "sending", {"sent_by": "mmg", "billable_units": 2}),
+            ("def", "sending", {"sent_by": "firetext"}),
+        ]
+    )
+
+
+def test_flush_does_nothing_if_buffer_is_empty(buffer, mock_apply_updates):
+    buffer.flush()
+
+    assert not mock_apply_updates.called
+
+
+def test_flush_keeps_updates_if_they_cant_be_written(buffer, mock_apply_updates, caplog):
+    buffer.add("abc", "sending", reference="first")
+    mock_apply_updates.side_effect = [Exception, None]
+
+    buffer.flush()
+    buffer.add("abc", "pending", reference="second")
+    buffer.flush()
+
+    assert "Failed to write 1 buffered notification status updates" in caplog.messages
+    assert mock_apply_updates.call_args_list[1].args == ([("abc", "pending", {"reference": "second"})],)
+
+
+def test_flush_writes_updates_on_their_own_if_batch_cant_be_written(buffer, mock_apply_updates, caplog):
+    buffer.add("abc", "sending")
+    buffer.add("bad", "sending")
+    buffer.add("def", "sending")
+
+    def apply_updates(updates):
+        if any(notification_id == "bad" for notification_id, _, _ in updates):
+            raise ValueError
+
+    mock_apply_updates.side_effect = apply_updates
+    generation = buffer.add("ghi", "sending")
+
+    for _ in range(NOTIFICATION_STATUS_BUFFER_MAX_ATTEMPTS):
+        buffer.flush()
+
+    assert [call.args[0] for call in mock_apply_updates.call_args_list[:5]] == [
+        [("abc", "sending", {}), ("bad", "sending", {}), ("def", "sending", {}), ("ghi", "sending", {})],
+        [("abc", "sending", {})],
+        [("bad", "sending", {})],
+        [("def", "sending", {})],
+        [("ghi", "sending", {})],
+    ]
+    # the bad update is then tried on its own until it's dropped
+    assert [call.args[0] for call in mock_apply_updates.call_args_list[5:]] == [[("bad", "sending", {})]] * 4
+    assert "Dropped buffered status update for notification bad after 5 attempts" in caplog.messages
+    assert buffer._updates == {}
+    assert buffer.wait_until_written(generation, timeout=0)
+
+
+def test_flush_keeps_trying_updates_while_database_cant_be_reached(buffer, mock_apply_updates):
+    buffer.add("abc", "sending")
+    buffer.add("def", "sending")
+    mock_apply_updates.side_effect = OperationalError("UPDATE", {}, Exception("connection refused"))
+
+    for _ in range(NOTIFICATION_STATUS_BUFFER_MAX_ATTEMPTS + 1):
+        buffer.flush()
+
+    assert mock_apply_updates.call_count == NOTIFICATION_STATUS_BUFFER_MAX_ATTEMPTS + 1
+    assert list(buffer._updates) == ["abc", "def"]
+
+
+def test_add_starts_flushing_thread_once_per_process(buffer, mocker):
+    mock_thread = mocker.patch("app.notifications.notification_status_buffer.threading.Thread")
+
+    buffer.add("abc", "sending")
+    buffer.add("def", "sending")
+
+    assert mock_thread.call_count == 1
+    mock_thread.return_value.start.assert_called_once_with()
+
+    # a forked process needs its own thread, and leaves its parent's updates to its parent
+    mocker.patch("app.notifications.notification_status_buffer.os.getpid", return_value=-1)
+    buffer.add("ghi", "sending")
+
+    assert mock_thread.call_count == 2
+    assert list(buffer._updates) == ["ghi"]
+
+
+def test_write_wakes_flushing_thread_and_waits_for_update_to_be_written(buffer, mocker):
+    mock_wait = mocker.patch.object(buffer, "wait_until_written", return_value=True)
+
+    buffer.write("abc", "sending", reference="ref")
+
+    assert buffer._flush_requested.is_set()
+    mock_wait.assert_called_once_with(0)
+    assert buffer._updates == {"abc": ("sending", {"reference": "ref"})}
+
+
+def test_write_logs_rather_than_raises_if_update_not_written_in_time(buffer, mocker, caplog):
+    mocker.patch.object(buffer, "wait_until_written", return_value=False)
+
+    buffer.write("abc", "sending", reference="ref")
+
+    assert "Buffered status update for notification abc not written within 30 seconds" in caplog.messages
+
+
+def test_wait_until_written_returns_once_updates_written(buffer, mock_apply_updates):
+    generation = buffer.add("abc", "sending")
+
+    assert not buffer.wait_until_written(generation, timeout=0)
+
+    buffer.flush()
+
+    assert buffer.wait_until_written(generation, timeout=0)
+
+
+def test_wait_until_written_waits_for_updates_which_couldnt_be_written_to_be_written_later(buffer, mock_apply_updates):
+    generation = buffer.add("abc", "sending")
+    mock_apply_updates.side_effect = [Exception, None]
+
+    buffer.flush()
+
+    assert not buffer.wait_until_written(generation, timeout=0)
+
+    buffer.flush()
+
+    assert buffer.wait_until_written(generation, timeout=0)
+    assert mock_apply_updates.call_args_list[1].args == ([("abc", "sending", {})],)
+
+
+def test_flush_writes_updates(buffer, sample_template):
+    notification = create_notification(template=sample_template, status="created")
+    sent_at = datetime(2016, 1, 1, 12, 0)
+
+    buffer.add(notification.id, "sending", sent_at=sent_at, sent_by="mmg", reference=None, billable_units=1)
+    buffer.flush()
+
+    notification = Notification.query.get(notification.id)
+    assert notification.status == "sending"
+    assert notification.sent_at == sent_at
+    assert notification.sent_by == "mmg"
@@ -1,22 +1,30 @@
+from datetime import datetime
+from unittest.mock import call
+
 import pytest
 from flask import json
 from sqlalchemy.exc import SQLAlchemyError
 
-from app.celery.service_callback_tasks import send_delivery_status_to_service
+from app.celery.service_callback_tasks import send_delivery_status_to_service, send_delivery_statuses_to_service
 from app.dao.notifications_dao import get_notification_by_id
+from app.dao.service_callback_api_dao import get_delivery_status_callback_api_for_service
 from app.models import Complaint
 from app.notifications.notifications_ses_callback import (
     check_and_queue_callback_task,
+    check_and_queue_callback_tasks,
     handle_complaint,
 )
 from tests.app.db import (
     create_notification,
     create_notification_history,
+    create_service,
     create_service_callback_api,
+    create_template,
     ses_complaint_callback,
     ses_complaint_callback_malformed_message_id,
     ses_complaint_callback_with_missing_complaint_type,
 )
+from tests.conftest import set_config
 
 
 def test_ses_callback_should_not_set_status_once_status_is_delivered(sample_email_template):
@@ -103,3 +111,79 @@ def test_check_and_queue_callback_task_no_callback_api(mock_celery_task, sample_
 
     check_and_queue_callback_task(sample_notification)
     mock_send.assert_not_called()
+
+
+def test_check_and_queue_callback_tasks(mocker, mock_celery_task, sample_template):
+    mock_create = mocker.patch(
+        "app.notifications.notifications_ses_callback.create_delivery_status_callback_data",
+        side_effect=lambda notification, callback_api: f"encoded-{notification.id}",
+    )
+    mock_get_callback_api = mocker.patch(
+        "app.notifications.notifications_ses_callback.get_delivery_status_callback_api_for_service",
+        wraps=get_delivery_status_callback_api_for_service,
+    )
+    mock_send = mock_celery_task(send_delivery_status_to_service)
+    create_service_callback_api(callback_type="delivery_status", service=sample_template.service)
+    notification_1 = create_notification(template=sample_template)
+    notification_2 = create_notification(template=sample_template)
+    no_callback_api_notification = create_notification(
+        template=create_template(service=create_service(service_name="No callback api service"))
+    )
+
+    check_and_queue_callback_tasks(
+        [
+            (notification_1, datetime(2001, 1, 1, 12, 0)),
+            (notification_2, None),
+            (no_callback_api_notification, None),
+        ]
+    )
+
+    assert mock_get_callback_api.call_count == 2
+    assert mock_create.call_count == 2
+    assert mock_send.call_args_list == [
+        call(
+            [str(notification_1.id), f"encoded-{notification_1.id}"],
+            {"receipt_iso_timestamp": "2001-01-01T12:00:00"},
+            queue="service-callbacks",
+            MessageGroupId=str(sample_template.service_id),
+        ),
+        call(
+            [str(notification_2.id), f"encoded-{notification_2.id}"],
+            {"receipt_iso_timestamp": None},
+            queue="service-callbacks",
+            MessageGroupId=str(sample_template.service_id),
+        ),
+    ]
+
+
+def test_check_and_queue_callback_tasks_batches_callbacks_by_service(
+    notify_api, mocker, mock_celery_task, sample_template
+):
+    mocker.patch(
+        "app.notifications.notifications_ses_callback.create_delivery_status_callback_data",
+        side_effect=lambda notification, callback_api: f"encoded-{notification.id}",
+    )
+    mock_send = mock_celery_task(send_delivery_status_to_service)
+    mock_send_batch = mock_celery_task(send_delivery_statuses_to_service)
+    create_service_callback_api(callback_type="delivery_status", service=sample_template.service)
+    notifications = [create_notification(template=sample_template) for _ in range(3)]
+
+    with (
+        set_config(notify_api, "SERVICE_CALLBACK_BATCHING_ENABLED", True),
+        set_config(notify_api, "SERVICE_CALLBACK_BATCH_SIZE", 2),
+    ):
+        check_and_queue_callback_tasks((notification, None) for notification in notifications)
+
+    assert not mock_send.called
+    assert mock_send_batch.call_args_list == [
+        call(
+            [[[str(notification.id), f"encoded-{notification.id}", None] for notification in notifications[:2]]],
+            queue="service-callbacks",
+            MessageGroupId=str(sample_template.service_id),
+        ),
+        call(
+            [[[str(notifications[2].id), f"encoded-{notifications[2].id}", None]]],
+            queue="service-callbacks",
+            MessageGroupId=str(sample_template.service_id),
+        ),
+    ]
@@ -16,7 +16,7 @@ def mmg_post(client, data):
 
 
 def test_firetext_callback_should_not_need_auth(client, mocker):
-    mocker.patch("app.notifications.notifications_sms_callback.process_sms_client_response")
+    mocker.patch("app.notifications.notifications_sms_callback.queue_sms_client_response")
     data = "mobile=441234123123&status=0&reference=notification_id&time=2016-03-10 14:17:00"
 
     response = firetext_post(client, data)
@@ -132,7 +132,7 @@ def test_firetext_callback_including_a_code_should_return_200_and_call_task_with
 
 
 def test_mmg_callback_should_not_need_auth(client, mocker, sample_notification):
-    mocker.patch("app.notifications.notifications_sms_callback.process_sms_client_response")
+    mocker.patch("app.notifications.notifications_sms_callback.queue_sms_client_response")
     data = json.dumps(
         {
             "reference": "mmg_reference",
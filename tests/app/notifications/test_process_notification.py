@@ -14,6 +14,7 @@ from sqlalchemy.exc import SQLAlchemyError
 
 from app.constants import (
     EMAIL_TYPE,
+    INTERNATIONAL_SMS_TYPE,
     KEY_TYPE_NORMAL,
     LETTER_TYPE,
     SMS_TYPE,
@@ -26,6 +27,7 @@ from app.notifications.process_notifications import (
     send_notification_to_queue,
     simulated_recipient,
 )
+from app.notifications.rate_limit_script import DailyLimit
 from app.serialised_models import SerialisedTemplate
 from app.utils import parse_and_format_phone_number
 from app.v2.errors import BadRequestError, QrCodeTooLongError
@@ -461,6 +463,45 @@ def test_persist_notification_increments_cache_for_trial_or_live_service(
         ]
 
 
+@freeze_time("2016-01-01 11:09:00.061258")
+def test_persist_notification_increments_international_sms_caches_with_one_script_call(
+    notify_api, notify_db_session, mocker
+):
+    service = create_service(service_permissions=[SMS_TYPE, INTERNATIONAL_SMS_TYPE])
+    template = create_template(service=service)
+    api_key = create_api_key(service=service)
+    mock_script = mocker.patch("app.notifications.process_notifications.run_rate_limit_script")
+    mock_incr = mocker.patch("app.notifications.process_notifications.redis_store.incr")
+
+    with set_config(notify_api, "REDIS_ENABLED", True), set_config(notify_api, "REDIS_RATE_LIMIT_SCRIPT_ENABLED", True):
+        persist_notification(
+            template_id=template.id,
+            template_version=template.version,
+            recipient={
+                "unformatted_recipient": "+201212341234",
+                "normalised_to": "201212341234",
+                "international": True,
+                "phone_prefix": "20",
+                "rate_multiplier": 7,
+            },
+            service=template.service,
+            personalisation={},
+            notification_type=SMS_TYPE,
+            api_key_id=api_key.id,
+            key_type=api_key.key_type,
+        )
+
+    assert mock_script.call_args_list == [
+        mocker.call(
+            [
+                DailyLimit(cache_key=f"{service.id}-sms-2016-01-01-count", amount=1),
+                DailyLimit(cache_key=f"{service.id}-international_sms-2016-01-01-count", amount=1),
+            ]
+        )
+    ]
+    assert not mock_incr.called
+
+
 @pytest.mark.parametrize("restricted_service", [True, False])
 @freeze_time("2016-01-01 11:09:00.061258")
 def test_persist_notification_sets_daily_limit_cache_if_one_does_not_exist(
@@ -0,0 +1,63 @@
+import pytest
+from freezegun import freeze_time
+
+from app.notifications.rate_limit_script import (
+    DailyLimit,
+    LimitExceeded,
+    TokenBucket,
+    run_rate_limit_script,
+)
+
+
+@pytest.fixture
+def mock_script(mocker):
+    return mocker.patch("app.notifications.rate_limit_script._get_rate_limit_script").return_value
+
+
+@freeze_time("2016-01-01 12:00:00")
+def test_run_rate_limit_script_passes_keys_and_args(mock_script):
+    mock_script.return_value = [0, 0]
+
+    assert (
+        run_rate_limit_script(
+            [DailyLimit(cache_key="sms-count", amount=1, limit=10), DailyLimit(cache_key="intl-count", amount=2)],
+            token_bucket=TokenBucket(key="bucket", replenish_per_sec=0.5, bucket_max=11, bucket_min=0),
+        )
+        is None
+    )
+
+    mock_script.assert_called_once_with(
+        keys=["bucket", "sms-count", "intl-count"],
+        args=[1451649600.0, 86400, 0.5, 11, 0, 1, 10, 1, 2, -1, 1],
+    )
+
+
+@freeze_time("2016-01-01 12:00:00")
+def test_run_rate_limit_script_without_token_bucket(mock_script):
+    mock_script.return_value = [0, 0]
+
+    run_rate_limit_script([DailyLimit(cache_key="sms-count", amount=1, limit=10, increment=False)])
+
+    mock_script.assert_called_once_with(keys=["", "sms-count"], args=[1451649600.0, 86400, 0, 0, 0, 1, 10, 0])
+
+
+def test_run_rate_limit_script_returns_token_bucket_exceeded(mock_script):
+    mock_script.return_value = [-1, 0]
+
+    assert run_rate_limit_script(
+        [DailyLimit(cache_key="sms-count", amount=0, limit=10)],
+        token_bucket=TokenBucket(key="bucket", replenish_per_sec=1, bucket_max=21, bucket_min=0),
+    ) == LimitExceeded(daily_limit=None, count=0)
+
+
+def test_run_rate_limit_script_returns_daily_limit_exceeded(mock_script):
+    mock_script.return_value = [2, 99]
+    daily_limits = [DailyLimit(cache_key="sms-count", amount=1, limit=10), DailyLimit("intl-count", 1, 100)]
+
+    assert run_rate_limit_script(daily_limits) == LimitExceeded(daily_limit=daily_limits[1], count=99)
+
+
+def test_run_rate_limit_script_allows_if_redis_errors(mock_script):
+    mock_script.side_effect = ConnectionError
+
+    assert run_rate_limit_script([DailyLimit(cache_key="sms-count", amount=1, limit=10)]) is None
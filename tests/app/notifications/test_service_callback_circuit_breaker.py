@@ -0,0 +1,98 @@
+import pytest
+from freezegun import freeze_time
+
+from app import redis_store
+from app.notifications.service_callback_circuit_breaker import (
+    CircuitCheck,
+    _circuit_key,
+    check_service_callback_circuit,
+    record_service_callback_circuit_result,
+)
+from app.otel_metrics.service_callback import _service_callback_circuit_transitions
+from tests.conftest import set_config
+
+
+@pytest.fixture
+def circuit_breaker_enabled(notify_api, mocker):
+    mocker.patch.object(redis_store, "active", True)
+    with set_config(notify_api, "SERVICE_CALLBACK_CIRCUIT_BREAKER_ENABLED", True):
+        yield
+
+
+@pytest.fixture
+def mock_check_script(mocker):
+    return mocker.patch("app.notifications.service_callback_circuit_breaker._get_check_circuit_script").return_value
+
+
+@pytest.fixture
+def mock_record_script(mocker):
+    return mocker.patch(
+        "app.notifications.service_callback_circuit_breaker._get_record_circuit_result_script"
+    ).return_value
+
+
+def test_check_service_callback_circuit_does_nothing_if_disabled(notify_api, mock_check_script):
+    with set_config(notify_api, "SERVICE_CALLBACK_CIRCUIT_BREAKER_ENABLED", False):
+        assert check_service_callback_circuit("https://example.com") == CircuitCheck(park_for=0, probe=False)
+
+    assert not mock_check_script.called
+
+
+@freeze_time("2016-01-01 12:00:00")
+@pytest.mark.parametrize(
+    "script_result, expected_check, expected_transition_count",
+    [
+        ([0, 0], CircuitCheck(park_for=0, probe=False), 0),
+        ([25, 0], CircuitCheck(park_for=25, probe=False), 0),
+        # parked for no longer than SQS can delay a message
+        ([3000, 0], CircuitCheck(park_for=900, probe=False), 0),
+        ([0, 1], CircuitCheck(park_for=0, probe=True), 1),
+    ],
+)
+def test_check_service_callback_circuit(
+    circuit_breaker_enabled, mock_check_script, mocker, script_result, expected_check, expected_transition_count
+):
+    mock_transition = mocker.patch.object(_service_callback_circuit_transitions, "add")
+    mock_check_script.return_value = script_result
+
+    assert check_service_callback_circuit("https://example.com") == expected_check
+
+    mock_check_script.assert_called_once_with(keys=[_circuit_key("https://example.com")], args=[1451649600.0, 30])
+    assert mock_transition.call_args_list == [mocker.call(1, {"circuit.state": "half_open"})] * (
+        expected_transition_count
+    )
+
+
+def test_check_service_callback_circuit_allows_callback_if_redis_errors(circuit_breaker_enabled, mock_check_script):
+    mock_check_script.side_effect = ConnectionError
+
+    assert check_service_callback_circuit("https://example.com") == CircuitCheck(park_for=0, probe=False)
+
+
+@freeze_time("2016-01-01 12:00:00")
+@pytest.mark.parametrize(
+    "succeeded, script_result, expected_transitions",
+    [
+        (True, 0, []),
+        (False, 1, [{"circuit.state": "open"}]),
+        (True, 2, [{"circuit.state": "closed"}]),
+    ],
+)
+def test_record_service_callback_circuit_result(
+    circuit_breaker_enabled, mock_record_script, mocker, succeeded, script_result, expected_transitions
+):
+    mock_transition = mocker.patch.object(_service_callback_circuit_transitions, "add")
+    mock_record_script.return_value = script_result
+
+    record_service_callback_circuit_result("https://example.com", succeeded=succeeded)
+
+    mock_record_script.assert_called_once_with(
+        keys=[_circuit_key("https://example.com")],
+        args=[1451649600.0, 1 if succeeded else 0, 60, 20, 0.5, 30, 3600],
+    )
+    assert mock_transition.call_args_list == [mocker.call(1, attrs) for attrs in expected_transitions]
+
+
+def test_circuit_key_doesnt_include_url():
+    assert "example.com" not in _circuit_key("https://example.com/callback?token=secret")
+    assert _circuit_key("https://example.com/a") != _circuit_key("https://example.com/b")
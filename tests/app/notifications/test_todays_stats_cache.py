@@ -0,0 +1,246 @@
+import json
+import uuid
+from collections import namedtuple
+from datetime import date
+from unittest.mock import call
+
+import pytest
+from freezegun import freeze_time
+
+from app import redis_store
+from app.celery.scheduled_tasks import refresh_todays_stats_cache
+from app.constants import (
+    EMAIL_TYPE,
+    KEY_TYPE_NORMAL,
+    KEY_TYPE_TEST,
+    NOTIFICATION_STATUS_TYPES_COMPLETED,
+    SMS_TYPE,
+)
+from app.notifications.todays_stats_cache import (
+    TODAYS_STATS_EXPIRY_SECONDS,
+    TODAYS_STATS_RECENT_EXPIRY_SECONDS,
+    TodaysStatsRow,
+    get_service_ids_to_refresh,
+    get_todays_stats,
+    record_notifications_created,
+    refresh_todays_stats,
+    todays_stats_available,
+)
+from tests.conftest import set_config
+
+StatsRow = namedtuple("StatsRow", ["service_id", "notification_type", "status", "key_type", "count"])
+
+
+@pytest.fixture
+def todays_stats_cache_enabled(notify_api, mocker):
+    mocker.patch.object(redis_store, "active", True)
+    with set_config(notify_api, "TODAYS_STATS_CACHE_ENABLED", True):
+        yield
+
+
+@pytest.fixture
+def mock_redis(mocker):
+    mocker.patch("app.notifications.todays_stats_cache._refresh_todays_stats_script", None)
+    return mocker.patch.object(redis_store, "redis_store")
+
+
+@pytest.fixture
+def mock_pipeline(mock_redis):
+    return mock_redis.pipeline.return_value
+
+
+@freeze_time("2026-10-17T12:00:00")
+def test_record_notifications_created(todays_stats_cache_enabled, mock_pipeline):
+    service_id = uuid.uuid4()
+
+    record_notifications_created(service_id, KEY_TYPE_NORMAL, {SMS_TYPE: 3})
+
+    assert mock_pipeline.hincrby.call_args_list == [
+        call(f"service-{service_id}-todays-stats-2026-10-17", "sms:created:normal", 3),
+        # by the minute they were created in
+        call(f"service-{service_id}-todays-stats-2026-10-17-recent", "29870640:sms:normal", 3),
+    ]
+    assert mock_pipeline.expire.call_args_list == [
+        call(f"service-{service_id}-todays-stats-2026-10-17", TODAYS_STATS_EXPIRY_SECONDS),
+        call(f"service-{service_id}-todays-stats-2026-10-17-recent", TODAYS_STATS_RECENT_EXPIRY_SECONDS),
+        call("todays-stats-changed-2026-10-17", TODAYS_STATS_EXPIRY_SECONDS),
+    ]
+    mock_pipeline.sadd.assert_called_once_with("todays-stats-changed-2026-10-17", str(service_id))
+    assert mock_pipeline.execute.called
+
+
+def test_record_notifications_created_does_nothing_if_disabled(notify_api, mock_pipeline):
+    with set_config(notify_api, "TODAYS_STATS_CACHE_ENABLED", False):
+        record_notifications_created(uuid.uuid4(), KEY_TYPE_NORMAL, {SMS_TYPE: 1})
+
+    assert not mock_pipeline.execute.called
+
+
+def test_record_notifications_created_ignores_redis_errors(todays_stats_cache_enabled, mock_pipeline):
+    mock_pipeline.execute.side_effect = ConnectionError
+
+    record_notifications_created(uuid.uuid4(), KEY_TYPE_NORMAL, {SMS_TYPE: 1})
+
+
+def _refresh_script_call(service_id, counts, pipeline):
+    return call(
+        keys=[
+            f"service-{service_id}-todays-stats-2026-10-17",
+            f"service-{service_id}-todays-stats-2026-10-17-recent",
+            "todays-stats-in-flight-2026-10-17",
+        ],
+        args=[
+            29870640,
+            TODAYS_STATS_EXPIRY_SECONDS,
+            json.dumps(counts),
+            json.dumps(NOTIFICATION_STATUS_TYPES_COMPLETED),
+            str(service_id),
+            "created",
+        ],
+        client=pipeline,
+    )
+
+
+def test_refresh_todays_stats_refreshes_every_service_in_rows(mock_redis, mock_pipeline):
+    service_id = uuid.uuid4()
+
+    refresh_todays_stats(
+        [
+            StatsRow(service_id, SMS_TYPE, "delivered", KEY_TYPE_NORMAL, 5),
+            StatsRow(service_id, SMS_TYPE, "created", KEY_TYPE_TEST, 2),
+        ],
+        date(2026, 10, 17),
+        service_ids=None,
+        # the counts are from 12:00:30 UTC
+        snapshot_at=1792238430,
+    )
+
+    assert mock_redis.register_script.return_value.call_args_list == [
+        _refresh_script_call(service_id, {"sms:delivered:normal": 5, "sms:created:test": 2}, mock_pipeline)
+    ]
+    mock_pipeline.set.assert_called_once_with("todays-stats-refreshed-2026-10-17", 1, ex=TODAYS_STATS_EXPIRY_SECONDS)
+    assert mock_pipeline.execute.called
+
+
+def test_refresh_todays_stats_refreshes_given_services(mock_redis, mock_pipeline):
+    service_id, service_without_stats_id = str(uuid.uuid4()), str(uuid.uuid4())
+
+    refresh_todays_stats(
+        [StatsRow(uuid.UUID(service_id), SMS_TYPE, "delivered", KEY_TYPE_NORMAL, 5)],
+        date(2026, 10, 17),
+        service_ids=[service_id, service_without_stats_id],
+        snapshot_at=1792238430,
+    )
+
+    assert mock_redis.register_script.return_value.call_args_list == [
+        _refresh_script_call(service_id, {"sms:delivered:normal": 5}, mock_pipeline),
+        _refresh_script_call(service_without_stats_id, {}, mock_pipeline),
+    ]
+
+
+def test_get_service_ids_to_refresh(mock_redis, mock_pipeline):
+    mock_redis.exists.return_value = 1
+    mock_pipeline.execute.return_value = [{b"def", b"abc"}, 1]
+
+    assert get_service_ids_to_refresh(date(2026, 10, 17)) == ["abc", "def"]
+
+    mock_redis.exists.assert_called_once_with("todays-stats-refreshed-2026-10-17")
+    mock_pipeline.sunion.assert_called_once_with("todays-stats-changed-2026-10-17", "todays-stats-in-flight-2026-10-17")
+    mock_pipeline.delete.assert_called_once_with("todays-stats-changed-2026-10-17")
+
+
+def test_get_service_ids_to_refresh_returns_none_until_refreshed(mock_redis, mock_pipeline):
+    mock_redis.exists.return_value = 0
+
+    assert get_service_ids_to_refresh(date(2026, 10, 17)) is None
+
+    # services with new notifications are still refreshed after the first refresh
+    assert not mock_pipeline.delete.called
+
+
+@pytest.mark.parametrize("refreshed, expected", [(1, True), (0, False)])
+def test_todays_stats_available(todays_stats_cache_enabled, mock_redis, refreshed, expected):
+    mock_redis.exists.return_value = refreshed
+
+    assert todays_stats_available() is expected
+
+
+def test_todays_stats_available_returns_false_if_redis_errors(todays_stats_cache_enabled, mock_redis):
+    mock_redis.exists.side_effect = ConnectionError
+
+    assert todays_stats_available() is False
+
+
+@pytest.mark.parametrize(
+    "include_from_test_key, expected_stats",
+    [
+        (False, [TodaysStatsRow(EMAIL_TYPE, "created", 1), TodaysStatsRow(SMS_TYPE, "delivered", 5)]),
+        (True, [TodaysStatsRow(EMAIL_TYPE, "created", 1), TodaysStatsRow(SMS_TYPE, "delivered", 7)]),
+    ],
+)
+def test_get_todays_stats(todays_stats_cache_enabled, mock_pipeline, include_from_test_key, expected_stats):
+    service_id, other_service_id = uuid.uuid4(), uuid.uuid4()
+    mock_pipeline.execute.return_value = [
+        1,
+        {
+            b"sms:delivered:normal": b"4",
+            b"sms:delivered:team": b"1",
+            b"sms:delivered:test": b"2",
+            b"email:created:normal": b"1",
+        },
+        {},
+    ]
+
+    assert get_todays_stats([service_id, other_service_id], include_from_test_key=include_from_test_key) == {
+        service_id: expected_stats,
+        other_service_id: [],
+    }
+
+
+def test_get_todays_stats_returns_none_until_refreshed(todays_stats_cache_enabled, mock_pipeline):
+    mock_pipeline.execute.return_value = [0, {}]
+
+    assert get_todays_stats([uuid.uuid4()]) is None
+
+
+def test_get_todays_stats_returns_none_if_redis_errors(todays_stats_cache_enabled, mock_pipeline):
+    mock_pipeline.execute.side_effect = ConnectionError
+
+    assert get_todays_stats([uuid.uuid4()]) is None
+
+
+def test_get_todays_stats_returns_none_if_disabled(notify_api, mock_pipeline):
+    with set_config(notify_api, "TODAYS_STATS_CACHE_ENABLED", False):
+        assert get_todays_stats([uuid.uuid4()]) is None
+
+    assert not mock_pipeline.execute.called
+
+
+@freeze_time("2026-10-17T12:00:00")
+def test_refresh_todays_stats_cache(todays_stats_cache_enabled, mocker):
+    service_ids = [str(uuid.uuid4())]
+    rows = [StatsRow(service_ids[0], SMS_TYPE, "delivered", KEY_TYPE_NORMAL, 5)]
+    mocker.patch("app.celery.scheduled_tasks.get_service_ids_to_refresh", return_value=service_ids)
+    mocker.patch("app.celery.scheduled_tasks.dao_get_replication_lag_seconds", return_value=30)
+    mock_fetch = mocker.patch(
+        "app.celery.scheduled_tasks.dao_fetch_stats_by_service_and_key_type_for_day", return_value=rows
+    )
+    mock_refresh = mocker.patch("app.celery.scheduled_tasks.refresh_todays_stats")
+
+    refresh_todays_stats_cache()
+
+    assert mock_fetch.call_args.args == (date(2026, 10, 17),)
+    assert mock_fetch.call_args.kwargs["service_ids"] == service_ids
+    # the replica's counts are as of 30 seconds ago
+    mock_refresh.assert_called_once_with(rows, date(2026, 10, 17), service_ids, 1792238370)
+
+
+def test_refresh_todays_stats_cache_does_nothing_if_no_services_changed(todays_stats_cache_enabled, mocker):
+    mocker.patch("app.celery.scheduled_tasks.get_service_ids_to_refresh", return_value=[])
+    mock_fetch = mocker.patch("app.celery.scheduled_tasks.dao_fetch_stats_by_service_and_key_type_for_day")
+    mock_refresh = mocker.patch("app.celery.scheduled_tasks.refresh_todays_stats")
+
+    refresh_todays_stats_cache()
+
+    assert not mock_fetch.called
+    assert not mock_refresh.called
@@ -26,6 +26,7 @@ from app.models import ServicePermission
 from app.notifications.process_notifications import (
     create_content_for_notification,
 )
+from app.notifications.rate_limit_script import DailyLimit, LimitExceeded, TokenBucket
 from app.notifications.validators import (
     check_if_service_can_send_files_by_email,
     check_is_message_too_long,
@@ -604,6 +605,102 @@ def test_check_rate_limiting_validates_api_rate_limit_and_daily_limit(notify_db_
     ]
 
 
+@pytest.mark.parametrize("api_rate_limit_enabled", [True, False])
+def test_check_rate_limiting_with_script_checks_token_bucket_and_daily_limit_in_one_call(
+    notify_api, notify_db_session, mocker, api_rate_limit_enabled
+):
+    mock_script = mocker.patch("app.notifications.validators.run_rate_limit_script", return_value=None)
+    mock_rate_limit = mocker.patch("app.notifications.validators.check_service_over_api_rate_limit")
+    mock_daily_limit = mocker.patch("app.notifications.validators.check_service_over_daily_message_limit")
+    service = create_service(rate_limit=60, sms_message_limit=1000)
+    api_key = create_api_key(service=service)
+
+    with set_config(notify_api, "REDIS_RATE_LIMIT_SCRIPT_ENABLED", True):
+        with set_config(notify_api, "API_RATE_LIMIT_ENABLED", api_rate_limit_enabled):
+            check_rate_limiting(service, api_key, notification_type=SMS_TYPE)
+
+    assert mock_script.call_args_list == [
+        call(
+            [
+                DailyLimit(
+                    cache_key=daily_limit_cache_key(service.id, notification_type=SMS_TYPE, key_type=api_key.key_type),
+                    amount=1,
+                    limit=1000,
+                    increment=False,
+                )
+            ],
+            token_bucket=(
+                TokenBucket(
+                    key=f"{service.id}-token-bucket-{api_key.key_type}",
+                    replenish_per_sec=1,
+                    bucket_max=21,
+                    bucket_min=0,
+                )
+                if api_rate_limit_enabled
+                else None
+            ),
+        )
+    ]
+    assert not mock_rate_limit.called
+    assert not mock_daily_limit.called
+
+
+def test_check_rate_limiting_with_script_raises_if_token_bucket_empty(notify_api, notify_db_session, mocker):
+    mocker.patch(
+        "app.notifications.validators.run_rate_limit_script",
+        return_value=LimitExceeded(daily_limit=None, count=0),
+    )
+    service = create_service(rate_limit=60)
+    api_key = create_api_key(service=service)
+
+    with set_config(notify_api, "REDIS_RATE_LIMIT_SCRIPT_ENABLED", True):
+        with pytest.raises(RateLimitError) as e:
+            check_rate_limiting(service, api_key, notification_type=SMS_TYPE)
+
+    assert e.value.message == "Exceeded rate limit for key type LIVE of 60 requests per 60 seconds"
+
+
+def test_check_rate_limiting_with_script_raises_if_daily_limit_exceeded(notify_api, notify_db_session, mocker):
+    service = create_service(email_message_limit=5)
+    api_key = create_api_key(service=service)
+    daily_limit = DailyLimit(cache_key="some-key", amount=0, limit=5)
+    mocker.patch(
+        "app.notifications.validators.run_rate_limit_script",
+        return_value=LimitExceeded(daily_limit=daily_limit, count=5),
+    )
+
+    with set_config(notify_api, "REDIS_RATE_LIMIT_SCRIPT_ENABLED", True):
+        with pytest.raises(TooManyRequestsError) as e:
+            check_rate_limiting(service, api_key, notification_type=EMAIL_TYPE)
+
+    assert e.value.limit_name == EMAIL_TYPE
+    assert e.value.sending_limit == 5
+
+
+@pytest.mark.parametrize("count, should_raise", [(4, False), (5, True)])
+def test_check_rate_limiting_with_script_allows_up_to_the_daily_limit(
+    notify_api, notify_db_session, mocker, count, should_raise
+):
+    service = create_service(email_message_limit=5)
+    api_key = create_api_key(service=service)
+
+    def rate_limit_script(daily_limits, token_bucket=None):
+        # the script's check of a counter, with `count` sent so far today
+        (daily_limit,) = daily_limits
+        if count + daily_limit.amount > daily_limit.limit:
+            return LimitExceeded(daily_limit=daily_limit, count=count)
+        return None
+
+    mocker.patch("app.notifications.validators.run_rate_limit_script", side_effect=rate_limit_script)
+
+    with set_config(notify_api, "REDIS_RATE_LIMIT_SCRIPT_ENABLED", True):
+        if should_raise:
+            with pytest.raises(TooManyRequestsError):
+                check_rate_limiting(service, api_key, notification_type=EMAIL_TYPE)
+        else:
+            check_rate_limiting(service, api_key, notification_type=EMAIL_TYPE)
+
+
 @pytest.mark.parametrize("key_type", ["test", "normal"])
 def test_validate_and_format_recipient_fails_when_international_number_and_service_does_not_allow_int_sms(
     key_type,
@@ -40,6 +40,7 @@ from tests.app.db import (
     create_service_data_retention,
 )
 from tests.conftest import set_config
+from tests.utils import QueryRecorder
 
 
 def get_created_at_date_time(days_ago=0):
@@ -182,10 +183,28 @@ def test_start_multipart_upload_sets_upload_id(mocker, mock_processor):
 def test_fetch_and_upload_notifications(mocker, mock_processor):
     mock_upload = mocker.patch.object(mock_processor, "_upload_csv_part_if_needed")
     mock_upload_rem = mocker.patch.object(mock_processor, "_upload_remaining_data")
-    mock_processor._fetch_and_upload_notifications()
 
-    assert mock_upload.call_count == 2
+    with QueryRecorder() as query_recorder:
+        mock_processor._fetch_and_upload_notifications()
+
+    # too small for a part of its own, so it's all uploaded at the end
+    assert not mock_upload.called
     mock_upload_rem.assert_called_once()
+    assert len(mock_processor.csv_buffer.getvalue().splitlines()) == 40
+    # one query fetches every notification, rather than one for each page and more for each notification
+    assert len([query for query in query_recorder.queries if "FROM notifications" in query.statement]) == 1
+
+
+def test_fetch_and_upload_notifications_uploads_parts_as_buffer_fills(mocker, mock_processor):
+    mocker.patch("app.report_requests.process_notifications_report.S3_MULTIPART_UPLOAD_MIN_PART_SIZE", 1000)
+    mock_upload_part = mocker.patch.object(mock_processor, "_upload_part")
+
+    mock_processor._fetch_and_upload_notifications()
+
+    uploaded = b"".join(upload.args[0] for upload in mock_upload_part.call_args_list)
+    assert mock_upload_part.call_count > 1
+    assert all(len(upload.args[0]) >= 1000 for upload in mock_upload_part.call_args_list[:-1])
+    assert len(uploaded.splitlines()) == 40
 
 
 def test_upload_part_adds_to_parts(mocker, mock_processor):
@@ -220,32 +239,33 @@ def test_abort_upload_calls_s3(mocker, mock_processor):
     mock_abort.assert_called_once()
 
 
-def test_convert_notifications_to_csv(mock_processor):
-    notifications = [
-        {
-            "recipient": "user@email.com",
-            "client_reference": "abc123",
-            "template_name": "test-template",
-            "template_type": "email",
-            "created_by_name": "Admin User",
-            "created_by_email_address": "admin@test.com",
-            "job_name": "send emails",
-            "status": "delivered",
-            "created_at": "2025-04-01T00:00:00",
-            "api_key_name": "TEST-API-KEY",
-        }
-    ]
-    rows = mock_processor._convert_notifications_to_csv(notifications)
-    assert rows[0][0] == "user@email.com"
-    assert rows[0][1] == "abc123"
-    assert rows[0][2] == "test-template"
-    assert rows[0][3] == "email"
-    assert rows[0][4] == "Admin User"
-    assert rows[0][5] == "admin@test.com"
-    assert rows[0][6] == "send emails"
-    assert rows[0][7] == "delivered"
-    assert rows[0][8] == "2025-04-01T00:00:00"
-    assert rows[0][9] == "TEST-API-KEY"
+def test_stream_csv_rows(mock_processor, mock_service, sample_email_template):
+    user = mock_service.users[0]
+    job = create_job(template=sample_email_template, original_file_name="send emails.csv")
+    notification = create_notification(
+        job=job,
+        to_field="user@email.com",
+        client_reference="abc123",
+        status=NOTIFICATION_PERMANENT_FAILURE,
+        created_at=datetime(2025, 4, 1, 12),
+        created_by_id=user.id,
+    )
+    mock_processor.notification_type = "email"
+
+    rows = list(mock_processor._stream_csv_rows(limit_days=10_000))
+
+    assert rows[-1] == (
+        "user@email.com",
+        "abc123",
+        notification.template.name,
+        "email",
+        user.name,
+        user.email_address,
+        "send emails.csv",
+        "Email address doesn’t exist",
+        utc_string_to_bst_string(datetime(2025, 4, 1, 12)),
+        "",
+    )
 
 
 def test_process_calls_abort_on_exception(mocker, mock_processor):
@@ -293,10 +313,10 @@ def test_upload_remaining_data_skips_if_empty(mocker, mock_processor):
     mock_s3_upload_part.assert_not_called()
 
 
-def test_fetch_serialized_notifications_empty(mocker, mock_processor):
-    mocker.patch("app.report_requests.process_notifications_report.get_notifications_for_service")
-    result = mock_processor._fetch_serialized_notifications(7, None)
-    assert result == []
+def test_stream_csv_rows_empty(mock_processor):
+    mock_processor.notification_type = "letter"
+
+    assert list(mock_processor._stream_csv_rows(limit_days=7)) == []
 
 
 @pytest.mark.parametrize(
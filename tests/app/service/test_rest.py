@@ -1850,6 +1850,35 @@ def test_get_notifications_for_service_pagination_links(
     assert "next" not in page_3_response["links"]
 
 
+def test_get_notifications_for_service_older_than(admin_request, sample_template):
+    created_at = datetime.utcnow()
+    notifications = sorted(
+        (create_notification(sample_template, created_at=created_at) for _ in range(4)),
+        key=lambda notification: notification.id,
+        reverse=True,
+    )
+
+    first_page = admin_request.get(
+        "service.get_all_notifications_for_service",
+        service_id=sample_template.service_id,
+        older_than=notifications[0].id,
+        page_size=2,
+    )
+
+    assert [n["id"] for n in first_page["notifications"]] == [str(n.id) for n in notifications[1:3]]
+    assert first_page["links"] == {"next": True}
+
+    last_page = admin_request.get(
+        "service.get_all_notifications_for_service",
+        service_id=sample_template.service_id,
+        older_than=notifications[2].id,
+        page_size=2,
+    )
+
+    assert [n["id"] for n in last_page["notifications"]] == [str(notifications[3].id)]
+    assert last_page["links"] == {}
+
+
 def test_get_notifications_for_service_for_csv_multipage(
     admin_request,
     sample_template,
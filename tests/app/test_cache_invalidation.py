@@ -0,0 +1,271 @@
+import json
+from threading import RLock
+from unittest.mock import PropertyMock, call
+
+import cachetools
+import pytest
+
+from app import db, redis_store
+from app.cache_invalidation import (
+    CACHE_INVALIDATION_CHANNEL,
+    CacheInvalidationListener,
+    cache_invalidation_listener,
+    queue_service_cache_invalidation,
+)
+from app.dao.email_branding_dao import dao_update_email_branding
+from app.dao.service_email_reply_to_dao import update_reply_to_email_address
+from app.dao.service_sms_sender_dao import dao_get_sms_senders_by_service_id, dao_update_service_sms_sender
+from app.dao.services_dao import dao_update_service
+from app.dao.templates_dao import dao_update_template
+from app.serialised_models import SerialisedEmailBranding, SerialisedService, SerialisedTemplate, memory_cache
+from tests.app.db import create_email_branding, create_reply_to_email, create_template
+from tests.conftest import set_config
+
+
+@pytest.fixture
+def mock_redis(mocker):
+    mocker.patch.object(redis_store, "active", True)
+    mocker.patch.object(redis_store, "delete")
+    mocker.patch.object(redis_store, "redis_store")
+    return redis_store
+
+
+def test_dao_update_service_evicts_service_from_memory_cache(sample_service):
+    assert SerialisedService.from_id(sample_service.id).name == "Sample service"
+
+    sample_service.name = "Renamed service"
+    dao_update_service(sample_service)
+
+    assert SerialisedService.from_id(sample_service.id).name == "Renamed service"
+
+
+def test_dao_update_template_evicts_template_from_memory_cache(sample_template):
+    assert SerialisedTemplate.from_id_and_service_id(sample_template.id, sample_template.service_id).content == (
+        sample_template.content
+    )
+
+    sample_template.content = "New content"
+    dao_update_template(sample_template)
+
+    assert (
+        SerialisedTemplate.from_id_and_service_id(sample_template.id, sample_template.service_id).content
+        == "New content"
+    )
+
+
+def test_dao_update_service_sms_sender_evicts_templates_from_memory_cache(sample_template):
+    sms_sender = dao_get_sms_senders_by_service_id(sample_template.service_id)[0]
+    assert SerialisedTemplate.from_id_and_service_id(sample_template.id, sample_template.service_id).reply_to_text == (
+        sms_sender.sms_sender
+    )
+
+    dao_update_service_sms_sender(sample_template.service_id, sms_sender.id, is_default=True, sms_sender="new-sender")
+
+    assert (
+        SerialisedTemplate.from_id_and_service_id(sample_template.id, sample_template.service_id).reply_to_text
+        == "new-sender"
+    )
+
+
+def test_update_reply_to_email_address_evicts_templates_from_memory_cache(sample_email_template):
+    service = sample_email_template.service
+    reply_to = create_reply_to_email(service, "old@example.com")
+    assert (
+        SerialisedTemplate.from_id_and_service_id(sample_email_template.id, service.id).reply_to_text
+        == "old@example.com"
+    )
+
+    update_reply_to_email_address(service.id, reply_to.id, "new@example.com", is_default=True)
+
+    assert (
+        SerialisedTemplate.from_id_and_service_id(sample_email_template.id, service.id).reply_to_text
+        == "new@example.com"
+    )
+
+
+def test_dao_update_email_branding_evicts_email_branding_from_memory_cache(notify_db_session):
+    email_branding = create_email_branding(colour="blue")
+    assert SerialisedEmailBranding.from_id(email_branding.id).colour == "blue"
+
+    dao_update_email_branding(email_branding, colour="red")
+
+    assert SerialisedEmailBranding.from_id(email_branding.id).colour == "red"
+
+
+def test_dao_update_service_deletes_redis_cache_and_publishes_invalidation(sample_service, mock_redis):
+    dao_update_service(sample_service)
+
+    assert mock_redis.delete.call_args_list == [call(f"service-{sample_service.id}")]
+    assert mock_redis.redis_store.publish.call_args_list == [
+        call(CACHE_INVALIDATION_CHANNEL, json.dumps({"model": "service", "id": str(sample_service.id)}))
+    ]
+
+
+def test_dao_update_template_deletes_redis_cache_and_publishes_invalidation(sample_template, mock_redis):
+    dao_update_template(sample_template)
+
+    assert mock_redis.delete.call_args_list == [
+        call(f"service-{sample_template.service_id}-template-{sample_template.id}-version-None")
+    ]
+    assert mock_redis.redis_store.publish.call_args_list == [
+        call(CACHE_INVALIDATION_CHANNEL, json.dumps({"model": "template", "id": str(sample_template.id)}))
+    ]
+
+
+def test_update_reply_to_email_address_deletes_service_and_template_redis_caches(sample_service, mock_redis):
+    reply_to = create_reply_to_email(sample_service, "old@example.com")
+    sms_template = create_template(sample_service, template_type="sms")
+    email_template = create_template(sample_service, template_type="email")
+
+    update_reply_to_email_address(sample_service.id, reply_to.id, "new@example.com", is_default=True)
+
+    assert {args[0] for args, _ in mock_redis.delete.call_args_list} == {
+        f"service-{sample_service.id}",
+        f"service-{sample_service.id}-template-{sms_template.id}-version-None",
+        f"service-{sample_service.id}-template-{email_template.id}-version-None",
+    }
+
+
+def test_dao_update_email_branding_deletes_redis_cache_and_publishes_invalidation(notify_db_session, mock_redis):
+    email_branding = create_email_branding()
+
+    dao_update_email_branding(email_branding, text="New text")
+
+    assert mock_redis.delete.call_args_list == [call(f"api-email_branding-{email_branding.id}")]
+    assert mock_redis.redis_store.publish.call_args_list == [
+        call(CACHE_INVALIDATION_CHANNEL, json.dumps({"model": "email_branding", "id": str(email_branding.id)}))
+    ]
+
+
+def test_cache_invalidation_not_published_until_commit(sample_service, mock_redis):
+    queue_service_cache_invalidation(sample_service.id)
+
+    assert not mock_redis.redis_store.publish.called
+
+    db.session.commit()
+
+    assert mock_redis.redis_store.publish.call_count == 1
+
+
+def test_cache_invalidation_discarded_on_rollback(sample_service, mock_redis):
+    queue_service_cache_invalidation(sample_service.id)
+    db.session.rollback()
+    db.session.commit()
+
+    assert not mock_redis.delete.called
+    assert not mock_redis.redis_store.publish.called
+
+
+def test_listener_evicts_only_matching_model_and_id():
+    listener = CacheInvalidationListener()
+    service_cache = cachetools.TTLCache(maxsize=10, ttl=10)
+    template_cache = cachetools.TTLCache(maxsize=10, ttl=10)
+    listener.register("service", service_cache, RLock())
+    listener.register("template", template_cache, RLock())
+
+    service_cache.update({("abc",): 1, ("def",): 2})
+    template_cache.update({("abc", "def"): 3})
+
+    listener.evict("service", "abc")
+
+    assert dict(service_cache) == {("def",): 2}
+    assert dict(template_cache) == {("abc", "def"): 3}
+
+
+class StopListening(BaseException):
+    pass
+
+
+def test_listener_evicts_caches_on_messages(mocker):
+    listener = CacheInvalidationListener()
+    cache = cachetools.TTLCache(maxsize=10, ttl=10)
+    listener.register("service", cache, RLock())
+    cache.update({("abc",): 1, ("def",): 2})
+
+    mock_redis_client = mocker.Mock()
+    mock_pubsub = mock_redis_client.pubsub.return_value
+    mock_pubsub.get_message.side_effect = [
+        None,
+        {"data": json.dumps({"model": "service", "id": "abc"})},
+        StopListening,
+    ]
+
+    with pytest.raises(StopListening):
+        listener._listen(mock_redis_client, mocker.Mock())
+
+    mock_pubsub.subscribe.assert_called_once_with(CACHE_INVALIDATION_CHANNEL)
+    assert dict(cache) == {("def",): 2}
+
+
+def test_listener_clears_caches_when_resubscribing(mocker):
+    listener = CacheInvalidationListener()
+    cache = cachetools.TTLCache(maxsize=10, ttl=10)
+    listener.register("service", cache, RLock())
+    cache.update({("abc",): 1})
+    mocker.patch("app.cache_invalidation.time.sleep")
+    mock_logger = mocker.Mock()
+
+    mock_redis_client = mocker.Mock()
+    mock_redis_client.pubsub.return_value.get_message.side_effect = [ConnectionError, StopListening]
+
+    def subscribe(channel):
+        assert not listener._subscribed
+        cache.update({("abc",): 1})
+
+    mock_redis_client.pubsub.return_value.subscribe.side_effect = subscribe
+
+    with pytest.raises(StopListening):
+        listener._listen(mock_redis_client, mock_logger)
+
+    assert mock_redis_client.pubsub.return_value.subscribe.call_count == 2
+    assert mock_logger.exception.call_count == 1
+    assert dict(cache) == {}
+
+
+def test_listener_not_started_if_disabled(notify_api, mocker, mock_redis):
+    mock_thread = mocker.patch("app.cache_invalidation.threading.Thread")
+    listener = CacheInvalidationListener()
+
+    with set_config(notify_api, "SERIALISED_MODEL_CACHE_INVALIDATION_ENABLED", False):
+        listener.ensure_started()
+
+    assert not mock_thread.called
+    assert not listener.listening
+
+
+def test_listener_started_once_per_process(notify_api, mocker, mock_redis):
+    mock_thread = mocker.patch("app.cache_invalidation.threading.Thread")
+    listener = CacheInvalidationListener()
+
+    with set_config(notify_api, "SERIALISED_MODEL_CACHE_INVALIDATION_ENABLED", True):
+        listener.ensure_started()
+        listener.ensure_started()
+
+    assert mock_thread.call_count == 1
+    mock_thread.return_value.start.assert_called_once_with()
+
+    # a forked process needs its own listener
+    mocker.patch("app.cache_invalidation.os.getpid", return_value=-1)
+    with set_config(notify_api, "SERIALISED_MODEL_CACHE_INVALIDATION_ENABLED", True):
+        listener.ensure_started()
+
+    assert mock_thread.call_count == 2
+
+
+@pytest.mark.parametrize("listening, expected_calls", [(False, 2), (True, 1)])
+def test_memory_cache_invalidated_by_caches_for_longer_while_listening(mocker, listening, expected_calls):
+    mocker.patch.object(cache_invalidation_listener, "ensure_started")
+    mocker.patch.object(CacheInvalidationListener, "listening", new_callable=PropertyMock, return_value=listening)
+    expensive = mocker.Mock()
+
+    class Model:
+        @classmethod
+        # a ttl of 0 means nothing is cached unless the longer lived cache is used
+        @memory_cache(ttl=0, invalidated_by="model")
+        def from_id(cls, model_id):
+            expensive(model_id)
+
+    Model.from_id("abc")
+    Model.from_id("abc")
+
+    assert expensive.call_count == expected_calls
@@ -4,8 +4,8 @@ from unittest.mock import ANY, call
 import pytest
 from freezegun import freeze_time
 
-from app.serialised_models import SerialisedTemplate, memory_cache
-from tests.app.db import create_template
+from app.serialised_models import SerialisedEmailBranding, SerialisedTemplate, memory_cache
+from tests.app.db import create_email_branding, create_template
 
 EXPECTED_TEMPLATE_ATTRIBUTES = {
     "archived",
@@ -217,3 +217,23 @@ def test_memory_cache_on_non_class_method(mocker):
 
     with pytest.raises(TypeError):
         Model().not_a_classmethod("foo")
+
+
+def test_email_branding_caches_in_redis_with_correct_keys(notify_db_session, mocker):
+    mock_redis_set = mocker.patch("app.serialised_models.redis_cache.redis_client.set")
+    email_branding = create_email_branding(logo="logo.png")
+
+    serialised_email_branding = SerialisedEmailBranding.from_id(email_branding.id)
+
+    mock_redis_set.assert_called_once_with(f"api-email_branding-{email_branding.id}", ANY, ex=2419200, skippable=True)
+    assert json.loads(mock_redis_set.call_args_list[0][0][1]) == {
+        "data": {
+            "alt_text": None,
+            "brand_type": "org",
+            "colour": "blue",
+            "id": str(email_branding.id),
+            "logo": "logo.png",
+            "text": "DisplayName",
+        }
+    }
+    assert serialised_email_branding.logo_url == "http://static-logos.notify.tools/logo.png"